@@ -1235,6 +1235,7 @@ class LLMChat {
    */
   int32_t SampleTokenFromLogits(NDArray logits_on_device,
                                 picojson::object generation_config = picojson::object()) {
+    auto tsample_start = std::chrono::high_resolution_clock::now();
     // prepare generation settings
     // the generation_config will not override the original config
     // since is only used for this generation
@@ -1278,6 +1279,7 @@ class LLMChat {
     }
     auto tend = std::chrono::high_resolution_clock::now();
     this->sample_total_time += static_cast<double>((tend - tstart).count()) / 1e9;
+    this->last_sample_time = static_cast<double>((tend - tsample_start).count()) / 1e9;
     return next_token;
   }
 
@@ -1634,6 +1636,8 @@ class LLMChat {
   double embed_total_time = 0;
   double decode_total_time = 0;
   double sample_total_time = 0;
+  // the time of the last sampling, including the logits processing before it
+  double last_sample_time = 0;
   double prefill_total_time = 0;
   int64_t decode_total_tokens = 0;
   int64_t prefill_total_tokens = 0;
@@ -1855,6 +1859,10 @@ class LLMChatModule : public ModuleNode {
       return PackedFunc([this, sptr_to_self](TVMArgs args, TVMRetValue* rv) {
         *rv = GetChat()->VerboseRuntimeStatsText();
       });
+    } else if (name == "last_sample_time") {
+      return PackedFunc([this, sptr_to_self](TVMArgs args, TVMRetValue* rv) {
+        *rv = GetChat()->last_sample_time;
+      });
     } else if (name == "reset_runtime_stats") {
       return PackedFunc(
           [this, sptr_to_self](TVMArgs args, TVMRetValue* rv) { GetChat()->ResetRuntimeStats(); });
@@ -11,9 +11,16 @@
 
 #include <atomic>
 #include <condition_variable>
+#include <cstring>
 #include <mutex>
+#include <string>
+#include <unordered_map>
+#include <utility>
 
+#include "../streamer.h"
+#include "../tokenizers.h"
 #include "engine.h"
+#include "event_trace_recorder.h"
 #include "request.h"
 
 namespace mlc {
@@ -29,8 +36,14 @@ class AsyncThreadedEngineImpl : public AsyncThreadedEngine, public ModuleNode {
   TVM_MODULE_VTABLE_BEGIN("mlc.serve.async_threaded_engine");
   TVM_MODULE_VTABLE_ENTRY("add_request", &AsyncThreadedEngineImpl::AddRequest);
   TVM_MODULE_VTABLE_ENTRY("abort_request", &AsyncThreadedEngineImpl::AbortRequest);
+  TVM_MODULE_VTABLE_ENTRY("embed_tokens", &AsyncThreadedEngineImpl::EmbedTokens);
+  TVM_MODULE_VTABLE_ENTRY("metrics", &AsyncThreadedEngineImpl::Metrics);
   TVM_MODULE_VTABLE_ENTRY("run_background_loop", &AsyncThreadedEngineImpl::RunBackgroundLoop);
   TVM_MODULE_VTABLE_ENTRY("exit_background_loop", &AsyncThreadedEngineImpl::ExitBackgroundLoop);
+  TVM_MODULE_VTABLE_ENTRY("enable_background_detokenization",
+                          &AsyncThreadedEngineImpl::EnableBackgroundDetokenization);
+  TVM_MODULE_VTABLE_ENTRY("pop_detokenized_stream_outputs",
+                          &AsyncThreadedEngineImpl::PopDetokenizedStreamOutputs);
   if (_name == "init_background_engine") {
     return PackedFunc([_self](TVMArgs args, TVMRetValue* rv) -> void {
       SelfPtr self = static_cast<SelfPtr>(_self.get());
@@ -39,7 +52,74 @@ class AsyncThreadedEngineImpl : public AsyncThreadedEngine, public ModuleNode {
   }
   TVM_MODULE_VTABLE_END();
 
-  void InitBackgroundEngine(TVMArgs args) { background_engine_ = CreateEnginePacked(args); }
+  void InitBackgroundEngine(TVMArgs args) {
+    if (!detokenizer_.defined()) {
+      SetBackgroundEngine(CreateEnginePacked(args));
+      return;
+    }
+    // Replace the request stream callback (the 5th argument) with the
+    // internal callback that detokenizes outputs on the background thread.
+    static constexpr int kRequestStreamCallbackIndex = 4;
+    static constexpr int kTraceRecorderIndex = 5;
+    CHECK_GT(args.size(), kTraceRecorderIndex) << "Incorrect number of arguments.";
+    trace_recorder_ = args.At<Optional<EventTraceRecorder>>(kTraceRecorderIndex);
+    detokenize_callback_ = PackedFunc([this](TVMArgs args, TVMRetValue* rv) {
+      this->DetokenizeStreamOutputs(args[0]);
+    });
+    std::vector<TVMValue> values(args.values, args.values + args.size());
+    std::vector<int> type_codes(args.type_codes, args.type_codes + args.size());
+    TVMArgsSetter setter(values.data(), type_codes.data());
+    setter(kRequestStreamCallbackIndex, detokenize_callback_);
+    SetBackgroundEngine(
+        CreateEnginePacked(TVMArgs(values.data(), type_codes.data(), values.size())));
+  }
+
+  void EnableBackgroundDetokenization(const String& tokenizer_path,
+                                      PackedFunc wakeup_callback) final {
+    CHECK(background_engine_ == nullptr)
+        << "Background detokenization must be enabled before the background engine is "
+           "initialized.";
+    detokenizer_ = Tokenizer::FromPath(tokenizer_path);
+    wakeup_callback_ = std::move(wakeup_callback);
+  }
+
+  Array<ObjectRef> PopDetokenizedStreamOutputs() final {
+    std::vector<DetokenizedOutput> outputs;
+    {
+      std::lock_guard<std::mutex> lock(output_mutex_);
+      outputs.swap(pending_outputs_);
+      pending_output_index_.clear();
+      wakeup_pending_ = false;
+    }
+
+    int num_outputs = outputs.size();
+    Array<String> request_ids;
+    Array<String> delta_texts;
+    std::vector<int64_t> num_delta_tokens;
+    Array<ObjectRef> delta_logprob_token_ids;
+    Array<ObjectRef> delta_logprobs;
+    Array<ObjectRef> finish_reasons;
+    request_ids.reserve(num_outputs);
+    delta_texts.reserve(num_outputs);
+    num_delta_tokens.reserve(num_outputs);
+    delta_logprob_token_ids.reserve(num_outputs);
+    delta_logprobs.reserve(num_outputs);
+    finish_reasons.reserve(num_outputs);
+    for (DetokenizedOutput& output : outputs) {
+      request_ids.push_back(std::move(output.request_id));
+      delta_texts.push_back(std::move(output.delta_text));
+      num_delta_tokens.push_back(output.num_delta_tokens);
+      delta_logprob_token_ids.push_back(std::move(output.delta_logprob_token_ids));
+      delta_logprobs.push_back(std::move(output.delta_logprobs));
+      finish_reasons.push_back(std::move(output.finish_reason));
+    }
+    return {request_ids,
+            delta_texts,
+            IntTuple(std::move(num_delta_tokens)),
+            delta_logprob_token_ids,
+            delta_logprobs,
+            finish_reasons};
+  }
 
   void AddRequest(Request request) final {
     {
@@ -59,10 +139,30 @@ class AsyncThreadedEngineImpl : public AsyncThreadedEngine, public ModuleNode {
     cv_.notify_one();
   }
 
+  void EmbedTokens(IntTuple token_ids, PackedFunc callback) final {
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      embeddings_to_compute_.emplace_back(std::move(token_ids), std::move(callback));
+      ++pending_operation_cnt_;
+    }
+    cv_.notify_one();
+  }
+
+  String Metrics() final {
+    // The engine is released by the background loop on exit, so it is only accessed
+    // from other threads while holding the mutex.
+    std::lock_guard<std::mutex> lock(mutex_);
+    if (background_engine_ == nullptr) {
+      return "{}";
+    }
+    return background_engine_->Metrics();
+  }
+
   void RunBackgroundLoop() final {
     // The local vectors that load the requests in critical regions.
     std::vector<Request> local_requests_to_add;
     std::vector<String> local_requests_to_abort;
+    std::vector<std::pair<IntTuple, PackedFunc>> local_embeddings_to_compute;
 
     while (!exit_now_.load(std::memory_order_relaxed)) {
       {
@@ -74,18 +174,64 @@ class AsyncThreadedEngineImpl : public AsyncThreadedEngine, public ModuleNode {
 
         local_requests_to_add = requests_to_add_;
         local_requests_to_abort = requests_to_abort_;
+        local_embeddings_to_compute.swap(embeddings_to_compute_);
         requests_to_add_.clear();
         requests_to_abort_.clear();
         pending_operation_cnt_ = 0;
       }
       for (Request request : local_requests_to_add) {
+        if (detokenizer_.defined()) {
+          // Each sequence of a request generating multiple sequences is streamed separately.
+          int num_choices = request->generation_cfg->n;
+          for (int i = 0; i < num_choices; ++i) {
+            text_streamers_.emplace(GetChoiceRequestId(request->id, i),
+                                    TextStreamer(detokenizer_.value()));
+          }
+          if (num_choices > 1) {
+            request_num_choices_[request->id] = num_choices;
+          }
+        }
         background_engine_->AddRequest(request);
       }
       for (String request_id : local_requests_to_abort) {
+        // Aborting a request generating multiple sequences drops the streamers of all of them.
+        auto it = request_num_choices_.find(request_id);
+        if (it != request_num_choices_.end()) {
+          for (int i = 0; i < it->second; ++i) {
+            text_streamers_.erase(GetChoiceRequestId(request_id, i));
+          }
+          request_num_choices_.erase(it);
+        }
+        text_streamers_.erase(request_id);
         background_engine_->AbortRequest(request_id);
       }
+      for (const auto& [token_ids, callback] : local_embeddings_to_compute) {
+        callback(background_engine_->EmbedTokens(token_ids));
+      }
+      local_embeddings_to_compute.clear();
       background_engine_->Step();
     }
+
+    // Release the engine with its models and KV cache on the thread driving it, so that
+    // the device memory is freed at exit rather than when the module is destructed. The
+    // callbacks into the frontend are released as well, as they refer back to the module.
+    std::unique_ptr<Engine> engine;
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      engine = std::move(background_engine_);
+    }
+    engine.reset();
+    text_streamers_.clear();
+    request_num_choices_.clear();
+    detokenize_callback_ = nullptr;
+    wakeup_callback_ = nullptr;
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      requests_to_add_.clear();
+      requests_to_abort_.clear();
+      embeddings_to_compute_.clear();
+      pending_operation_cnt_ = 0;
+    }
   }
 
   void ExitBackgroundLoop() final {
@@ -97,7 +243,135 @@ class AsyncThreadedEngineImpl : public AsyncThreadedEngine, public ModuleNode {
   }
 
  private:
-  /*! \brief The background normal engine for request processing. */
+  /*! \brief Set the background engine, which other threads read while holding the mutex. */
+  void SetBackgroundEngine(std::unique_ptr<Engine> engine) {
+    std::lock_guard<std::mutex> lock(mutex_);
+    background_engine_ = std::move(engine);
+  }
+
+  /*!
+   * \brief Drop the number of sequences of the request that a finished sequence belongs
+   * to, once all the sequences of the request have finished.
+   * \param choice_request_id The id of the finished sequence.
+   */
+  void OnSequenceFinished(const String& choice_request_id) {
+    auto it = request_num_choices_.find(choice_request_id);
+    if (it == request_num_choices_.end()) {
+      // The sequences other than the first one are suffixed with "#<index>".
+      const std::string& id = choice_request_id;
+      size_t pos = id.rfind('#');
+      if (pos == std::string::npos) {
+        return;
+      }
+      it = request_num_choices_.find(String(id.substr(0, pos)));
+      if (it == request_num_choices_.end()) {
+        return;
+      }
+    }
+    for (int i = 0; i < it->second; ++i) {
+      if (text_streamers_.count(GetChoiceRequestId(it->first, i))) {
+        return;
+      }
+    }
+    request_num_choices_.erase(it);
+  }
+
+  /*! \brief A detokenized delta output of a request, possibly coalesced from multiple steps. */
+  struct DetokenizedOutput {
+    String request_id;
+    std::string delta_text;
+    int64_t num_delta_tokens = 0;
+    Optional<NDArray> delta_logprob_token_ids;
+    Optional<NDArray> delta_logprobs;
+    Optional<String> finish_reason;
+  };
+
+  /*! \brief Concatenate two 2-dim CPU arrays with the same number of columns by rows. */
+  static NDArray ConcatRows(const NDArray& a, const NDArray& b) {
+    ICHECK_EQ(a->ndim, 2);
+    ICHECK_EQ(b->ndim, 2);
+    ICHECK_EQ(a->shape[1], b->shape[1]);
+    NDArray ret = NDArray::Empty({a->shape[0] + b->shape[0], a->shape[1]}, a->dtype, a->device);
+    size_t a_nbytes = GetDataSize(*a.operator->());
+    std::memcpy(ret->data, a->data, a_nbytes);
+    std::memcpy(static_cast<char*>(ret->data) + a_nbytes, b->data, GetDataSize(*b.operator->()));
+    return ret;
+  }
+
+  /*!
+   * \brief The request stream callback of the background engine in background
+   * detokenization mode. It detokenizes the delta outputs on the background
+   * thread, merges them into the output buffer and wakes up the consumer
+   * when the buffer was empty.
+   */
+  void DetokenizeStreamOutputs(Array<RequestStreamOutput> delta_outputs) {
+    std::vector<DetokenizedOutput> detokenized_outputs;
+    detokenized_outputs.reserve(delta_outputs.size());
+    for (const RequestStreamOutput& delta_output : delta_outputs) {
+      auto it = text_streamers_.find(delta_output->request_id);
+      if (it == text_streamers_.end()) {
+        // The request has been aborted.
+        continue;
+      }
+      RECORD_EVENT(trace_recorder_, delta_output->request_id, "start detokenization");
+      const IntTuple& delta_token_ids = delta_output->delta_token_ids;
+      DetokenizedOutput output;
+      output.request_id = delta_output->request_id;
+      output.delta_text = it->second->Put(
+          {delta_token_ids->data, delta_token_ids->data + delta_token_ids->size});
+      output.num_delta_tokens = delta_token_ids->size;
+      output.delta_logprob_token_ids = delta_output->delta_logprob_token_ids;
+      output.delta_logprobs = delta_output->delta_logprobs;
+      output.finish_reason = delta_output->finish_reason;
+      if (delta_output->finish_reason.defined()) {
+        output.delta_text += it->second->Finish();
+        text_streamers_.erase(it);
+        OnSequenceFinished(delta_output->request_id);
+      }
+      RECORD_EVENT(trace_recorder_, delta_output->request_id, "finish detokenization");
+      detokenized_outputs.push_back(std::move(output));
+    }
+    if (detokenized_outputs.empty()) {
+      return;
+    }
+
+    bool need_wakeup = false;
+    {
+      std::lock_guard<std::mutex> lock(output_mutex_);
+      for (DetokenizedOutput& output : detokenized_outputs) {
+        auto it = pending_output_index_.find(output.request_id);
+        if (it == pending_output_index_.end()) {
+          pending_output_index_.emplace(output.request_id, pending_outputs_.size());
+          pending_outputs_.push_back(std::move(output));
+          continue;
+        }
+        // Coalesce with the output of previous steps not yet consumed.
+        DetokenizedOutput& pending = pending_outputs_[it->second];
+        pending.delta_text += output.delta_text;
+        pending.num_delta_tokens += output.num_delta_tokens;
+        if (pending.delta_logprobs.defined() && output.delta_logprobs.defined()) {
+          pending.delta_logprob_token_ids = ConcatRows(pending.delta_logprob_token_ids.value(),
+                                                       output.delta_logprob_token_ids.value());
+          pending.delta_logprobs =
+              ConcatRows(pending.delta_logprobs.value(), output.delta_logprobs.value());
+        }
+        pending.finish_reason = std::move(output.finish_reason);
+      }
+      need_wakeup = !wakeup_pending_;
+      wakeup_pending_ = true;
+    }
+    // NOTE: Invoke the wakeup callback outside the critical region, since
+    // the callback may acquire the GIL, while the consumer may hold the GIL
+    // when popping the outputs.
+    if (need_wakeup) {
+      wakeup_callback_();
+    }
+  }
+
+  /*!
+   * \brief The background normal engine for request processing. It is set and released
+   * while holding `mutex_`, so that `Metrics` can read it from other threads.
+   */
   std::unique_ptr<Engine> background_engine_;
 
   /*! \brief The mutex ensuring only one thread can access critical regions. */
@@ -120,11 +394,46 @@ class AsyncThreadedEngineImpl : public AsyncThreadedEngine, public ModuleNode {
    * the threaded engine in the background loop.
    */
   std::vector<String> requests_to_abort_;
+  /*!
+   * \brief The token ids to embed, each with the callback receiving the embeddings.
+   * Elements are sended from other threads and consumed by
+   * the threaded engine in the background loop.
+   */
+  std::vector<std::pair<IntTuple, PackedFunc>> embeddings_to_compute_;
   /*!
    * \brief Number of pending operations, should be the size of
-   * `requests_to_add_` and `requests_to_abort_`.
+   * `requests_to_add_`, `requests_to_abort_` and `embeddings_to_compute_`.
    */
   std::atomic<int> pending_operation_cnt_ = 0;
+
+  /************** Background Detokenization **************/
+  /*! \brief The tokenizer for detokenization. Defined only in background detokenization mode. */
+  Optional<Tokenizer> detokenizer_;
+  /*! \brief The callback to notify the consumer that new outputs are buffered. */
+  PackedFunc wakeup_callback_;
+  /*! \brief The internal request stream callback passed to the background engine. */
+  PackedFunc detokenize_callback_;
+  /*! \brief The event trace recorder for requests. */
+  Optional<EventTraceRecorder> trace_recorder_;
+  /*!
+   * \brief The text streamer of each unfinished request.
+   * Only accessed by the background engine thread.
+   */
+  std::unordered_map<String, TextStreamer> text_streamers_;
+  /*!
+   * \brief The number of sequences of each unfinished request generating multiple
+   * sequences, whose streamers are keyed by the ids of the sequences.
+   * Only accessed by the background engine thread.
+   */
+  std::unordered_map<String, int> request_num_choices_;
+  /*! \brief The mutex guarding the detokenized output buffer. */
+  std::mutex output_mutex_;
+  /*! \brief The buffered detokenized outputs that are not consumed yet. */
+  std::vector<DetokenizedOutput> pending_outputs_;
+  /*! \brief The mapping from request id to its position in `pending_outputs_`. */
+  std::unordered_map<String, int> pending_output_index_;
+  /*! \brief A boolean flag denoting if the consumer has been notified and not consumed yet. */
+  bool wakeup_pending_ = false;
 };
 
 TVM_REGISTER_GLOBAL("mlc.serve.create_threaded_engine").set_body_typed([]() {
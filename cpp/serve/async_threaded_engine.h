@@ -30,7 +30,10 @@ class AsyncThreadedEngine {
  public:
   virtual ~AsyncThreadedEngine() = default;
 
-  /*! \brief Starts the background request processing loop. */
+  /*!
+   * \brief Starts the background request processing loop. The background engine
+   * is released when the loop exits.
+   */
   virtual void RunBackgroundLoop() = 0;
 
   /*!
@@ -45,6 +48,51 @@ class AsyncThreadedEngine {
 
   /*! \brief Abort the input request (specified by id string) from engine. */
   virtual void AbortRequest(const String& request_id) = 0;
+
+  /*!
+   * \brief Compute the token embeddings of the input token ids on the
+   * background engine thread, in between engine steps.
+   * \param token_ids The token ids to embed.
+   * \param callback The callback function invoked on the background thread
+   * with the embeddings on CPU.
+   * \sa Engine::EmbedTokens
+   */
+  virtual void EmbedTokens(IntTuple token_ids, PackedFunc callback) = 0;
+
+  /*!
+   * \brief Get the metrics of the background engine in JSON string.
+   * \sa Engine::Metrics
+   */
+  virtual String Metrics() = 0;
+
+  /*!
+   * \brief Enable the detokenization of request stream outputs on the
+   * background engine thread. This method must be invoked before the
+   * background engine is initialized.
+   * In this mode, the engine detokenizes the delta tokens of each request
+   * right after each engine step, and accumulates the detokenized outputs
+   * in a buffer. The wakeup callback is invoked (with no argument) only
+   * when the buffer turns from empty to non-empty, and the buffered outputs
+   * are fetched in batch via `PopDetokenizedStreamOutputs`. Outputs of
+   * multiple engine steps are coalesced when the consumer falls behind.
+   * \param tokenizer_path The tokenizer path for detokenization.
+   * \param wakeup_callback The callback function to notify the consumer.
+   */
+  virtual void EnableBackgroundDetokenization(const String& tokenizer_path,
+                                              PackedFunc wakeup_callback) = 0;
+
+  /*!
+   * \brief Pop all the buffered detokenized stream outputs.
+   * \return The buffered outputs in six parallel columns:
+   * - the request ids (Array<String>),
+   * - the delta texts (Array<String>),
+   * - the numbers of delta tokens (IntTuple),
+   * - the logprob token ids of delta tokens (Array<Optional<NDArray>>),
+   * - the logprobs of delta tokens (Array<Optional<NDArray>>),
+   * - the finish reasons (Array<Optional<String>>).
+   * \sa PackLogProbs
+   */
+  virtual Array<ObjectRef> PopDetokenizedStreamOutputs() = 0;
 };
 
 }  // namespace serve
@@ -29,6 +29,11 @@ GenerationConfig::GenerationConfig(String config_json_str) {
   ObjectPtr<GenerationConfigNode> n = make_object<GenerationConfigNode>();
 
   picojson::object config = config_json.get<picojson::object>();
+  if (config.count("n")) {
+    CHECK(config["n"].is<int64_t>());
+    n->n = config["n"].get<int64_t>();
+    CHECK_GE(n->n, 1) << "The number of sequences to generate must be positive.";
+  }
   if (config.count("temperature")) {
     CHECK(config["temperature"].is<double>());
     n->temperature = config["temperature"].get<double>();
@@ -37,6 +42,10 @@ GenerationConfig::GenerationConfig(String config_json_str) {
     CHECK(config["top_p"].is<double>());
     n->top_p = config["top_p"].get<double>();
   }
+  if (config.count("top_k")) {
+    CHECK(config["top_k"].is<int64_t>());
+    n->top_k = config["top_k"].get<int64_t>();
+  }
   if (config.count("frequency_penalty")) {
     CHECK(config["frequency_penalty"].is<double>());
     n->frequency_penalty = config["frequency_penalty"].get<double>();
@@ -124,6 +133,17 @@ GenerationConfig::GenerationConfig(String config_json_str) {
     }
     n->stop_token_ids = std::move(stop_token_ids);
   }
+  if (config.count("response_format")) {
+    CHECK(config["response_format"].is<picojson::object>())
+        << "Invalid response_format. Response format should be an object";
+    picojson::object response_format = config["response_format"].get<picojson::object>();
+    if (response_format.count("type")) {
+      CHECK(response_format["type"].is<std::string>());
+      n->response_format.type = response_format["type"].get<std::string>();
+      CHECK(n->response_format.type == "text" || n->response_format.type == "json_object")
+          << "Unsupported response format type " << n->response_format.type;
+    }
+  }
 
   // Params for benchmarking. Not the part of openai spec.
   if (config.count("ignore_eos")) {
@@ -135,8 +155,10 @@ GenerationConfig::GenerationConfig(String config_json_str) {
 
 String GenerationConfigNode::AsJSONString() const {
   picojson::object config;
+  config["n"] = picojson::value(static_cast<int64_t>(this->n));
   config["temperature"] = picojson::value(this->temperature);
   config["top_p"] = picojson::value(this->top_p);
+  config["top_k"] = picojson::value(static_cast<int64_t>(this->top_k));
   config["frequency_penalty"] = picojson::value(this->frequency_penalty);
   config["presence_penalty"] = picojson::value(this->presence_penalty);
   config["repetition_penalty"] = picojson::value(this->repetition_penalty);
@@ -163,6 +185,10 @@ String GenerationConfigNode::AsJSONString() const {
   }
   config["stop_token_ids"] = picojson::value(stop_token_ids_arr);
 
+  picojson::object response_format;
+  response_format["type"] = picojson::value(this->response_format.type);
+  config["response_format"] = picojson::value(response_format);
+
   // Params for benchmarking. Not the part of openai spec.
   config["ignore_eos"] = picojson::value(this->ignore_eos);
 
@@ -174,12 +200,13 @@ String GenerationConfigNode::AsJSONString() const {
 TVM_REGISTER_OBJECT_TYPE(KVCacheConfigNode);
 
 KVCacheConfig::KVCacheConfig(int page_size, int max_num_sequence, int max_total_sequence_length,
-                             int prefill_chunk_size) {
+                             int prefill_chunk_size, int prefix_cache_max_num_entries) {
   ObjectPtr<KVCacheConfigNode> n = make_object<KVCacheConfigNode>();
   n->page_size = page_size;
   n->max_num_sequence = max_num_sequence;
   n->max_total_sequence_length = max_total_sequence_length;
   n->prefill_chunk_size = prefill_chunk_size;
+  n->prefix_cache_max_num_entries = prefix_cache_max_num_entries;
   data_ = std::move(n);
 }
 
@@ -188,6 +215,7 @@ KVCacheConfig::KVCacheConfig(const std::string& config_str, int max_single_seque
   int max_total_sequence_length;
   int max_num_sequence = -1;
   int prefill_chunk_size;
+  int prefix_cache_max_num_entries = 0;
 
   picojson::value config_json;
   std::string err = picojson::parse(config_json, config_str);
@@ -220,6 +248,12 @@ KVCacheConfig::KVCacheConfig(const std::string& config_str, int max_single_seque
     CHECK(config["max_num_sequence"].is<int64_t>());
     max_num_sequence = config["max_num_sequence"].get<int64_t>();
   }
+  if (config.count("prefix_cache_max_num_entries")) {
+    CHECK(config["prefix_cache_max_num_entries"].is<int64_t>());
+    prefix_cache_max_num_entries = config["prefix_cache_max_num_entries"].get<int64_t>();
+    CHECK_GE(prefix_cache_max_num_entries, 0)
+        << "The prefix cache max number of entries should be non-negative.";
+  }
 
   if (max_num_sequence == -1) {
     max_num_sequence = max_total_sequence_length / max_single_sequence_length;
@@ -230,6 +264,7 @@ KVCacheConfig::KVCacheConfig(const std::string& config_str, int max_single_seque
   n->max_num_sequence = max_num_sequence;
   n->max_total_sequence_length = max_total_sequence_length;
   n->prefill_chunk_size = prefill_chunk_size;
+  n->prefix_cache_max_num_entries = prefix_cache_max_num_entries;
   data_ = std::move(n);
 }
 
@@ -240,6 +275,8 @@ String KVCacheConfigNode::AsJSONString() const {
   config["max_total_sequence_length"] =
       picojson::value(static_cast<int64_t>(this->max_total_sequence_length));
   config["prefill_chunk_size"] = picojson::value(static_cast<int64_t>(this->prefill_chunk_size));
+  config["prefix_cache_max_num_entries"] =
+      picojson::value(static_cast<int64_t>(this->prefix_cache_max_num_entries));
   return picojson::value(config).serialize(true);
 }
 
@@ -247,16 +284,20 @@ String KVCacheConfigNode::AsJSONString() const {
 
 TVM_REGISTER_OBJECT_TYPE(EngineModeNode);
 
-EngineMode::EngineMode(bool enable_speculative, int spec_draft_length) {
+EngineMode::EngineMode(bool enable_speculative, int spec_draft_length, String scheduler) {
   ObjectPtr<EngineModeNode> n = make_object<EngineModeNode>();
   n->enable_speculative = enable_speculative;
   n->spec_draft_length = spec_draft_length;
+  n->scheduler = std::move(scheduler);
   data_ = std::move(n);
 }
 
 EngineMode::EngineMode(const std::string& config_str) {
   bool enable_speculative = false;
   int spec_draft_length = 4;
+  bool spec_adaptive_draft_length = true;
+  int spec_max_draft_length = 8;
+  std::string scheduler = "fcfs";
 
   picojson::value config_json;
   std::string err = picojson::parse(config_json, config_str);
@@ -274,10 +315,27 @@ EngineMode::EngineMode(const std::string& config_str) {
     CHECK(config["spec_draft_length"].is<int64_t>());
     spec_draft_length = config["spec_draft_length"].get<int64_t>();
   }
+  if (config.count("spec_adaptive_draft_length")) {
+    CHECK(config["spec_adaptive_draft_length"].is<bool>());
+    spec_adaptive_draft_length = config["spec_adaptive_draft_length"].get<bool>();
+  }
+  if (config.count("spec_max_draft_length")) {
+    CHECK(config["spec_max_draft_length"].is<int64_t>());
+    spec_max_draft_length = config["spec_max_draft_length"].get<int64_t>();
+  }
+  CHECK_GT(spec_draft_length, 0) << "The speculative draft length should be positive.";
+  CHECK_GT(spec_max_draft_length, 0) << "The maximum speculative draft length should be positive.";
+  if (config.count("scheduler")) {
+    CHECK(config["scheduler"].is<std::string>());
+    scheduler = config["scheduler"].get<std::string>();
+  }
 
   ObjectPtr<EngineModeNode> n = make_object<EngineModeNode>();
   n->enable_speculative = enable_speculative;
   n->spec_draft_length = spec_draft_length;
+  n->spec_adaptive_draft_length = spec_adaptive_draft_length;
+  n->spec_max_draft_length = spec_max_draft_length;
+  n->scheduler = scheduler;
   data_ = std::move(n);
 }
 
@@ -285,6 +343,11 @@ String EngineModeNode::AsJSONString() const {
   picojson::object config;
   config["enable_speculative"] = picojson::value(static_cast<bool>(this->enable_speculative));
   config["spec_draft_length"] = picojson::value(static_cast<int64_t>(this->spec_draft_length));
+  config["spec_adaptive_draft_length"] =
+      picojson::value(static_cast<bool>(this->spec_adaptive_draft_length));
+  config["spec_max_draft_length"] =
+      picojson::value(static_cast<int64_t>(this->spec_max_draft_length));
+  config["scheduler"] = picojson::value(std::string(this->scheduler));
   return picojson::value(config).serialize(true);
 }
 
@@ -9,6 +9,8 @@
 #include <tvm/runtime/container/string.h>
 #include <tvm/runtime/object.h>
 
+#include <algorithm>
+
 namespace mlc {
 namespace llm {
 namespace serve {
@@ -17,11 +19,24 @@ using namespace tvm::runtime;
 
 /****************** GenerationConfig ******************/
 
+/*! \brief The response format of a request. */
+struct ResponseFormat {
+  /*! \brief "text", or "json_object" to constrain the output to be a JSON object. */
+  String type = "text";
+};
+
 /*! \brief The generation configuration of a request. */
 class GenerationConfigNode : public Object {
  public:
+  /*!
+   * \brief The number of sequences to generate for the request. The sequences are
+   * forked from the request after its prompt is prefilled, sharing the prompt KV data.
+   */
+  int n = 1;
   double temperature = 0.8;
   double top_p = 0.95;
+  /*! \brief The number of most probable tokens kept for sampling. Non-positive disables it. */
+  int top_k = -1;
   double frequency_penalty = 0.0;
   double presence_penalty = 0.0;
   double repetition_penalty = 1.0;
@@ -35,6 +50,8 @@ class GenerationConfigNode : public Object {
   Array<String> stop_strs;
   std::vector<int> stop_token_ids;
 
+  ResponseFormat response_format;
+
   String AsJSONString() const;
 
   static constexpr const char* _type_key = "mlc.serve.GenerationConfig";
@@ -59,6 +76,8 @@ class KVCacheConfigNode : public Object {
   int max_num_sequence;
   int max_total_sequence_length;
   int prefill_chunk_size;
+  /*! \brief The maximum number of prompts kept in the prefix cache. 0 disables the cache. */
+  int prefix_cache_max_num_entries = 0;
 
   String AsJSONString() const;
 
@@ -71,7 +90,7 @@ class KVCacheConfigNode : public Object {
 class KVCacheConfig : public ObjectRef {
  public:
   explicit KVCacheConfig(int page_size, int max_num_sequence, int max_total_sequence_length,
-                         int prefill_chunk_size);
+                         int prefill_chunk_size, int prefix_cache_max_num_entries = 0);
 
   explicit KVCacheConfig(const std::string& config_str, int max_single_sequence_length);
 
@@ -85,8 +104,27 @@ class EngineModeNode : public Object {
  public:
   /* Whether the speculative decoding mode is enabled */
   bool enable_speculative;
-  /* The number of tokens to generate in speculative proposal (draft) */
+  /*
+   * The number of tokens to generate in speculative proposal (draft). It is the
+   * initial draft length of requests when the draft length is adaptive.
+   */
   int spec_draft_length;
+  /* Whether the draft length of each request adapts to its draft acceptance rate */
+  bool spec_adaptive_draft_length = true;
+  /* The maximum draft length of requests when the draft length is adaptive */
+  int spec_max_draft_length = 8;
+  /*
+   * The policy deciding the order of admitting waiting requests and preempting
+   * running requests. It is one of "fcfs", "shortest_prompt_first", "priority"
+   * and "fair_share".
+   */
+  String scheduler = "fcfs";
+
+  /*! \brief Get the maximum number of draft tokens of a request in one speculation step. */
+  int GetMaxDraftLength() const {
+    return spec_adaptive_draft_length ? std::max(spec_draft_length, spec_max_draft_length)
+                                      : spec_draft_length;
+  }
 
   String AsJSONString() const;
 
@@ -98,7 +136,7 @@ class EngineModeNode : public Object {
 
 class EngineMode : public ObjectRef {
  public:
-  explicit EngineMode(bool enable_speculative, int spec_draft_length);
+  explicit EngineMode(bool enable_speculative, int spec_draft_length, String scheduler = "fcfs");
 
   explicit EngineMode(const std::string& config_str);
 
@@ -6,6 +6,9 @@
 
 #include <tvm/runtime/registry.h>
 
+#include <algorithm>
+#include <cmath>
+
 #include "model.h"
 
 namespace mlc {
@@ -79,62 +82,27 @@ TVM_REGISTER_GLOBAL("mlc.serve.TokenDataGetTokenIds").set_body_typed([](TokenDat
 
 /****************** SampleResult ******************/
 
-/*! \brief Convert a single token with probability to JSON string. */
-inline void TokenToLogProbJSON(const Tokenizer& tokenizer, const TokenProbPair& token_prob,
-                               std::ostringstream* os) {
-  const std::string& token = tokenizer->TokenTable()[token_prob.first];
-
-  (*os) << "\"token\": \"";
-  for (char ch : token) {
-    if (ch >= 33 && ch <= 126) {
-      // The character is in ASCII visible range.
-      // Handle escape characters in JSON.
-      if (ch == '"') {
-        (*os) << "\\\"";
-      } else if (ch == '\\') {
-        (*os) << "\\\\";
-      } else {
-        (*os) << ch;
-      }
-    }
-  }
-  (*os) << "\", ";
-  (*os) << "\"logprob\": " << std::log(std::max(token_prob.second, 1e-10f)) << ", ";
-  (*os) << "\"bytes\": [";
-  int token_len = token.size();
-  for (int pos = 0; pos < token_len; ++pos) {
-    (*os) << static_cast<int>(static_cast<u_char>(token[pos]));
-    if (pos != token_len - 1) {
-      (*os) << ", ";
-    }
-  }
-  (*os) << "]";
-}
-
-std::string SampleResult::GetLogProbJSON(const Tokenizer& tokenizer, bool logprob) const {
-  ICHECK(top_prob_tokens.empty() || logprob);
-  if (!logprob) {
-    // Logprob is not needed.
-    return "";
-  }
-
-  std::ostringstream os;
-  os << "{";
-  // - Convert the sampled token to JSON.
-  TokenToLogProbJSON(tokenizer, sampled_token_id, &os);
-  // - Convert the tokens with top probabilities.
-  os << ", \"top_logprobs\": [";
-  int num_top = top_prob_tokens.size();
-  for (int i = 0; i < num_top; ++i) {
-    os << "{";
-    TokenToLogProbJSON(tokenizer, top_prob_tokens[i], &os);
-    os << "}";
-    if (i != num_top - 1) {
-      os << ", ";
+std::pair<NDArray, NDArray> PackLogProbs(const std::vector<SampleResult>& sample_results,
+                                         int num_top_logprobs) {
+  int num_tokens = sample_results.size();
+  int num_columns = 1 + num_top_logprobs;
+  DLDevice device_cpu{DLDeviceType::kDLCPU, /*device_id=*/0};
+  NDArray token_ids = NDArray::Empty({num_tokens, num_columns}, DataType::Int(32), device_cpu);
+  NDArray logprobs = NDArray::Empty({num_tokens, num_columns}, DataType::Float(32), device_cpu);
+  int32_t* p_token_ids = static_cast<int32_t*>(token_ids->data);
+  float* p_logprobs = static_cast<float*>(logprobs->data);
+  auto f_pack = [&p_token_ids, &p_logprobs](const TokenProbPair& token_prob) {
+    *p_token_ids++ = token_prob.first;
+    *p_logprobs++ = std::log(std::max(token_prob.second, 1e-10f));
+  };
+  for (const SampleResult& result : sample_results) {
+    ICHECK_EQ(static_cast<int>(result.top_prob_tokens.size()), num_top_logprobs);
+    f_pack(result.sampled_token_id);
+    for (const TokenProbPair& token_prob : result.top_prob_tokens) {
+      f_pack(token_prob);
     }
   }
-  os << "]}";
-  return os.str();
+  return {token_ids, logprobs};
 }
 
 /****************** RequestStreamOutput ******************/
@@ -143,12 +111,14 @@ TVM_REGISTER_OBJECT_TYPE(RequestStreamOutputObj);
 
 RequestStreamOutput::RequestStreamOutput(String request_id,
                                          const std::vector<int32_t>& delta_token_ids,
-                                         Optional<Array<String>> delta_logprob_json_strs,
+                                         Optional<NDArray> delta_logprob_token_ids,
+                                         Optional<NDArray> delta_logprobs,
                                          Optional<String> finish_reason) {
   ObjectPtr<RequestStreamOutputObj> n = make_object<RequestStreamOutputObj>();
   n->request_id = std::move(request_id);
   n->delta_token_ids = IntTuple{delta_token_ids.begin(), delta_token_ids.end()};
-  n->delta_logprob_json_strs = std::move(delta_logprob_json_strs);
+  n->delta_logprob_token_ids = std::move(delta_logprob_token_ids);
+  n->delta_logprobs = std::move(delta_logprobs);
   n->finish_reason = std::move(finish_reason);
   data_ = std::move(n);
 }
@@ -156,7 +126,8 @@ RequestStreamOutput::RequestStreamOutput(String request_id,
 TVM_REGISTER_GLOBAL("mlc.serve.RequestStreamOutputUnpack")
     .set_body_typed([](RequestStreamOutput output) {
       return Array<ObjectRef>{output->request_id, output->delta_token_ids,
-                              output->delta_logprob_json_strs, output->finish_reason};
+                              output->delta_logprob_token_ids, output->delta_logprobs,
+                              output->finish_reason};
     });
 
 }  // namespace serve
@@ -103,17 +103,20 @@ struct SampleResult {
   TokenProbPair sampled_token_id;
   /*! \brief The token id and probability of the tokens with top probabilities. */
   std::vector<TokenProbPair> top_prob_tokens;
-
-  /*!
-   * \brief Get the logprob JSON string of this token with regard
-   * to OpenAI API at https://platform.openai.com/docs/api-reference/chat/object.
-   * \param tokenizer The tokenizer for token table lookup.
-   * \param logprob A boolean indicating if need to return log probability.
-   * \return A JSON string that conforms to the logprob spec in OpenAI API.
-   */
-  std::string GetLogProbJSON(const Tokenizer& tokenizer, bool logprob) const;
 };
 
+/*!
+ * \brief Pack the logprobs of sampling results into two CPU arrays, which
+ * are returned to Python without converting each token to a string.
+ * \param sample_results The sampling results of the tokens.
+ * \param num_top_logprobs The number of tokens with top probabilities of each result.
+ * \return The token ids (int32) and logprobs (float32), both in shape
+ * `(num_tokens, 1 + num_top_logprobs)`. In each row, the first column is the
+ * sampled token and the other columns are the tokens with top probabilities.
+ */
+std::pair<NDArray, NDArray> PackLogProbs(const std::vector<SampleResult>& sample_results,
+                                         int num_top_logprobs);
+
 /****************** RequestStreamOutput ******************/
 
 /*!
@@ -129,8 +132,15 @@ class RequestStreamOutputObj : public Object {
    * for the input request.
    */
   IntTuple delta_token_ids;
-  /*! \brief The logprobs JSON strings of the new generated tokens since last invocation. */
-  Optional<Array<String>> delta_logprob_json_strs;
+  /*!
+   * \brief The ids of the new generated tokens and their top tokens since last
+   * invocation, in shape `(num_tokens, 1 + top_logprobs)`. Defined only when
+   * logprobs are requested.
+   * \sa PackLogProbs
+   */
+  Optional<NDArray> delta_logprob_token_ids;
+  /*! \brief The logprobs corresponding to `delta_logprob_token_ids`. */
+  Optional<NDArray> delta_logprobs;
   /*!
    * \brief The finish reason of the request when it is finished,
    * of None if the request has not finished yet.
@@ -150,7 +160,8 @@ class RequestStreamOutputObj : public Object {
 class RequestStreamOutput : public ObjectRef {
  public:
   explicit RequestStreamOutput(String request_id, const std::vector<int32_t>& delta_token_ids,
-                               Optional<Array<String>> delta_logprob_json_strs,
+                               Optional<NDArray> delta_logprob_token_ids,
+                               Optional<NDArray> delta_logprobs,
                                Optional<String> finish_reason);
 
   TVM_DEFINE_OBJECT_REF_METHODS(RequestStreamOutput, ObjectRef, RequestStreamOutputObj);
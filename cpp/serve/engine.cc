@@ -12,6 +12,7 @@
 #include <tvm/runtime/registry.h>
 #include <tvm/runtime/threading_backend.h>
 
+#include <mutex>
 #include <tuple>
 
 #include "../tokenizers.h"
@@ -19,6 +20,7 @@
 #include "engine_actions/action_commons.h"
 #include "engine_state.h"
 #include "event_trace_recorder.h"
+#include "grammar/grammar_state_matcher.h"
 #include "logit_processor.h"
 #include "model.h"
 #include "request.h"
@@ -52,6 +54,7 @@ class EngineImpl : public Engine {
     this->max_single_sequence_length_ = max_single_sequence_length;
     this->kv_cache_config_ = KVCacheConfig(kv_cache_config_json_str, max_single_sequence_length);
     this->engine_mode_ = EngineMode(engine_mode_json_str);
+    this->estate_->scheduler = RequestScheduler::Create(engine_mode_->scheduler);
     this->request_stream_callback_ = std::move(request_stream_callback);
     this->trace_recorder_ = trace_recorder;
     this->tokenizer_ = Tokenizer::FromPath(tokenizer_path);
@@ -72,13 +75,18 @@ class EngineImpl : public Engine {
           << this->max_single_sequence_length_;
       this->models_.push_back(model);
     }
+    if (kv_cache_config_->prefix_cache_max_num_entries > 0) {
+      this->estate_->prefix_cache = PrefixCache(kv_cache_config_->prefix_cache_max_num_entries,
+                                                kv_cache_config_->page_size);
+    }
     int max_logit_processor_num_token = kv_cache_config_->max_num_sequence;
     if (engine_mode_->enable_speculative) {
-      max_logit_processor_num_token *= engine_mode_->spec_draft_length;
+      max_logit_processor_num_token *= engine_mode_->GetMaxDraftLength();
     }
     LogitProcessor logit_processor =
         this->models_[0]->CreateLogitProcessor(max_logit_processor_num_token, trace_recorder);
-    Sampler sampler = Sampler::Create(/*sampler_kind=*/"cpu", trace_recorder_);
+    Sampler sampler =
+        this->models_[0]->CreateSampler(kv_cache_config_->max_num_sequence, trace_recorder_);
     // Step 3. Initialize engine actions that represent state transitions.
     if (this->engine_mode_->enable_speculative) {
       // Speculative decoding is only possible for more than one model.
@@ -90,7 +98,7 @@ class EngineImpl : public Engine {
                                           this->kv_cache_config_,  //
                                           this->trace_recorder_),
           EngineAction::BatchDraft(this->models_, logit_processor, sampler, this->trace_recorder_,
-                                   this->engine_mode_->spec_draft_length),
+                                   this->engine_mode_),
           EngineAction::BatchVerify(this->models_, logit_processor, sampler, this->kv_cache_config_,
                                     this->trace_recorder_)};
     } else {
@@ -104,6 +112,8 @@ class EngineImpl : public Engine {
     }
     // Step 4. Automatically set the threading backend max concurrency.
     SetThreadMaxConcurrency();
+    num_total_pages_ = models_[0]->GetNumAvailablePages();
+    PublishMetrics();
   }
 
   void Reset() final {
@@ -111,6 +121,7 @@ class EngineImpl : public Engine {
     for (Model model : models_) {
       model->Reset();
     }
+    PublishMetrics();
   }
 
   bool Empty() final { return estate_->request_states.empty(); }
@@ -130,11 +141,28 @@ class EngineImpl : public Engine {
     // Get a request copy where all text inputs are tokenized.
     request = Request::FromUntokenized(request, tokenizer_);
     ICHECK_NE(request->input_total_length, -1);
+    CHECK_LE(request->generation_cfg->n, kv_cache_config_->max_num_sequence)
+        << "ValueError: The number of sequences to generate " << request->generation_cfg->n
+        << " exceeds the maximum number of sequences " << kv_cache_config_->max_num_sequence;
     // Append to the waiting queue and create the request state.
+    RequestState rstate(request, models_.size(), estate_->id_manager.GetNewId(), token_table_,
+                        CreateGrammarStateMatcher(request));
+    // Create the states of the other sequences, which are forked after prefill.
+    for (int i = 1; i < request->generation_cfg->n; ++i) {
+      ObjectPtr<GenerationConfigNode> generation_cfg =
+          make_object<GenerationConfigNode>(*request->generation_cfg.get());
+      generation_cfg->n = 1;
+      generation_cfg->seed = request->generation_cfg->seed + i;
+      Request child(GetChoiceRequestId(request->id, i), request->inputs,
+                    GenerationConfig(generation_cfg), request->priority, request->tenant);
+      RequestState child_rstate(child, models_.size(), /*internal_id=*/-1, token_table_,
+                                CreateGrammarStateMatcher(child));
+      child_rstate->tadd = rstate->tadd;
+      rstate->children_to_fork.push_back(child_rstate);
+    }
     estate_->waiting_queue.push_back(request);
-    estate_->request_states.emplace(
-        request->id,
-        RequestState(request, models_.size(), estate_->id_manager.GetNewId(), token_table_));
+    estate_->request_states.emplace(request->id, std::move(rstate));
+    estate_->metrics.num_requests_added += 1;
   }
 
   void AbortRequest(const String& request_id) final {
@@ -168,6 +196,7 @@ class EngineImpl : public Engine {
       // The request to abort is in waiting queue
       estate_->waiting_queue.erase(it_waiting);
     }
+    estate_->metrics.num_requests_aborted += 1;
   }
 
   /*********************** Engine Action ***********************/
@@ -175,20 +204,112 @@ class EngineImpl : public Engine {
   void Step() final {
     CHECK(request_stream_callback_.defined())
         << "The request stream callback is not set. Engine cannot execute.";
+    estate_->metrics.waiting_queue_size.Observe(estate_->waiting_queue.size());
+    estate_->metrics.running_batch_size.Observe(estate_->running_queue.size());
+    EngineStats stats_before = estate_->stats;
+    int64_t num_generated_tokens_before = estate_->metrics.num_generated_tokens;
     for (EngineAction action : actions_) {
       Array<Request> processed_requests = action->Step(estate_);
       if (!processed_requests.empty()) {
-        ActionStepPostProcess(processed_requests, estate_, models_, tokenizer_,
-                              request_stream_callback_.value(), max_single_sequence_length_);
+        ActionStepPostProcess(processed_requests, estate_, models_,
+                              request_stream_callback_.value(), max_single_sequence_length_,
+                              trace_recorder_);
+        RecordStepThroughput(stats_before, num_generated_tokens_before);
+        PublishMetrics();
         return;
       }
     }
     ICHECK(estate_->running_queue.empty())
         << "Internal assumption violated: It is expected that an engine step takes at least one "
            "action (e.g. prefill, decode, etc.) but it does not.";
+    PublishMetrics();
+  }
+
+  NDArray EmbedTokens(IntTuple token_ids) final {
+    CHECK_GT(token_ids.size(), 0) << "ValueError: No token to embed.";
+    CHECK_LE(token_ids.size(), kv_cache_config_->prefill_chunk_size)
+        << "ValueError: The number of tokens to embed " << token_ids.size()
+        << " exceeds the prefill chunk size " << kv_cache_config_->prefill_chunk_size;
+    // Copy the embeddings out right away, since the device buffer is reused by later steps.
+    return models_[0]->TokenEmbed(token_ids).CopyTo(DLDevice{kDLCPU, 0});
+  }
+
+  String Metrics() final {
+    EngineMetrics metrics;
+    EngineStats stats;
+    double kv_cache_utilization;
+    int num_waiting_requests;
+    int num_running_requests;
+    {
+      std::lock_guard<std::mutex> lock(metrics_mutex_);
+      metrics = published_metrics_;
+      stats = published_stats_;
+      kv_cache_utilization = published_kv_cache_utilization_;
+      num_waiting_requests = published_num_waiting_requests_;
+      num_running_requests = published_num_running_requests_;
+    }
+
+    picojson::object counters;
+    counters["requests_added"] = picojson::value(metrics.num_requests_added);
+    counters["requests_finished"] = picojson::value(metrics.num_requests_finished);
+    counters["requests_aborted"] = picojson::value(metrics.num_requests_aborted);
+    counters["prefill_tokens"] = picojson::value(stats.engine_total_prefill_length);
+    counters["generated_tokens"] = picojson::value(metrics.num_generated_tokens);
+    counters["prefill_time"] = picojson::value(stats.engine_total_prefill_time);
+    counters["decode_time"] = picojson::value(stats.engine_total_decode_time);
+    picojson::object gauges;
+    gauges["waiting_requests"] = picojson::value(static_cast<int64_t>(num_waiting_requests));
+    gauges["running_requests"] = picojson::value(static_cast<int64_t>(num_running_requests));
+    gauges["kv_cache_utilization"] = picojson::value(kv_cache_utilization);
+    picojson::object histograms;
+    histograms["waiting_queue_size"] = picojson::value(metrics.waiting_queue_size.AsJSON());
+    histograms["running_batch_size"] = picojson::value(metrics.running_batch_size.AsJSON());
+    histograms["time_to_first_token"] = picojson::value(metrics.time_to_first_token.AsJSON());
+    histograms["inter_token_latency"] = picojson::value(metrics.inter_token_latency.AsJSON());
+    histograms["request_latency"] = picojson::value(metrics.request_latency.AsJSON());
+    histograms["prefill_throughput"] = picojson::value(metrics.prefill_throughput.AsJSON());
+    histograms["decode_throughput"] = picojson::value(metrics.decode_throughput.AsJSON());
+    picojson::object config;
+    config["counters"] = picojson::value(counters);
+    config["gauges"] = picojson::value(gauges);
+    config["histograms"] = picojson::value(histograms);
+    return picojson::value(config).serialize(true);
   }
 
  private:
+  /*! \brief Record the number of tokens processed per second in the last engine step. */
+  void RecordStepThroughput(const EngineStats& stats_before, int64_t num_generated_tokens_before) {
+    const EngineStats& stats = estate_->stats;
+    double prefill_time = stats.engine_total_prefill_time - stats_before.engine_total_prefill_time;
+    double decode_time = stats.engine_total_decode_time - stats_before.engine_total_decode_time;
+    if (prefill_time > 0) {
+      estate_->metrics.prefill_throughput.Observe(
+          (stats.engine_total_prefill_length - stats_before.engine_total_prefill_length) /
+          prefill_time);
+    }
+    if (decode_time > 0) {
+      estate_->metrics.decode_throughput.Observe(
+          (estate_->metrics.num_generated_tokens - num_generated_tokens_before) / decode_time);
+    }
+  }
+
+  /*!
+   * \brief Copy the metrics for `Metrics` to read from other threads. The copy is
+   * of constant size, and the metrics are serialized only when they are read.
+   */
+  void PublishMetrics() {
+    double kv_cache_utilization =
+        num_total_pages_ > 0
+            ? 1.0 - static_cast<double>(models_[0]->GetNumAvailablePages()) / num_total_pages_
+            : 0.0;
+    std::lock_guard<std::mutex> lock(metrics_mutex_);
+    published_metrics_ = estate_->metrics;
+    published_stats_ = estate_->stats;
+    published_kv_cache_utilization_ = kv_cache_utilization;
+    published_num_waiting_requests_ = estate_->waiting_queue.size();
+    published_num_running_requests_ = estate_->running_queue.size();
+  }
+
   /*! \brief Set the maximum threading backend concurrency. */
   void SetThreadMaxConcurrency() {
     int host_cpu_usage = 1;
@@ -200,6 +321,29 @@ class EngineImpl : public Engine {
         std::max(max_concurrency - host_cpu_usage, 1), kv_cache_config_->max_num_sequence));
   }
 
+  /*! \brief Create the grammar state matcher if the output of the request is constrained. */
+  Optional<GrammarStateMatcher> CreateGrammarStateMatcher(const Request& request) {
+    if (request->generation_cfg->response_format.type == "json_object") {
+      return CreateJSONGrammarStateMatcher();
+    }
+    return NullOpt;
+  }
+
+  /*!
+   * \brief Create a matcher of the JSON grammar. The grammar is preprocessed against the token
+   * table at the first call, and the result is shared by all matchers afterwards.
+   */
+  GrammarStateMatcher CreateJSONGrammarStateMatcher() {
+    if (json_grammar_init_ctx_ == nullptr) {
+      json_grammar_init_ctx_ =
+          GrammarStateMatcher::CreateInitContext(BNFGrammar::GetGrammarOfJSON(), token_table_);
+    }
+    // Draft tokens are fed to the matcher and rolled back after verification.
+    int max_rollback_steps =
+        engine_mode_->enable_speculative ? engine_mode_->GetMaxDraftLength() : 0;
+    return GrammarStateMatcher(json_grammar_init_ctx_, max_rollback_steps);
+  }
+
   // Engine state, managing requests and request states.
   EngineState estate_;
   // Configurations and singletons
@@ -208,6 +352,8 @@ class EngineImpl : public Engine {
   int max_single_sequence_length_;
   Tokenizer tokenizer_;
   std::vector<std::string> token_table_;
+  // The preprocessed JSON grammar, created at the first request of JSON mode.
+  std::shared_ptr<GrammarStateInitContext> json_grammar_init_ctx_;
   // Models
   Array<Model> models_;
   // Request stream callback function
@@ -216,6 +362,15 @@ class EngineImpl : public Engine {
   Array<EngineAction> actions_;
   // Event trace recorder.
   Optional<EventTraceRecorder> trace_recorder_;
+  // The number of KV cache pages of the first model.
+  int num_total_pages_ = 0;
+  // The metrics published by the engine thread for `Metrics` to read.
+  std::mutex metrics_mutex_;
+  EngineMetrics published_metrics_;
+  EngineStats published_stats_;
+  double published_kv_cache_utilization_ = 0.0;
+  int published_num_waiting_requests_ = 0;
+  int published_num_running_requests_ = 0;
 };
 
 std::unique_ptr<Engine> Engine::Create(
@@ -297,8 +452,10 @@ class EngineModule : public ModuleNode {
   TVM_MODULE_VTABLE_ENTRY_PACKED("init", &EngineModule::InitPacked);
   TVM_MODULE_VTABLE_ENTRY("add_request", &EngineModule::AddRequest);
   TVM_MODULE_VTABLE_ENTRY("abort_request", &EngineModule::Abort);
+  TVM_MODULE_VTABLE_ENTRY("embed_tokens", &EngineModule::EmbedTokens);
   TVM_MODULE_VTABLE_ENTRY("step", &EngineModule::Step);
   TVM_MODULE_VTABLE_ENTRY("stats", &EngineModule::Stats);
+  TVM_MODULE_VTABLE_ENTRY("metrics", &EngineModule::Metrics);
   TVM_MODULE_VTABLE_ENTRY("reset", &EngineModule::Reset);
   TVM_MODULE_VTABLE_ENTRY("get_request_stream_callback", &EngineModule::GetRequestStreamCallback);
   TVM_MODULE_VTABLE_ENTRY("set_request_stream_callback", &EngineModule::SetRequestStreamCallback);
@@ -312,6 +469,8 @@ class EngineModule : public ModuleNode {
   void AddRequest(Request request) { return GetEngine()->AddRequest(std::move(request)); }
   /*! \brief Redirection to `Engine::AbortRequest`. */
   void Abort(const String& request_id) { return GetEngine()->AbortRequest(request_id); }
+  /*! \brief Redirection to `Engine::EmbedTokens`. */
+  NDArray EmbedTokens(IntTuple token_ids) { return GetEngine()->EmbedTokens(token_ids); }
   /*! \brief Redirection to `Engine::Step`. */
   void Step() { return GetEngine()->Step(); }
   /*! \brief Redirection to `Engine::GetRequestStreamCallback`. */
@@ -326,6 +485,8 @@ class EngineModule : public ModuleNode {
   void Reset() { return GetEngine()->Reset(); }
   /*! \brief Redirection to `Engine::Stats` */
   String Stats() { return GetEngine()->Stats(); }
+  /*! \brief Redirection to `Engine::Metrics` */
+  String Metrics() { return GetEngine()->Metrics(); }
 
  private:
   Engine* GetEngine() {
@@ -79,6 +79,14 @@ class Engine {
   /*! \brief Get the statistics of the Engine in JSON string. */
   virtual String Stats() = 0;
 
+  /*!
+   * \brief Get the metrics of the Engine for monitoring in JSON string, which
+   * contains "counters", "gauges" and "histograms". The metrics are updated at
+   * each engine step. Different from other methods, it is safe to call this
+   * method from threads other than the engine-driving thread.
+   */
+  virtual String Metrics() = 0;
+
   /*! \brief Get the request stream callback function of the engine. */
   virtual Optional<PackedFunc> GetRequestStreamCallback() = 0;
 
@@ -93,6 +101,16 @@ class Engine {
   /*! \brief Abort the input request (specified by id string) from engine. */
   virtual void AbortRequest(const String& request_id) = 0;
 
+  /*!
+   * \brief Compute the token embeddings of the input token ids with the first
+   * model in one pass. The token ids of multiple inputs can be concatenated
+   * into one call, since the KV cache is neither read nor written.
+   * \param token_ids The token ids to embed, whose number must not exceed
+   * the prefill chunk size.
+   * \return The embeddings on CPU in shape (1, num_tokens, hidden_size).
+   */
+  virtual NDArray EmbedTokens(IntTuple token_ids) = 0;
+
   /*********************** Engine Action ***********************/
 
   /*!
@@ -86,12 +86,12 @@ class EngineAction : public ObjectRef {
    * models, the `Step` function of the created action will not take effect.
    * \param sampler The sampler to sample new tokens.
    * \param trace_recorder The event trace recorder for requests.
-   * \param draft_length The number of draft proposal rounds.
+   * \param engine_mode The engine mode deciding the number of draft tokens of each request.
    * \return The created action object.
    */
   static EngineAction BatchDraft(Array<Model> models, LogitProcessor logit_processor,
                                  Sampler sampler, Optional<EventTraceRecorder> trace_recorder,
-                                 int draft_length = 4);
+                                 EngineMode engine_mode);
 
   /*!
    * \brief Create the action that runs one-step speculative verification for requests in the
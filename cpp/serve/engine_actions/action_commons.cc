@@ -5,6 +5,10 @@
 
 #include "action_commons.h"
 
+#include <algorithm>
+#include <sstream>
+#include <tuple>
+
 namespace mlc {
 namespace llm {
 namespace serve {
@@ -14,10 +18,71 @@ void RemoveRequestFromModel(EngineState estate, int64_t req_internal_id, Array<M
   for (Model model : models) {
     model->RemoveSequence(req_internal_id);
   }
+  // Release the prefix cache entry that the request was forked from.
+  if (estate->prefix_cache.defined()) {
+    estate->prefix_cache.value()->OnSequenceRemoved(req_internal_id);
+  }
+}
+
+bool EvictPrefixCacheEntry(EngineState estate, const Array<Model>& models) {
+  if (!estate->prefix_cache.defined()) {
+    return false;
+  }
+  return estate->prefix_cache.value()->EvictLRU(estate, models);
+}
+
+/*!
+ * \brief Record the draft acceptance of a finished request in the engine statistics
+ * and the event trace.
+ */
+void RecordDraftAcceptance(const RequestState& rstate, EngineState estate,
+                           const Optional<EventTraceRecorder>& trace_recorder) {
+  const DraftAcceptanceStats& draft_stats = rstate->draft_stats;
+  if (draft_stats.total_num_proposed == 0) {
+    return;
+  }
+  double acceptance_rate =
+      static_cast<double>(draft_stats.total_num_accepted) / draft_stats.total_num_proposed;
+  int bucket = std::min(static_cast<int>(acceptance_rate * EngineStats::kNumAcceptanceRateBuckets),
+                        EngineStats::kNumAcceptanceRateBuckets - 1);
+  ++estate->stats.spec_request_acceptance_rate_histogram[bucket];
+
+  if (trace_recorder.defined()) {
+    std::ostringstream os;
+    os << "draft acceptance histogram [";
+    for (int i = 0; i < static_cast<int>(draft_stats.accept_histogram.size()); ++i) {
+      os << (i > 0 ? ", " : "") << draft_stats.accept_histogram[i];
+    }
+    os << "], last draft length " << draft_stats.draft_length;
+    trace_recorder.value()->AddEvent(rstate->request->id, os.str());
+  }
+}
+
+/*! \brief Record the latency metrics of returning new tokens of a request. */
+void RecordTokenReturnMetrics(const RequestState& rstate, EngineState estate, int num_tokens) {
+  auto tnow = std::chrono::high_resolution_clock::now();
+  EngineMetrics& metrics = estate->metrics;
+  if (!rstate->tlast_token_return.has_value()) {
+    metrics.time_to_first_token.Observe(
+        static_cast<double>((tnow - rstate->tadd).count()) / 1e9);
+    // The tokens returned together with the first token have no inter-token latency.
+    if (num_tokens > 1) {
+      metrics.inter_token_latency.Observe(0.0, num_tokens - 1);
+    }
+  } else {
+    // Tokens returned in one step, e.g., accepted draft tokens, share the step latency.
+    metrics.inter_token_latency.Observe(
+        static_cast<double>((tnow - rstate->tlast_token_return.value()).count()) / 1e9 /
+            num_tokens,
+        num_tokens);
+  }
+  rstate->tlast_token_return = tnow;
+  metrics.num_generated_tokens += num_tokens;
 }
 
 void ProcessFinishedRequest(Array<Request> finished_requests, EngineState estate,
-                            Array<Model> models, int max_single_sequence_length) {
+                            Array<Model> models, int max_single_sequence_length,
+                            const Optional<EventTraceRecorder>& trace_recorder) {
   // - Remove the finished request.
   for (Request request : finished_requests) {
     // Remove from running queue.
@@ -32,10 +97,14 @@ void ProcessFinishedRequest(Array<Request> finished_requests, EngineState estate
     estate->request_states.erase(request->id);
 
     // Update engine statistics.
+    RecordDraftAcceptance(state, estate, trace_recorder);
     int num_input_tokens = request->input_total_length;
     int num_output_tokens = state->mstates[0]->committed_tokens.size() - 1;
     estate->stats.current_total_seq_len -= num_input_tokens + num_output_tokens;
     auto trequest_finish = std::chrono::high_resolution_clock::now();
+    estate->metrics.num_requests_finished += 1;
+    estate->metrics.request_latency.Observe(
+        static_cast<double>((trequest_finish - state->tadd).count()) / 1e9);
     estate->stats.request_total_prefill_time +=
         static_cast<double>((state->tprefill_finish - state->tadd).count()) / 1e9;
     estate->stats.total_prefill_length += num_input_tokens;
@@ -46,9 +115,9 @@ void ProcessFinishedRequest(Array<Request> finished_requests, EngineState estate
 }
 
 void ActionStepPostProcess(Array<Request> requests, EngineState estate, Array<Model> models,
-                           const Tokenizer& tokenizer,
                            FRequestStreamCallback request_stream_callback,
-                           int max_single_sequence_length) {
+                           int max_single_sequence_length,
+                           Optional<EventTraceRecorder> trace_recorder) {
   Array<Request> finished_requests;
   finished_requests.reserve(requests.size());
 
@@ -58,18 +127,27 @@ void ActionStepPostProcess(Array<Request> requests, EngineState estate, Array<Mo
   // - Collect new generated tokens and finish reasons for requests.
   for (Request request : requests) {
     RequestState rstate = estate->GetRequestState(request);
-    auto [delta_token_ids, delta_logprob_json_strs, finish_reason] =
-        rstate->GetReturnTokenIds(tokenizer, max_single_sequence_length);
+    auto [delta_token_ids, delta_sample_results, finish_reason] =
+        rstate->GetReturnTokenIds(max_single_sequence_length);
+
+    estate->scheduler->OnTokensGenerated(request, delta_token_ids.size());
+    if (!delta_token_ids.empty()) {
+      RecordTokenReturnMetrics(rstate, estate, delta_token_ids.size());
+    }
 
     // When there is no new delta tokens nor a finish reason, no need to invoke callback.
     if (delta_token_ids.empty() && !finish_reason.defined()) {
       continue;
     }
 
+    Optional<NDArray> delta_logprob_token_ids;
+    Optional<NDArray> delta_logprobs;
+    if (request->generation_cfg->logprobs) {
+      std::tie(delta_logprob_token_ids, delta_logprobs) =
+          PackLogProbs(delta_sample_results, request->generation_cfg->top_logprobs);
+    }
     callback_delta_outputs.push_back(RequestStreamOutput(
-        request->id, delta_token_ids,
-        request->generation_cfg->logprobs > 0 ? delta_logprob_json_strs : Optional<Array<String>>(),
-        finish_reason));
+        request->id, delta_token_ids, delta_logprob_token_ids, delta_logprobs, finish_reason));
     if (finish_reason.defined()) {
       finished_requests.push_back(request);
     }
@@ -79,7 +157,7 @@ void ActionStepPostProcess(Array<Request> requests, EngineState estate, Array<Mo
   request_stream_callback(callback_delta_outputs);
 
   ProcessFinishedRequest(std::move(finished_requests), std::move(estate), std::move(models),
-                         max_single_sequence_length);
+                         max_single_sequence_length, trace_recorder);
 }
 
 void PreemptLastRunningRequest(EngineState estate, const Array<Model>& models,
@@ -26,6 +26,16 @@ using namespace tvm::runtime;
  */
 void RemoveRequestFromModel(EngineState estate, int64_t req_internal_id, Array<Model> models);
 
+/*!
+ * \brief Evict the least recently used unreferenced entry of the prefix
+ * cache to free KV cache pages.
+ * \param estate The engine state that holds the prefix cache.
+ * \param models The models to remove the evicted entry from.
+ * \return A boolean denoting if any entry is evicted. Returns false when
+ * the prefix cache is disabled.
+ */
+bool EvictPrefixCacheEntry(EngineState estate, const Array<Model>& models);
+
 /*!
  * \brief The request post-processing after an engine action step.
  * It includes
@@ -35,15 +45,15 @@ void RemoveRequestFromModel(EngineState estate, int64_t req_internal_id, Array<M
  * \param requests The requests to process.
  * \param estate The engine state.
  * \param models The models to remove the finished from.
- * \param tokenizer The tokenizer for logprob process.
  * \param request_stream_callback The request stream callback function.
  * \param max_single_sequence_length The max single sequence length to help decide
  * if a request is finished.
+ * \param trace_recorder The event trace recorder for requests.
  */
 void ActionStepPostProcess(Array<Request> requests, EngineState estate, Array<Model> models,
-                           const Tokenizer& tokenizer,
                            FRequestStreamCallback request_stream_callback,
-                           int max_single_sequence_length);
+                           int max_single_sequence_length,
+                           Optional<EventTraceRecorder> trace_recorder);
 
 /*!
  * \brief Preempt the last running requests from `running_queue`,
@@ -39,8 +39,11 @@ class BatchDecodeActionObj : public EngineActionObj {
 
     // Preempt requests when decode cannot apply.
     int num_available_pages = models_[0]->GetNumAvailablePages();
+    // Cached prefixes are evicted before any running request is preempted.
     while (!CanDecode(estate->running_queue.size())) {
-      PreemptLastRunningRequest(estate, models_, trace_recorder_);
+      if (!EvictPrefixCacheEntry(estate, models_)) {
+        PreemptLastRunningRequest(estate, models_, trace_recorder_);
+      }
     }
 
     auto tstart = std::chrono::high_resolution_clock::now();
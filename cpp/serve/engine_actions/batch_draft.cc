@@ -3,6 +3,8 @@
  * \file serve/engine_actions/batch_draft.cc
  */
 
+#include <algorithm>
+
 #include "../config.h"
 #include "../model.h"
 #include "../sampler.h"
@@ -21,13 +23,13 @@ namespace serve {
 class BatchDraftActionObj : public EngineActionObj {
  public:
   explicit BatchDraftActionObj(Array<Model> models, LogitProcessor logit_processor, Sampler sampler,
-                               Optional<EventTraceRecorder> trace_recorder, int draft_length)
+                               Optional<EventTraceRecorder> trace_recorder, EngineMode engine_mode)
       : models_(std::move(models)),
         logit_processor_(std::move(logit_processor)),
         sampler_(std::move(sampler)),
         trace_recorder_(std::move(trace_recorder)),
-        draft_length_(draft_length) {
-    ICHECK_GT(draft_length_, 0);
+        engine_mode_(std::move(engine_mode)) {
+    ICHECK_GT(engine_mode_->spec_draft_length, 0);
   }
 
   Array<Request> Step(EngineState estate) final {
@@ -37,53 +39,63 @@ class BatchDraftActionObj : public EngineActionObj {
     }
 
     // Preempt requests when decode cannot apply.
+    // Cached prefixes are evicted before any running request is preempted.
     while (!CanDecode(estate->running_queue.size())) {
-      PreemptLastRunningRequest(estate, models_, trace_recorder_);
+      if (!EvictPrefixCacheEntry(estate, models_)) {
+        PreemptLastRunningRequest(estate, models_, trace_recorder_);
+      }
     }
 
     auto tstart = std::chrono::high_resolution_clock::now();
 
     // NOTE: Right now we only support decode all the running requests at a time.
     int num_requests = estate->running_queue.size();
-    Array<String> request_ids;
-    std::vector<int64_t> request_internal_ids;
-    Array<GenerationConfig> generation_cfg;
     Array<RequestState> rstates;
-    std::vector<RandomGenerator*> rngs;
-    request_ids.reserve(num_requests);
-    request_internal_ids.reserve(num_requests);
-    generation_cfg.reserve(num_requests);
+    std::vector<int> draft_lengths;
     rstates.reserve(num_requests);
+    draft_lengths.reserve(num_requests);
+    int max_draft_length = 0;
     for (const Request& request : estate->running_queue) {
       RequestState rstate = estate->GetRequestState(request);
-      request_ids.push_back(request->id);
+      // - Decide the draft length of each request.
+      rstate->draft_stats.draft_length = GetDraftLength(estate, rstate->draft_stats);
       rstates.push_back(rstate);
-      request_internal_ids.push_back(rstate->mstates[0]->internal_id);
-      generation_cfg.push_back(request->generation_cfg);
-      rngs.push_back(&rstate->rng);
+      draft_lengths.push_back(rstate->draft_stats.draft_length);
+      max_draft_length = std::max(max_draft_length, rstate->draft_stats.draft_length);
     }
 
     // The first model doesn't get involved in draft proposal.
     for (int model_id = 1; model_id < static_cast<int>(models_.size()); ++model_id) {
-      // Collect
-      // - the last committed token,
-      // - the request states,
-      // - the sampling parameters,
-      // of each request.
-      std::vector<int> input_tokens;
-      Array<RequestModelState> mstates =
-          rstates.Map([model_id](const RequestState& rstate) { return rstate->mstates[model_id]; });
-      input_tokens.reserve(num_requests);
-      // draft_length_ rounds of draft proposal.
-      for (int draft_id = 0; draft_id < draft_length_; ++draft_id) {
-        // prepare new input tokens
-        input_tokens.clear();
+      // max_draft_length rounds of draft proposal, where each round proposes one
+      // draft token for the requests whose draft is not long enough yet.
+      for (int draft_id = 0; draft_id < max_draft_length; ++draft_id) {
+        // Collect
+        // - the last committed or draft token,
+        // - the request states,
+        // - the sampling parameters,
+        // of each request in this round.
+        Array<String> request_ids;
+        std::vector<int64_t> request_internal_ids;
+        Array<GenerationConfig> generation_cfg;
+        Array<RequestModelState> mstates;
+        std::vector<RandomGenerator*> rngs;
+        std::vector<int> input_tokens;
         for (int i = 0; i < num_requests; ++i) {
+          if (draft_lengths[i] <= draft_id) {
+            continue;
+          }
+          RequestModelState mstate = rstates[i]->mstates[model_id];
+          request_ids.push_back(rstates[i]->request->id);
+          request_internal_ids.push_back(mstate->internal_id);
+          generation_cfg.push_back(rstates[i]->request->generation_cfg);
+          rngs.push_back(&rstates[i]->rng);
           // The first draft proposal uses the last committed token.
-          input_tokens.push_back(
-              draft_id == 0 ? mstates[i]->committed_tokens.back().sampled_token_id.first
-                            : mstates[i]->draft_output_tokens.back().sampled_token_id.first);
+          input_tokens.push_back(draft_id == 0
+                                     ? mstate->committed_tokens.back().sampled_token_id.first
+                                     : mstate->draft_output_tokens.back().sampled_token_id.first);
+          mstates.push_back(mstate);
         }
+        int num_round_requests = input_tokens.size();
 
         // - Compute embeddings.
         RECORD_EVENT(trace_recorder_, request_ids, "start proposal embedding");
@@ -92,9 +104,9 @@ class BatchDraftActionObj : public EngineActionObj {
         RECORD_EVENT(trace_recorder_, request_ids, "finish proposal embedding");
         ICHECK_EQ(embeddings->ndim, 3);
         ICHECK_EQ(embeddings->shape[0], 1);
-        ICHECK_EQ(embeddings->shape[1], num_requests);
-        embeddings =
-            embeddings.CreateView({num_requests, 1, embeddings->shape[2]}, embeddings->dtype);
+        ICHECK_EQ(embeddings->shape[1], num_round_requests);
+        embeddings = embeddings.CreateView({num_round_requests, 1, embeddings->shape[2]},
+                                           embeddings->dtype);
 
         // - Invoke model decode.
         RECORD_EVENT(trace_recorder_, request_ids, "start proposal decode");
@@ -105,7 +117,7 @@ class BatchDraftActionObj : public EngineActionObj {
         ICHECK_EQ(logits->shape[1], 1);
 
         // - Update logits.
-        logits = logits.CreateView({num_requests, logits->shape[2]}, logits->dtype);
+        logits = logits.CreateView({num_round_requests, logits->shape[2]}, logits->dtype);
         logit_processor_->InplaceUpdateLogits(logits, generation_cfg, mstates, request_ids);
 
         // - Compute probability distributions.
@@ -116,23 +128,63 @@ class BatchDraftActionObj : public EngineActionObj {
         std::vector<NDArray> prob_dist;
         std::vector<SampleResult> sample_results = sampler_->BatchSampleTokens(
             probs_device, request_ids, generation_cfg, rngs, &prob_dist);
-        ICHECK_EQ(sample_results.size(), num_requests);
+        ICHECK_EQ(sample_results.size(), num_round_requests);
 
         // - Add draft token to the state.
-        for (int i = 0; i < num_requests; ++i) {
+        for (int i = 0; i < num_round_requests; ++i) {
           mstates[i]->AddDraftToken(sample_results[i], prob_dist[i]);
           estate->stats.total_draft_length += 1;
         }
+        estate->stats.total_draft_steps += 1;
       }
     }
 
     auto tend = std::chrono::high_resolution_clock::now();
-    estate->stats.engine_total_decode_time += static_cast<double>((tend - tstart).count()) / 1e9;
+    double draft_time = static_cast<double>((tend - tstart).count()) / 1e9;
+    estate->stats.engine_total_decode_time += draft_time;
+    estate->stats.engine_total_draft_time += draft_time;
 
     return {};
   }
 
  private:
+  /*!
+   * \brief Get the number of draft tokens to propose for a request in this step.
+   * \details With each draft token accepted independently at the acceptance rate `a`
+   * of the request, a draft of length `k` commits `1 + a + ... + a^(k-1)` tokens in
+   * expectation, as the first rejected draft token is replaced by a token sampled from
+   * the verify model. It costs `k` draft model steps and one verification. The draft
+   * length maximizing the expected tokens per unit of time is chosen, which drops to 1
+   * when speculation does not pay off. A step of draft length 1 is a plain decode step
+   * of the verify model plus one draft model step, which keeps the KV cache of the
+   * draft model in sync and keeps measuring the acceptance rate of the request.
+   */
+  int GetDraftLength(const EngineState& estate, const DraftAcceptanceStats& draft_stats) const {
+    if (!engine_mode_->spec_adaptive_draft_length || draft_stats.total_num_proposed == 0) {
+      return engine_mode_->spec_draft_length;
+    }
+    // The time of a draft model step relative to a verification before they are measured.
+    constexpr double kDefaultDraftCostRatio = 0.2;
+    double acceptance_rate = draft_stats.GetAcceptanceRate();
+    double draft_cost_ratio = estate->stats.GetDraftCostRatio(kDefaultDraftCostRatio);
+
+    int best_draft_length = 1;
+    double best_throughput = 0.0;
+    double expected_num_tokens = 0.0;
+    double prob_all_accepted = 1.0;
+    for (int draft_length = 1; draft_length <= engine_mode_->GetMaxDraftLength();
+         ++draft_length) {
+      expected_num_tokens += prob_all_accepted;
+      prob_all_accepted *= acceptance_rate;
+      double throughput = expected_num_tokens / (draft_length * draft_cost_ratio + 1.0);
+      if (throughput > best_throughput) {
+        best_throughput = throughput;
+        best_draft_length = draft_length;
+      }
+    }
+    return best_draft_length;
+  }
+
   /*! \brief Check if the input requests can be decoded under conditions. */
   bool CanDecode(int num_requests) {
     // The first model is not involved in draft proposal.
@@ -154,16 +206,16 @@ class BatchDraftActionObj : public EngineActionObj {
   Sampler sampler_;
   /*! \brief Event trace recorder. */
   Optional<EventTraceRecorder> trace_recorder_;
-  /*! \brief Draft proposal length */
-  int draft_length_;
+  /*! \brief The engine mode deciding the draft length of requests. */
+  EngineMode engine_mode_;
 };
 
 EngineAction EngineAction::BatchDraft(Array<Model> models, LogitProcessor logit_processor,
                                       Sampler sampler, Optional<EventTraceRecorder> trace_recorder,
-                                      int draft_length) {
+                                      EngineMode engine_mode) {
   return EngineAction(make_object<BatchDraftActionObj>(
       std::move(models), std::move(logit_processor), std::move(sampler), std::move(trace_recorder),
-      draft_length));
+      std::move(engine_mode)));
 }
 
 }  // namespace serve
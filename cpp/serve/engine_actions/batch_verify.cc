@@ -122,6 +122,20 @@ class BatchVerifyActionObj : public EngineActionObj {
     for (int i = 0; i < num_requests; ++i) {
       const std::vector<SampleResult>& sample_results = sample_results_arr[i];
       int accept_length = sample_results.size();
+      // - Record the number of accepted draft tokens. A rejected draft token is replaced
+      // by a different token sampled from the verify model.
+      int num_accepted_drafts = 0;
+      while (num_accepted_drafts < accept_length &&
+             sample_results[num_accepted_drafts].sampled_token_id.first ==
+                 draft_output_tokens[i][num_accepted_drafts].sampled_token_id.first) {
+        ++num_accepted_drafts;
+      }
+      rstates[i]->draft_stats.Record(draft_lengths[i], num_accepted_drafts);
+      std::vector<int64_t>& accept_histogram = estate->stats.spec_accept_histogram;
+      if (static_cast<int>(accept_histogram.size()) <= num_accepted_drafts) {
+        accept_histogram.resize(num_accepted_drafts + 1, 0);
+      }
+      ++accept_histogram[num_accepted_drafts];
       for (SampleResult sample_result : sample_results) {
         rstates[i]->mstates[verify_model_id_]->CommitToken(sample_result);
         rstates[i]->mstates[draft_model_id_]->CommitToken(sample_result);
@@ -149,7 +163,10 @@ class BatchVerifyActionObj : public EngineActionObj {
     }
 
     auto tend = std::chrono::high_resolution_clock::now();
-    estate->stats.engine_total_decode_time += static_cast<double>((tend - tstart).count()) / 1e9;
+    double verify_time = static_cast<double>((tend - tstart).count()) / 1e9;
+    estate->stats.engine_total_decode_time += verify_time;
+    estate->stats.engine_total_verify_time += verify_time;
+    estate->stats.total_verify_steps += 1;
 
     return requests;
   }
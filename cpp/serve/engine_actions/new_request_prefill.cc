@@ -3,10 +3,13 @@
  * \file serve/engine_actions/new_request_prefill.cc
  */
 
+#include <numeric>
+
 #include "../config.h"
 #include "../model.h"
 #include "../sampler.h"
 #include "action.h"
+#include "action_commons.h"
 
 namespace mlc {
 namespace llm {
@@ -28,10 +31,14 @@ class NewRequestPrefillActionObj : public EngineActionObj {
         trace_recorder_(std::move(trace_recorder)) {}
 
   Array<Request> Step(EngineState estate) final {
+    // - Order the waiting and running requests by the scheduling policy.
+    estate->scheduler->SortQueues(estate);
+
     // - Find the requests in `waiting_queue` that can prefill in this step.
-    auto [requests, rstates, prefill_lengths] = GetRequestsToPrefill(estate);
+    auto [requests, rstates, prefill_lengths, prefix_matches] = GetRequestsToPrefill(estate);
     ICHECK_EQ(requests.size(), rstates.size());
     ICHECK_EQ(requests.size(), prefill_lengths.size());
+    ICHECK_EQ(requests.size(), prefix_matches.size());
     if (requests.empty()) {
       return {};
     }
@@ -46,6 +53,94 @@ class NewRequestPrefillActionObj : public EngineActionObj {
       ICHECK(it != estate->waiting_queue.end());
       estate->waiting_queue.erase(it);
       estate->running_queue.push_back(requests[i]);
+      if (rstates[i]->mstates[0]->committed_tokens.empty()) {
+        estate->scheduler->OnRequestAdmitted(estate, rstates[i]);
+      }
+    }
+
+    // - Collect the input tokens of the requests for the prefix cache, and
+    // find the checkpoints where the prefill stops to insert prefixes into the cache.
+    std::vector<std::vector<int32_t>> input_token_ids(num_requests);
+    std::vector<std::vector<int>> checkpoints(num_requests);
+    if (estate->prefix_cache.defined()) {
+      for (int i = 0; i < num_requests; ++i) {
+        if (GetInputTokenIds(rstates[i]->mstates[0]->inputs, &input_token_ids[i])) {
+          checkpoints[i] =
+              estate->prefix_cache.value()->GetCheckpoints(input_token_ids[i], prefix_matches[i]);
+        }
+      }
+    }
+
+    // - Add the sequences to the models. The sequence with a cached prefix
+    // is forked from the cache entry in all models at once.
+    for (int i = 0; i < num_requests; ++i) {
+      if (prefix_matches[i].entry_id != -1) {
+        estate->prefix_cache.value()->ForkFromEntry(estate, prefix_matches[i].entry_id,
+                                                    rstates[i]->mstates[0]->internal_id, models_);
+        continue;
+      }
+      for (int model_id = 0; model_id < static_cast<int>(models_.size()); ++model_id) {
+        models_[model_id]->AddNewSequence(rstates[i]->mstates[model_id]->internal_id);
+      }
+    }
+
+    // - Prefill the requests up to their checkpoints round by round, and insert
+    // the prefilled prefixes into the prefix cache.
+    std::vector<int> prefilled_lengths(num_requests);
+    for (int i = 0; i < num_requests; ++i) {
+      prefilled_lengths[i] = prefix_matches[i].matched_length;
+    }
+    for (int round = 0;; ++round) {
+      std::vector<int> round_requests;
+      for (int i = 0; i < num_requests; ++i) {
+        if (round < static_cast<int>(checkpoints[i].size())) {
+          round_requests.push_back(i);
+        }
+      }
+      if (round_requests.empty()) {
+        break;
+      }
+      for (int model_id = 0; model_id < static_cast<int>(models_.size()); ++model_id) {
+        Array<NDArray> embeddings;
+        std::vector<int64_t> request_internal_ids;
+        std::vector<int> lengths;
+        for (int i : round_requests) {
+          const std::vector<int32_t>& token_ids = input_token_ids[i];
+          embeddings.push_back(
+              TokenData(std::vector<int32_t>(token_ids.begin() + prefilled_lengths[i],
+                                             token_ids.begin() + checkpoints[i][round]))
+                  ->GetEmbedding(models_[model_id]));
+          request_internal_ids.push_back(rstates[i]->mstates[model_id]->internal_id);
+          lengths.push_back(checkpoints[i][round] - prefilled_lengths[i]);
+        }
+        models_[model_id]->BatchPrefill(embeddings, request_internal_ids, lengths);
+      }
+      for (int i : round_requests) {
+        int checkpoint = checkpoints[i][round];
+        const std::vector<int32_t>& token_ids = input_token_ids[i];
+        int64_t new_internal_id = estate->prefix_cache.value()->Insert(
+            estate, std::vector<int32_t>(token_ids.begin(), token_ids.begin() + checkpoint),
+            rstates[i]->mstates[0]->internal_id, models_);
+        for (RequestModelState mstate : rstates[i]->mstates) {
+          mstate->internal_id = new_internal_id;
+        }
+        prefilled_lengths[i] = checkpoint;
+      }
+    }
+
+    // - Skip the prefill of the cached and prefilled prefixes by trimming the inputs.
+    std::vector<int> remaining_lengths(num_requests);
+    for (int i = 0; i < num_requests; ++i) {
+      remaining_lengths[i] = prefill_lengths[i];
+      if (prefilled_lengths[i] == 0) {
+        continue;
+      }
+      const std::vector<int32_t>& token_ids = input_token_ids[i];
+      remaining_lengths[i] = token_ids.size() - prefilled_lengths[i];
+      for (RequestModelState mstate : rstates[i]->mstates) {
+        mstate->inputs = {TokenData(
+            std::vector<int32_t>(token_ids.begin() + prefilled_lengths[i], token_ids.end()))};
+      }
     }
 
     // - Get embedding and run prefill for each model.
@@ -57,12 +152,10 @@ class NewRequestPrefillActionObj : public EngineActionObj {
       request_internal_ids.reserve(num_requests);
       for (int i = 0; i < num_requests; ++i) {
         RequestModelState mstate = rstates[i]->mstates[model_id];
-        ICHECK_EQ(mstate->GetInputLength(), prefill_lengths[i]);
+        ICHECK_EQ(mstate->GetInputLength(), remaining_lengths[i]);
         ICHECK(mstate->draft_output_tokens.empty());
         ICHECK(mstate->draft_output_prob_dist.empty());
         ICHECK(!mstate->inputs.empty());
-        // Add the sequence to the model.
-        models_[model_id]->AddNewSequence(mstate->internal_id);
         request_internal_ids.push_back(mstate->internal_id);
         RECORD_EVENT(trace_recorder_, requests[i]->id, "start embedding");
         for (int i = 0; i < static_cast<int>(mstate->inputs.size()); ++i) {
@@ -75,7 +168,7 @@ class NewRequestPrefillActionObj : public EngineActionObj {
 
       RECORD_EVENT(trace_recorder_, request_ids, "start prefill");
       NDArray logits =
-          models_[model_id]->BatchPrefill(embeddings, request_internal_ids, prefill_lengths);
+          models_[model_id]->BatchPrefill(embeddings, request_internal_ids, remaining_lengths);
       RECORD_EVENT(trace_recorder_, request_ids, "finish prefill");
       ICHECK_EQ(logits->ndim, 3);
       ICHECK_EQ(logits->shape[0], 1);
@@ -109,10 +202,22 @@ class NewRequestPrefillActionObj : public EngineActionObj {
     NDArray probs_device =
         logit_processor_->ComputeProbsFromLogits(logits_for_sample, generation_cfg, request_ids);
 
-    // - Sample tokens.
-    std::vector<SampleResult> sample_results =
-        sampler_->BatchSampleTokens(probs_device, request_ids, generation_cfg, rngs);
-    ICHECK_EQ(sample_results.size(), num_requests);
+    // - Sample tokens. The sequences to fork from a request sample their first
+    // tokens from the distribution of the request, after the request itself.
+    std::vector<int> sample_indices(num_requests);
+    std::iota(sample_indices.begin(), sample_indices.end(), 0);
+    Array<String> sample_request_ids = request_ids;
+    for (int i = 0; i < num_requests; ++i) {
+      for (const RequestState& child : rstates[i]->children_to_fork) {
+        sample_indices.push_back(i);
+        sample_request_ids.push_back(child->request->id);
+        generation_cfg.push_back(child->request->generation_cfg);
+        rngs.push_back(&child->rng);
+      }
+    }
+    std::vector<SampleResult> sample_results = sampler_->BatchSampleTokens(
+        probs_device, sample_indices, sample_request_ids, generation_cfg, rngs);
+    ICHECK_EQ(sample_results.size(), sample_indices.size());
 
     // - Update the committed tokens of states.
     // - If a request is first-time prefilled, set the prefill finish time.
@@ -126,14 +231,42 @@ class NewRequestPrefillActionObj : public EngineActionObj {
       if (mstates_for_sample[i]->committed_tokens.size() == 1) {
         rstates[i]->tprefill_finish = tnow;
       }
-      sum_prefill_lengths += prefill_lengths[i];
+      sum_prefill_lengths += prefill_lengths[i] + prefix_matches[i].matched_length;
+      estate->stats.engine_total_prefill_length += prefill_lengths[i];
+    }
+
+    // - Fork the other sequences of the requests generating multiple sequences.
+    // The forked sequences share the prompt KV data, and join the running queue
+    // with their first sampled tokens.
+    Array<Request> processed_requests = requests;
+    int sample_pos = num_requests;
+    for (int i = 0; i < num_requests; ++i) {
+      for (RequestState child : rstates[i]->children_to_fork) {
+        int64_t child_internal_id = estate->id_manager.GetNewId();
+        for (int model_id = 0; model_id < static_cast<int>(models_.size()); ++model_id) {
+          models_[model_id]->ForkSequence(rstates[i]->mstates[model_id]->internal_id,
+                                          child_internal_id);
+          RequestModelState mstate = child->mstates[model_id];
+          mstate->internal_id = child_internal_id;
+          mstate->inputs.clear();
+          mstate->CommitToken(sample_results[sample_pos]);
+        }
+        ++sample_pos;
+        child->tprefill_finish = tnow;
+        estate->request_states.emplace(child->request->id, child);
+        estate->running_queue.push_back(child->request);
+        estate->metrics.num_requests_added += 1;
+        processed_requests.push_back(child->request);
+        sum_prefill_lengths += prefill_lengths[i] + prefix_matches[i].matched_length;
+      }
+      rstates[i]->children_to_fork.clear();
     }
     estate->stats.current_total_seq_len += sum_prefill_lengths;
 
     auto tend = std::chrono::high_resolution_clock::now();
     estate->stats.engine_total_prefill_time += static_cast<double>((tend - tstart).count()) / 1e9;
 
-    return requests;
+    return processed_requests;
   }
 
  private:
@@ -141,46 +274,109 @@ class NewRequestPrefillActionObj : public EngineActionObj {
    * \brief Find one or multiple requests to run prefill.
    * \param estate The engine state.
    * \return The requests to prefill, together with their respective
-   * state and input length.
+   * state, input length to prefill and prefix cache match.
    */
-  std::tuple<Array<Request>, Array<RequestState>, std::vector<int>> GetRequestsToPrefill(
-      EngineState estate) {
+  std::tuple<Array<Request>, Array<RequestState>, std::vector<int>,
+             std::vector<PrefixCacheObj::MatchResult>>
+  GetRequestsToPrefill(EngineState estate) {
     if (estate->waiting_queue.empty()) {
       // No request to prefill.
-      return {{}, {}, {}};
+      return {{}, {}, {}, {}};
     }
 
     // - Try to prefill pending requests.
     std::vector<Request> prefill_requests;
     std::vector<RequestState> rstates;
     std::vector<int> prefill_lengths;
+    std::vector<PrefixCacheObj::MatchResult> prefix_matches;
     int total_input_length = 0;
     int total_required_pages = 0;
+    int total_num_sequences = 0;
     int num_available_pages = models_[0]->GetNumAvailablePages();
 
     for (int i = 1; i <= static_cast<int>(estate->waiting_queue.size()); ++i) {
       Request request = estate->waiting_queue[i - 1];
       RequestState rstate = estate->GetRequestState(request);
       int input_length = rstate->mstates[0]->GetInputLength();
+      // Only the tokens after the cached prefix need prefill.
+      PrefixCacheObj::MatchResult match = MatchPrefixCache(estate, rstate);
+      input_length -= match.matched_length;
       int num_require_pages =
           (input_length + kv_cache_config_->page_size - 1) / kv_cache_config_->page_size;
+      // The sequences forked after prefill share the prompt pages.
+      int num_sequences = 1 + rstate->children_to_fork.size();
       total_input_length += input_length;
       total_required_pages += num_require_pages;
-      if (CanPrefill(estate, i, total_input_length, total_required_pages, num_available_pages)) {
+      total_num_sequences += num_sequences;
+      if (CanPrefill(estate, total_num_sequences, total_input_length, total_required_pages,
+                     num_available_pages)) {
         prefill_requests.push_back(request);
         rstates.push_back(rstate);
         prefill_lengths.push_back(input_length);
-      } else {
-        total_input_length -= input_length;
-        total_required_pages -= num_require_pages;
-        break;
+        prefix_matches.push_back(match);
+        continue;
+      }
+      total_input_length -= input_length;
+      total_required_pages -= num_require_pages;
+      total_num_sequences -= num_sequences;
+      // Free pages by evicting cached prefixes and retry the request. We only
+      // evict before any request is selected, so that the entries matched by
+      // the selected requests are kept.
+      if (prefill_requests.empty() && EvictPrefixCacheEntry(estate, models_)) {
+        num_available_pages = models_[0]->GetNumAvailablePages();
+        --i;
+        continue;
       }
+      break;
     }
 
-    return {prefill_requests, rstates, prefill_lengths};
+    // Count the lookups of the selected requests only, as a request may be
+    // looked up in multiple steps before it is prefilled.
+    if (estate->prefix_cache.defined()) {
+      for (int i = 0; i < static_cast<int>(prefill_requests.size()); ++i) {
+        ++estate->stats.prefix_cache_lookups;
+        estate->stats.prefix_cache_lookup_tokens +=
+            prefill_lengths[i] + prefix_matches[i].matched_length;
+      }
+    }
+    return {prefill_requests, rstates, prefill_lengths, prefix_matches};
+  }
+
+  /*!
+   * \brief Look up the longest cached prefix of the request inputs.
+   * Requests with non-token inputs are not looked up.
+   */
+  PrefixCacheObj::MatchResult MatchPrefixCache(EngineState estate, RequestState rstate) {
+    std::vector<int32_t> token_ids;
+    if (!estate->prefix_cache.defined() ||
+        !GetInputTokenIds(rstate->mstates[0]->inputs, &token_ids)) {
+      return PrefixCacheObj::MatchResult();
+    }
+    return estate->prefix_cache.value()->Match(token_ids);
+  }
+
+  /*!
+   * \brief Flatten the input data into token ids.
+   * \return A boolean denoting if all the inputs are token data.
+   */
+  static bool GetInputTokenIds(const Array<Data>& inputs, std::vector<int32_t>* token_ids) {
+    token_ids->clear();
+    for (const Data& data : inputs) {
+      const auto* token_data = data.as<TokenDataNode>();
+      if (token_data == nullptr) {
+        token_ids->clear();
+        return false;
+      }
+      token_ids->insert(token_ids->end(), token_data->token_ids->data,
+                        token_data->token_ids->data + token_data->token_ids.size());
+    }
+    return true;
   }
 
-  /*! \brief Check if the input requests can be prefilled under conditions. */
+  /*!
+   * \brief Check if the input requests can be prefilled under conditions.
+   * `num_prefill_req` counts the sequences to fork from the requests after prefill.
+   */
   bool CanPrefill(EngineState estate, int num_prefill_req, int total_input_length,
                   int num_required_pages, int num_available_pages) {
     int num_running_requests = estate->running_queue.size();
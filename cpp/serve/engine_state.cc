@@ -10,6 +10,16 @@ namespace mlc {
 namespace llm {
 namespace serve {
 
+/*! \brief Return the queue wait statistics in JSON. */
+picojson::object QueueWaitStatsAsJSON(const QueueWaitStats& stats) {
+  picojson::object config;
+  config["num_admitted"] = picojson::value(stats.num_admitted);
+  config["avg_wait_time"] = picojson::value(
+      stats.num_admitted > 0 ? stats.total_wait_time / stats.num_admitted : 0.0);
+  config["max_wait_time"] = picojson::value(stats.max_wait_time);
+  return config;
+}
+
 String EngineStats::AsJSON() const {
   picojson::object config;
   config["single_token_prefill_latency"] =
@@ -22,6 +32,40 @@ String EngineStats::AsJSON() const {
   config["total_decode_tokens"] = picojson::value(total_decode_length);
   config["total_accepted_tokens"] = picojson::value(total_accepted_length);
   config["total_draft_tokens"] = picojson::value(total_draft_length);
+  config["prefix_cache_hit_rate"] = picojson::value(
+      prefix_cache_lookups > 0 ? static_cast<double>(prefix_cache_hits) / prefix_cache_lookups
+                               : 0.0);
+  config["prefix_cache_token_hit_rate"] =
+      picojson::value(prefix_cache_lookup_tokens > 0 ? static_cast<double>(prefix_cache_hit_tokens) /
+                                                           prefix_cache_lookup_tokens
+                                                     : 0.0);
+  config["prefix_cache_hit_tokens"] = picojson::value(prefix_cache_hit_tokens);
+  config["prefix_cache_evictions"] = picojson::value(prefix_cache_evictions);
+  config["prefix_cache_num_entries"] = picojson::value(prefix_cache_num_entries);
+  picojson::object queue_wait_json = QueueWaitStatsAsJSON(queue_wait);
+  config["avg_queue_wait_time"] = queue_wait_json["avg_wait_time"];
+  config["max_queue_wait_time"] = queue_wait_json["max_wait_time"];
+  picojson::object queue_wait_by_class_json;
+  for (const auto& [request_class, class_stats] : queue_wait_by_class) {
+    queue_wait_by_class_json[request_class] = picojson::value(QueueWaitStatsAsJSON(class_stats));
+  }
+  config["queue_wait_by_class"] = picojson::value(queue_wait_by_class_json);
+  picojson::array spec_accept_histogram_json;
+  int64_t num_verified_drafts = 0;
+  for (int64_t count : spec_accept_histogram) {
+    spec_accept_histogram_json.push_back(picojson::value(count));
+    num_verified_drafts += count;
+  }
+  config["spec_accept_histogram"] = picojson::value(spec_accept_histogram_json);
+  picojson::array spec_request_acceptance_rate_histogram_json;
+  for (int64_t count : spec_request_acceptance_rate_histogram) {
+    spec_request_acceptance_rate_histogram_json.push_back(picojson::value(count));
+  }
+  config["spec_request_acceptance_rate_histogram"] =
+      picojson::value(spec_request_acceptance_rate_histogram_json);
+  config["spec_avg_draft_length"] = picojson::value(
+      num_verified_drafts > 0 ? static_cast<double>(total_draft_length) / num_verified_drafts
+                              : 0.0);
   return picojson::value(config).serialize(true);
 }
 
@@ -32,9 +76,24 @@ void EngineStats::Reset() {
   engine_total_prefill_time = 0.0f;
   engine_total_decode_time = 0.0f;
   total_prefill_length = 0;
+  engine_total_prefill_length = 0;
   total_decode_length = 0;
   total_accepted_length = 0;
   total_draft_length = 0;
+  engine_total_draft_time = 0.0f;
+  total_draft_steps = 0;
+  engine_total_verify_time = 0.0f;
+  total_verify_steps = 0;
+  spec_accept_histogram.clear();
+  spec_request_acceptance_rate_histogram.assign(kNumAcceptanceRateBuckets, 0);
+  prefix_cache_lookups = 0;
+  prefix_cache_hits = 0;
+  prefix_cache_lookup_tokens = 0;
+  prefix_cache_hit_tokens = 0;
+  prefix_cache_evictions = 0;
+  prefix_cache_num_entries = 0;
+  queue_wait = QueueWaitStats();
+  queue_wait_by_class.clear();
 }
 
 TVM_REGISTER_OBJECT_TYPE(EngineStateObj);
@@ -47,6 +106,10 @@ void EngineStateObj::Reset() {
   request_states.clear();
   id_manager.Reset();
   stats.Reset();
+  scheduler->Reset();
+  if (prefix_cache.defined()) {
+    prefix_cache.value()->Reset();
+  }
 }
 
 RequestState EngineStateObj::GetRequestState(Request request) {
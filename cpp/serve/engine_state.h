@@ -7,8 +7,16 @@
 
 #include <tvm/runtime/container/string.h>
 
+#include <algorithm>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+#include "metrics.h"
+#include "prefix_cache.h"
 #include "request.h"
 #include "request_state.h"
+#include "scheduler.h"
 
 namespace mlc {
 namespace llm {
@@ -16,6 +24,23 @@ namespace serve {
 
 using namespace tvm::runtime;
 
+/*! \brief The statistics of the time requests wait before admission. */
+struct QueueWaitStats {
+  /*! \brief The number of admitted requests. */
+  int64_t num_admitted = 0;
+  /*! \brief The sum of the wait time of admitted requests. */
+  double total_wait_time = 0.0f;
+  /*! \brief The maximum wait time of admitted requests. */
+  double max_wait_time = 0.0f;
+
+  /*! \brief Record the wait time of an admitted request. */
+  void Record(double wait_time) {
+    ++num_admitted;
+    total_wait_time += wait_time;
+    max_wait_time = std::max(max_wait_time, wait_time);
+  }
+};
+
 /*! \brief Runtime statistics of engine. */
 struct EngineStats {
   /*! \brief The current total sequence length in the first model. */
@@ -30,12 +55,62 @@ struct EngineStats {
   double engine_total_decode_time = 0.0f;
   /*! \brief The total number of processed tokens in prefill. */
   int64_t total_prefill_length = 0;
+  /*! \brief The total number of tokens the engine prefilled, including recomputation. */
+  int64_t engine_total_prefill_length = 0;
   /*! \brief The total number of processed tokens in decode. */
   int64_t total_decode_length = 0;
   /*! \brief The total number of accepted tokens in speculation verification. */
   int64_t total_accepted_length = 0;
   /*! \brief The total number of speculated draft tokens. */
   int64_t total_draft_length = 0;
+  /*! \brief The total engine time on draft proposal in speculative decoding. */
+  double engine_total_draft_time = 0.0f;
+  /*! \brief The total number of batched draft model steps in draft proposal. */
+  int64_t total_draft_steps = 0;
+  /*! \brief The total engine time on verification in speculative decoding. */
+  double engine_total_verify_time = 0.0f;
+  /*! \brief The total number of batched verification steps. */
+  int64_t total_verify_steps = 0;
+  /*! \brief The number of draft verifications by the number of accepted draft tokens. */
+  std::vector<int64_t> spec_accept_histogram;
+  /*!
+   * \brief The number of finished requests by their draft acceptance rate, in buckets of
+   * width 0.1. Requests without any draft are not counted.
+   */
+  std::vector<int64_t> spec_request_acceptance_rate_histogram =
+      std::vector<int64_t>(kNumAcceptanceRateBuckets, 0);
+  /*! \brief The total number of prefix cache lookups in prefill. */
+  int64_t prefix_cache_lookups = 0;
+  /*! \brief The total number of prefix cache lookups that hit a cached prefix. */
+  int64_t prefix_cache_hits = 0;
+  /*! \brief The total number of input tokens looked up in the prefix cache. */
+  int64_t prefix_cache_lookup_tokens = 0;
+  /*! \brief The total number of input tokens whose prefill is skipped by the prefix cache. */
+  int64_t prefix_cache_hit_tokens = 0;
+  /*! \brief The total number of evicted prefix cache entries. */
+  int64_t prefix_cache_evictions = 0;
+  /*! \brief The current number of prefix cache entries. */
+  int64_t prefix_cache_num_entries = 0;
+  /*! \brief The time requests wait in the waiting queue before their first admission. */
+  QueueWaitStats queue_wait;
+  /*! \brief The queue wait statistics of each request class of the scheduler. */
+  std::unordered_map<std::string, QueueWaitStats> queue_wait_by_class;
+
+  /*! \brief The number of buckets of `spec_request_acceptance_rate_histogram`. */
+  static constexpr int kNumAcceptanceRateBuckets = 10;
+
+  /*!
+   * \brief Get the time of a batched draft model step relative to the time of a
+   * batched verification step, which is assumed to be `default_ratio` before both
+   * are measured.
+   */
+  double GetDraftCostRatio(double default_ratio) const {
+    if (total_draft_steps == 0 || total_verify_steps == 0 || engine_total_verify_time <= 0) {
+      return default_ratio;
+    }
+    return (engine_total_draft_time / total_draft_steps) /
+           (engine_total_verify_time / total_verify_steps);
+  }
 
   /*!
    * \brief Return the engine runtime statistics in JSON string.
@@ -46,6 +121,10 @@ struct EngineStats {
    * - engine time for decode (sec)
    * - total number of processed tokens in prefill.
    * - total number of processed tokens in decode.
+   * - prefix cache hit rate, token hit rate, evictions and number of entries.
+   * - average and max queue wait time (sec), in total and of each request class.
+   * - histograms of accepted draft tokens per verification and of the draft acceptance
+   *   rates of finished requests, and the average draft length in speculative decoding.
    * \return The statistics in JSON string.
    */
   String AsJSON() const;
@@ -95,6 +174,12 @@ class EngineStateObj : public Object {
   EngineInternalIDManager id_manager;
   /*! \brief Runtime statistics. */
   EngineStats stats;
+  /*! \brief The metrics for monitoring, which are not cleared by `Reset`. */
+  EngineMetrics metrics;
+  /*! \brief The prefix cache of prompts, which is undefined when disabled. */
+  Optional<PrefixCache> prefix_cache;
+  /*! \brief The scheduler ordering the waiting and running requests. */
+  RequestScheduler scheduler = RequestScheduler::Create("fcfs");
 
   /*! \brief Reset the engine state and clear the statistics. */
   void Reset();
@@ -195,6 +195,7 @@ void FunctionTable::_InitFunctions() {
   this->apply_logit_bias_func_ = mod->GetFunction("apply_logit_bias_inplace", true);
   this->apply_penalty_func_ = mod->GetFunction("apply_penalty_inplace", true);
   this->apply_bitmask_func_ = mod->GetFunction("apply_bitmask_inplace", true);
+  this->sample_top_p_top_k_func_ = mod->GetFunction("batch_sample_top_p_top_k", true);
   this->create_kv_cache_func_ = mod_get_func("create_flashinfer_paged_kv_cache");
   if (!this->create_kv_cache_func_.defined()) {
     this->create_kv_cache_func_ = mod_get_func("create_tir_paged_kv_cache");
@@ -205,6 +206,8 @@ void FunctionTable::_InitFunctions() {
       get_global_func("vm.builtin.paged_attention_kv_cache_add_sequence");
   this->kv_cache_remove_sequence_func_ =
       get_global_func("vm.builtin.paged_attention_kv_cache_remove_sequence");
+  this->kv_cache_fork_sequence_func_ =
+      get_global_func("vm.builtin.paged_attention_kv_cache_fork_sequence");
   this->kv_cache_begin_forward_func_ =
       get_global_func("vm.builtin.paged_attention_kv_cache_begin_forward");
   this->kv_cache_end_forward_func_ =
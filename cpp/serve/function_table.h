@@ -74,11 +74,13 @@ struct FunctionTable {
   PackedFunc apply_logit_bias_func_;
   PackedFunc apply_penalty_func_;
   PackedFunc apply_bitmask_func_;
+  PackedFunc sample_top_p_top_k_func_;
   PackedFunc create_kv_cache_func_;
   PackedFunc reset_kv_cache_func_;
   bool support_backtracking_kv_;
   PackedFunc kv_cache_add_sequence_func_;
   PackedFunc kv_cache_remove_sequence_func_;
+  PackedFunc kv_cache_fork_sequence_func_;
   PackedFunc kv_cache_begin_forward_func_;
   PackedFunc kv_cache_end_forward_func_;
   PackedFunc kv_cache_attention_func_;
@@ -4,6 +4,7 @@
  */
 #include "grammar_state_matcher.h"
 
+#include <algorithm>
 #include <chrono>
 #include <queue>
 
@@ -135,6 +136,8 @@ class GrammarStateMatcherNodeImpl : public GrammarStateMatcherNode, public Gramm
 
   void FindNextTokenBitmask(DLTensor* next_token_bitmask) final;
 
+  bool CanTerminate() final { return CanReachEnd(); }
+
   void Rollback(int num_tokens) final;
 
   int MaxRollbackSteps() final { return max_rollback_steps_; }
@@ -157,10 +160,6 @@ class GrammarStateMatcherNodeImpl : public GrammarStateMatcherNode, public Gramm
                             const std::vector<int>& uncertain_indices,
                             const std::vector<bool>& uncertain_tokens_bitset);
 
-  /*! \brief Set the acceptable next token in next_token_bitmask. */
-  void SetTokenBitmask(DLTensor* next_token_bitmask, std::vector<int32_t>& accepted_indices,
-                       std::vector<int32_t>& rejected_indices, bool can_reach_end);
-
   friend IntTuple FindNextRejectedTokens(GrammarStateMatcher matcher);
 
   std::shared_ptr<GrammarStateInitContext> init_ctx_;
@@ -168,20 +167,31 @@ class GrammarStateMatcherNodeImpl : public GrammarStateMatcherNode, public Gramm
   std::deque<int> token_size_history_;
 
   // Temporary data for FindNextTokenBitmask. They are stored here to avoid repeated allocation.
-  std::vector<int32_t> tmp_accepted_indices_;
-  std::vector<int32_t> tmp_rejected_indices_;
-  std::vector<int32_t> tmp_accepted_indices_delta_;
-  std::vector<int32_t> tmp_rejected_indices_delta_;
   std::vector<bool> tmp_uncertain_tokens_bitset_;
 };
 
 bool GrammarStateMatcherNodeImpl::AcceptToken(int32_t token_id) {
+  const auto& stop_token_ids = init_ctx_->stop_token_ids;
+  if (std::find(stop_token_ids.begin(), stop_token_ids.end(), token_id) != stop_token_ids.end()) {
+    if (!CanReachEnd()) {
+      return false;
+    }
+    // The stop token consumes no codepoint, but is recorded to keep the rollback consistent.
+    token_size_history_.push_back(0);
+    if (token_size_history_.size() > max_rollback_steps_) {
+      token_size_history_.pop_front();
+    }
+    return true;
+  }
   CHECK(init_ctx_->codepoint_tokens_lookup.count(token_id) > 0);
   const auto& token = init_ctx_->codepoint_tokens_lookup[token_id].token;
+  int accepted_cnt = 0;
   for (auto codepoint : token) {
     if (!AcceptCodepoint(codepoint, false)) {
+      RollbackCodepoints(accepted_cnt);
       return false;
     }
+    ++accepted_cnt;
   }
   token_size_history_.push_back(token.size());
   if (token_size_history_.size() > max_rollback_steps_) {
@@ -196,16 +206,19 @@ void GrammarStateMatcherNodeImpl::FindNextTokenBitmask(DLTensor* next_token_bitm
   const auto& catagorized_tokens_for_grammar = init_ctx_->catagorized_tokens_for_grammar;
   const auto& latest_stack_tops = stack_tops_history_.GetLatest();
 
-  // We check all the stacks one by one, and find the accepted token set or the rejected token set
-  // for each stack. We will try to find the small one of the two sets.
-  // The final accepted token set is the union of the accepted token sets of all stacks.
-  // The final rejected token set is the intersection of the rejected token sets of all stacks.
-
-  // Note these indices store the indices in tokens_sorted_by_codepoint, instead of the token ids.
-  tmp_accepted_indices_.clear();
-  // {-1} means the universal set, i.e. all tokens initially
-  tmp_rejected_indices_.assign({-1});
-
+  DCHECK(next_token_bitmask->dtype.code == kDLUInt && next_token_bitmask->dtype.bits == 32 &&
+         next_token_bitmask->data && next_token_bitmask->ndim == 1 && next_token_bitmask->shape);
+  int bitmask_size = next_token_bitmask->shape[0];
+  CHECK_GE(bitmask_size, BitsetManager::GetBitsetSize(init_ctx_->vocab_size));
+  BitsetManager next_token_bitset(reinterpret_cast<uint32_t*>(next_token_bitmask->data),
+                                  bitmask_size);
+  // Clear the whole bitmask, since the model vocabulary can be larger than the token table.
+  next_token_bitset.Reset(bitmask_size * 32, false);
+
+  // We check all the stacks one by one. The final accepted token set is the union of the accepted
+  // token sets of all stacks. For each stack, the tokens accepted regardless of the parent rules
+  // are merged from the bitmask cached in preprocessing, and only the uncertain tokens are matched.
+  // Note the uncertain indices are the indices in tokens_sorted_by_codepoint, not the token ids.
   for (auto top : latest_stack_tops) {
     // Step 1. Find the current catagorized_tokens
     auto cur_rule_position = tree_[top];
@@ -218,30 +231,21 @@ void GrammarStateMatcherNodeImpl::FindNextTokenBitmask(DLTensor* next_token_bitm
     const auto& catagorized_tokens = catagorized_tokens_for_grammar.at(
         {cur_rule_position.sequence_id, cur_rule_position.element_id});
 
-    // For each stack, we will check every uncertain token and put them into the accepted or
-    // rejected list.
-    // If the accepted tokens are saved, it means it is likely to be smaller than the rejected
-    // tokens, so we will just find the accepted tokens, and vice versa.
-    bool is_find_accept_mode =
-        catagorized_tokens.not_saved_index != CatagorizedTokens::NotSavedIndex::kAccepted;
+    // Step 2. Merge the cached accepted tokens.
+    next_token_bitset.UnionWith(catagorized_tokens.accepted_bitmask);
 
+    // Step 3. Match the uncertain tokens and set the accepted ones.
     // If uncertain tokens are saved, we will iterate over the uncertain tokens.
     // Otherwise, we will iterate over all_tokens - accepted_tokens - rejected_tokens.
     bool is_uncertain_saved =
         catagorized_tokens.not_saved_index != CatagorizedTokens::NotSavedIndex::kUncertain;
 
-    // Step 2. Update the accepted tokens in accepted_indices_delta, or the rejected tokens in
-    // rejected_indices_delta.
-
     // Examine only the current one stack
     stack_tops_history_.PushHistory({tree_.NewNode(cur_rule_position)});
 
     const std::vector<TCodepoint>* prev_token = nullptr;
     int prev_matched_size = 0;
 
-    tmp_accepted_indices_delta_.clear();
-    tmp_rejected_indices_delta_.clear();
-
     if (!is_uncertain_saved) {
       // unc_tokens = all_tokens - accepted_tokens - rejected_tokens
       tmp_uncertain_tokens_bitset_.assign(tokens_sorted_by_codepoint.size(), true);
@@ -256,7 +260,7 @@ void GrammarStateMatcherNodeImpl::FindNextTokenBitmask(DLTensor* next_token_bitm
     int iterator_uncertain = -1;
 
     while (true) {
-      // Step 2.1. Find the current token.
+      // Step 3.1. Find the current token.
       auto idx =
           GetNextUncertainToken(is_uncertain_saved, &iterator_uncertain,
                                 catagorized_tokens.uncertain_indices, tmp_uncertain_tokens_bitset_);
@@ -265,7 +269,7 @@ void GrammarStateMatcherNodeImpl::FindNextTokenBitmask(DLTensor* next_token_bitm
       }
       const auto& cur_token = tokens_sorted_by_codepoint[idx].token;
 
-      // Step 2.2. Find the longest common prefix with the accepted part of the previous token.
+      // Step 3.2. Find the longest common prefix with the accepted part of the previous token.
       // We can reuse the previous matched size to avoid unnecessary matching.
       int prev_useful_size = 0;
       if (prev_token) {
@@ -279,7 +283,7 @@ void GrammarStateMatcherNodeImpl::FindNextTokenBitmask(DLTensor* next_token_bitm
         RollbackCodepoints(prev_matched_size - prev_useful_size);
       }
 
-      // Step 2.3. Find if the current token is accepted or rejected.
+      // Step 3.3. Find if the current token is accepted or rejected.
       bool accepted = true;
       prev_matched_size = prev_useful_size;
 
@@ -291,35 +295,24 @@ void GrammarStateMatcherNodeImpl::FindNextTokenBitmask(DLTensor* next_token_bitm
         prev_matched_size = j + 1;
       }
 
-      // Step 2.4. Push the result to the delta list.
-      if (accepted && is_find_accept_mode) {
-        tmp_accepted_indices_delta_.push_back(idx);
-      } else if (!accepted && !is_find_accept_mode) {
-        tmp_rejected_indices_delta_.push_back(idx);
+      // Step 3.4. Set the accepted token.
+      if (accepted) {
+        next_token_bitset.Set(tokens_sorted_by_codepoint[idx].id, true);
       }
 
       prev_token = &cur_token;
     }
 
     RollbackCodepoints(prev_matched_size + 1);
+  }
 
-    // Step 3. Update the accepted_indices and rejected_indices
-    if (is_find_accept_mode) {
-      // accepted_indices += catagorized_tokens.accepted_indices + accepted_indices_delta
-      IntsetUnion(&tmp_accepted_indices_delta_, catagorized_tokens.accepted_indices);
-      IntsetUnion(&tmp_accepted_indices_, tmp_accepted_indices_delta_);
-    } else {
-      // rejected_indices = Intersect(
-      //     rejected_indices,
-      //     catagorized_tokens.rejected_indices + rejected_indices_delta)
-      IntsetUnion(&tmp_rejected_indices_delta_, catagorized_tokens.rejected_indices);
-      IntsetIntersection(&tmp_rejected_indices_, tmp_rejected_indices_delta_);
+  // Finally add the stop tokens if the end of the grammar can be reached. Special tokens are never
+  // set, since they are excluded from tokens_sorted_by_codepoint.
+  if (CanReachEnd()) {
+    for (int idx : init_ctx_->stop_token_ids) {
+      next_token_bitset.Set(idx, true);
     }
   }
-
-  // Finally update the rejected_ids bitset
-  bool can_reach_end = CanReachEnd();
-  SetTokenBitmask(next_token_bitmask, tmp_accepted_indices_, tmp_rejected_indices_, can_reach_end);
 }
 
 void GrammarStateMatcherNodeImpl::Rollback(int num_tokens) {
@@ -332,57 +325,6 @@ void GrammarStateMatcherNodeImpl::Rollback(int num_tokens) {
   }
 }
 
-void GrammarStateMatcherNodeImpl::SetTokenBitmask(DLTensor* next_token_bitmask,
-                                                  std::vector<int32_t>& accepted_indices,
-                                                  std::vector<int32_t>& rejected_indices,
-                                                  bool can_reach_end) {
-  // accepted_ids = Union(accepted_indices, all_tokens - rejected_indices)
-  // rejected_ids = Intersect(all_tokens - accepted_indices, rejected_indices)
-  DCHECK(next_token_bitmask->dtype.code == kDLUInt && next_token_bitmask->dtype.bits == 32 &&
-         next_token_bitmask->data && next_token_bitmask->ndim == 1 && next_token_bitmask->shape);
-
-  BitsetManager next_token_bitset(reinterpret_cast<uint32_t*>(next_token_bitmask->data),
-                                  next_token_bitmask->shape[0]);
-
-  if (rejected_indices.size() == 1 && rejected_indices[0] == -1) {
-    // If rejected_indices is the universal set, the final accepted token set is just
-    // accepted_indices
-    next_token_bitset.Reset(init_ctx_->vocab_size, false);
-    for (int idx : accepted_indices) {
-      next_token_bitset.Set(init_ctx_->tokens_sorted_by_codepoint[idx].id, true);
-    }
-
-    if (can_reach_end) {
-      // add end tokens
-      for (int idx : init_ctx_->stop_token_ids) {
-        next_token_bitset.Set(idx, true);
-      }
-    }
-  } else {
-    // Otherwise, the final rejected token set is (rejected_indices \ accepted_indices)
-    next_token_bitset.Reset(init_ctx_->vocab_size, true);
-
-    auto it_acc = accepted_indices.begin();
-    for (auto i : rejected_indices) {
-      while (it_acc != accepted_indices.end() && *it_acc < i) {
-        ++it_acc;
-      }
-      if (it_acc == accepted_indices.end() || *it_acc != i) {
-        next_token_bitset.Set(init_ctx_->tokens_sorted_by_codepoint[i].id, false);
-      }
-    }
-
-    for (int idx : init_ctx_->special_token_ids) {
-      next_token_bitset.Set(idx, false);
-    }
-    if (!can_reach_end) {
-      for (int idx : init_ctx_->stop_token_ids) {
-        next_token_bitset.Set(idx, false);
-      }
-    }
-  }
-}
-
 int GrammarStateMatcherNodeImpl::GetNextUncertainToken(
     bool is_uncertain_saved, int* iterator_uncertain, const std::vector<int>& uncertain_indices,
     const std::vector<bool>& uncertain_tokens_bitset) {
@@ -409,6 +351,11 @@ GrammarStateMatcher::GrammarStateMatcher(std::shared_ptr<GrammarStateInitContext
                                          int max_rollback_steps)
     : ObjectRef(make_object<GrammarStateMatcherNodeImpl>(init_ctx, max_rollback_steps)) {}
 
+std::shared_ptr<GrammarStateInitContext> GrammarStateMatcher::CreateInitContext(
+    const BNFGrammar& grammar, const std::vector<std::string>& token_table) {
+  return serve::CreateInitContext(grammar, token_table);
+}
+
 TVM_REGISTER_GLOBAL("mlc.serve.GrammarStateMatcherFromTokenizer")
     .set_body_typed([](BNFGrammar grammar, Optional<Tokenizer> tokenizer, int max_rollback_steps) {
       auto init_ctx = CreateInitContext(
@@ -57,7 +57,8 @@ class GrammarStateMatcherNode : public Object {
   /*!
    * \brief Accept one token and update the state of the matcher.
    * \param token_id The id of the token to accept.
-   * \return Whether the token is accepted.
+   * \return Whether the token is accepted. If not, the state of the matcher is unchanged.
+   * \note A stop token is accepted iff the end of the grammar can be reached.
    */
   virtual bool AcceptToken(int32_t token_id) = 0;
 
@@ -65,10 +66,14 @@ class GrammarStateMatcherNode : public Object {
    * \brief Find the set of tokens that are acceptable for the next step and store them in a
    * bitmask.
    * \param next_token_bitmask The bitmask to store the result. The bitmask must be pre-allocated,
-   * and its shape needs to be (ceil(vocab_size, 32),), with a dtype of uint32.
+   * and its shape needs to be (n,) with n >= ceil(vocab_size, 32), with a dtype of uint32. Bits
+   * beyond the vocabulary are set to 0.
    */
   virtual void FindNextTokenBitmask(DLTensor* next_token_bitmask) = 0;
 
+  /*! \brief Whether the end of the grammar can be reached, i.e. the generation can stop here. */
+  virtual bool CanTerminate() = 0;
+
   /*!
    * \brief Rollback the matcher to a previous state.
    * \param num_tokens The number of tokens to rollback. It cannot exceed the current number of
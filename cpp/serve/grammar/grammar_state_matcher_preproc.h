@@ -11,6 +11,7 @@
 #include "../../support/encoding.h"
 #include "grammar.h"
 #include "grammar_state_matcher_base.h"
+#include "support.h"
 
 namespace mlc {
 namespace llm {
@@ -40,6 +41,13 @@ struct CatagorizedTokens {
   std::vector<int32_t> uncertain_indices;
   enum class NotSavedIndex { kAccepted = 0, kRejected = 1, kUncertain = 2 };
   NotSavedIndex not_saved_index;
+  /*!
+   * \brief The accepted tokens as a bitmask over the token ids, of size ceildiv(vocab_size, 32).
+   * Matching merges it into the result a word at a time, instead of setting the accepted tokens
+   * one by one, which dominates the time of matching for positions accepting most of the
+   * vocabulary, e.g. inside JSON strings.
+   */
+  std::vector<uint32_t> accepted_bitmask;
 
   CatagorizedTokens() = default;
 
@@ -216,6 +224,31 @@ inline CatagorizedTokens GrammarStateMatcherForInitContext::GetCatagorizedTokens
                            std::move(tmp_uncertain_indices_));
 }
 
+/*! \brief Compute the accepted tokens as a bitmask over the token ids. */
+inline std::vector<uint32_t> GetAcceptedTokenBitmask(
+    const CatagorizedTokens& catagorized_tokens,
+    const std::vector<TokenAndId>& tokens_sorted_by_codepoint, size_t vocab_size) {
+  std::vector<uint32_t> bitmask(BitsetManager::GetBitsetSize(vocab_size), 0);
+  BitsetManager bitset(bitmask.data(), bitmask.size());
+  if (catagorized_tokens.not_saved_index != CatagorizedTokens::NotSavedIndex::kAccepted) {
+    for (auto idx : catagorized_tokens.accepted_indices) {
+      bitset.Set(tokens_sorted_by_codepoint[idx].id, true);
+    }
+  } else {
+    // accepted_tokens = all_tokens - rejected_tokens - uncertain_tokens
+    for (const auto& token : tokens_sorted_by_codepoint) {
+      bitset.Set(token.id, true);
+    }
+    for (auto idx : catagorized_tokens.rejected_indices) {
+      bitset.Set(tokens_sorted_by_codepoint[idx].id, false);
+    }
+    for (auto idx : catagorized_tokens.uncertain_indices) {
+      bitset.Set(tokens_sorted_by_codepoint[idx].id, false);
+    }
+  }
+  return bitmask;
+}
+
 inline std::string ReplaceUnderscoreWithSpace(const std::string& str,
                                               const std::string& kSpecialUnderscore) {
   std::string res;
@@ -300,8 +333,10 @@ inline std::shared_ptr<GrammarStateInitContext> CreateInitContext(
         auto grammar_state_matcher = GrammarStateMatcherForInitContext(grammar, cur_rule_position);
         auto cur_catagorized_tokens_for_grammar =
             grammar_state_matcher.GetCatagorizedTokens(ptr->tokens_sorted_by_codepoint, i == 0);
+        cur_catagorized_tokens_for_grammar.accepted_bitmask = GetAcceptedTokenBitmask(
+            cur_catagorized_tokens_for_grammar, ptr->tokens_sorted_by_codepoint, ptr->vocab_size);
         ptr->catagorized_tokens_for_grammar[{sequence_id, element_id}] =
-            cur_catagorized_tokens_for_grammar;
+            std::move(cur_catagorized_tokens_for_grammar);
       }
     }
   }
@@ -10,6 +10,7 @@
 
 #include <cstdint>
 #include <cstring>
+#include <vector>
 
 namespace mlc {
 namespace llm {
@@ -41,81 +42,19 @@ class BitsetManager {
     std::memset(data_, value ? 0xFF : 0, GetBitsetSize(size) * sizeof(uint32_t));
   }
 
+  /*! \brief Let this bitset be the union of itself and another bitset, one word at a time. */
+  void UnionWith(const std::vector<uint32_t>& other) {
+    DCHECK(static_cast<int>(other.size()) <= buffer_size_);
+    for (int i = 0; i < static_cast<int>(other.size()); ++i) {
+      data_[i] |= other[i];
+    }
+  }
+
  private:
   uint32_t* const data_;
   const int buffer_size_;
 };
 
-/*!
- * \brief Let lhs be the union of lhs and rhs. Suppose that both sets are sorted.
- * \note No additional vectors are allocated, and the time complexity is O(n)
- */
-void IntsetUnion(std::vector<int32_t>* lhs, const std::vector<int32_t>& rhs) {
-  int original_lhs_size = lhs->size();
-  int rhs_size = rhs.size();
-
-  lhs->resize(original_lhs_size + rhs_size);
-
-  auto it_lhs = lhs->rbegin() + rhs_size;
-  auto it_rhs = rhs.rbegin();
-  auto it_result = lhs->rbegin();
-
-  while (it_lhs != lhs->rend() && it_rhs != rhs.rend()) {
-    if (*it_lhs > *it_rhs) {
-      *it_result = *it_lhs;
-      ++it_lhs;
-    } else if (*it_lhs < *it_rhs) {
-      *it_result = *it_rhs;
-      ++it_rhs;
-    } else {
-      *it_result = *it_lhs;
-      ++it_lhs;
-      ++it_rhs;
-    }
-    ++it_result;
-  }
-
-  while (it_rhs != rhs.rend()) {
-    *it_result = *it_rhs;
-    ++it_result;
-    ++it_rhs;
-  }
-
-  auto last = std::unique(lhs->begin(), lhs->end());
-  lhs->erase(last, lhs->end());
-}
-
-/*!
- * \brief Let lhs be the intersection of lhs and rhs. Suppose that both sets are sorted.
- * \note No additional vector is allocated, and the time complexity is O(n).
- * \note Support the case where lhs is the universal set by setting lhs to {-1}. The result will be
- * rhs then.
- */
-void IntsetIntersection(std::vector<int32_t>* lhs, const std::vector<int32_t>& rhs) {
-  if (lhs->size() == 1 && (*lhs)[0] == -1) {
-    *lhs = rhs;
-    return;
-  }
-
-  auto it_lhs = lhs->begin();
-  auto it_rhs = rhs.begin();
-  auto it_result = lhs->begin();
-
-  while (it_lhs != lhs->end() && it_rhs != rhs.end()) {
-    if (*it_lhs < *it_rhs) {
-      ++it_lhs;
-    } else if (*it_lhs > *it_rhs) {
-      ++it_rhs;
-    } else {
-      *it_result = *it_lhs;
-      ++it_lhs;
-      ++it_rhs;
-      ++it_result;
-    }
-  }
-  lhs->erase(it_result, lhs->end());
-}
-
 }  // namespace serve
 }  // namespace llm
 }  // namespace mlc
@@ -309,25 +309,34 @@ class LogitProcessorImpl : public LogitProcessorObj {
     int* p_bitmask = static_cast<int*>(bitmask_host_->data);
 
     // - Set arrays.
+    //   The bitmask of each token is written in place into its row of the batch bitmask, so that
+    //   the bitmasks of the whole batch are copied to GPU and applied in one kernel launch.
     int num_token_for_mask = 0;
+    int64_t bitmask_row_shape[1] = {bitmask_size_};
+    DLTensor bitmask_row{/*data=*/nullptr,
+                         /*device=*/bitmask_host_->device,
+                         /*ndim=*/1,
+                         /*dtype=*/DataType::UInt(32),
+                         /*shape=*/bitmask_row_shape,
+                         /*strides=*/nullptr,
+                         /*byte_offset=*/0};
     for (int i = 0; i < static_cast<int>(mstates.size()); ++i) {
+      if (!mstates[i]->RequireNextTokenBitmask()) {
+        continue;
+      }
       int num_token_to_process =
           cum_num_token == nullptr ? 1 : (cum_num_token->at(i + 1) - cum_num_token->at(i));
       int token_offset = cum_num_token == nullptr ? i : cum_num_token->at(i);
       CHECK(num_token_to_process == 1 || mstates[i]->draft_output_tokens.empty());
       for (int j = 0; j < num_token_to_process; ++j) {
-        std::vector<int> bitmask = mstates[i]->GetTokenBitmask(vocab_size_);
-        if (!bitmask.empty()) {
-          p_seq_ids[num_token_for_mask] = token_offset + j;
-          ICHECK_EQ(bitmask.size(), bitmask_size_);
-          for (int p = 0; p < bitmask_size_; ++p) {
-            p_bitmask[num_token_for_mask * bitmask_size_ + p] = bitmask[p];
-          }
-          ++num_token_for_mask;
-        }
+        // The j-th token is conditioned on the first j draft tokens.
         if (j > 0) {
           mstates[i]->AddDraftToken(draft_tokens->at(i)[j - 1], NDArray());
         }
+        p_seq_ids[num_token_for_mask] = token_offset + j;
+        bitmask_row.data = p_bitmask + num_token_for_mask * bitmask_size_;
+        mstates[i]->FindNextTokenBitmask(&bitmask_row);
+        ++num_token_for_mask;
       }
       if (num_token_to_process != 1) {
         // Roll back.
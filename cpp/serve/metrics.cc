@@ -0,0 +1,39 @@
+/*!
+ *  Copyright (c) 2023 by Contributors
+ * \file serve/metrics.cc
+ */
+#include "metrics.h"
+
+#include <algorithm>
+
+namespace mlc {
+namespace llm {
+namespace serve {
+
+void MetricHistogram::Observe(double value, int64_t num_observations) {
+  int bucket = std::lower_bound(bounds.begin(), bounds.end(), value) - bounds.begin();
+  counts[bucket] += num_observations;
+  sum += value * num_observations;
+  count += num_observations;
+}
+
+picojson::object MetricHistogram::AsJSON() const {
+  picojson::array bounds_json;
+  picojson::array counts_json;
+  for (double bound : bounds) {
+    bounds_json.push_back(picojson::value(bound));
+  }
+  for (int64_t bucket_count : counts) {
+    counts_json.push_back(picojson::value(bucket_count));
+  }
+  picojson::object config;
+  config["bounds"] = picojson::value(bounds_json);
+  config["counts"] = picojson::value(counts_json);
+  config["sum"] = picojson::value(sum);
+  config["count"] = picojson::value(count);
+  return config;
+}
+
+}  // namespace serve
+}  // namespace llm
+}  // namespace mlc
@@ -0,0 +1,84 @@
+/*!
+ *  Copyright (c) 2023 by Contributors
+ * \file serve/metrics.h
+ * \brief The metrics of the serving engine for monitoring.
+ */
+#ifndef MLC_LLM_SERVE_METRICS_H_
+#define MLC_LLM_SERVE_METRICS_H_
+
+#include <picojson.h>
+#include <tvm/runtime/container/string.h>
+
+#include <vector>
+
+namespace mlc {
+namespace llm {
+namespace serve {
+
+using namespace tvm::runtime;
+
+/*!
+ * \brief The histogram of observed values with fixed bucket upper bounds,
+ * following the Prometheus histogram semantics.
+ */
+struct MetricHistogram {
+  /*! \brief The increasing upper bounds of the buckets, excluding the last +Inf bucket. */
+  std::vector<double> bounds;
+  /*! \brief The number of observations in each bucket (not cumulative), including +Inf. */
+  std::vector<int64_t> counts;
+  /*! \brief The sum of all observed values. */
+  double sum = 0.0;
+  /*! \brief The total number of observations. */
+  int64_t count = 0;
+
+  MetricHistogram() = default;
+  explicit MetricHistogram(std::vector<double> bounds)
+      : bounds(std::move(bounds)), counts(this->bounds.size() + 1, 0) {}
+
+  /*! \brief Observe a value for `num_observations` times. */
+  void Observe(double value, int64_t num_observations = 1);
+
+  /*! \brief Return the histogram in JSON. */
+  picojson::object AsJSON() const;
+};
+
+/*!
+ * \brief The metrics of the serving engine. They are updated incrementally as
+ * the engine runs, so that reading them costs nothing proportional to the
+ * history. Counters that already exist in `EngineStats` are not duplicated.
+ */
+struct EngineMetrics {
+  /*! \brief The total number of requests added to the engine. */
+  int64_t num_requests_added = 0;
+  /*! \brief The total number of requests that finished generation. */
+  int64_t num_requests_finished = 0;
+  /*! \brief The total number of requests aborted before finishing. */
+  int64_t num_requests_aborted = 0;
+  /*! \brief The total number of tokens returned to requests. */
+  int64_t num_generated_tokens = 0;
+
+  /*! \brief The number of waiting requests at the start of each engine step. */
+  MetricHistogram waiting_queue_size{{0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024}};
+  /*! \brief The number of running requests at the start of each engine step. */
+  MetricHistogram running_batch_size{{1, 2, 4, 8, 16, 32, 64, 128, 256, 512}};
+  /*! \brief The time from adding a request to returning its first token (sec). */
+  MetricHistogram time_to_first_token{
+      {0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60}};
+  /*! \brief The time between returning successive tokens of a request (sec). */
+  MetricHistogram inter_token_latency{
+      {0.001, 0.0025, 0.005, 0.01, 0.02, 0.04, 0.06, 0.08, 0.1, 0.15, 0.2, 0.5, 1}};
+  /*! \brief The time from adding a request to its finish (sec). */
+  MetricHistogram request_latency{{0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250}};
+  /*! \brief The number of tokens prefilled per second in each prefill step. */
+  MetricHistogram prefill_throughput{
+      {10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000}};
+  /*! \brief The number of tokens generated per second in each decode step. */
+  MetricHistogram decode_throughput{
+      {10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000}};
+};
+
+}  // namespace serve
+}  // namespace llm
+}  // namespace mlc
+
+#endif  // MLC_LLM_SERVE_METRICS_H_
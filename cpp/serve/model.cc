@@ -360,8 +360,18 @@ class ModelImpl : public ModelObj {
                           std::move(trace_recorder));
   }
 
+  Sampler CreateSampler(int max_num_sample, Optional<EventTraceRecorder> trace_recorder) final {
+    if (Sampler::SupportGPUSampler(ft_, device_)) {
+      return Sampler::CreateGPUSampler(max_num_sample, vocab_size_, &this->ft_, device_,
+                                       std::move(trace_recorder));
+    }
+    return Sampler::Create(/*sampler_kind=*/"cpu", std::move(trace_recorder));
+  }
+
   void CreateKVCache(KVCacheConfig kv_cache_config) final {
-    IntTuple max_num_sequence{kv_cache_config->max_num_sequence};
+    // The prefix cache entries are frozen sequences that also occupy KV cache slots.
+    IntTuple max_num_sequence{kv_cache_config->max_num_sequence +
+                              kv_cache_config->prefix_cache_max_num_entries};
     IntTuple max_total_sequence_length{kv_cache_config->max_total_sequence_length};
     IntTuple prefill_chunk_size{kv_cache_config->prefill_chunk_size};
     IntTuple page_size{kv_cache_config->page_size};
@@ -376,6 +386,10 @@ class ModelImpl : public ModelObj {
     ft_.kv_cache_remove_sequence_func_(kv_cache_, seq_id);
   }
 
+  void ForkSequence(int64_t parent_seq_id, int64_t child_seq_id) final {
+    ft_.kv_cache_fork_sequence_func_(kv_cache_, parent_seq_id, child_seq_id);
+  }
+
   /*! \brief Get the number of available pages in KV cache. */
   int GetNumAvailablePages() const final {
     if (!ft_.use_disco) {
@@ -15,6 +15,7 @@
 #include "event_trace_recorder.h"
 #include "function_table.h"
 #include "logit_processor.h"
+#include "sampler.h"
 
 namespace mlc {
 namespace llm {
@@ -108,6 +109,14 @@ class ModelObj : public Object {
   /*! \brief Remove the given sequence from the KV cache in the model. */
   virtual void RemoveSequence(int64_t seq_id) = 0;
 
+  /*!
+   * \brief Fork a new sequence from the given parent sequence in the KV cache.
+   * The child sequence shares the KV pages of the parent sequence.
+   * \param parent_seq_id The id of the parent sequence.
+   * \param child_seq_id The id of the new child sequence.
+   */
+  virtual void ForkSequence(int64_t parent_seq_id, int64_t child_seq_id) = 0;
+
   /*! \brief Get the number of available pages in KV cache. */
   virtual int GetNumAvailablePages() const = 0;
 
@@ -120,6 +129,15 @@ class ModelObj : public Object {
   virtual LogitProcessor CreateLogitProcessor(int max_num_token,
                                               Optional<EventTraceRecorder> trace_recorder) = 0;
 
+  /*!
+   * \brief Create a sampler from this model, which samples on GPU when the
+   * model is compiled with the GPU sampling function, and on CPU otherwise.
+   * \param max_num_sample The maximum number of tokens sampled in a batch.
+   * \param trace_recorder The event trace recorder for requests.
+   */
+  virtual Sampler CreateSampler(int max_num_sample,
+                                Optional<EventTraceRecorder> trace_recorder) = 0;
+
   /*!
    * \brief Estimate number of CPU units required to drive the model
    * executing during TP.
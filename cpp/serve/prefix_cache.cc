@@ -0,0 +1,275 @@
+/*!
+ *  Copyright (c) 2023 by Contributors
+ * \file serve/prefix_cache.cc
+ */
+#include "prefix_cache.h"
+
+#include <tvm/runtime/logging.h>
+
+#include <algorithm>
+#include <limits>
+
+#include "engine_state.h"
+
+namespace mlc {
+namespace llm {
+namespace serve {
+
+/*!
+ * \brief The maximum fork depth of cache entries. The paged KV cache
+ * supports a limited depth of forked sequences, and a request forked
+ * from an entry takes one more level.
+ */
+constexpr const int kMaxEntryForkDepth = 3;
+
+TVM_REGISTER_OBJECT_TYPE(PrefixCacheObj);
+
+PrefixCache::PrefixCache(int max_num_entries, int page_size) {
+  data_ = make_object<PrefixCacheObj>(max_num_entries, page_size);
+}
+
+PrefixCacheObj::PrefixCacheObj(int max_num_entries, int page_size)
+    : max_num_entries_(max_num_entries),
+      page_size_(page_size),
+      root_(std::make_unique<RadixNode>()) {
+  CHECK_GT(max_num_entries_, 0) << "The prefix cache requires at least one entry.";
+  CHECK_GT(page_size_, 0) << "The page size must be positive.";
+}
+
+PrefixCacheObj::MatchResult PrefixCacheObj::Match(const std::vector<int32_t>& tokens) const {
+  MatchResult result;
+  const RadixNode* node = root_.get();
+  int pos = 0;
+  // At least one token is left to prefill.
+  int max_length = static_cast<int>(tokens.size()) - 1;
+  while (pos < max_length) {
+    auto it = node->children.find(tokens[pos]);
+    if (it == node->children.end()) {
+      break;
+    }
+    const RadixNode* child = it->second.get();
+    int edge_length = child->edge.size();
+    int common = 0;
+    while (common < edge_length && pos + common < max_length &&
+           child->edge[common] == tokens[pos + common]) {
+      ++common;
+    }
+    pos += common;
+    // Entries only end at nodes, so the edge must be fully matched.
+    if (common < edge_length) {
+      break;
+    }
+    node = child;
+    if (node->entry_id != -1) {
+      result.entry_id = node->entry_id;
+      result.matched_length = node->length;
+    }
+  }
+  result.common_length = pos;
+  return result;
+}
+
+std::vector<int> PrefixCacheObj::GetCheckpoints(const std::vector<int32_t>& tokens,
+                                                const MatchResult& match) const {
+  std::vector<int> checkpoints;
+  int last_checkpoint = match.matched_length;
+  int depth = match.entry_id != -1 ? entries_[match.entry_id].depth : 0;
+  auto f_add_checkpoint = [&](int length) {
+    if (length > last_checkpoint && depth < kMaxEntryForkDepth) {
+      checkpoints.push_back(length);
+      last_checkpoint = length;
+      ++depth;
+    }
+  };
+  // The prefix shared with the cached prompts, where the prompts diverge.
+  f_add_checkpoint(match.common_length / page_size_ * page_size_);
+  // The prefix of the whole prompt, leaving at least one token to prefill.
+  f_add_checkpoint((static_cast<int>(tokens.size()) - 1) / page_size_ * page_size_);
+  return checkpoints;
+}
+
+void PrefixCacheObj::ForkFromEntry(EngineState estate, int entry_id, int64_t seq_id,
+                                   const Array<Model>& models) {
+  Entry& entry = entries_[entry_id];
+  ICHECK_NE(entry.seq_id, -1);
+  for (Model model : models) {
+    model->ForkSequence(entry.seq_id, seq_id);
+  }
+  ++entry.ref_count;
+  entry.last_access = ++clock_;
+  seq_parent_entry_[seq_id] = entry_id;
+  ++estate->stats.prefix_cache_hits;
+  estate->stats.prefix_cache_hit_tokens += entry.node->length;
+}
+
+int64_t PrefixCacheObj::Insert(EngineState estate, const std::vector<int32_t>& tokens,
+                               int64_t seq_id, const Array<Model>& models) {
+  int num_tokens = tokens.size();
+  ICHECK(num_tokens > 0 && num_tokens % page_size_ == 0)
+      << "The cached prefixes must be aligned to pages, while the prefix length is " << num_tokens;
+  auto it_parent = seq_parent_entry_.find(seq_id);
+  int parent_entry_id = it_parent != seq_parent_entry_.end() ? it_parent->second : -1;
+  if (parent_entry_id != -1) {
+    const Entry& parent_entry = entries_[parent_entry_id];
+    if (parent_entry.node->length == num_tokens || parent_entry.depth >= kMaxEntryForkDepth) {
+      // The prefix is already cached, or the fork chain is too deep.
+      return seq_id;
+    }
+  }
+  if (num_entries_ == max_num_entries_ && !EvictLRU(estate, models)) {
+    // All entries are in use.
+    return seq_id;
+  }
+  RadixNode* node = GetOrCreateNode(tokens);
+  if (node->entry_id != -1) {
+    // The prefix is already cached by another request.
+    entries_[node->entry_id].last_access = ++clock_;
+    return seq_id;
+  }
+  // Freeze the current sequence of the request as the entry, and fork a new
+  // sequence for the request to continue generation.
+  int64_t new_seq_id = estate->id_manager.GetNewId();
+  for (Model model : models) {
+    model->ForkSequence(seq_id, new_seq_id);
+  }
+
+  int entry_id = AllocateEntry();
+  Entry& entry = entries_[entry_id];
+  entry.seq_id = seq_id;
+  entry.node = node;
+  entry.parent_entry_id = parent_entry_id;
+  entry.ref_count = 1;
+  entry.depth = parent_entry_id != -1 ? entries_[parent_entry_id].depth + 1 : 1;
+  entry.last_access = ++clock_;
+  node->entry_id = entry_id;
+  // The reference of the parent entry is transferred from the request to the entry.
+  seq_parent_entry_.erase(seq_id);
+  seq_parent_entry_[new_seq_id] = entry_id;
+  ++num_entries_;
+  estate->stats.prefix_cache_num_entries = num_entries_;
+  return new_seq_id;
+}
+
+void PrefixCacheObj::OnSequenceRemoved(int64_t seq_id) {
+  auto it = seq_parent_entry_.find(seq_id);
+  if (it == seq_parent_entry_.end()) {
+    return;
+  }
+  Entry& entry = entries_[it->second];
+  ICHECK_GT(entry.ref_count, 0);
+  --entry.ref_count;
+  seq_parent_entry_.erase(it);
+}
+
+bool PrefixCacheObj::EvictLRU(EngineState estate, const Array<Model>& models) {
+  int victim = -1;
+  int64_t min_last_access = std::numeric_limits<int64_t>::max();
+  for (int entry_id = 0; entry_id < static_cast<int>(entries_.size()); ++entry_id) {
+    const Entry& entry = entries_[entry_id];
+    if (entry.seq_id != -1 && entry.ref_count == 0 && entry.last_access < min_last_access) {
+      victim = entry_id;
+      min_last_access = entry.last_access;
+    }
+  }
+  if (victim == -1) {
+    return false;
+  }
+
+  Entry& entry = entries_[victim];
+  for (Model model : models) {
+    model->RemoveSequence(entry.seq_id);
+  }
+  estate->id_manager.RecycleId(entry.seq_id);
+  if (entry.parent_entry_id != -1) {
+    ICHECK_GT(entries_[entry.parent_entry_id].ref_count, 0);
+    --entries_[entry.parent_entry_id].ref_count;
+  }
+  RemoveEntryFromTree(victim);
+  entry = Entry();
+  free_entry_ids_.push_back(victim);
+  --num_entries_;
+  ++estate->stats.prefix_cache_evictions;
+  estate->stats.prefix_cache_num_entries = num_entries_;
+  return true;
+}
+
+void PrefixCacheObj::Reset() {
+  root_ = std::make_unique<RadixNode>();
+  entries_.clear();
+  free_entry_ids_.clear();
+  num_entries_ = 0;
+  seq_parent_entry_.clear();
+  clock_ = 0;
+}
+
+PrefixCacheObj::RadixNode* PrefixCacheObj::GetOrCreateNode(const std::vector<int32_t>& tokens) {
+  RadixNode* node = root_.get();
+  int pos = 0;
+  int num_tokens = tokens.size();
+  while (pos < num_tokens) {
+    auto it = node->children.find(tokens[pos]);
+    if (it == node->children.end()) {
+      // Create a new leaf with the remaining tokens.
+      auto leaf = std::make_unique<RadixNode>();
+      leaf->edge.assign(tokens.begin() + pos, tokens.end());
+      leaf->length = num_tokens;
+      leaf->parent = node;
+      RadixNode* leaf_ptr = leaf.get();
+      node->children.emplace(tokens[pos], std::move(leaf));
+      return leaf_ptr;
+    }
+
+    RadixNode* child = it->second.get();
+    int edge_length = child->edge.size();
+    int common = 0;
+    while (common < edge_length && pos + common < num_tokens &&
+           child->edge[common] == tokens[pos + common]) {
+      ++common;
+    }
+    if (common == edge_length) {
+      pos += edge_length;
+      node = child;
+      continue;
+    }
+
+    // Split the edge at the first mismatch.
+    auto middle = std::make_unique<RadixNode>();
+    middle->edge.assign(child->edge.begin(), child->edge.begin() + common);
+    middle->length = node->length + common;
+    middle->parent = node;
+    std::unique_ptr<RadixNode> child_owned = std::move(it->second);
+    child_owned->edge.erase(child_owned->edge.begin(), child_owned->edge.begin() + common);
+    child_owned->parent = middle.get();
+    middle->children.emplace(child_owned->edge[0], std::move(child_owned));
+    RadixNode* middle_ptr = middle.get();
+    it->second = std::move(middle);
+    node = middle_ptr;
+    pos += common;
+  }
+  return node;
+}
+
+void PrefixCacheObj::RemoveEntryFromTree(int entry_id) {
+  RadixNode* node = entries_[entry_id].node;
+  node->entry_id = -1;
+  // Prune the leaves that hold no entry.
+  while (node != root_.get() && node->entry_id == -1 && node->children.empty()) {
+    RadixNode* parent = node->parent;
+    parent->children.erase(node->edge[0]);
+    node = parent;
+  }
+}
+
+int PrefixCacheObj::AllocateEntry() {
+  if (!free_entry_ids_.empty()) {
+    int entry_id = free_entry_ids_.back();
+    free_entry_ids_.pop_back();
+    return entry_id;
+  }
+  entries_.emplace_back();
+  return static_cast<int>(entries_.size()) - 1;
+}
+
+}  // namespace serve
+}  // namespace llm
+}  // namespace mlc
@@ -0,0 +1,210 @@
+/*!
+ *  Copyright (c) 2023 by Contributors
+ * \file serve/prefix_cache.h
+ * \brief The radix-tree prefix cache that reuses the KV data of common
+ * prompt prefixes across requests.
+ */
+#ifndef MLC_LLM_SERVE_PREFIX_CACHE_H_
+#define MLC_LLM_SERVE_PREFIX_CACHE_H_
+
+#include <tvm/runtime/container/array.h>
+#include <tvm/runtime/object.h>
+
+#include <memory>
+#include <unordered_map>
+#include <vector>
+
+#include "model.h"
+
+namespace mlc {
+namespace llm {
+namespace serve {
+
+using namespace tvm::runtime;
+
+class EngineState;
+
+/*!
+ * \brief The prefix cache of the serving engine.
+ * \details The prefix cache keeps the KV data of block-aligned prompt
+ * prefixes in "frozen" sequences of the paged KV cache, and indexes them
+ * with a radix tree keyed by token ids. A new request whose input starts
+ * with a cached prefix forks the cached sequence in the KV cache, so that
+ * the KV pages of the common prefix are shared instead of being prefilled
+ * again.
+ *
+ * Since a sequence can only be forked at its end, the prefixes to cache
+ * are decided before prefill as "checkpoints" of the request, at which the
+ * prefill stops to freeze the sequence as a new entry:
+ * - the longest block-aligned prefix shared with the cached prefixes, i.e.,
+ * where the prompt diverges from the cached prompts, such as the end of a
+ * common system prompt;
+ * - the longest block-aligned prefix of the prompt that leaves at least one
+ * token to prefill, so that the same prompt hits the cache in full.
+ *
+ * A cache entry is referenced by the sequences forked from it (running
+ * requests or other cache entries). Referenced entries are pinned, and the
+ * entries with zero reference are evicted in LRU order when the cache is
+ * full or the KV cache runs out of pages.
+ */
+class PrefixCacheObj : public Object {
+ public:
+  /*! \brief The result of a prefix cache lookup. */
+  struct MatchResult {
+    /*! \brief The matched cache entry id, or -1 if no entry matches. */
+    int entry_id = -1;
+    /*! \brief The number of prefix tokens whose KV data are cached. */
+    int matched_length = 0;
+    /*!
+     * \brief The length of the longest common prefix of the input and the
+     * cached prefixes, which is no shorter than `matched_length`.
+     */
+    int common_length = 0;
+  };
+
+  explicit PrefixCacheObj(int max_num_entries, int page_size);
+
+  /*!
+   * \brief Find the longest cached prefix of the input tokens.
+   * The matched prefix is always shorter than the input, so that at
+   * least one token is left to prefill.
+   * \param tokens The input token ids of a request.
+   * \return The match result.
+   */
+  MatchResult Match(const std::vector<int32_t>& tokens) const;
+
+  /*!
+   * \brief Get the checkpoints of a request to prefill, which are the
+   * block-aligned prefix lengths, in ascending order, where the prefill stops
+   * to insert the prefix into the cache.
+   * \param tokens The input token ids of the request.
+   * \param match The match result of the input tokens.
+   * \return The checkpoints, which are longer than the matched prefix and
+   * shorter than the input.
+   */
+  std::vector<int> GetCheckpoints(const std::vector<int32_t>& tokens,
+                                  const MatchResult& match) const;
+
+  /*!
+   * \brief Create the sequence of a request by forking the given cache entry.
+   * \param estate The engine state, where hit statistics are updated.
+   * \param entry_id The cache entry to fork from.
+   * \param seq_id The sequence id of the request in the KV cache.
+   * \param models The models whose KV caches hold the entry.
+   */
+  void ForkFromEntry(EngineState estate, int entry_id, int64_t seq_id, const Array<Model>& models);
+
+  /*!
+   * \brief Insert the prefilled prefix of a request at a checkpoint into the cache.
+   * On insertion, the sequence of the request is frozen as the new cache
+   * entry, and the request continues with a new sequence forked from it.
+   * \param estate The engine state providing the internal id manager.
+   * \param tokens The prefilled prefix token ids, whose length is block-aligned.
+   * \param seq_id The current sequence id of the request.
+   * \param models The models whose KV caches hold the sequence.
+   * \return The new sequence id of the request, which equals to the
+   * input sequence id when the prompt is not inserted.
+   */
+  int64_t Insert(EngineState estate, const std::vector<int32_t>& tokens, int64_t seq_id,
+                 const Array<Model>& models);
+
+  /*!
+   * \brief Notify the cache that the given sequence has been removed from
+   * the KV cache, so that the entry it was forked from is released.
+   */
+  void OnSequenceRemoved(int64_t seq_id);
+
+  /*!
+   * \brief Evict the least recently used unreferenced entry.
+   * \return A boolean denoting if any entry is evicted.
+   */
+  bool EvictLRU(EngineState estate, const Array<Model>& models);
+
+  /*! \brief Return the number of entries in the cache. */
+  int NumEntries() const { return num_entries_; }
+
+  /*! \brief Clear the cache. This does not touch the KV cache. */
+  void Reset();
+
+  static constexpr const char* _type_key = "mlc.serve.PrefixCache";
+  static constexpr const bool _type_has_method_sequal_reduce = false;
+  static constexpr const bool _type_has_method_shash_reduce = false;
+  TVM_DECLARE_FINAL_OBJECT_INFO(PrefixCacheObj, Object);
+
+ private:
+  /*! \brief A node of the radix tree. */
+  struct RadixNode {
+    /*! \brief The token ids on the edge from the parent to this node. */
+    std::vector<int32_t> edge;
+    /*! \brief The total number of tokens from the root to this node. */
+    int length = 0;
+    /*! \brief The cache entry ending at this node, or -1 if none. */
+    int entry_id = -1;
+    /*! \brief The parent node. */
+    RadixNode* parent = nullptr;
+    /*! \brief The children nodes, keyed by the first token of their edges. */
+    std::unordered_map<int32_t, std::unique_ptr<RadixNode>> children;
+  };
+
+  /*! \brief A cache entry, which is a frozen sequence in the KV cache. */
+  struct Entry {
+    /*! \brief The sequence id in the KV cache. */
+    int64_t seq_id = -1;
+    /*! \brief The radix tree node where this entry ends. */
+    RadixNode* node = nullptr;
+    /*! \brief The entry that this entry's sequence was forked from, or -1. */
+    int parent_entry_id = -1;
+    /*! \brief The number of sequences forked from this entry. */
+    int ref_count = 0;
+    /*! \brief The fork depth of the sequence in the KV cache. */
+    int depth = 1;
+    /*! \brief The logical timestamp of the last access. */
+    int64_t last_access = 0;
+  };
+
+  /*! \brief Find or create the node of the given tokens, splitting edges when needed. */
+  RadixNode* GetOrCreateNode(const std::vector<int32_t>& tokens);
+  /*! \brief Remove the entry from the tree and prune the nodes without entry or children. */
+  void RemoveEntryFromTree(int entry_id);
+  /*! \brief Allocate a slot in `entries_` for a new entry. */
+  int AllocateEntry();
+
+  /*! \brief The maximum number of entries. */
+  int max_num_entries_;
+  /*! \brief The page size of the KV cache, to which cached prefixes are aligned. */
+  int page_size_;
+  /*! \brief The root of the radix tree. */
+  std::unique_ptr<RadixNode> root_;
+  /*! \brief The cache entries. Invalid entries have `seq_id` -1. */
+  std::vector<Entry> entries_;
+  /*! \brief The unused slots in `entries_`. */
+  std::vector<int> free_entry_ids_;
+  /*! \brief The number of valid entries. */
+  int num_entries_ = 0;
+  /*! \brief The mapping from the sequences forked from entries to the entry ids. */
+  std::unordered_map<int64_t, int> seq_parent_entry_;
+  /*! \brief The logical clock for LRU. */
+  int64_t clock_ = 0;
+};
+
+/*!
+ * \brief Managed reference of PrefixCacheObj.
+ * \sa PrefixCacheObj
+ */
+class PrefixCache : public ObjectRef {
+ public:
+  /*!
+   * \brief Create a prefix cache.
+   * \param max_num_entries The maximum number of cached prefixes.
+   * \param page_size The page size of the KV cache.
+   */
+  explicit PrefixCache(int max_num_entries, int page_size);
+
+  TVM_DEFINE_MUTABLE_OBJECT_REF_METHODS(PrefixCache, ObjectRef, PrefixCacheObj);
+};
+
+}  // namespace serve
+}  // namespace llm
+}  // namespace mlc
+
+#endif  // MLC_LLM_SERVE_PREFIX_CACHE_H_
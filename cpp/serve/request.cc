@@ -18,7 +18,8 @@ namespace serve {
 
 TVM_REGISTER_OBJECT_TYPE(RequestNode);
 
-Request::Request(String id, Array<Data> inputs, GenerationConfig generation_cfg) {
+Request::Request(String id, Array<Data> inputs, GenerationConfig generation_cfg, int priority,
+                 String tenant) {
   CHECK(!inputs.empty()) << "No input data is given.";
   // Compute the total input length, or fall back to "-1" which means
   // unknown due to the existence of untokenized data.
@@ -37,6 +38,8 @@ Request::Request(String id, Array<Data> inputs, GenerationConfig generation_cfg)
   n->inputs = std::move(inputs);
   n->input_total_length = input_total_length;
   n->generation_cfg = std::move(generation_cfg);
+  n->priority = priority;
+  n->tenant = std::move(tenant);
   data_ = std::move(n);
 }
 
@@ -60,14 +63,16 @@ Request Request::FromUntokenized(const Request& request, const Tokenizer& tokeni
     ICHECK_NE(request->input_total_length, -1);
     return request;
   } else {
-    return Request(request->id, std::move(inputs), request->generation_cfg);
+    return Request(request->id, std::move(inputs), request->generation_cfg, request->priority,
+                   request->tenant);
   }
 }
 
 TVM_REGISTER_GLOBAL("mlc.serve.Request")
-    .set_body_typed([](String id, Array<Data> inputs, String generation_cfg_json) {
+    .set_body_typed([](String id, Array<Data> inputs, String generation_cfg_json, int priority,
+                       String tenant) {
       return Request(std::move(id), std::move(inputs),
-                     GenerationConfig(std::move(generation_cfg_json)));
+                     GenerationConfig(std::move(generation_cfg_json)), priority, std::move(tenant));
     });
 
 TVM_REGISTER_GLOBAL("mlc.serve.RequestGetInputs").set_body_typed([](Request request) {
@@ -11,6 +11,8 @@
 #include <tvm/runtime/object.h>
 #include <tvm/runtime/packed_func.h>
 
+#include <string>
+
 #include "../tokenizers.h"
 #include "config.h"
 #include "data.h"
@@ -53,6 +55,13 @@ class RequestNode : public Object {
    * top_p, repetition_penalty, max_gen_len, etc.
    */
   GenerationConfig generation_cfg;
+  /*!
+   * \brief The priority of the request under the "priority" scheduler.
+   * Requests with higher priority are admitted first and preempted last.
+   */
+  int priority = 0;
+  /*! \brief The tenant the request belongs to under the "fair_share" scheduler. */
+  String tenant = "";
 
   static constexpr const char* _type_key = "mlc.serve.Request";
   static constexpr const bool _type_has_method_sequal_reduce = false;
@@ -62,7 +71,8 @@ class RequestNode : public Object {
 
 class Request : public ObjectRef {
  public:
-  explicit Request(String id, Array<Data> inputs, GenerationConfig generation_cfg);
+  explicit Request(String id, Array<Data> inputs, GenerationConfig generation_cfg,
+                   int priority = 0, String tenant = "");
 
   /*!
    * \brief Return a request object with all text data tokenized,
@@ -76,6 +86,22 @@ class Request : public ObjectRef {
   TVM_DEFINE_OBJECT_REF_METHODS(Request, ObjectRef, RequestNode);
 };
 
+/*!
+ * \brief Get the id of a sequence of the request which generates multiple sequences
+ * (`generation_cfg->n > 1`). Each sequence is handled as a separate request in the
+ * engine, where the first sequence keeps the request id, and the i-th (i > 0)
+ * sequence has id "<request id>#<i>".
+ * \param request_id The id of the request.
+ * \param choice_index The index of the sequence.
+ * \return The id of the sequence.
+ */
+inline String GetChoiceRequestId(const String& request_id, int choice_index) {
+  if (choice_index == 0) {
+    return request_id;
+  }
+  return std::string(request_id) + "#" + std::to_string(choice_index);
+}
+
 }  // namespace serve
 }  // namespace llm
 }  // namespace mlc
@@ -5,6 +5,8 @@
 
 #include "request_state.h"
 
+#include <algorithm>
+
 namespace mlc {
 namespace llm {
 namespace serve {
@@ -31,17 +33,53 @@ int RequestModelStateNode::GetInputLength() const {
   return total_length;
 }
 
-std::vector<int> RequestModelStateNode::GetTokenBitmask(int vocab_size) const {
-  // TODO(mlc-team): implement this function.
-  return std::vector<int>();
+bool RequestModelStateNode::RequireNextTokenBitmask() const {
+  return grammar_state_matcher.defined();
+}
+
+void RequestModelStateNode::FindNextTokenBitmask(DLTensor* next_token_bitmask) {
+  ICHECK(grammar_state_matcher.defined());
+  grammar_state_matcher.value()->FindNextTokenBitmask(next_token_bitmask);
+  // The stop tokens of the request, e.g. the ones of the conversation template, are not known by
+  // the matcher. They are acceptable once the grammar is complete.
+  if (grammar_state_matcher.value()->CanTerminate()) {
+    uint32_t* data = static_cast<uint32_t*>(next_token_bitmask->data);
+    for (int token_id : request->generation_cfg->stop_token_ids) {
+      if (token_id / 32 < next_token_bitmask->shape[0]) {
+        data[token_id / 32] |= 1u << (token_id % 32);
+      }
+    }
+  }
+}
+
+/*! \brief Whether the token is a stop token of the request, which the grammar does not match. */
+inline bool IsRequestStopToken(const Request& request, int32_t token_id) {
+  const std::vector<int>& stop_token_ids = request->generation_cfg->stop_token_ids;
+  return std::find(stop_token_ids.begin(), stop_token_ids.end(), token_id) !=
+         stop_token_ids.end();
 }
 
 void RequestModelStateNode::CommitToken(SampleResult sampled_token) {
+  if (grammar_state_matcher.defined() &&
+      !IsRequestStopToken(request, sampled_token.sampled_token_id.first)) {
+    ICHECK(draft_output_tokens.empty());
+    // The token is sampled under the bitmask, so it is accepted except for numerical corner
+    // cases, where the matcher stays unchanged.
+    grammar_state_matcher.value()->AcceptToken(sampled_token.sampled_token_id.first);
+  }
   committed_tokens.push_back(std::move(sampled_token));
   appeared_token_ids[sampled_token.sampled_token_id.first] += 1;
 }
 
 void RequestModelStateNode::AddDraftToken(SampleResult sampled_token, NDArray prob_dist) {
+  // Drafts after the first one rejected by the grammar are not fed to the matcher. They will be
+  // rejected in verification anyway, since the rejected draft has zero probability.
+  if (grammar_state_matcher.defined() &&
+      num_grammar_accepted_draft_tokens == static_cast<int>(draft_output_tokens.size()) &&
+      !IsRequestStopToken(request, sampled_token.sampled_token_id.first) &&
+      grammar_state_matcher.value()->AcceptToken(sampled_token.sampled_token_id.first)) {
+    ++num_grammar_accepted_draft_tokens;
+  }
   draft_output_tokens.push_back(std::move(sampled_token));
   draft_output_prob_dist.push_back(std::move(prob_dist));
   appeared_token_ids[sampled_token.sampled_token_id.first] += 1;
@@ -49,6 +87,10 @@ void RequestModelStateNode::AddDraftToken(SampleResult sampled_token, NDArray pr
 
 void RequestModelStateNode::RemoveLastDraftToken() {
   ICHECK(!draft_output_tokens.empty());
+  if (num_grammar_accepted_draft_tokens == static_cast<int>(draft_output_tokens.size())) {
+    grammar_state_matcher.value()->Rollback(1);
+    --num_grammar_accepted_draft_tokens;
+  }
   auto it = appeared_token_ids.find(draft_output_tokens.back().sampled_token_id.first);
   draft_output_tokens.pop_back();
   draft_output_prob_dist.pop_back();
@@ -64,16 +106,42 @@ void RequestModelStateNode::RemoveAllDraftTokens() {
   }
 }
 
+/****************** DraftAcceptanceStats ******************/
+
+void DraftAcceptanceStats::Record(int num_proposed, int num_accepted) {
+  // The weight of the past verifications decays by this factor at each verification,
+  // so that the acceptance rate follows the changes in the difficulty of the output.
+  constexpr double kDecay = 0.9;
+  ICHECK_LE(num_accepted, num_proposed);
+  decayed_num_accepted = decayed_num_accepted * kDecay + num_accepted;
+  decayed_num_verified =
+      decayed_num_verified * kDecay + num_accepted + (num_accepted < num_proposed ? 1 : 0);
+  total_num_proposed += num_proposed;
+  total_num_accepted += num_accepted;
+  if (static_cast<int>(accept_histogram.size()) <= num_accepted) {
+    accept_histogram.resize(num_accepted + 1, 0);
+  }
+  ++accept_histogram[num_accepted];
+}
+
+double DraftAcceptanceStats::GetAcceptanceRate() const {
+  return decayed_num_verified > 0 ? decayed_num_accepted / decayed_num_verified : 0.0;
+}
+
+/****************** RequestState ******************/
+
 TVM_REGISTER_OBJECT_TYPE(RequestStateNode);
 
 RequestState::RequestState(Request request, int num_models, int64_t internal_id,
-                           const std::vector<std::string>& token_table) {
+                           const std::vector<std::string>& token_table,
+                           Optional<GrammarStateMatcher> grammar_state_matcher) {
   ObjectPtr<RequestStateNode> n = make_object<RequestStateNode>();
   Array<RequestModelState> mstates;
   mstates.reserve(num_models);
   for (int i = 0; i < num_models; ++i) {
     mstates.push_back(RequestModelState(request, i, internal_id, request->inputs));
   }
+  mstates[0]->grammar_state_matcher = std::move(grammar_state_matcher);
   n->rng = RandomGenerator(request->generation_cfg->seed);
   n->stop_str_handler = StopStrHandler(
       !request->generation_cfg->ignore_eos ? request->generation_cfg->stop_strs : Array<String>(),
@@ -85,8 +153,7 @@ RequestState::RequestState(Request request, int num_models, int64_t internal_id,
   data_ = std::move(n);
 }
 
-DeltaRequestReturn RequestStateNode::GetReturnTokenIds(const Tokenizer& tokenizer,
-                                                       int max_single_sequence_length) {
+DeltaRequestReturn RequestStateNode::GetReturnTokenIds(int max_single_sequence_length) {
   // - Case 0. There is remaining draft output ==> Unfinished
   //   All draft outputs are supposed to be processed before finish.
   for (RequestModelState mstate : mstates) {
@@ -96,7 +163,7 @@ DeltaRequestReturn RequestStateNode::GetReturnTokenIds(const Tokenizer& tokenize
   }
 
   std::vector<int32_t> return_token_ids;
-  std::vector<String> logprob_json_strs;
+  std::vector<SampleResult> sample_results;
   Optional<String> finish_reason;
   const std::vector<SampleResult>& committed_tokens = mstates[0]->committed_tokens;
   int num_committed_tokens = committed_tokens.size();
@@ -107,8 +174,9 @@ DeltaRequestReturn RequestStateNode::GetReturnTokenIds(const Tokenizer& tokenize
   while (next_callback_token_pos < num_committed_tokens) {
     std::vector<int32_t> delta_token_ids =
         stop_str_handler->Put(committed_tokens[next_callback_token_pos].sampled_token_id.first);
-    logprob_json_strs.push_back(committed_tokens[next_callback_token_pos].GetLogProbJSON(
-        tokenizer, request->generation_cfg->logprobs));
+    if (request->generation_cfg->logprobs) {
+      sample_results.push_back(committed_tokens[next_callback_token_pos]);
+    }
     ++next_callback_token_pos;
     return_token_ids.insert(return_token_ids.end(), delta_token_ids.begin(), delta_token_ids.end());
     if (stop_str_handler->StopTriggered()) {
@@ -137,7 +205,7 @@ DeltaRequestReturn RequestStateNode::GetReturnTokenIds(const Tokenizer& tokenize
   }
 
   if (finish_reason.defined()) {
-    return {return_token_ids, logprob_json_strs, finish_reason};
+    return {return_token_ids, sample_results, finish_reason};
   }
 
   // Case 3. Generation reaches the specified max generation length ==> Finished
@@ -146,15 +214,15 @@ DeltaRequestReturn RequestStateNode::GetReturnTokenIds(const Tokenizer& tokenize
       num_committed_tokens >= request->generation_cfg->max_tokens) {
     std::vector<int32_t> remaining = stop_str_handler->Finish();
     return_token_ids.insert(return_token_ids.end(), remaining.begin(), remaining.end());
-    return {return_token_ids, logprob_json_strs, String("length")};
+    return {return_token_ids, sample_results, String("length")};
   }
   // Case 4. Total length of the request reaches the maximum single sequence length ==> Finished
   if (request->input_total_length + num_committed_tokens >= max_single_sequence_length) {
     std::vector<int32_t> remaining = stop_str_handler->Finish();
     return_token_ids.insert(return_token_ids.end(), remaining.begin(), remaining.end());
-    return {return_token_ids, logprob_json_strs, String("length")};
+    return {return_token_ids, sample_results, String("length")};
   }
-  return {return_token_ids, logprob_json_strs, Optional<String>()};
+  return {return_token_ids, sample_results, Optional<String>()};
 }
 
 }  // namespace serve
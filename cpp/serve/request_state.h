@@ -10,9 +10,14 @@
 #include <tvm/runtime/ndarray.h>
 #include <tvm/runtime/object.h>
 
+#include <chrono>
+#include <optional>
+#include <vector>
+
 #include "../random.h"
 #include "../streamer.h"
 #include "config.h"
+#include "grammar/grammar_state_matcher.h"
 #include "request.h"
 
 namespace mlc {
@@ -69,14 +74,27 @@ class RequestModelStateNode : public Object {
   std::vector<NDArray> draft_output_prob_dist;
   /*! \brief The appeared committed and draft tokens and their occurrence times. */
   std::unordered_map<int32_t, int32_t> appeared_token_ids;
+  /*!
+   * \brief The matcher constraining the output to the grammar of the response format.
+   * It is undefined when the output is not constrained.
+   * \note The committed tokens and the draft tokens accepted by the grammar are fed to the
+   * matcher, and the draft tokens are rolled back on removal.
+   */
+  Optional<GrammarStateMatcher> grammar_state_matcher;
+  /*! \brief The number of leading draft tokens accepted by the grammar state matcher. */
+  int num_grammar_accepted_draft_tokens = 0;
 
   /*! \brief Return the total length of the input data. */
   int GetInputLength() const;
+  /*! \brief Return whether the next token is constrained by a token bitmask. */
+  bool RequireNextTokenBitmask() const;
   /*!
-   * \brief Return the token bitmask induced by the current state.
-   * The returned vector should have size "ceildiv(vocab_size, 32)".
+   * \brief Find the token bitmask induced by the current state, where the bits of the
+   * acceptable tokens are set.
+   * \param next_token_bitmask The pre-allocated bitmask of shape (ceildiv(vocab_size, 32),)
+   * and dtype uint32, which is usually a row of the bitmask of the whole batch.
    */
-  std::vector<int> GetTokenBitmask(int vocab_size) const;
+  void FindNextTokenBitmask(DLTensor* next_token_bitmask);
   /*! \brief Commit a new token into committed_tokens. Update appeared_token_ids. */
   void CommitToken(SampleResult sampled_token);
   /*! \brief Add a draft token into draft_output_tokens. Update appeared_token_ids. */
@@ -100,9 +118,46 @@ class RequestModelState : public ObjectRef {
   TVM_DEFINE_MUTABLE_OBJECT_REF_METHODS(RequestModelState, ObjectRef, RequestModelStateNode);
 };
 
+/*!
+ * \brief The draft acceptance statistics of a request in speculative decoding,
+ * which decide the draft length of the request when it is adaptive.
+ */
+struct DraftAcceptanceStats {
+  /*!
+   * \brief The number of draft tokens to propose for the request in the next
+   * speculation step, or 0 before the first step.
+   */
+  int draft_length = 0;
+  /*!
+   * \brief The exponentially decayed number of accepted draft tokens, and the
+   * decayed number of verified draft tokens, i.e., the accepted draft tokens
+   * plus the rejected one. Their ratio estimates the current acceptance rate.
+   */
+  double decayed_num_accepted = 0.0;
+  double decayed_num_verified = 0.0;
+  /*! \brief The total number of proposed draft tokens. */
+  int64_t total_num_proposed = 0;
+  /*! \brief The total number of accepted draft tokens. */
+  int64_t total_num_accepted = 0;
+  /*! \brief The number of verifications by the number of accepted draft tokens. */
+  std::vector<int64_t> accept_histogram;
+
+  /*!
+   * \brief Record the result of a verification.
+   * \param num_proposed The number of verified draft tokens.
+   * \param num_accepted The number of leading draft tokens accepted.
+   */
+  void Record(int num_proposed, int num_accepted);
+  /*! \brief Return the estimated probability of a draft token being accepted. */
+  double GetAcceptanceRate() const;
+};
+
+class RequestState;
+
 struct DeltaRequestReturn {
   std::vector<int32_t> delta_token_ids;
-  Array<String> delta_logprob_json_strs;
+  /*! \brief The sampling results of the delta tokens, collected only when logprobs are needed. */
+  std::vector<SampleResult> delta_sample_results;
   Optional<String> finish_reason;
 };
 
@@ -124,22 +179,32 @@ class RequestStateNode : public Object {
    * next request stream callback invocation.
    */
   int next_callback_token_pos;
+  /*! \brief The draft acceptance statistics in speculative decoding. */
+  DraftAcceptanceStats draft_stats;
+  /*!
+   * \brief The states of the other sequences of a request generating multiple
+   * sequences, which are not in the engine yet. They are forked from this
+   * request after its prompt is prefilled, and then share the KV data of the
+   * prompt. It is empty after the fork.
+   */
+  std::vector<RequestState> children_to_fork;
 
   /*! \brief The time of adding the request to engine. */
   std::chrono::high_resolution_clock::time_point tadd;
   /*! \brief The time of finishing prefill stage. */
   std::chrono::high_resolution_clock::time_point tprefill_finish;
+  /*! \brief The time of returning the last tokens, which is undefined before the first token. */
+  std::optional<std::chrono::high_resolution_clock::time_point> tlast_token_return;
 
   /*!
-   * \brief Get the delta token ids and the logprob JSON strings for this
+   * \brief Get the delta token ids and their sampling results for this
    * request to return since the last time calling into this function,
    * and return the finish reason if the request generation has finished.
-   * \param tokenizer The tokenizer for logprob process.
    * \param max_single_sequence_length The maximum allowed single sequence length.
-   * \return The delta token ids to return, the logprob JSON strings of each
-   * delta token id, and the optional finish reason.
+   * \return The delta token ids to return, the sampling results of the
+   * delta tokens when logprobs are requested, and the optional finish reason.
    */
-  DeltaRequestReturn GetReturnTokenIds(const Tokenizer& tokenizer, int max_single_sequence_length);
+  DeltaRequestReturn GetReturnTokenIds(int max_single_sequence_length);
 
   static constexpr const char* _type_key = "mlc.serve.RequestState";
   static constexpr const bool _type_has_method_sequal_reduce = false;
@@ -149,8 +214,18 @@ class RequestStateNode : public Object {
 
 class RequestState : public ObjectRef {
  public:
+  /*!
+   * \brief Constructor.
+   * \param request The request.
+   * \param num_models The number of models serving the request.
+   * \param internal_id The internal id of the request.
+   * \param token_table The token table of the tokenizer.
+   * \param grammar_state_matcher The matcher constraining the output, if any. It is used
+   * by the first model, which makes the final decision of the tokens in speculative decoding.
+   */
   explicit RequestState(Request request, int num_models, int64_t internal_id,
-                        const std::vector<std::string>& token_table);
+                        const std::vector<std::string>& token_table,
+                        Optional<GrammarStateMatcher> grammar_state_matcher = NullOpt);
 
   TVM_DEFINE_MUTABLE_OBJECT_REF_METHODS(RequestState, ObjectRef, RequestStateNode);
 };
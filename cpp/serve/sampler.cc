@@ -10,6 +10,7 @@
 #include <tvm/runtime/registry.h>
 #include <tvm/runtime/threading_backend.h>
 
+#include <algorithm>
 #include <cmath>
 
 #include "../random.h"
@@ -19,12 +20,13 @@ namespace llm {
 namespace serve {
 
 /*!
- * \brief Sample a value from the input probability distribution with top-p.
+ * \brief Sample a value from the input probability distribution with top-p and top-k.
  * The input is a batch of distributions, and we use `unit_offset` to specify
  * which distribution to sample from.
  * \param prob The input batch of probability distributions.
  * \param unit_offset The offset specifying which distribution to sample from.
  * \param top_p The top-p value of sampling.
+ * \param top_k The top-k value of sampling, which is disabled when non-positive.
  * \param uniform_sample The random number in [0, 1] for sampling.
  * \param output_prob_dist Optional pointer to store the corresponding probability distribution of
  * each token, offset by unit_offset. If nullptr provided, nothing will be stored out.
@@ -32,7 +34,8 @@ namespace serve {
  * \note This function is an enhancement of SampleTopPFromProb in TVM Unity.
  * We will upstream the enhancement after it gets stable.
  */
-TokenProbPair SampleTopPFromProb(NDArray prob, int unit_offset, double top_p, double uniform_sample,
+TokenProbPair SampleTopPFromProb(NDArray prob, int unit_offset, double top_p, int top_k,
+                                 double uniform_sample,
                                  std::vector<NDArray>* output_prob_dist = nullptr) {
   // prob: (*, v)
   // The prob array may have arbitrary ndim and shape.
@@ -60,8 +63,8 @@ TokenProbPair SampleTopPFromProb(NDArray prob, int unit_offset, double top_p, do
     }
   }
 
-  if (top_p == 0) {
-    // Specially handle case where top_p == 0.
+  if (top_p == 0 || top_k == 1) {
+    // Specially handle case where top_p == 0 or top_k == 1.
     // This case is equivalent to doing argmax.
     int argmax_pos = -1;
     float max_prob = 0.0;
@@ -91,8 +94,8 @@ TokenProbPair SampleTopPFromProb(NDArray prob, int unit_offset, double top_p, do
     (*output_prob_dist)[unit_offset].CopyFromBytes(p_prob, ndata * sizeof(float));
   }
 
-  if (top_p >= one) {
-    // Specially handle case where top_p == 1.
+  if (top_p >= one && top_k <= 0) {
+    // Specially handle case where top_p == 1 and top_k is disabled.
     double prob_sum = 0.0f;
     for (int64_t i = 0; i < ndata; ++i) {
       prob_sum += p_prob[i];
@@ -128,14 +131,20 @@ TokenProbPair SampleTopPFromProb(NDArray prob, int unit_offset, double top_p, do
       return lhs.first > rhs.first;
     };
     std::sort(data.begin(), data.end(), fcmp);
+    // All the tokens no less than the cutoff are in `data`. So when there are at
+    // least `top_k` of them, the first `top_k` ones are exactly the top-k tokens.
+    bool truncated_by_top_k = top_k > 0 && static_cast<int64_t>(data.size()) >= top_k;
+    if (truncated_by_top_k) {
+      data.resize(top_k);
+    }
 
     // short cut, if we know that
-    // uniform sample < p[0] / top_p
+    // uniform sample < p[0]
     // we know that unform_sample < p[0] / top_p_sum
-    // because top_p_sum guarantees to be smaller than top_p
+    // because top_p_sum is no larger than 1
     // so we can simply return the argmax sample
     // without computing anything
-    if (uniform_sample < data[0].first / top_p) {
+    if (uniform_sample < data[0].first) {
       return std::make_pair(data[0].first, data[0].second);
     }
 
@@ -156,7 +165,9 @@ TokenProbPair SampleTopPFromProb(NDArray prob, int unit_offset, double top_p, do
     // we find that the current total sum by the given cutoff
     // is not sufficient to cover everything
     // this means we might need to retry a smaller cutoff pt.
-    if (cum_sum_prob < top_p && cuttoff != 0.0f) return std::make_pair(-1, -1);
+    if (cum_sum_prob < top_p && cuttoff != 0.0f && !truncated_by_top_k) {
+      return std::make_pair(-1, -1);
+    }
 
     float last_cum_sum_prob = 0.0;
     for (auto it = data.begin(); it != data.end(); ++it) {
@@ -184,6 +195,12 @@ TokenProbPair SampleTopPFromProb(NDArray prob, int unit_offset, double top_p, do
   return {sampled_index.second, sampled_index.first};
 }
 
+TVM_REGISTER_GLOBAL("mlc.serve.SampleTopPFromProb")
+    .set_body_typed([](NDArray prob, int unit_offset, double top_p, int top_k,
+                       double uniform_sample) {
+      return SampleTopPFromProb(prob, unit_offset, top_p, top_k, uniform_sample).first;
+    });
+
 namespace detail {
 
 /*! \brief Implementation of getting top probs on CPU. */
@@ -263,6 +280,7 @@ class CPUSampler : public SamplerObj {
   }
 
   std::vector<SampleResult> BatchSampleTokens(NDArray probs_device,                           //
+                                              const std::vector<int>& sample_indices,         //
                                               const Array<String>& request_ids,               //
                                               const Array<GenerationConfig>& generation_cfg,  //
                                               const std::vector<RandomGenerator*>& rngs,      //
@@ -276,31 +294,34 @@ class CPUSampler : public SamplerObj {
     RECORD_EVENT(trace_recorder_, request_ids, "finish copy probs to CPU");
 
     // - Sample tokens from probabilities.
-    ICHECK_EQ(probs_host->shape[0], request_ids.size());
-    ICHECK_EQ(probs_host->shape[0], generation_cfg.size());
-    ICHECK_EQ(probs_host->shape[0], rngs.size());
-    int n = probs_host->shape[0];
+    int n = sample_indices.size();
+    ICHECK_EQ(n, request_ids.size());
+    ICHECK_EQ(n, generation_cfg.size());
+    ICHECK_EQ(n, rngs.size());
 
     std::vector<SampleResult> sample_results;
     sample_results.resize(n);
     if (output_prob_dist) {
-      output_prob_dist->resize(n);
+      output_prob_dist->resize(probs_host->shape[0]);
     }
 
     tvm::runtime::parallel_for_with_threading_backend(
-        [this, &sample_results, &probs_host, &generation_cfg, &rngs, &request_ids,
-         output_prob_dist](int i) {
+        [this, &sample_results, &probs_host, &sample_indices, &generation_cfg, &rngs,
+         &request_ids, output_prob_dist](int i) {
           RECORD_EVENT(this->trace_recorder_, request_ids[i], "start sample token");
+          int prob_index = sample_indices[i];
+          ICHECK(prob_index >= 0 && prob_index < probs_host->shape[0]);
           // Sample top p from probability.
           sample_results[i].sampled_token_id = SampleTopPFromProb(
-              probs_host, i, generation_cfg[i]->temperature < eps_ ? 0.0 : generation_cfg[i]->top_p,
-              rngs[i]->GetRandomNumber(), output_prob_dist);
+              probs_host, prob_index,
+              generation_cfg[i]->temperature < eps_ ? 0.0 : generation_cfg[i]->top_p,
+              generation_cfg[i]->top_k, rngs[i]->GetRandomNumber(), output_prob_dist);
           if (output_prob_dist == nullptr) {
             // When `output_prob_dist` is not nullptr, it means right now
             // we are sampling for a small model in speculation, in which
             // case we do not need to get the top probs.
             sample_results[i].top_prob_tokens =
-                ComputeTopProbs(probs_host, i, generation_cfg[i]->top_logprobs);
+                ComputeTopProbs(probs_host, prob_index, generation_cfg[i]->top_logprobs);
           }
           RECORD_EVENT(this->trace_recorder_, request_ids[i], "finish sample token");
         },
@@ -383,7 +404,7 @@ class CPUSampler : public SamplerObj {
             sample_result.sampled_token_id = SampleTopPFromProb(
                 probs_host, verify_start + cur_token_idx,
                 generation_cfg[i]->temperature < eps_ ? 0.0 : generation_cfg[i]->top_p,
-                rngs[i]->GetRandomNumber());
+                generation_cfg[i]->top_k, rngs[i]->GetRandomNumber());
             sample_result.top_prob_tokens = ComputeTopProbs(
                 probs_host, verify_start + cur_token_idx, generation_cfg[i]->top_logprobs);
             sample_results[i].push_back(sample_result);
@@ -429,6 +450,215 @@ class CPUSampler : public SamplerObj {
   const float eps_ = 1e-5;
 };
 
+/********************* GPU Sampler *********************/
+
+/*!
+ * \brief The sampler that samples tokens on GPU with the sampling function
+ * compiled into the model, so that only the sampled tokens and the requested
+ * top probabilities are copied back to CPU instead of the full distributions.
+ */
+class GPUSampler : public SamplerObj {
+ public:
+  explicit GPUSampler(int max_num_sample, int vocab_size, FunctionTable* ft, DLDevice device,
+                      Optional<EventTraceRecorder> trace_recorder)
+      : max_num_sample_(max_num_sample),
+        vocab_size_(vocab_size),
+        sample_func_(ft->sample_top_p_top_k_func_),
+        cpu_sampler_(Sampler::Create(/*sampler_kind=*/"cpu", trace_recorder)),
+        trace_recorder_(std::move(trace_recorder)) {
+    CHECK(sample_func_.defined()) << "Function \"batch_sample_top_p_top_k\" not found in model";
+    DLDevice device_cpu{DLDeviceType::kDLCPU, /*device_id=*/0};
+    // Initialize auxiliary arrays on CPU.
+    sample_indices_host_ = NDArray::Empty({max_num_sample}, dtype_i32_, device_cpu);
+    uniform_samples_host_ = NDArray::Empty({max_num_sample}, dtype_f32_, device_cpu);
+    top_p_host_ = NDArray::Empty({max_num_sample}, dtype_f32_, device_cpu);
+    top_k_host_ = NDArray::Empty({max_num_sample}, dtype_i32_, device_cpu);
+    num_top_probs_host_ = NDArray::Empty({max_num_sample}, dtype_i32_, device_cpu);
+    sampled_token_ids_host_ = NDArray::Empty({max_num_sample}, dtype_i32_, device_cpu);
+    sampled_probs_host_ = NDArray::Empty({max_num_sample}, dtype_f32_, device_cpu);
+    top_token_ids_host_ =
+        NDArray::Empty({max_num_sample, kMaxNumTopProbs}, dtype_i32_, device_cpu);
+    top_token_probs_host_ =
+        NDArray::Empty({max_num_sample, kMaxNumTopProbs}, dtype_f32_, device_cpu);
+    // Initialize auxiliary arrays on GPU.
+    sample_indices_device_ = NDArray::Empty({max_num_sample}, dtype_i32_, device);
+    uniform_samples_device_ = NDArray::Empty({max_num_sample}, dtype_f32_, device);
+    top_p_device_ = NDArray::Empty({max_num_sample}, dtype_f32_, device);
+    top_k_device_ = NDArray::Empty({max_num_sample}, dtype_i32_, device);
+    num_top_probs_device_ = NDArray::Empty({max_num_sample}, dtype_i32_, device);
+    sampled_token_ids_device_ = NDArray::Empty({max_num_sample}, dtype_i32_, device);
+    sampled_probs_device_ = NDArray::Empty({max_num_sample}, dtype_f32_, device);
+    top_token_ids_device_ = NDArray::Empty({max_num_sample, kMaxNumTopProbs}, dtype_i32_, device);
+    top_token_probs_device_ =
+        NDArray::Empty({max_num_sample, kMaxNumTopProbs}, dtype_f32_, device);
+  }
+
+  std::vector<SampleResult> BatchSampleTokens(NDArray probs_device,                           //
+                                              const std::vector<int>& sample_indices,         //
+                                              const Array<String>& request_ids,               //
+                                              const Array<GenerationConfig>& generation_cfg,  //
+                                              const std::vector<RandomGenerator*>& rngs,      //
+                                              std::vector<NDArray>* output_prob_dist) final {
+    if (output_prob_dist != nullptr) {
+      // The full prob distributions are needed on CPU for speculative decoding.
+      return cpu_sampler_->BatchSampleTokens(probs_device, sample_indices, request_ids,
+                                             generation_cfg, rngs, output_prob_dist);
+    }
+    // probs_device: (n, v)
+    RECORD_EVENT(trace_recorder_, request_ids, "start sampling");
+    CHECK_EQ(probs_device->ndim, 2);
+    CHECK_EQ(probs_device->shape[1], vocab_size_);
+    int n = sample_indices.size();
+    ICHECK_EQ(n, request_ids.size());
+    ICHECK_EQ(n, generation_cfg.size());
+    ICHECK_EQ(n, rngs.size());
+    CHECK_LE(n, max_num_sample_);
+    if (n == 0) {
+      return {};
+    }
+
+    // - Prepare the sampling parameters of each sample on CPU.
+    int* p_sample_indices = static_cast<int*>(sample_indices_host_->data);
+    float* p_uniform_samples = static_cast<float*>(uniform_samples_host_->data);
+    float* p_top_p = static_cast<float*>(top_p_host_->data);
+    int* p_top_k = static_cast<int*>(top_k_host_->data);
+    int* p_num_top_probs = static_cast<int*>(num_top_probs_host_->data);
+    bool need_top_probs = false;
+    for (int i = 0; i < n; ++i) {
+      ICHECK(sample_indices[i] >= 0 && sample_indices[i] < probs_device->shape[0]);
+      p_sample_indices[i] = sample_indices[i];
+      // The kernel expects a uniform sample in [0, 1).
+      p_uniform_samples[i] = std::min(static_cast<float>(rngs[i]->GetRandomNumber()), kMaxUniform);
+      const GenerationConfig& cfg = generation_cfg[i];
+      if (cfg->temperature < eps_ || cfg->top_p < eps_) {
+        // Greedy sampling.
+        p_top_p[i] = 1.0f;
+        p_top_k[i] = 1;
+      } else {
+        // A top-p larger than 1 keeps all the tokens, which avoids dropping
+        // tokens when the float sum of all probabilities is slightly below 1.
+        p_top_p[i] = cfg->top_p >= 1.0f - eps_ ? 2.0f : cfg->top_p;
+        p_top_k[i] = cfg->top_k > 0 ? cfg->top_k : 0;
+      }
+      // The kernel writes the top probabilities into buffers of `kMaxNumTopProbs` columns.
+      CHECK_LE(cfg->top_logprobs, kMaxNumTopProbs)
+          << "The number of top logprobs " << cfg->top_logprobs << " exceeds the maximum "
+          << kMaxNumTopProbs << " supported by the GPU sampler.";
+      p_num_top_probs[i] = cfg->top_logprobs;
+      need_top_probs |= cfg->top_logprobs > 0;
+    }
+
+    // - Copy the parameters to GPU, sample, and copy the results back to CPU.
+    RECORD_EVENT(trace_recorder_, request_ids, "start sampling kernel");
+    NDArray sample_indices_device = CopyToDevice(sample_indices_host_, sample_indices_device_, n);
+    NDArray uniform_samples_device =
+        CopyToDevice(uniform_samples_host_, uniform_samples_device_, n);
+    NDArray top_p_device = CopyToDevice(top_p_host_, top_p_device_, n);
+    NDArray top_k_device = CopyToDevice(top_k_host_, top_k_device_, n);
+    NDArray num_top_probs_device = CopyToDevice(num_top_probs_host_, num_top_probs_device_, n);
+    NDArray sampled_token_ids_device = sampled_token_ids_device_.CreateView({n}, dtype_i32_);
+    NDArray sampled_probs_device = sampled_probs_device_.CreateView({n}, dtype_f32_);
+    NDArray top_token_ids_device =
+        top_token_ids_device_.CreateView({n, kMaxNumTopProbs}, dtype_i32_);
+    NDArray top_token_probs_device =
+        top_token_probs_device_.CreateView({n, kMaxNumTopProbs}, dtype_f32_);
+    sample_func_(probs_device, sample_indices_device, uniform_samples_device, top_p_device,
+                 top_k_device, num_top_probs_device, sampled_token_ids_device,
+                 sampled_probs_device, top_token_ids_device, top_token_probs_device);
+    NDArray sampled_token_ids_host = sampled_token_ids_host_.CreateView({n}, dtype_i32_);
+    NDArray sampled_probs_host = sampled_probs_host_.CreateView({n}, dtype_f32_);
+    sampled_token_ids_host.CopyFrom(sampled_token_ids_device);
+    sampled_probs_host.CopyFrom(sampled_probs_device);
+    NDArray top_token_ids_host =
+        top_token_ids_host_.CreateView({n, kMaxNumTopProbs}, dtype_i32_);
+    NDArray top_token_probs_host =
+        top_token_probs_host_.CreateView({n, kMaxNumTopProbs}, dtype_f32_);
+    if (need_top_probs) {
+      top_token_ids_host.CopyFrom(top_token_ids_device);
+      top_token_probs_host.CopyFrom(top_token_probs_device);
+    }
+    RECORD_EVENT(trace_recorder_, request_ids, "finish sampling kernel");
+
+    // - Collect the sampling results.
+    const int* p_sampled_token_ids = static_cast<int*>(sampled_token_ids_host->data);
+    const float* p_sampled_probs = static_cast<float*>(sampled_probs_host->data);
+    const int* p_top_token_ids = static_cast<int*>(top_token_ids_host->data);
+    const float* p_top_token_probs = static_cast<float*>(top_token_probs_host->data);
+    std::vector<SampleResult> sample_results;
+    sample_results.resize(n);
+    for (int i = 0; i < n; ++i) {
+      sample_results[i].sampled_token_id = {p_sampled_token_ids[i], p_sampled_probs[i]};
+      for (int j = 0; j < p_num_top_probs[i]; ++j) {
+        sample_results[i].top_prob_tokens.emplace_back(
+            p_top_token_ids[i * kMaxNumTopProbs + j], p_top_token_probs[i * kMaxNumTopProbs + j]);
+      }
+    }
+    RECORD_EVENT(trace_recorder_, request_ids, "finish sampling");
+    return sample_results;
+  }
+
+  std::vector<std::vector<SampleResult>> BatchVerifyDraftTokens(
+      NDArray probs_device, const Array<String>& request_ids,
+      const std::vector<int>& cum_verify_lengths, const Array<GenerationConfig>& generation_cfg,
+      const std::vector<RandomGenerator*>& rngs,
+      const std::vector<std::vector<SampleResult>>& draft_output_tokens,
+      const std::vector<std::vector<NDArray>>& draft_output_prob_dist) final {
+    // The verification needs the draft prob distributions, which are on CPU.
+    return cpu_sampler_->BatchVerifyDraftTokens(probs_device, request_ids, cum_verify_lengths,
+                                                generation_cfg, rngs, draft_output_tokens,
+                                                draft_output_prob_dist);
+  }
+
+ private:
+  /*! \brief Copy the first `n` elements of the host array to the device array. */
+  NDArray CopyToDevice(NDArray array_host, NDArray array_device, int n) {
+    NDArray view_host = array_host.CreateView({n}, array_host->dtype);
+    NDArray view_device = array_device.CreateView({n}, array_device->dtype);
+    view_device.CopyFrom(view_host);
+    return view_device;
+  }
+
+  /*! \brief The number of top probabilities returned by the sampling function. */
+  static constexpr int kMaxNumTopProbs = 5;
+  /*! \brief The largest float below 1, which bounds the uniform samples. */
+  static constexpr float kMaxUniform = 1.0f - 1e-7f;
+
+  /*! \brief The maximum number of tokens sampled in a batch. */
+  int max_num_sample_;
+  /*! \brief The model's vocabulary size. */
+  int vocab_size_;
+  /*! \brief The sampling function compiled into the model. */
+  PackedFunc sample_func_;
+  /*! \brief The CPU sampler to fall back to when distributions are needed on CPU. */
+  Sampler cpu_sampler_;
+  /*! \brief The event trace recorder for requests. */
+  Optional<EventTraceRecorder> trace_recorder_;
+  // Auxiliary arrays on CPU.
+  NDArray sample_indices_host_;
+  NDArray uniform_samples_host_;
+  NDArray top_p_host_;
+  NDArray top_k_host_;
+  NDArray num_top_probs_host_;
+  NDArray sampled_token_ids_host_;
+  NDArray sampled_probs_host_;
+  NDArray top_token_ids_host_;
+  NDArray top_token_probs_host_;
+  // Auxiliary arrays on GPU.
+  NDArray sample_indices_device_;
+  NDArray uniform_samples_device_;
+  NDArray top_p_device_;
+  NDArray top_k_device_;
+  NDArray num_top_probs_device_;
+  NDArray sampled_token_ids_device_;
+  NDArray sampled_probs_device_;
+  NDArray top_token_ids_device_;
+  NDArray top_token_probs_device_;
+  // Data types.
+  const DLDataType dtype_i32_ = DataType::Int(32);
+  const DLDataType dtype_f32_ = DataType::Float(32);
+  const float eps_ = 1e-5;
+};
+
 /*********************** Sampler ***********************/
 
 TVM_REGISTER_OBJECT_TYPE(SamplerObj);
@@ -442,6 +672,12 @@ Sampler Sampler::Create(std::string sampler_kind, Optional<EventTraceRecorder> t
   }
 }
 
+Sampler Sampler::CreateGPUSampler(int max_num_sample, int vocab_size, FunctionTable* ft,
+                                  DLDevice device, Optional<EventTraceRecorder> trace_recorder) {
+  return Sampler(make_object<GPUSampler>(max_num_sample, vocab_size, ft, device,
+                                         std::move(trace_recorder)));
+}
+
 }  // namespace serve
 }  // namespace llm
 }  // namespace mlc
@@ -10,11 +10,14 @@
 #include <tvm/runtime/container/string.h>
 #include <tvm/runtime/module.h>
 
+#include <numeric>
+#include <vector>
+
 #include "../base.h"
 #include "../random.h"
 #include "data.h"
 #include "event_trace_recorder.h"
-#include "model.h"
+#include "function_table.h"
 #include "request_state.h"
 
 namespace mlc {
@@ -43,8 +46,34 @@ class SamplerObj : public Object {
    * \return The batch of sampling results, which contain the sampled token id
    * and other probability info.
    */
+  std::vector<SampleResult> BatchSampleTokens(
+      NDArray probs_device,                           //
+      const Array<String>& request_ids,               //
+      const Array<GenerationConfig>& generation_cfg,  //
+      const std::vector<RandomGenerator*>& rngs,      //
+      std::vector<NDArray>* output_prob_dist = nullptr) {
+    std::vector<int> sample_indices(request_ids.size());
+    std::iota(sample_indices.begin(), sample_indices.end(), 0);
+    return BatchSampleTokens(probs_device, sample_indices, request_ids, generation_cfg, rngs,
+                             output_prob_dist);
+  }
+
+  /*!
+   * \brief Sample tokens from the input batch of prob distribution on device,
+   * where multiple sequences may sample from the same distribution, e.g., the
+   * sequences forked from one request after prefill.
+   * \param probs_device The prob distributions on GPU to sample tokens from.
+   * \param sample_indices The index of the prob distribution to sample from for each sequence.
+   * \param request_ids The id of each sequence.
+   * \param generation_cfg The generation config of each sequence.
+   * \param rngs The random number generator of each sequence.
+   * \param output_prob_dist The output probability distribution of each
+   * input distribution, rather than of each sequence.
+   * \return The sampling result of each sequence.
+   */
   virtual std::vector<SampleResult> BatchSampleTokens(
       NDArray probs_device,                           //
+      const std::vector<int>& sample_indices,         //
       const Array<String>& request_ids,               //
       const Array<GenerationConfig>& generation_cfg,  //
       const std::vector<RandomGenerator*>& rngs,      //
@@ -89,6 +118,27 @@ class Sampler : public ObjectRef {
   TVM_DLL static Sampler Create(std::string sampler_kind,
                                 Optional<EventTraceRecorder> trace_recorder);
 
+  /*!
+   * \brief Create the sampler that samples tokens on GPU with the sampling
+   * function compiled into the model, and copies only the sampling results
+   * back to CPU. It falls back to sampling on CPU when the full probability
+   * distributions are needed on CPU, i.e., in speculative decoding.
+   * \param max_num_sample The maximum number of tokens sampled in a batch.
+   * \param vocab_size The model's vocabulary size.
+   * \param ft The packed function table of the model.
+   * \param device The device of the model.
+   * \param trace_recorder The event trace recorder for requests.
+   * \return The created sampler.
+   */
+  TVM_DLL static Sampler CreateGPUSampler(int max_num_sample, int vocab_size, FunctionTable* ft,
+                                          DLDevice device,
+                                          Optional<EventTraceRecorder> trace_recorder);
+
+  /*! \brief Check if the model supports sampling on the given device with GPU sampler. */
+  static bool SupportGPUSampler(const FunctionTable& ft, DLDevice device) {
+    return device.device_type != kDLCPU && ft.sample_top_p_top_k_func_.defined();
+  }
+
   TVM_DEFINE_MUTABLE_OBJECT_REF_METHODS(Sampler, ObjectRef, SamplerObj);
 };
 
@@ -0,0 +1,150 @@
+/*!
+ *  Copyright (c) 2023 by Contributors
+ * \file serve/scheduler.cc
+ * \brief The implementation of the request scheduling policies.
+ */
+#include "scheduler.h"
+
+#include <algorithm>
+#include <chrono>
+#include <limits>
+#include <unordered_map>
+
+#include "engine_state.h"
+
+namespace mlc {
+namespace llm {
+namespace serve {
+
+TVM_REGISTER_OBJECT_TYPE(RequestSchedulerObj);
+
+void RequestSchedulerObj::SortQueues(EngineState estate) {
+  auto f_rank_before = [this, &estate](const Request& lhs, const Request& rhs) {
+    RequestState lhs_state = estate->GetRequestState(lhs);
+    RequestState rhs_state = estate->GetRequestState(rhs);
+    if (RankBefore(lhs_state, rhs_state)) {
+      return true;
+    }
+    if (RankBefore(rhs_state, lhs_state)) {
+      return false;
+    }
+    // Preempted requests, which have generated tokens, resume before new requests.
+    bool lhs_started = !lhs_state->mstates[0]->committed_tokens.empty();
+    bool rhs_started = !rhs_state->mstates[0]->committed_tokens.empty();
+    if (lhs_started != rhs_started) {
+      return lhs_started;
+    }
+    return lhs_state->tadd < rhs_state->tadd;
+  };
+  // Admit the highest ranked requests first, and preempt the lowest ranked requests first.
+  std::stable_sort(estate->waiting_queue.begin(), estate->waiting_queue.end(), f_rank_before);
+  std::stable_sort(estate->running_queue.begin(), estate->running_queue.end(), f_rank_before);
+}
+
+void RequestSchedulerObj::OnRequestAdmitted(EngineState estate, const RequestState& rstate) {
+  double wait_time =
+      static_cast<double>((std::chrono::high_resolution_clock::now() - rstate->tadd).count()) / 1e9;
+  estate->stats.queue_wait.Record(wait_time);
+  estate->stats.queue_wait_by_class[GetRequestClass(rstate->request)].Record(wait_time);
+}
+
+/*! \brief The first-come-first-serve scheduler. */
+class FCFSSchedulerObj : public RequestSchedulerObj {
+ protected:
+  bool RankBefore(const RequestState& lhs, const RequestState& rhs) const final { return false; }
+};
+
+/*! \brief The scheduler admitting the requests with shorter prompts first. */
+class ShortestPromptFirstSchedulerObj : public RequestSchedulerObj {
+ protected:
+  bool RankBefore(const RequestState& lhs, const RequestState& rhs) const final {
+    return lhs->request->input_total_length < rhs->request->input_total_length;
+  }
+};
+
+/*! \brief The scheduler admitting the requests with higher priority first. */
+class PrioritySchedulerObj : public RequestSchedulerObj {
+ protected:
+  bool RankBefore(const RequestState& lhs, const RequestState& rhs) const final {
+    return lhs->request->priority > rhs->request->priority;
+  }
+
+  std::string GetRequestClass(const Request& request) const final {
+    return "priority:" + std::to_string(request->priority);
+  }
+};
+
+/*!
+ * \brief The scheduler sharing the engine fairly across tenants, which admits
+ * the requests of the tenant that has been served the fewest tokens first.
+ * \details The served tokens of a tenant count both the prompt and the generated
+ * tokens. When a tenant is admitted after being idle, its count is raised to the
+ * minimum of the tenants with running requests, so that an idle period does not
+ * earn a tenant a credit to monopolize the engine afterwards.
+ */
+class FairShareSchedulerObj : public RequestSchedulerObj {
+ public:
+  void OnRequestAdmitted(EngineState estate, const RequestState& rstate) final {
+    RequestSchedulerObj::OnRequestAdmitted(estate, rstate);
+    const String& tenant = rstate->request->tenant;
+    int64_t min_running_tokens = std::numeric_limits<int64_t>::max();
+    bool tenant_running = false;
+    for (const Request& request : estate->running_queue) {
+      if (request.same_as(rstate->request)) {
+        continue;
+      } else if (request->tenant == tenant) {
+        tenant_running = true;
+      } else {
+        min_running_tokens = std::min(min_running_tokens, GetServedTokens(request->tenant));
+      }
+    }
+    int64_t& served_tokens = served_tokens_[tenant];
+    if (!tenant_running && min_running_tokens != std::numeric_limits<int64_t>::max()) {
+      served_tokens = std::max(served_tokens, min_running_tokens);
+    }
+    served_tokens += rstate->request->input_total_length;
+  }
+
+  void OnTokensGenerated(const Request& request, int num_tokens) final {
+    served_tokens_[request->tenant] += num_tokens;
+  }
+
+  void Reset() final { served_tokens_.clear(); }
+
+ protected:
+  bool RankBefore(const RequestState& lhs, const RequestState& rhs) const final {
+    return GetServedTokens(lhs->request->tenant) < GetServedTokens(rhs->request->tenant);
+  }
+
+  std::string GetRequestClass(const Request& request) const final {
+    return "tenant:" + std::string(request->tenant);
+  }
+
+ private:
+  int64_t GetServedTokens(const String& tenant) const {
+    auto it = served_tokens_.find(tenant);
+    return it == served_tokens_.end() ? 0 : it->second;
+  }
+
+  /*! \brief The number of tokens served for each tenant. */
+  std::unordered_map<String, int64_t> served_tokens_;
+};
+
+RequestScheduler RequestScheduler::Create(const std::string& scheduler_kind) {
+  if (scheduler_kind == "fcfs") {
+    return RequestScheduler(make_object<FCFSSchedulerObj>());
+  } else if (scheduler_kind == "shortest_prompt_first") {
+    return RequestScheduler(make_object<ShortestPromptFirstSchedulerObj>());
+  } else if (scheduler_kind == "priority") {
+    return RequestScheduler(make_object<PrioritySchedulerObj>());
+  } else if (scheduler_kind == "fair_share") {
+    return RequestScheduler(make_object<FairShareSchedulerObj>());
+  } else {
+    LOG(FATAL) << "Unsupported scheduler_kind \"" << scheduler_kind << "\"";
+    throw;
+  }
+}
+
+}  // namespace serve
+}  // namespace llm
+}  // namespace mlc
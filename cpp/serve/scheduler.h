@@ -0,0 +1,96 @@
+/*!
+ *  Copyright (c) 2023 by Contributors
+ * \file serve/scheduler.h
+ * \brief The request scheduling policies of the serving engine.
+ */
+#ifndef MLC_LLM_SERVE_SCHEDULER_H_
+#define MLC_LLM_SERVE_SCHEDULER_H_
+
+#include <tvm/runtime/container/string.h>
+#include <tvm/runtime/object.h>
+
+#include <string>
+
+#include "request.h"
+#include "request_state.h"
+
+namespace mlc {
+namespace llm {
+namespace serve {
+
+using namespace tvm::runtime;
+
+class EngineState;
+
+/*!
+ * \brief The request scheduler of the serving engine.
+ * \details The scheduler ranks requests by its policy. It orders the
+ * `waiting_queue` of the engine state so that the requests to admit first
+ * are at the front, and orders the `running_queue` so that the requests to
+ * preempt first are at the back, as the engine actions admit requests from
+ * the front of `waiting_queue` and preempt requests from the back of
+ * `running_queue`. Among requests tied under a policy, the requests that have
+ * generated tokens, such as preempted requests, rank before new requests, and
+ * requests are otherwise ranked by arrival time.
+ */
+class RequestSchedulerObj : public Object {
+ public:
+  /*! \brief Order the waiting and running queues of the engine state by rank. */
+  void SortQueues(EngineState estate);
+
+  /*!
+   * \brief Update the scheduler when a request is admitted for the first time,
+   * and record its time in the waiting queue in the engine statistics.
+   * \param estate The engine state.
+   * \param rstate The state of the admitted request.
+   */
+  virtual void OnRequestAdmitted(EngineState estate, const RequestState& rstate);
+
+  /*!
+   * \brief Update the scheduler with the tokens generated for a request.
+   * \param request The request.
+   * \param num_tokens The number of newly generated tokens.
+   */
+  virtual void OnTokensGenerated(const Request& request, int num_tokens) {}
+
+  /*! \brief Reset the scheduler states. */
+  virtual void Reset() {}
+
+  static constexpr const char* _type_key = "mlc.serve.RequestScheduler";
+  static constexpr const bool _type_has_method_sequal_reduce = false;
+  static constexpr const bool _type_has_method_shash_reduce = false;
+  TVM_DECLARE_BASE_OBJECT_INFO(RequestSchedulerObj, Object);
+
+ protected:
+  /*!
+   * \brief Compare two requests under the policy.
+   * \return A boolean denoting if request `lhs` is served before request `rhs`,
+   * or false if they are tied.
+   */
+  virtual bool RankBefore(const RequestState& lhs, const RequestState& rhs) const = 0;
+
+  /*!
+   * \brief Get the class of a request, under which the queue wait time of the
+   * request is aggregated in the engine statistics.
+   */
+  virtual std::string GetRequestClass(const Request& request) const { return "all"; }
+};
+
+class RequestScheduler : public ObjectRef {
+ public:
+  /*!
+   * \brief Create the request scheduler.
+   * \param scheduler_kind The scheduling policy, which is one of "fcfs",
+   * "shortest_prompt_first", "priority" and "fair_share".
+   * \return The created scheduler.
+   */
+  TVM_DLL static RequestScheduler Create(const std::string& scheduler_kind);
+
+  TVM_DEFINE_MUTABLE_OBJECT_REF_METHODS(RequestScheduler, ObjectRef, RequestSchedulerObj);
+};
+
+}  // namespace serve
+}  // namespace llm
+}  // namespace mlc
+
+#endif  // MLC_LLM_SERVE_SCHEDULER_H_
@@ -30,6 +30,15 @@ std::vector<int32_t> TokenizerObj::Encode(const std::string& text) const {
   return tokenizer->Encode(text);
 }
 
+std::vector<std::vector<int32_t>> TokenizerObj::EncodeBatch(const Array<String>& texts) const {
+  std::vector<std::vector<int32_t>> ret;
+  ret.reserve(texts.size());
+  for (const String& text : texts) {
+    ret.push_back(tokenizer->Encode(text));
+  }
+  return ret;
+}
+
 std::string TokenizerObj::Decode(const std::vector<int32_t>& token_ids) const {
   return tokenizer->Decode(token_ids);
 }
@@ -143,10 +152,36 @@ TVM_REGISTER_GLOBAL("mlc.TokenizerEncode")
       return IntTuple{token_ids.begin(), token_ids.end()};
     });
 
+TVM_REGISTER_GLOBAL("mlc.TokenizerEncodeBatch")
+    .set_body_typed([](const Tokenizer& tokenizer, const Array<String>& texts) {
+      std::vector<std::vector<int32_t>> batch_token_ids = tokenizer->EncodeBatch(texts);
+      Array<IntTuple> ret;
+      ret.reserve(batch_token_ids.size());
+      for (const std::vector<int32_t>& token_ids : batch_token_ids) {
+        ret.push_back(IntTuple{token_ids.begin(), token_ids.end()});
+      }
+      return ret;
+    });
+
 TVM_REGISTER_GLOBAL("mlc.TokenizerDecode")
     .set_body_typed([](const Tokenizer& tokenizer, const IntTuple& token_ids) {
       return tokenizer->Decode({token_ids->data, token_ids->data + token_ids->size});
     });
 
+TVM_REGISTER_GLOBAL("mlc.TokenizerGetTokenTable").set_body([](TVMArgs args, TVMRetValue* rv) {
+  Tokenizer tokenizer = args[0];
+  // Tokens are not necessarily valid UTF-8 strings, so the token table is returned
+  // as bytes, where each token is prefixed by its length in 4-byte little endian.
+  std::string packed_token_table;
+  for (const std::string& token : tokenizer->TokenTable()) {
+    uint32_t length = token.size();
+    for (int i = 0; i < 4; ++i) {
+      packed_token_table.push_back(static_cast<char>((length >> (i * 8)) & 0xFF));
+    }
+    packed_token_table += token;
+  }
+  *rv = TVMByteArray{packed_token_table.data(), packed_token_table.size()};
+});
+
 }  // namespace llm
 }  // namespace mlc
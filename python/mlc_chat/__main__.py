@@ -13,7 +13,16 @@ def main():
     parser.add_argument(
         "subcommand",
         type=str,
-        choices=["compile", "convert_weight", "gen_config", "chat", "bench"],
+        choices=[
+            "compile",
+            "tune",
+            "convert_weight",
+            "gen_config",
+            "chat",
+            "bench",
+            "bench_serve",
+            "cache",
+        ],
         help="Subcommand to to run. (choices: %(choices)s)",
     )
     parsed = parser.parse_args(sys.argv[1:2])
@@ -21,6 +30,10 @@ def main():
     if parsed.subcommand == "compile":
         from mlc_chat.cli import compile as cli
 
+        cli.main(sys.argv[2:])
+    elif parsed.subcommand == "tune":
+        from mlc_chat.cli import tune as cli
+
         cli.main(sys.argv[2:])
     elif parsed.subcommand == "convert_weight":
         from mlc_chat.cli import convert_weight as cli
@@ -37,6 +50,14 @@ def main():
     elif parsed.subcommand == "bench":
         from mlc_chat.cli import bench as cli
 
+        cli.main(sys.argv[2:])
+    elif parsed.subcommand == "bench_serve":
+        from mlc_chat.cli import bench_serve as cli
+
+        cli.main(sys.argv[2:])
+    elif parsed.subcommand == "cache":
+        from mlc_chat.cli import cache as cli
+
         cli.main(sys.argv[2:])
     else:
         raise ValueError(f"Unknown subcommand {parsed.subcommand}")
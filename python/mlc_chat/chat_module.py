@@ -5,7 +5,6 @@ import dataclasses
 import inspect
 import json
 import os
-import subprocess
 import sys
 import time
 import warnings
@@ -20,6 +19,17 @@ from tvm.runtime import disco  # pylint: disable=unused-import
 from mlc_chat.support import logging
 from mlc_chat.support.auto_device import detect_device
 from mlc_chat.support.config import ConfigBase
+from mlc_chat.support.model_metadata import read_metadata, report_memory_usage
+from mlc_chat.support.timeline_recorder import (
+    DECODE,
+    DETOKENIZE,
+    LOAD_MODEL,
+    PREFILL,
+    SAMPLE,
+    SYSTEM_PROMPT,
+    UNLOAD_MODEL,
+    TimelineRecorder,
+)
 
 from . import base as _
 
@@ -640,16 +650,13 @@ def _convert_generation_config_to_json_str(generation_config: Optional[Generatio
 
 
 def _inspect_model_lib_metadata_memory_usage(model_lib_path, config_file_path):
-    cmd = [
-        sys.executable,
-        "-m",
-        "mlc_chat.cli.model_metadata",
-        model_lib_path,
-        "--memory-only",
-        "--mlc-chat-config",
-        config_file_path,
-    ]
-    subprocess.run(cmd, check=False)
+    with open(config_file_path, mode="rt", encoding="utf-8") as file:
+        mlc_chat_config = json.load(file)
+    try:
+        report_memory_usage(read_metadata(model_lib_path), mlc_chat_config)
+    except Exception:  # pylint: disable=broad-exception-caught
+        # Legacy model libs do not have the metadata section.
+        logger.warning("Failed to estimate memory usage from the metadata of %s", model_lib_path)
 
 
 class ChatModule:  # pylint: disable=too-many-instance-attributes
@@ -705,6 +712,10 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
         The full path to the model library file to use (e.g. a ``.so`` file).
         If unspecified, we will use the provided ``model`` to search over
         possible paths.
+
+    timeline_recorder : Optional[TimelineRecorder]
+        The recorder of the per-token timeline of model loading, prefill, decode, sampling
+        and detokenization. Recording is disabled if unspecified.
     """
 
     def __init__(  # pylint: disable=too-many-arguments
@@ -713,6 +724,7 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
         device: str = "auto",
         chat_config: Optional[ChatConfig] = None,
         model_lib_path: Optional[str] = None,
+        timeline_recorder: Optional[TimelineRecorder] = None,
     ):
         # 0. Get device:
         # Retrieve device_name and device_id (if any, default 0) from device arg
@@ -720,8 +732,11 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
         device_type = self.device.device_type
         device_id = self.device.device_id
 
-        self.energy_events = {}
-        self.generate_counter = 0
+        self.timeline_recorder = timeline_recorder
+        # The request and step that timeline records are attributed to. A request starts at
+        # each prefill, and each decode is a step.
+        self._timeline_request = -1
+        self._timeline_step = 0
 
         # 1. Populate chat module and their functions
         fcreate_chat_mod = tvm.get_global_func("mlc.llm_chat_create")
@@ -748,6 +763,7 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
         self._evaluate_func = chat_mod["evaluate"]
         self._get_role0_func = chat_mod["get_role0"]
         self._get_role1_func = chat_mod["get_role1"]
+        self._last_sample_time_func = chat_mod["last_sample_time"]
 
         # 2. Look up model_path
         self.model_path, self.config_file_path = _get_model_path(model)
@@ -848,35 +864,23 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
             num_return_sequences = generation_config.n
             return_str = False
 
-        for idx in range(num_return_sequences):
+        for _ in range(num_return_sequences):
             if stateless:
                 self.reset_chat()
-            self.energy_events[f"chat.{self.generate_counter}.{idx}.prefill.start"] = time.time_ns()
             self._prefill(prompt, generation_config=generation_config)
-            self.energy_events[f"chat.{self.generate_counter}.{idx}.prefill.end"] = time.time_ns()
 
             if not progress_callback:
-                decode_counter = 0
                 while not self._stopped():
-                    self.energy_events[f"chat.{self.generate_counter}.{idx}.decode.{decode_counter}.start"] = time.time_ns()
                     self._decode(generation_config=generation_config)
-                    self.energy_events[f"chat.{self.generate_counter}.{idx}.decode.{decode_counter}.end"] = time.time_ns()
-                self.energy_events[f"chat.{self.generate_counter}.{idx}.get_message.start"] = time.time_ns()
                 new_msg = self._get_message()
-                self.energy_events[f"chat.{self.generate_counter}.{idx}.get_message.end"] = time.time_ns()
                 new_msgs.append(new_msg)
             else:
                 # apply callback with a rate of callback_interval
                 i, new_msg = 0, ""
-                decode_counter = 0
                 while not self._stopped():
-                    self.energy_events[f"chat.{self.generate_counter}.{idx}.decode.{decode_counter}.start"] = time.time_ns()
                     self._decode(generation_config=generation_config)
-                    self.energy_events[f"chat.{self.generate_counter}.{idx}.decode.{decode_counter}.end"] = time.time_ns()
                     if i % progress_callback.callback_interval == 0 or self._stopped():
-                        self.energy_events[f"chat.{self.generate_counter}.{idx}.get_message.start"] = time.time_ns()
                         new_msg = self._get_message()
-                        self.energy_events[f"chat.{self.generate_counter}.{idx}.get_message.end"] = time.time_ns()
                         progress_callback(new_msg)
                     i += 1
                 progress_callback(stopped=True)
@@ -1015,15 +1019,17 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
         app_config_json: str
             The partial config that is used to partially override the model configuration.
         """
-        self.energy_events[f"load_model.start"] = time.time_ns()
+        t_start = time.perf_counter_ns() if self.timeline_recorder is not None else 0
         self._reload_func(lib, model_path, app_config_json)
-        self.energy_events[f"load_model.end"] = time.time_ns()
+        if self.timeline_recorder is not None:
+            self._record_timeline(LOAD_MODEL, t_start)
 
     def _unload(self):
         r"""Unload the chat module and clear memory of all loaded models."""
-        self.energy_events[f"unload_model.start"] = time.time_ns()
+        t_start = time.perf_counter_ns() if self.timeline_recorder is not None else 0
         self._unload_func()
-        self.energy_events[f"unload_model.end"] = time.time_ns()
+        if self.timeline_recorder is not None:
+            self._record_timeline(UNLOAD_MODEL, t_start)
 
     def _prefill(
         self,
@@ -1089,9 +1095,12 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
         else:
             input_str = input
 
+        t_start = time.perf_counter_ns() if self.timeline_recorder is not None else 0
         self._prefill_func(
             input_str, decode_next_token, place_in_prompt.value, generation_config_str
         )
+        if self.timeline_recorder is not None:
+            self._record_prefill_timeline(t_start, decode_next_token)
 
     def _embed(
         self,
@@ -1142,7 +1151,10 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
         generation_config = _get_generation_config(self.chat_config, generation_config)
         generation_config_str = _convert_generation_config_to_json_str(generation_config)
 
+        t_start = time.perf_counter_ns() if self.timeline_recorder is not None else 0
         self._prefill_with_embed_func(embedding, decode_next_token, generation_config_str)
+        if self.timeline_recorder is not None:
+            self._record_prefill_timeline(t_start, decode_next_token)
 
     def _decode(self, generation_config: Optional[GenerationConfig] = None):
         r"""Decode the next token, the decoding result is stored in a buffer and
@@ -1155,7 +1167,12 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
         """
         generation_config = _get_generation_config(self.chat_config, generation_config)
         generation_config_str = _convert_generation_config_to_json_str(generation_config)
+        t_start = time.perf_counter_ns() if self.timeline_recorder is not None else 0
         self._decode_func(generation_config_str)
+        if self.timeline_recorder is not None:
+            self._timeline_step += 1
+            t_end = self._record_timeline(DECODE, t_start)
+            self._record_sample_timeline(t_end)
 
     def _stopped(self) -> bool:
         r"""Check if the stop condition is met for the current round.
@@ -1178,7 +1195,39 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
         This function returns the message that corresponds to
         all the tokens decoded so far.
         """
-        return self._get_message_func()
+        if self.timeline_recorder is None:
+            return self._get_message_func()
+        t_start = time.perf_counter_ns()
+        message = self._get_message_func()
+        self._record_timeline(DETOKENIZE, t_start)
+        return message
+
+    def _record_timeline(self, phase: int, t_start: int) -> int:
+        """Record a span of the current request and step ending now, and return the end time."""
+        t_end = time.perf_counter_ns()
+        self.timeline_recorder.record(
+            phase, self._timeline_request, self._timeline_step, t_start, t_end
+        )
+        return t_end
+
+    def _record_sample_timeline(self, t_end: int) -> None:
+        # Sampling is the last part of prefill and decode steps, whose duration is measured by
+        # the chat module, so its span is placed right before the end of the step.
+        sample_ns = int(self._last_sample_time_func() * 1e9)
+        self.timeline_recorder.record(
+            SAMPLE,
+            self._timeline_request,
+            self._timeline_step,
+            t_end - sample_ns,
+            t_end,
+        )
+
+    def _record_prefill_timeline(self, t_start: int, decode_next_token: bool) -> None:
+        self._timeline_request += 1
+        self._timeline_step = 0
+        t_end = self._record_timeline(PREFILL, t_start)
+        if decode_next_token:
+            self._record_sample_timeline(t_end)
 
     def _get_config_json(self):
         r"""Get the configuration of the chat module in a single json string.
@@ -1229,6 +1278,7 @@ class ChatModule:  # pylint: disable=too-many-instance-attributes
 
     def _process_system_prompts(self):
         r"""Pre-process by prefilling the system prompts, running prior to any user input."""
-        self.energy_events["prompt.system.start"] = time.time_ns()
+        t_start = time.perf_counter_ns() if self.timeline_recorder is not None else 0
         self._process_system_prompts_func()
-        self.energy_events["prompt.system.end"] = time.time_ns()
+        if self.timeline_recorder is not None:
+            self._record_timeline(SYSTEM_PROMPT, t_start)
@@ -50,6 +50,12 @@ def main(argv):
         default=None,
         help=HELP["model_lib_path"] + ' (default: "%(default)s")',
     )
+    parser.add_argument(
+        "--num-threads",
+        type=int,
+        default=None,
+        help=HELP["num_threads"] + ' (default: "%(default)s")',
+    )
     parsed = parser.parse_args(argv)
     bench(
         model=parsed.model,
@@ -59,4 +65,5 @@ def main(argv):
         overrides=parsed.overrides,
         generate_length=parsed.generate_length,
         model_lib_path=parsed.model_lib_path,
+        num_threads=parsed.num_threads,
     )
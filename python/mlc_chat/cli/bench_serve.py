@@ -0,0 +1,166 @@
+"""Command line entrypoint of the serving benchmark."""
+from pathlib import Path
+from typing import List
+
+from mlc_chat.help import HELP
+from mlc_chat.interface.bench_serve import (
+    ARRIVAL_PROCESSES,
+    ENDPOINTS,
+    SLO,
+    OpenAIClient,
+    StubEngineClient,
+    bench_serve,
+    load_trace,
+    synthesize_requests,
+)
+from mlc_chat.support.argparse import ArgumentParser
+
+
+def main(argv):
+    """Parse command line arguments and call `mlc_chat.interface.bench_serve`."""
+    parser = ArgumentParser("MLC LLM Serving Benchmark")
+
+    def _parse_request_rates(request_rates: str) -> List[float]:
+        return [float(rate) for rate in request_rates.split(",")]
+
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="",
+        help=HELP["served_model"] + " (required unless --stub-engine is set)",
+    )
+    parser.add_argument(
+        "--url",
+        type=str,
+        default="http://127.0.0.1:8000",
+        help=HELP["serve_url"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--endpoint",
+        type=str,
+        default="chat",
+        choices=list(ENDPOINTS.keys()),
+        help=HELP["serve_endpoint"] + ' (default: "%(default)s", choices: %(choices)s)',
+    )
+    parser.add_argument(
+        "--non-streaming",
+        action="store_true",
+        help=HELP["non_streaming"],
+    )
+    parser.add_argument(
+        "--dataset",
+        type=Path,
+        default=None,
+        help=HELP["bench_dataset"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--num-requests",
+        type=int,
+        default=100,
+        help="The number of synthetic requests. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--input-len",
+        type=int,
+        default=128,
+        help="The number of words in each synthetic prompt. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output-len",
+        type=int,
+        default=128,
+        help="The number of tokens to generate for each synthetic request. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--request-rate",
+        type=_parse_request_rates,
+        default="inf",
+        help=HELP["request_rate"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--arrival-process",
+        type=str,
+        default="poisson",
+        choices=ARRIVAL_PROCESSES,
+        help=HELP["arrival_process"] + ' (default: "%(default)s", choices: %(choices)s)',
+    )
+    parser.add_argument(
+        "--burstiness",
+        type=float,
+        default=1.0,
+        help=HELP["burstiness"] + " (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=256,
+        help=HELP["max_concurrency"] + " (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--slo-ttft",
+        type=float,
+        default=None,
+        help="Time to first token. " + HELP["slo"],
+    )
+    parser.add_argument(
+        "--slo-tpot",
+        type=float,
+        default=None,
+        help="Time per output token. " + HELP["slo"],
+    )
+    parser.add_argument(
+        "--slo-e2e-latency",
+        type=float,
+        default=None,
+        help="End-to-end latency. " + HELP["slo"],
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="The random seed of workload synthesis and arrivals. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=Path,
+        default=None,
+        help="The JSON file to save the metrics of each request rate. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stub-engine",
+        action="store_true",
+        help=HELP["stub_engine"],
+    )
+    parsed = parser.parse_args(argv)
+    if parsed.stub_engine:
+        client = StubEngineClient(stream=not parsed.non_streaming)
+    else:
+        if parsed.model == "":
+            parser.error("--model is required when benchmarking a server.")
+        client = OpenAIClient(
+            parsed.url, parsed.model, parsed.endpoint, stream=not parsed.non_streaming
+        )
+    if parsed.dataset is not None:
+        requests = load_trace(parsed.dataset)
+    else:
+        if parsed.arrival_process == "trace":
+            parser.error('--arrival-process "trace" requires --dataset.')
+        requests = synthesize_requests(
+            parsed.num_requests, parsed.input_len, parsed.output_len, parsed.seed
+        )
+    bench_serve(
+        client=client,
+        requests=requests,
+        request_rates=parsed.request_rate,
+        arrival_process=parsed.arrival_process,
+        burstiness=parsed.burstiness,
+        max_concurrency=parsed.max_concurrency,
+        slo=SLO(
+            ttft=parsed.slo_ttft,
+            tpot=parsed.slo_tpot,
+            e2e_latency=parsed.slo_e2e_latency,
+        ),
+        seed=parsed.seed,
+        output=parsed.output,
+    )
@@ -0,0 +1,105 @@
+"""Command line entrypoint of managing the model lib cache."""
+import subprocess
+import sys
+
+from mlc_chat.help import HELP
+from mlc_chat.interface.cache import cache_ls, cache_prune, cache_warm
+from mlc_chat.support.argparse import ArgumentParser
+from mlc_chat.support.constants import MLC_CACHE_DIR, MLC_MODEL_LIB_CACHE_MAX_GB
+from mlc_chat.support.style import bold
+
+
+def main(argv):
+    """Parse command line arguments and call `mlc_chat.interface.cache`."""
+    parser = ArgumentParser("MLC LLM Model Lib Cache")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    subparsers.add_parser("ls", help="List the cached model libs, most recently used first.")
+
+    parser_prune = subparsers.add_parser("prune", help="Evict least recently used model libs.")
+    parser_prune.add_argument(
+        "--max-size-gb",
+        type=float,
+        default=MLC_MODEL_LIB_CACHE_MAX_GB,
+        help=HELP["cache_max_size_gb"] + ' (default: "%(default)s")',
+    )
+    parser_prune.add_argument(
+        "--dry-run",
+        action="store_true",
+        help=HELP["cache_dry_run"],
+    )
+
+    parser_warm = subparsers.add_parser("warm", help="Compile model libs into the cache.")
+    parser_warm.add_argument(
+        "models",
+        type=str,
+        nargs="+",
+        help=HELP["warm_models"] + " (required)",
+    )
+    parser_warm.add_argument(
+        "--device",
+        type=str,
+        nargs="+",
+        required=True,
+        help=HELP["warm_devices"] + " (required)",
+    )
+    parser_warm.add_argument(
+        "--overrides",
+        type=str,
+        nargs="+",
+        default=[""],
+        help=HELP["warm_overrides"] + ' (default: "%(default)s")',
+    )
+    parser_warm.add_argument(
+        "--opt",
+        type=str,
+        default=None,
+        help=HELP["opt"] + ' (default: "O2")',
+    )
+    parser_warm.add_argument(
+        "--num-jobs",
+        type=int,
+        default=1,
+        help=HELP["warm_num_jobs"] + ' (default: "%(default)s")',
+    )
+    parser_warm.add_argument(
+        "--background",
+        action="store_true",
+        help=HELP["warm_background"],
+    )
+    parser_warm.add_argument(
+        "--log-file",
+        type=str,
+        default=str(MLC_CACHE_DIR / "model_lib_warm.log"),
+        help='The log file of the background warm-up. (default: "%(default)s")',
+    )
+    parsed = parser.parse_args(argv)
+
+    if parsed.action == "ls":
+        cache_ls()
+    elif parsed.action == "prune":
+        if parsed.max_size_gb is None:
+            parser.error("--max-size-gb is required when MLC_MODEL_LIB_CACHE_MAX_GB is not set")
+        cache_prune(parsed.max_size_gb, dry_run=parsed.dry_run)
+    elif parsed.background:
+        cmd = [sys.executable, "-m", "mlc_chat", "cache"] + [
+            arg for arg in argv if arg != "--background"
+        ]
+        with open(parsed.log_file, "a", encoding="utf-8") as log_file:
+            # pylint: disable-next=consider-using-with
+            proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+        print(f"Warming up model libs in background process {proc.pid}")
+        print(f"Log file: {bold(parsed.log_file)}")
+    else:
+        cache_warm(
+            models=parsed.models,
+            devices=parsed.device,
+            overrides=parsed.overrides,
+            opt=parsed.opt,
+            num_jobs=parsed.num_jobs,
+        )
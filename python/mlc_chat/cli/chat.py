@@ -41,7 +41,13 @@ def main(argv):
         "--energy-events",
         type=str,
         default="energy_events.txt",
-        help="Energy events file to use for energy profiling (default: energy_events.txt)"
+        help=HELP["chat_energy_events"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--timeline",
+        type=str,
+        default=None,
+        help=HELP["chat_timeline"] + ' (default: "%(default)s")',
     )
     parsed = parser.parse_args(argv)
     chat(
@@ -51,4 +57,5 @@ def main(argv):
         overrides=parsed.overrides,
         model_lib_path=parsed.model_lib_path,
         energy_events_filename=parsed.energy_events,
+        timeline_filename=parsed.timeline,
     )
@@ -118,6 +118,12 @@ def main(argv):
         default=None,
         help=HELP["debug_dump"] + " (default: %(default)s)",
     )
+    parser.add_argument(
+        "--tuning-database",
+        type=_parse_dir,
+        default=None,
+        help=HELP["tuning_database"] + " (default: %(default)s)",
+    )
     parsed = parser.parse_args(argv)
     target, build_func = detect_target_and_host(parsed.device, parsed.host)
     parsed.model_type = detect_model_type(parsed.model_type, parsed.model)
@@ -139,4 +145,5 @@ def main(argv):
         output=parsed.output,
         overrides=parsed.overrides,
         debug_dump=parsed.debug_dump,
+        tuning_database=parsed.tuning_database,
     )
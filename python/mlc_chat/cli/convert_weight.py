@@ -1,5 +1,6 @@
 """Command line entrypoint of weight conversion."""
 import argparse
+import os
 from pathlib import Path
 from typing import Union
 
@@ -76,6 +77,18 @@ def main(argv):
         required=True,
         help=HELP["output_quantize"] + " (required)",
     )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help=HELP["convert_num_workers"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--max-memory-gb",
+        type=float,
+        default=None,
+        help=HELP["convert_max_memory_gb"] + ' (default: "%(default)s")',
+    )
 
     parsed = parser.parse_args(argv)
     parsed.source, parsed.source_format = detect_weight(
@@ -92,4 +105,6 @@ def main(argv):
         source=parsed.source,
         source_format=parsed.source_format,
         output=parsed.output,
+        num_workers=parsed.num_workers,
+        max_memory_gb=parsed.max_memory_gb,
     )
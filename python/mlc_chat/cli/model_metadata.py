@@ -1,31 +1,21 @@
 """A tool that inspects the metadata of a model lib."""
 import json
-import math
-from dataclasses import asdict
 from pathlib import Path
-from typing import Any, Dict, List, Union
-
-import numpy as np
+from typing import Any, Dict
 
 from mlc_chat.support import logging
 from mlc_chat.support.argparse import ArgumentParser
-from mlc_chat.support.config import ConfigBase
-from mlc_chat.support.style import green, red
+from mlc_chat.support.model_metadata import (
+    compute_memory_usage,
+    extract_metadata,
+    report_memory_usage,
+)
+from mlc_chat.support.style import red
 
 logging.enable_logging()
 logger = logging.getLogger(__name__)
 
 
-def _extract_metadata(model_lib: Path) -> Dict[str, Any]:
-    # pylint: disable=import-outside-toplevel
-    from tvm.runtime import device, load_module
-    from tvm.runtime.relax_vm import VirtualMachine
-
-    # pylint: enable=import-outside-toplevel
-
-    return json.loads(VirtualMachine(load_module(model_lib), device("cpu"))["_metadata"]())
-
-
 def _report_all(metadata: Dict[str, Any]) -> None:
     # Print JSON with aesthetic values that packs each parameter into one line,
     # while keeping the rest indented.
@@ -43,83 +33,37 @@ def _report_all(metadata: Dict[str, Any]) -> None:
     print(beautified_json)
 
 
-def _read_dynamic_shape(shape: List[Union[int, str]], config: Union[Dict, ConfigBase]) -> List[int]:
-    if isinstance(config, ConfigBase):
-        config = asdict(config)
-    param_shape = []
-    for s in shape:
-        if isinstance(s, int):
-            param_shape.append(s)
-        else:
-            if config is None:
-                logger.error(
-                    "%s: Encountered dynamic shape %s, need to specify `--mlc-chat-config` for "
-                    + "memory usage calculation.",
-                    red("FAILED"),
-                    red(s),
-                )
-                raise AttributeError
-            if not s in config:
-                logger.error(
-                    "%s to retrieve concrete %s for dynamic shape from %s.",
-                    red("FAILED"),
-                    red(s),
-                    config,
-                )
-                raise KeyError
-            param_shape.append(config[s])
-    return param_shape
-
-
-def _compute_memory_usage(metadata: Dict[str, Any], config: Union[Dict, ConfigBase]):
-    params_bytes = 0.0
-    for param in metadata["params"]:
-        if all(isinstance(v, int) for v in param["shape"]):
-            assert all(v > 0 for v in param["shape"]), "All shapes should be strictly positive."
-            param_shape = param["shape"]
-        else:
-            # Contains dynamic shape; use config to look up concrete values
-            param_shape = _read_dynamic_shape(param["shape"], config)
-        params_bytes += math.prod(param_shape) * np.dtype(param["dtype"]).itemsize
-    temp_func_bytes = 0.0
-    for _func_name, func_bytes in metadata["memory_usage"].items():
-        temp_func_bytes = max(temp_func_bytes, func_bytes)
-    kv_cache_bytes = metadata["kv_cache_bytes"]
-
-    return params_bytes, temp_func_bytes, kv_cache_bytes
-
-
-def _report_memory_usage(metadata: Dict[str, Any], config: Union[Dict, ConfigBase]) -> None:
-    params_bytes, temp_func_bytes, kv_cache_bytes = _compute_memory_usage(metadata, config)
-    total_size = params_bytes + temp_func_bytes + kv_cache_bytes
-    logger.info(
-        "%s: %.2f MB (Parameters: %.2f MB. KVCache: %.2f MB. Temporary buffer: %.2f MB)",
-        green("Total memory usage"),
-        total_size / 1024 / 1024,
-        params_bytes / 1024 / 1024,
-        kv_cache_bytes / 1024 / 1024,
-        temp_func_bytes / 1024 / 1024,
-    )
-
-    logger.info(
-        "To reduce memory usage, "
-        "tweak `prefill_chunk_size`, `context_window_size` and `sliding_window_size`"
-    )
-
-
 def _print_memory_usage_in_json(metadata: Dict[str, Any], config: Dict) -> None:
-    params_bytes, temp_func_bytes, kv_cache_bytes = _compute_memory_usage(metadata, config)
+    params_bytes, temp_func_bytes, kv_cache_bytes = compute_memory_usage(metadata, config)
     print(
         json.dumps(
             {
                 "params_bytes": params_bytes,
                 "temp_func_bytes": temp_func_bytes,
                 "kv_cache_bytes": kv_cache_bytes,
+                "memory_usage_breakdown": metadata.get("memory_usage_breakdown", {}),
             }
         )
     )
 
 
+def _report_memory_usage_breakdown(metadata: Dict[str, Any]) -> None:
+    # Model libraries compiled before the breakdown is recorded only have the totals.
+    if "memory_usage_breakdown" not in metadata:
+        return
+    print(f"{'Function':<40} {'Peak (MB)':>12} {'Total (MB)':>12} {'Allocs':>8} {'Unbounded':>10}")
+    for func_name, usage in sorted(
+        metadata["memory_usage_breakdown"].items(), key=lambda item: -item[1]["peak_bytes"]
+    ):
+        print(
+            f"{func_name:<40} "
+            f"{usage['peak_bytes'] / 1024 / 1024:>12.2f} "
+            f"{usage['total_bytes'] / 1024 / 1024:>12.2f} "
+            f"{usage['num_allocs']:>8} "
+            f"{usage['num_unbounded_allocs']:>10}"
+        )
+
+
 def main():
     """Entry point for the model metadata tool."""
     parser = ArgumentParser(description="A tool that inspects the metadata of a model lib.")
@@ -144,8 +88,9 @@ def main():
     parser.add_argument(
         "--memory-only",
         action="store_true",
-        help="""If set, only inspect the metadata in memory usage and print richer analysis.
-        Otherwise, the tool will load all the metadata from the model library file but only print
+        help="""If set, only inspect the metadata in memory usage and print richer analysis,
+        including the peak and the total bytes allocated in each function. Otherwise, the tool
+        will load all the metadata from the model library file but only print
         the basic information in JSON.
         """,
     )
@@ -157,7 +102,7 @@ def main():
     parsed = parser.parse_args()
     # Load metadata from model lib
     try:
-        metadata = _extract_metadata(parsed.model_lib)
+        metadata = extract_metadata(parsed.model_lib)
     except:  # pylint: disable=bare-except
         logger.exception("%s to read metadata section in legacy model lib.", red("FAILED"))
         return
@@ -173,7 +118,8 @@ def main():
     if parsed.print_memory_usage_in_json_only:
         _print_memory_usage_in_json(metadata, cfg)
     elif parsed.memory_only:
-        _report_memory_usage(metadata, cfg)
+        report_memory_usage(metadata, cfg)
+        _report_memory_usage_breakdown(metadata)
     else:
         _report_all(metadata)
 
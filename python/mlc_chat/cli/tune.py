@@ -0,0 +1,108 @@
+"""Command line entrypoint of kernel tuning."""
+import json
+from pathlib import Path
+from typing import Union
+
+from mlc_chat.help import HELP
+from mlc_chat.interface.compile import ModelConfigOverride, OptimizationFlags
+from mlc_chat.interface.tune import tune
+from mlc_chat.model import MODELS
+from mlc_chat.quantization import QUANTIZATION
+from mlc_chat.support.argparse import ArgumentParser
+from mlc_chat.support.auto_config import (
+    detect_mlc_chat_config,
+    detect_model_type,
+    detect_quantization,
+)
+from mlc_chat.support.auto_target import detect_target_and_host
+
+
+def main(argv):
+    """Parse command line argumennts and call `mlc_llm.interface.tune`."""
+
+    def _parse_output(path: Union[str, Path]) -> Path:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    parser = ArgumentParser("mlc_chat tune")
+    parser.add_argument(
+        "model",
+        type=detect_mlc_chat_config,
+        help=HELP["model"] + " (required)",
+    )
+    parser.add_argument(
+        "--quantization",
+        type=str,
+        choices=list(QUANTIZATION.keys()),
+        help=HELP["quantization"]
+        + " (default: look up mlc-chat-config.json, choices: %(choices)s)",
+    )
+    parser.add_argument(
+        "--model-type",
+        type=str,
+        default="auto",
+        choices=["auto"] + list(MODELS.keys()),
+        help=HELP["model_type"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="auto",
+        help=HELP["device_compile"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="auto",
+        help=HELP["host"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--opt",
+        type=OptimizationFlags.from_str,
+        default="O2",
+        help=HELP["opt"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=_parse_output,
+        required=True,
+        help=HELP["output_tune"] + " (required)",
+    )
+    parser.add_argument(
+        "--overrides",
+        type=ModelConfigOverride.from_str,
+        default="",
+        help=HELP["overrides"] + ' (default: "%(default)s")',
+    )
+    parser.add_argument(
+        "--num-trials",
+        type=int,
+        default=2000,
+        help=HELP["num_trials"] + " (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--num-trials-per-task",
+        type=int,
+        default=256,
+        help=HELP["num_trials_per_task"] + " (default: %(default)s)",
+    )
+    parsed = parser.parse_args(argv)
+    target, _ = detect_target_and_host(parsed.device, parsed.host)
+    parsed.model_type = detect_model_type(parsed.model_type, parsed.model)
+    parsed.quantization = detect_quantization(parsed.quantization, parsed.model)
+    with open(parsed.model, "r", encoding="utf-8") as config_file:
+        config = json.load(config_file)
+
+    tune(
+        config=config,
+        quantization=parsed.quantization,
+        model_type=parsed.model_type,
+        target=target,
+        opt=parsed.opt,
+        output=parsed.output,
+        overrides=parsed.overrides,
+        num_trials=parsed.num_trials,
+        num_trials_per_task=parsed.num_trials_per_task,
+    )
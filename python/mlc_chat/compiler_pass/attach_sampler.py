@@ -0,0 +1,349 @@
+"""The compiler pass that attaches the GPU sampling function to the IRModule."""
+
+import tvm
+from tvm import IRModule, tir
+from tvm.script import tir as T
+
+# mypy: disable-error-code="attr-defined,valid-type"
+# pylint: disable=too-many-locals,too-many-statements,invalid-name
+
+# The maximum number of tokens with top probabilities returned for each sample,
+# which is the upper bound of "top_logprobs".
+MAX_NUM_TOP_PROBS = 5
+# The number of bisection steps that search for the probability threshold of
+# top-p and top-k. The search runs over the bit patterns of float32 values in
+# [0, 1], which are ordered as integers, so that 31 steps find the exact threshold.
+_NUM_BISECTION_STEPS = 31
+# The bit pattern of float32 value 1.0.
+_FLOAT32_ONE_BITS = 0x3F800000
+
+
+def _get_batch_sample_top_p_top_k(num_threads: int) -> tir.PrimFunc:
+    """Create the function that samples one token for each sample from a batch of
+    probability distributions with renormalized top-p and top-k, using one thread
+    block for each sample.
+
+    Instead of sorting the vocabulary, the function bisects the probability threshold
+    `t`, such that the kept tokens are exactly the tokens with probability no less
+    than `t`. The threshold is the largest one where the kept tokens have a total
+    probability no less than top-p, or number no less than top-k. The sampled token
+    is then drawn from the kept tokens in the descending order of probabilities, which
+    is bisected in the same way, so that the function samples the same token as the
+    CPU sampler for the same uniform sample. The returned probability of the sampled
+    token is its probability in the input distribution, as the CPU sampler returns.
+    """
+    log_num_threads = num_threads.bit_length() - 1
+    assert 1 << log_num_threads == num_threads
+
+    @T.prim_func
+    def batch_sample_top_p_top_k(  # pylint: disable=too-many-arguments,too-many-branches
+        var_probs: T.handle,
+        var_sample_indices: T.handle,
+        var_uniform_samples: T.handle,
+        var_top_p: T.handle,
+        var_top_k: T.handle,
+        var_num_top_probs: T.handle,
+        var_sampled_token_ids: T.handle,
+        var_sampled_probs: T.handle,
+        var_top_token_ids: T.handle,
+        var_top_token_probs: T.handle,
+    ):
+        T.func_attr(
+            {
+                "global_symbol": "batch_sample_top_p_top_k",
+                "tir.noalias": True,
+                "tir.is_scheduled": True,
+            }
+        )
+        batch_size = T.int32(is_size_var=True)
+        vocab_size = T.int32(is_size_var=True)
+        num_samples = T.int32(is_size_var=True)
+        probs = T.match_buffer(var_probs, (batch_size, vocab_size), "float32")
+        sample_indices = T.match_buffer(var_sample_indices, (num_samples,), "int32")
+        uniform_samples = T.match_buffer(var_uniform_samples, (num_samples,), "float32")
+        top_p = T.match_buffer(var_top_p, (num_samples,), "float32")
+        top_k = T.match_buffer(var_top_k, (num_samples,), "int32")
+        num_top_probs = T.match_buffer(var_num_top_probs, (num_samples,), "int32")
+        sampled_token_ids = T.match_buffer(var_sampled_token_ids, (num_samples,), "int32")
+        sampled_probs = T.match_buffer(var_sampled_probs, (num_samples,), "float32")
+        top_token_ids = T.match_buffer(var_top_token_ids, (num_samples, MAX_NUM_TOP_PROBS), "int32")
+        top_token_probs = T.match_buffer(
+            var_top_token_probs, (num_samples, MAX_NUM_TOP_PROBS), "float32"
+        )
+
+        for bx in T.thread_binding(num_samples, thread="blockIdx.x"):
+            for tx in T.thread_binding(num_threads, thread="threadIdx.x"):
+                with T.block("sample"):
+                    red_prob = T.alloc_buffer((num_threads,), "float32", scope="shared")
+                    red_int = T.alloc_buffer((num_threads,), "int32", scope="shared")
+                    local_prob = T.alloc_buffer((1,), "float32", scope="local")
+                    local_int = T.alloc_buffer((1,), "int32", scope="local")
+                    # The bisection range of the threshold bits, where the low end
+                    # satisfies the top-p/top-k condition and the high end does not.
+                    lo = T.alloc_buffer((1,), "int32", scope="local")
+                    hi = T.alloc_buffer((1,), "int32", scope="local")
+                    prev_prob = T.alloc_buffer((1,), "float32", scope="local")
+                    prev_id = T.alloc_buffer((1,), "int32", scope="local")
+                    prefix = T.alloc_buffer((1,), "float32", scope="local")
+                    total = T.alloc_buffer((1,), "float32", scope="local")
+                    acc = T.alloc_buffer((1,), "float32", scope="local")
+                    found_id = T.alloc_buffer((1,), "int32", scope="local")
+                    top_id = T.alloc_buffer((1,), "int32", scope="local")
+                    num_ties_before = T.alloc_buffer((1,), "int32", scope="local")
+                    last_id = T.alloc_buffer((1,), "int32", scope="local")
+
+                    row: T.int32 = sample_indices[bx]
+                    chunk_size: T.int32 = T.ceildiv(vocab_size, num_threads)
+                    # Greedy sampling (top-k being 1) keeps only the token with the top
+                    # probability, which is found together with the top probabilities.
+                    num_top: T.int32 = T.max(
+                        num_top_probs[bx], T.if_then_else(top_k[bx] == 1, 1, 0)
+                    )
+
+                    # Step 1. Find the tokens with top probabilities in order, where
+                    # ties are broken by the smaller token id.
+                    prev_prob[0] = T.float32(2.0)
+                    prev_id[0] = -1
+                    for j in T.serial(MAX_NUM_TOP_PROBS):
+                        if j < num_top:
+                            local_prob[0] = T.float32(-1.0)
+                            local_int[0] = -1
+                            for i in T.serial(chunk_size):
+                                v: T.int32 = i * num_threads + tx
+                                if v < vocab_size:
+                                    if (
+                                        probs[row, v] < prev_prob[0]
+                                        or (probs[row, v] == prev_prob[0] and v > prev_id[0])
+                                    ) and probs[row, v] > local_prob[0]:
+                                        local_prob[0] = probs[row, v]
+                                        local_int[0] = v
+                            red_prob[tx] = local_prob[0]
+                            red_int[tx] = local_int[0]
+                            T.tvm_storage_sync("shared")
+                            for k in T.serial(log_num_threads):
+                                stride: T.int32 = T.shift_right(T.int32(num_threads), k + 1)
+                                if tx < stride:
+                                    if red_prob[tx + stride] > red_prob[tx] or (
+                                        red_prob[tx + stride] == red_prob[tx]
+                                        and red_int[tx + stride] < red_int[tx]
+                                    ):
+                                        red_prob[tx] = red_prob[tx + stride]
+                                        red_int[tx] = red_int[tx + stride]
+                                T.tvm_storage_sync("shared")
+                            prev_prob[0] = red_prob[0]
+                            prev_id[0] = red_int[0]
+                            if tx == 0:
+                                top_token_ids[bx, j] = prev_id[0]
+                                top_token_probs[bx, j] = prev_prob[0]
+                            if j == 0:
+                                # The bits of the top probability, which is the threshold
+                                # of greedy sampling.
+                                lo[0] = T.reinterpret("int32", prev_prob[0])
+                                top_id[0] = prev_id[0]
+                            T.tvm_storage_sync("shared")
+
+                    # Step 2. Bisect the threshold of top-p and top-k, unless the sampling
+                    # is greedy or keeps all the tokens.
+                    keep_all: T.bool = top_p[bx] > T.float32(1.0) and top_k[bx] <= 0
+                    if top_k[bx] != 1 and not keep_all:
+                        lo[0] = 0
+                        hi[0] = _FLOAT32_ONE_BITS + 1
+                        for _step in T.serial(_NUM_BISECTION_STEPS):
+                            mid: T.int32 = lo[0] + T.shift_right(hi[0] - lo[0], 1)
+                            threshold: T.float32 = T.reinterpret("float32", mid)
+                            local_prob[0] = T.float32(0.0)
+                            local_int[0] = 0
+                            for i in T.serial(chunk_size):
+                                v: T.int32 = i * num_threads + tx
+                                if v < vocab_size:
+                                    if probs[row, v] >= threshold:
+                                        local_prob[0] += probs[row, v]
+                                        local_int[0] += 1
+                            red_prob[tx] = local_prob[0]
+                            red_int[tx] = local_int[0]
+                            T.tvm_storage_sync("shared")
+                            for k in T.serial(log_num_threads):
+                                stride: T.int32 = T.shift_right(T.int32(num_threads), k + 1)
+                                if tx < stride:
+                                    red_prob[tx] += red_prob[tx + stride]
+                                    red_int[tx] += red_int[tx + stride]
+                                T.tvm_storage_sync("shared")
+                            if red_prob[0] >= top_p[bx] or (
+                                top_k[bx] > 0 and red_int[0] >= top_k[bx]
+                            ):
+                                lo[0] = mid
+                            else:
+                                hi[0] = mid
+                            T.tvm_storage_sync("shared")
+
+                    if top_k[bx] == 1:
+                        # Step 3a. Greedy sampling picks the token with the top probability,
+                        # whose probability is reported as 1, as the CPU sampler does.
+                        if tx == 0:
+                            sampled_token_ids[bx] = top_id[0]
+                            sampled_probs[bx] = T.float32(1.0)
+                    elif keep_all:
+                        # Step 3b. All the tokens are kept, which are sampled in the order of
+                        # token ids as the CPU sampler does. Each thread sums up the
+                        # probabilities of a contiguous chunk of the vocabulary, and the thread
+                        # whose chunk covers the uniform sample scans its chunk.
+                        local_prob[0] = T.float32(0.0)
+                        for i in T.serial(chunk_size):
+                            v: T.int32 = tx * chunk_size + i
+                            if v < vocab_size:
+                                local_prob[0] += probs[row, v]
+                        red_prob[tx] = local_prob[0]
+                        T.tvm_storage_sync("shared")
+                        # Every thread accumulates the chunk sums in the same order, so that
+                        # the prefix sums of the chunks partition the total sum exactly.
+                        prefix[0] = T.float32(0.0)
+                        total[0] = T.float32(0.0)
+                        for j in T.serial(num_threads):
+                            if j < tx:
+                                prefix[0] += red_prob[j]
+                            total[0] += red_prob[j]
+                        target: T.float32 = uniform_samples[bx] * total[0]
+                        prefix_next: T.float32 = prefix[0] + local_prob[0]
+                        if (
+                            local_prob[0] > T.float32(0.0)
+                            and prefix[0] <= target
+                            and (target < prefix_next or prefix_next == total[0])
+                        ):
+                            acc[0] = T.float32(0.0)
+                            found_id[0] = -1
+                            last_id[0] = -1
+                            for i in T.serial(chunk_size):
+                                v: T.int32 = tx * chunk_size + i
+                                if v < vocab_size:
+                                    if probs[row, v] > T.float32(0.0):
+                                        acc[0] += probs[row, v]
+                                        last_id[0] = v
+                                        if found_id[0] == -1 and prefix[0] + acc[0] > target:
+                                            found_id[0] = v
+                            if found_id[0] == -1:
+                                found_id[0] = last_id[0]
+                            sampled_token_ids[bx] = found_id[0]
+                            sampled_probs[bx] = probs[row, found_id[0]]
+                    else:
+                        # Step 3c. Sample from the kept tokens in the descending order of
+                        # probabilities, as the CPU sampler does. Let S(t) be the total
+                        # probability of the tokens no less than `t`. The sampled token has
+                        # the largest probability `t` where S(t) exceeds the uniform sample
+                        # scaled by the kept total, which is bisected like the threshold.
+                        local_prob[0] = T.float32(0.0)
+                        for i in T.serial(chunk_size):
+                            v: T.int32 = i * num_threads + tx
+                            if v < vocab_size:
+                                if probs[row, v] >= T.reinterpret("float32", lo[0]):
+                                    local_prob[0] += probs[row, v]
+                        red_prob[tx] = local_prob[0]
+                        T.tvm_storage_sync("shared")
+                        for k in T.serial(log_num_threads):
+                            stride: T.int32 = T.shift_right(T.int32(num_threads), k + 1)
+                            if tx < stride:
+                                red_prob[tx] += red_prob[tx + stride]
+                            T.tvm_storage_sync("shared")
+                        total[0] = red_prob[0]
+                        T.tvm_storage_sync("shared")
+                        target: T.float32 = uniform_samples[bx] * total[0]
+                        # The low end is the kept threshold, where S(t) is the kept total.
+                        hi[0] = _FLOAT32_ONE_BITS + 1
+                        for _step in T.serial(_NUM_BISECTION_STEPS):
+                            mid: T.int32 = lo[0] + T.shift_right(hi[0] - lo[0], 1)
+                            threshold: T.float32 = T.reinterpret("float32", mid)
+                            local_prob[0] = T.float32(0.0)
+                            for i in T.serial(chunk_size):
+                                v: T.int32 = i * num_threads + tx
+                                if v < vocab_size:
+                                    if probs[row, v] >= threshold:
+                                        local_prob[0] += probs[row, v]
+                            red_prob[tx] = local_prob[0]
+                            T.tvm_storage_sync("shared")
+                            for k in T.serial(log_num_threads):
+                                stride: T.int32 = T.shift_right(T.int32(num_threads), k + 1)
+                                if tx < stride:
+                                    red_prob[tx] += red_prob[tx + stride]
+                                T.tvm_storage_sync("shared")
+                            if red_prob[0] > target:
+                                lo[0] = mid
+                            else:
+                                hi[0] = mid
+                            T.tvm_storage_sync("shared")
+
+                        # The tokens with the sampled probability are taken in the order of
+                        # token ids, after the tokens with larger probabilities.
+                        sampled_prob: T.float32 = T.reinterpret("float32", lo[0])
+                        local_prob[0] = T.float32(0.0)
+                        local_int[0] = 0
+                        for i in T.serial(chunk_size):
+                            v: T.int32 = i * num_threads + tx
+                            if v < vocab_size:
+                                if probs[row, v] > sampled_prob:
+                                    local_prob[0] += probs[row, v]
+                                elif probs[row, v] == sampled_prob:
+                                    local_int[0] += 1
+                        red_prob[tx] = local_prob[0]
+                        red_int[tx] = local_int[0]
+                        T.tvm_storage_sync("shared")
+                        for k in T.serial(log_num_threads):
+                            stride: T.int32 = T.shift_right(T.int32(num_threads), k + 1)
+                            if tx < stride:
+                                red_prob[tx] += red_prob[tx + stride]
+                                red_int[tx] += red_int[tx + stride]
+                            T.tvm_storage_sync("shared")
+                        num_ties: T.int32 = red_int[0]
+                        tie_rank: T.int32 = T.Cast(
+                            "int32",
+                            T.min(
+                                T.Cast("float32", num_ties - 1),
+                                T.max((target - red_prob[0]) / sampled_prob, T.float32(0.0)),
+                            ),
+                        )
+                        T.tvm_storage_sync("shared")
+                        local_int[0] = 0
+                        for i in T.serial(chunk_size):
+                            v: T.int32 = tx * chunk_size + i
+                            if v < vocab_size:
+                                if probs[row, v] == sampled_prob:
+                                    local_int[0] += 1
+                        red_int[tx] = local_int[0]
+                        T.tvm_storage_sync("shared")
+                        num_ties_before[0] = 0
+                        for j in T.serial(num_threads):
+                            if j < tx:
+                                num_ties_before[0] += red_int[j]
+                        if (
+                            num_ties_before[0] <= tie_rank
+                            and tie_rank < num_ties_before[0] + local_int[0]
+                        ):
+                            for i in T.serial(chunk_size):
+                                v: T.int32 = tx * chunk_size + i
+                                if v < vocab_size:
+                                    if probs[row, v] == sampled_prob:
+                                        if num_ties_before[0] == tie_rank:
+                                            sampled_token_ids[bx] = v
+                                            sampled_probs[bx] = sampled_prob
+                                        num_ties_before[0] += 1
+
+    return batch_sample_top_p_top_k
+
+
+@tvm.transform.module_pass(opt_level=0, name="AttachGPUSamplerFunc")
+class AttachGPUSamplerFunc:  # pylint: disable=too-few-public-methods
+    """Attach the GPU sampling function to the IRModule, with which the engine samples
+    tokens on device and copies only the sampled tokens back to host."""
+
+    def __init__(self, target: tvm.target.Target):
+        self.target = target
+
+    def transform_module(self, mod: IRModule, _ctx: tvm.transform.PassContext) -> IRModule:
+        """Entrypoint"""
+        if self.target.kind.name == "llvm":
+            # The sampling is done on CPU directly for CPU targets.
+            return mod
+        num_threads = min(1024, int(self.target.max_num_threads))
+        # Round down to a power of two for the tree reductions.
+        num_threads = 1 << (num_threads.bit_length() - 1)
+        mod = mod.clone()
+        mod["batch_sample_top_p_top_k"] = _get_batch_sample_top_p_top_k(num_threads)
+        return mod
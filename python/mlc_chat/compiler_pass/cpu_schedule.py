@@ -0,0 +1,137 @@
+"""Dlight schedule rules for CPU targets, which make the reduction kernels, i.e. the fused
+dequantize-matmul and dequantize-GEMV kernels of group quantization, vectorized and parallel
+across the CPU threads, and parallelize the outer spatial loops of all other kernels.
+
+The rules only apply to llvm targets, and are placed after the GPU rules in
+`dl.ApplyDefaultSchedule`, which in turn skip llvm targets.
+"""
+from typing import List, Optional
+
+from tvm import dlight as dl
+from tvm import tir
+from tvm.runtime import DataType
+from tvm.target import Target
+
+
+def _is_cpu_target(target: Target) -> bool:
+    return target.kind.name == "llvm"
+
+
+def _get_vector_bits(target: Target) -> int:
+    """The width of the SIMD registers of the target CPU in bits."""
+    mcpu = str(target.attrs.get("mcpu", ""))
+    mattr = [str(attr) for attr in target.attrs.get("mattr", [])]
+    mtriple = str(target.attrs.get("mtriple", ""))
+    if "+avx512f" in mattr or mcpu in ["skylake-avx512", "cascadelake", "icelake-server"]:
+        return 512
+    if mtriple.startswith(("aarch64", "arm")) or "+neon" in mattr:
+        return 128
+    return 256
+
+
+def _parallelize_spatial(sch: tir.Schedule, block_info: dl.BlockInfo) -> Optional[tir.LoopRV]:
+    """Fuse the leading spatial loops of the block, and run the fused loop in parallel.
+    Return the fused loop, or None if the block has no leading spatial loop."""
+    loops: List[tir.LoopRV] = []
+    for iter_info in block_info.iters:
+        if iter_info.kind != "S":
+            break
+        loops.append(iter_info.loop_rv)
+    if not loops:
+        return None
+    loop = sch.fuse(*loops) if len(loops) > 1 else loops[0]
+    extent = sch.get(loop).extent
+    if isinstance(extent, tir.IntImm) and extent.value == 1:
+        return loop
+    try:
+        sch.parallel(loop)
+    except tir.ScheduleError:
+        pass
+    return loop
+
+
+class Reduction(dl.ScheduleRule):
+    """The CPU schedule rule for functions with one reduction block, i.e. matmul and GEMV,
+    and the fused dequantize-matmul of group quantization in particular.
+
+    The spatial loops are fused and run in parallel, and the reduction loop is split into
+    the SIMD lanes, which accumulate in registers through `rfactor` and are summed up after
+    the reduction. Element-wise epilogues left after inlining are parallelized on their own.
+    """
+
+    def apply(  # pylint: disable=too-many-locals
+        self,
+        func: tir.PrimFunc,
+        target: Target,
+        _: bool,
+    ) -> Optional[tir.Schedule]:
+        if not isinstance(func, tir.PrimFunc) or not _is_cpu_target(target):
+            return None
+        sch = tir.Schedule(func)
+        block_infos = dl.normalize_prim_func(sch)
+        if block_infos is None:
+            return None
+        block_infos = dl.try_inline_contiguous_spatial(sch, block_infos)
+        reduction_blocks = [info for info in block_infos if info.is_reduction()]
+        if len(reduction_blocks) != 1:
+            return None
+        (block_info,) = reduction_blocks
+        if any(iter_info.kind not in ["S", "R"] for iter_info in block_info.iters):
+            return None
+        for info in block_infos:
+            if info is not block_info and not info.is_injective():
+                return None
+
+        block = block_info.block_rv
+        s_loops = [iter_info.loop_rv for iter_info in block_info.iters if iter_info.kind == "S"]
+        r_loops = [iter_info.loop_rv for iter_info in block_info.iters if iter_info.kind == "R"]
+        if not s_loops or not r_loops:
+            return None
+        sch.reorder(*s_loops, *r_loops)
+        spatial = sch.fuse(*s_loops) if len(s_loops) > 1 else s_loops[0]
+        reduction = sch.fuse(*r_loops) if len(r_loops) > 1 else r_loops[0]
+
+        dtype_bits = DataType(sch.get(block).writes[0].buffer.dtype).bits
+        lanes = _get_vector_bits(target) // dtype_bits
+        extent = sch.get(reduction).extent
+        if lanes > 1 and isinstance(extent, tir.IntImm) and extent.value % lanes == 0:
+            reduction_o, reduction_i = sch.split(reduction, factors=[None, lanes])
+            try:
+                rf_block = sch.rfactor(reduction_i, factor_axis=0)
+            except tir.ScheduleError:
+                rf_block = None
+            if rf_block is not None:
+                # The partial sums live in registers, instead of a global workspace
+                # allocated in each iteration of the parallel loop.
+                sch.set_scope(rf_block, 0, "local")
+                sch.reverse_compute_at(block, spatial)
+                sch.decompose_reduction(rf_block, reduction_o)
+                sch.vectorize(reduction_i)
+        sch.parallel(spatial)
+
+        for info in block_infos:
+            if info is not block_info:
+                _parallelize_spatial(sch, info)
+        return sch
+
+
+class Fallback(dl.ScheduleRule):
+    """The CPU schedule rule that inlines the injective blocks, and runs the leading spatial
+    loops of the remaining blocks in parallel."""
+
+    def apply(
+        self,
+        func: tir.PrimFunc,
+        target: Target,
+        _: bool,
+    ) -> Optional[tir.Schedule]:
+        if not isinstance(func, tir.PrimFunc) or not _is_cpu_target(target):
+            return None
+        sch = tir.Schedule(func)
+        block_infos = dl.normalize_prim_func(sch)
+        if block_infos is None:
+            return None
+        block_infos = dl.try_inline(sch, block_infos)
+        for block_info in block_infos:
+            _parallelize_spatial(sch, block_info)
+        return sch
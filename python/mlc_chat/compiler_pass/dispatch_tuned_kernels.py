@@ -0,0 +1,29 @@
+"""A compiler pass that dispatches TIR functions to the kernels tuned in a tuning database."""
+from pathlib import Path
+from typing import Optional
+
+import tvm
+from tvm import IRModule
+from tvm.target import Target
+
+from mlc_chat.support.tuning_database import load_tuning_database
+
+
+@tvm.transform.module_pass(opt_level=0, name="DispatchTunedKernels")
+class DispatchTunedKernels:  # pylint: disable=too-few-public-methods
+    """Replace the TIR functions tuned in the tuning database with their tuned schedules,
+    which are then left untouched by the default dlight schedules."""
+
+    def __init__(self, target: Target, tuning_database: Optional[Path]) -> None:
+        self.target = target
+        self.tuning_database = tuning_database
+
+    def transform_module(self, mod: IRModule, _ctx: tvm.transform.PassContext) -> IRModule:
+        """Entrypoint"""
+        if self.tuning_database is None:
+            return mod
+        database = load_tuning_database(self.tuning_database, self.target)
+        if database is None:
+            return mod
+        with self.target, database:
+            return tvm.relax.transform.MetaScheduleApplyDatabase(enable_warning=False)(mod)
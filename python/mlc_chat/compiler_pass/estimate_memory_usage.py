@@ -1,11 +1,12 @@
 """Memory usage estimation analysis function for Relax functions."""
+import dataclasses
 import json
-from typing import Any, Dict
+import math
+from typing import Any, Dict, List, Optional, Tuple
 
 import tvm
 from tvm import relax, tir
 from tvm.ir import IRModule, Op
-from tvm.relax.expr_functor import PyExprVisitor, visitor
 
 from mlc_chat.support import logging
 
@@ -28,57 +29,191 @@ class AttachMetadataWithMemoryUsage:  # pylint: disable=too-few-public-methods
                 bb.emit_func_output(relax.StringImm(json.dumps(metadata)))
             return bb.finalize()["main"]
 
-        self.metadata["memory_usage"] = _MemoryEstimator().run(mod)
+        breakdown = _MemoryEstimator().run(mod)
+        self.metadata["memory_usage"] = {
+            func_name: usage["peak_bytes"] for func_name, usage in breakdown.items()
+        }
+        self.metadata["memory_usage_breakdown"] = breakdown
         mod["_metadata"] = _emit_metadata(self.metadata)
         return mod
 
 
-@visitor
-class _MemoryEstimator(PyExprVisitor):
-    """The IR visitor which estimates the memory usage of each Relax function."""
+@dataclasses.dataclass(eq=False)
+class _Allocation:
+    """An allocation, alive from the binding `start` to the binding `end` of its scope."""
+
+    scope: int
+    size: int
+    start: int
+    end: int
+
+
+# The view ops that StaticPlanBlockMemory plans to share the storage of their input, among
+# which only those registered in the TVM build are matched.
+_VIEW_OPS = ["relax.reshape", "relax.memory.view", "relax.memory.ensure_zero_offset"]
+
+
+class _MemoryEstimator:
+    """Estimate the peak memory of each Relax function, i.e. the maximum total size of the
+    storages and tensors allocated in the function that are alive at the same time.
+
+    An allocation is alive from its binding to the last use of any variable that refers to
+    it, where tensors allocated from a storage, tuples, tuple items, reshapes and other views
+    refer to the allocations they are made from, and the result of an `If` refers to the
+    allocations its branches return. Allocations in the function output are alive until
+    the end. Dynamic sizes are evaluated at the upper bounds of the variables given by the
+    `tir_var_upper_bound` attribute of the function, i.e. the `variable_bounds` of the
+    compilation. Allocations whose sizes remain unbounded are counted as zero bytes.
+    """
 
     def __init__(self) -> None:
-        self.planned_alloc_mem = 0
-        self.planned_mem_num = 0
         self._op_alloc_tensor = Op.get("relax.builtin.alloc_tensor")
         self._op_alloc_storage = Op.get("relax.memory.alloc_storage")
-
-    def run(self, mod: IRModule) -> Dict[str, int]:
-        """Entry point of the visitor."""
-        result: Dict[str, int] = {}
+        self._op_alloc_tensor_from_storage = Op.get("relax.memory.alloc_tensor")
+        self._view_ops: List[Op] = []
+        for op_name in _VIEW_OPS:
+            try:
+                self._view_ops.append(Op.get(op_name))
+            except tvm.TVMError:
+                pass
+        self._bounds: Dict[str, int] = {}
+        # The allocations each variable refers to.
+        self._refs: Dict[relax.Var, List[_Allocation]] = {}
+        self._num_scopes = 0
+        self._total_bytes = 0
+        self._num_allocs = 0
+        self._num_unbounded_allocs = 0
+
+    def run(self, mod: IRModule) -> Dict[str, Dict[str, int]]:
+        """Entry point of the estimator, which returns the memory usage breakdown of each
+        Relax function."""
+        result: Dict[str, Dict[str, int]] = {}
         for global_var, func in mod.functions_items():
-            if isinstance(func, relax.Function):
-                self.planned_alloc_mem = 0
-                self.planned_mem_num = 0
-                self.visit_expr(func)
-                result[global_var.name_hint] = self.planned_alloc_mem
-                logger.info(
-                    "[Memory usage] Function `%s`: %.2f MB",
-                    global_var.name_hint,
-                    self.planned_alloc_mem / 1024 / 1024,
-                )
+            if not isinstance(func, relax.Function):
+                continue
+            self._bounds = {}
+            if func.attrs is not None and "tir_var_upper_bound" in func.attrs:
+                bounds = func.attrs["tir_var_upper_bound"]
+                self._bounds = {str(name): int(bound) for name, bound in bounds.items()}
+            self._total_bytes = 0
+            self._num_allocs = 0
+            self._num_unbounded_allocs = 0
+            self._refs = {}
+            peak_bytes, _, _ = self._estimate(func.body)
+            result[global_var.name_hint] = {
+                "peak_bytes": peak_bytes,
+                "total_bytes": self._total_bytes,
+                "num_allocs": self._num_allocs,
+                "num_unbounded_allocs": self._num_unbounded_allocs,
+            }
+            logger.info(
+                "[Memory usage] Function `%s`: %.2f MB at peak, %.2f MB allocated in total",
+                global_var.name_hint,
+                peak_bytes / 1024 / 1024,
+                self._total_bytes / 1024 / 1024,
+            )
         return result
 
-    def visit_call_(self, call: relax.Call) -> None:  # pylint: disable=arguments-renamed
-        if call.op == self._op_alloc_tensor:
-            self._builtin_tensor_alloc(shape=call.args[0], dtype_str=call.args[1].value)
-        elif call.op == self._op_alloc_storage:
-            self._storage_alloc(size=call.args[0])
-        super().visit_call_(call)
-
-    def _builtin_tensor_alloc(self, shape: relax.Expr, dtype_str: str) -> None:
-        assert isinstance(shape, relax.ShapeExpr)
-        size = 1
-        for dim_len in shape.values:
-            if not isinstance(dim_len, tvm.tir.IntImm):
-                return
-            size *= dim_len.value
-        dtype = tvm.DataType(dtype_str)
-        self.planned_mem_num += 1
-        self.planned_alloc_mem += size * ((dtype.bits + 7) // 8) * dtype.lanes
-
-    def _storage_alloc(self, size: relax.Expr) -> None:
-        assert isinstance(size, relax.ShapeExpr)
-        if isinstance(size.values[0], tir.IntImm):
-            self.planned_mem_num += 1
-            self.planned_alloc_mem += size.values[0].value
+    def _estimate(self, expr: relax.Expr) -> Tuple[int, List[_Allocation], int]:
+        """Return the peak bytes of the allocations in the expression. Also return the
+        allocations outside the expression that its result refers to, and the total bytes of
+        the allocations in the expression that its result refers to, which outlive it."""
+        if not isinstance(expr, relax.SeqExpr):
+            return 0, [], 0
+        self._num_scopes += 1
+        scope = self._num_scopes
+        bindings = [binding for block in expr.blocks for binding in block.bindings]
+        allocs: List[_Allocation] = []
+        for i, binding in enumerate(bindings):
+            value = binding.value
+            used = [var for var in relax.analysis.free_vars(value) if var in self._refs]
+            for var in used:
+                for alloc in self._refs[var]:
+                    # The allocations of outer scopes are alive during this scope.
+                    if alloc.scope == scope:
+                        alloc.end = i
+            if isinstance(value, relax.If):
+                # The allocations in the branches are alive only within the binding, except
+                # those returned by the branches, which are referred to by the binding.
+                true_peak, true_outer, true_escaped = self._estimate(value.true_branch)
+                false_peak, false_outer, false_escaped = self._estimate(value.false_branch)
+                allocs.append(_Allocation(scope, max(true_peak, false_peak), i, i))
+                escaped = _Allocation(scope, max(true_escaped, false_escaped), i + 1, i)
+                allocs.append(escaped)
+                self._refs[binding.var] = true_outer + false_outer + [escaped]
+                continue
+            size = self._get_alloc_bytes(value)
+            if size is not None:
+                alloc = _Allocation(scope, size, i, i)
+                allocs.append(alloc)
+                self._refs[binding.var] = [alloc]
+            elif self._is_alias(value):
+                self._refs[binding.var] = [alloc for var in used for alloc in self._refs[var]]
+        outer: List[_Allocation] = []
+        escaped_allocs: List[_Allocation] = []
+        for var in relax.analysis.free_vars(expr.body):
+            for alloc in self._refs.get(var, []):
+                if alloc.scope != scope:
+                    outer.append(alloc)
+                elif all(alloc is not other for other in escaped_allocs):
+                    alloc.end = len(bindings)
+                    escaped_allocs.append(alloc)
+
+        deltas = [0] * (len(bindings) + 2)
+        for alloc in allocs:
+            deltas[alloc.start] += alloc.size
+            deltas[alloc.end + 1] -= alloc.size
+        peak_bytes = live_bytes = 0
+        for delta in deltas:
+            live_bytes += delta
+            peak_bytes = max(peak_bytes, live_bytes)
+        return peak_bytes, outer, sum(alloc.size for alloc in escaped_allocs)
+
+    def _is_alias(self, value: relax.Expr) -> bool:
+        """Whether the value refers to the allocations of the variables it uses."""
+        if isinstance(value, (relax.Var, relax.Tuple, relax.TupleGetItem)):
+            return True
+        if isinstance(value, relax.Call):
+            if value.op == self._op_alloc_tensor_from_storage or any(
+                value.op == op for op in self._view_ops
+            ):
+                return True
+            if isinstance(value.op, relax.ExternFunc):
+                return value.op.global_symbol == "vm.builtin.reshape"
+        return False
+
+    def _get_alloc_bytes(self, value: relax.Expr) -> Optional[int]:
+        """The bytes allocated by the value, or None if it is not an allocation."""
+        if not isinstance(value, relax.Call):
+            return None
+        if value.op == self._op_alloc_tensor:
+            shape, dtype = value.args[0], tvm.DataType(value.args[1].value)
+            assert isinstance(shape, relax.ShapeExpr)
+            size = self._evaluate(math.prod(shape.values, start=tir.IntImm("int64", 1)))
+            if size is not None:
+                size *= ((dtype.bits + 7) // 8) * dtype.lanes
+        elif value.op == self._op_alloc_storage:
+            assert isinstance(value.args[0], relax.ShapeExpr)
+            size = self._evaluate(value.args[0].values[0])
+        else:
+            return None
+        self._num_allocs += 1
+        if size is None:
+            self._num_unbounded_allocs += 1
+            return 0
+        self._total_bytes += size
+        return size
+
+    def _evaluate(self, expr: tir.PrimExpr) -> Optional[int]:
+        """Evaluate the size at the upper bounds of its variables. Return None if it is
+        unbounded."""
+        if not isinstance(expr, tir.IntImm):
+            var_map = {
+                var: tir.IntImm(var.dtype, self._bounds[var.name])
+                for var in tir.analysis.undefined_vars(expr)
+                if var.name in self._bounds
+            }
+            expr = tvm.arith.Analyzer().simplify(tir.stmt_functor.substitute(expr, var_map))
+        if not isinstance(expr, tir.IntImm):
+            return None
+        return expr.value
@@ -11,6 +11,8 @@ from tvm.relax.frontend import nn
 
 from mlc_chat.support import logging
 
+from . import cpu_schedule
+from .attach_sampler import AttachGPUSamplerFunc
 from .attach_to_ir_module import (
     AttachAdditionalPrimFuncs,
     AttachLogitProcessFunc,
@@ -19,6 +21,7 @@ from .attach_to_ir_module import (
 )
 from .clean_up_tir_attrs import CleanUpTIRAttrs
 from .cublas_dispatch import CublasDispatch
+from .dispatch_tuned_kernels import DispatchTunedKernels
 from .estimate_memory_usage import AttachMetadataWithMemoryUsage
 from .fuse_add_norm import FuseAddRMSNorm
 from .fuse_dequantize_matmul_ewise import FuseDequantizeMatmulEwise
@@ -77,6 +80,7 @@ def _mlc_llm_pipeline(  # pylint: disable=too-many-arguments
     metadata: Dict[str, Any] = None,
     ext_mods: List[nn.ExternModule] = None,
     debug_dump: Optional[Path] = None,
+    tuning_database: Optional[Path] = None,
 ):
     variable_bounds = variable_bounds or {}
     additional_tirs = additional_tirs or {}
@@ -91,6 +95,7 @@ def _mlc_llm_pipeline(  # pylint: disable=too-many-arguments
                 RewriteKVCacheCreation(target, flashinfer, metadata),
                 AttachVariableBounds(variable_bounds),
                 AttachLogitProcessFunc(),
+                AttachGPUSamplerFunc(target),
                 AttachAdditionalPrimFuncs(additional_tirs),
                 AttachMemoryPlanAttr(),
                 tvm.tir.transform.BindTarget(tvm.target.Target.current(allow_none=False)),
@@ -120,12 +125,15 @@ def _mlc_llm_pipeline(  # pylint: disable=too-many-arguments
                 _DebugDump("debug-phase3.py", debug_dump, show_meta=False),
                 # Phase 4. Low-level Optimizations
                 _LogProgress("Running TVM Dlight low-level optimizations"),
+                DispatchTunedKernels(target, tuning_database),
                 dl.ApplyDefaultSchedule(
                     dl.gpu.Matmul(),
                     dl.gpu.GEMV(),
                     dl.gpu.Reduction(),
                     dl.gpu.GeneralReduction(),
                     dl.gpu.Fallback(),
+                    cpu_schedule.Reduction(),
+                    cpu_schedule.Fallback(),
                 ),
                 _DebugDump("debug-phase4.py", debug_dump, show_meta=False),
                 _LogProgress("Lowering to VM bytecode"),
@@ -127,6 +127,23 @@ Chat configuration override. Configurations to override ChatConfig. Supports `co
 `context_window_size`, `prefill_chunk_size`, `sliding_window_size`, `attention_sink_size`,
 `max_batch_size` and `tensor_parallel_shards`. Meanwhile, model chat could be explicitly
 specified via details knobs, e.g. --overrides "context_window_size=1024;prefill_chunk_size=128".
+""".strip(),
+    "tuning_database": """
+The tuning database produced by `mlc_chat tune` for the same target. The kernels tuned in it
+are used in place of the default schedules. It is ignored with a warning if it is tuned for
+another target or of an outdated version.
+""".strip(),
+    "output_tune": """
+The directory of the tuning database to write. If it exists, the kernels already tuned in it are
+kept, and only the kernels missing from it are tuned. Only kernels with static shapes are tuned,
+e.g. those of single-sequence decoding. The kernels of prefill and batch decoding have dynamic
+shapes, and keep the default schedules.
+""".strip(),
+    "num_trials": """
+The total number of schedule candidates MetaSchedule measures across all the tuned kernels.
+""".strip(),
+    "num_trials_per_task": """
+The maximum number of schedule candidates MetaSchedule measures for each kernel.
 """.strip(),
     "debug_dump": """
 Specifies the directory where the compiler will store its IRs for debugging purposes
@@ -138,5 +155,97 @@ The prompt of the text generation.
 """.strip(),
     "generate_length": """
 The target length of the text generation.
+""".strip(),
+    "num_threads": """
+The number of CPU threads that run the model when it is deployed on CPU, e.g. to compare with
+other CPU runtimes at the same thread count. By default, it is the number of physical cores.
+""".strip(),
+    "convert_num_workers": """
+The number of threads that quantize parameters in parallel, while the next weight file is read
+in background and the converted parameters are written to the output as soon as they finish.
+""".strip(),
+    "convert_max_memory_gb": """
+The host RAM budget in GB of weight conversion. Prefetching of weight files and in-flight
+quantization are throttled to stay within the budget. Unbounded if unspecified.
+""".strip(),
+    "serve_url": """
+The base URL of the running `mlc_chat.serve.server` to benchmark.
+""".strip(),
+    "served_model": """
+The name of the served model to request, i.e., the `--model` the server is launched with.
+""".strip(),
+    "serve_endpoint": """
+The OpenAI API-compatible endpoint to benchmark.
+""".strip(),
+    "non_streaming": """
+Benchmark non-streaming responses. TTFT and inter-token latency are unavailable in this mode.
+""".strip(),
+    "bench_dataset": """
+The JSON Lines trace to replay. Each line is an object with "prompt", "max_tokens" and an
+optional "timestamp" (in seconds) of the recorded arrival. When unspecified, synthetic requests
+are generated with `--input-len` and `--output-len`.
+""".strip(),
+    "request_rate": """
+The comma-separated list of request rates (requests per second) to benchmark, each producing a
+point of the throughput-latency curve. Use "inf" to send all requests at once.
+""".strip(),
+    "arrival_process": """
+The arrival process of requests. "poisson" and "gamma" sample arrivals at the request rate, and
+"trace" replays the recorded timestamps in the dataset.
+""".strip(),
+    "burstiness": """
+The shape of the gamma arrival process. Values below 1 are burstier than Poisson arrivals.
+""".strip(),
+    "max_concurrency": """
+The maximum number of in-flight requests. Requests beyond the limit wait in the client, and the
+waiting time counts into their latency.
+""".strip(),
+    "slo": """
+The service level objective (in seconds) used to compute goodput. Unconstrained if unspecified.
+""".strip(),
+    "stub_engine": """
+Run against a simulated engine instead of a server. This is useful for testing the benchmark
+without GPU.
+""".strip(),
+    "cache_max_size_gb": """
+The size limit of the model lib cache in GB. Least recently used model libs are evicted until the
+cache fits in the limit, except those being compiled. Defaults to the environment variable
+MLC_MODEL_LIB_CACHE_MAX_GB.
+""".strip(),
+    "cache_dry_run": """
+Print the model libs to evict without deleting them.
+""".strip(),
+    "warm_models": """
+The models to compile, each of which is a model directory containing `mlc-chat-config.json`, or
+a URL as accepted by ChatModule.
+""".strip(),
+    "warm_devices": """
+The devices to compile for, e.g. "cuda:0". The devices do not need to be available locally.
+""".strip(),
+    "warm_overrides": """
+The list of model configuration overrides to compile, in the same format as --overrides of
+compilation. An empty string compiles the configuration in `mlc-chat-config.json`, which is what
+the serving engine uses by default.
+""".strip(),
+    "warm_num_jobs": """
+The number of model libs compiled in parallel.
+""".strip(),
+    "warm_background": """
+Detach the warm-up into a background process, whose output goes to the log file.
+""".strip(),
+    "chat_timeline": """
+The file to dump the per-token timeline of prefill, decode, sampling and detokenization on exit.
+Files ending with ".parquet" are written in Parquet, which requires `pyarrow`, and other files
+in the Chrome Trace Event Format, which can be viewed in chrome://tracing or Perfetto.
+""".strip(),
+    "chat_energy_events": """
+The file to dump the energy events to on exit, one "<event>.start <ns>" or "<event>.end <ns>"
+line per event with timestamps in nanoseconds since the Unix epoch, to be aligned with power logs.
+The events are "load_model", "unload_model", "prompt.system", "chat.<request>.prefill",
+"chat.<request>.decode.<step>", "chat.<request>.sample.<step>" and
+"chat.<request>.get_message.<step>", where <request> counts the prefills since the chat started,
+and <step> the decode steps of the request. Note that this differs from the previous
+"chat.<generation>.<sequence>.prefill" and "chat.<generation>.<sequence>.get_message" events,
+whose decode steps were overwritten by each other.
 """.strip(),
 }
@@ -1,6 +1,8 @@
 """Python entrypoint of benchmark."""
 from typing import Optional
 
+import tvm
+
 from mlc_chat.chat_module import ChatConfig, ChatModule
 
 from .chat import ChatConfigOverride
@@ -14,8 +16,12 @@ def bench(  # pylint: disable=too-many-arguments
     overrides: ChatConfigOverride,
     generate_length: int,
     model_lib_path: Optional[str],
+    num_threads: Optional[int] = None,
 ):
     """run the benchmarking"""
+    if num_threads is not None:
+        # Use `num_threads` threads on the big cores of the CPU thread pool.
+        tvm.get_global_func("runtime.config_threadpool")(1, num_threads)
     # Set up chat config
     config = ChatConfig(opt=opt)
     # Apply overrides
@@ -25,4 +31,6 @@ def bench(  # pylint: disable=too-many-arguments
 
     output = cm.benchmark_generate(prompt, generate_length=generate_length)
     print(f"Generated text:\n{output}\n")
+    if num_threads is not None:
+        print(f"Number of CPU threads: {num_threads}")
     print(f"Statistics:\n{cm.stats(verbose=True)}")
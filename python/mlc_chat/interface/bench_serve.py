@@ -0,0 +1,520 @@
+"""Python entrypoint of the open-loop serving benchmark."""
+
+import dataclasses
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from mlc_chat.support import logging
+from mlc_chat.support.style import bold
+
+logger = logging.getLogger(__name__)
+
+ARRIVAL_PROCESSES = ["poisson", "gamma", "trace"]
+ENDPOINTS = {
+    "chat": "/v1/chat/completions",
+    "completions": "/v1/completions",
+}
+PERCENTILES = [50, 90, 99]
+
+
+@dataclasses.dataclass
+class BenchRequest:
+    """A request in the benchmark workload."""
+
+    prompt: str
+    max_tokens: int
+    arrival_time: float = 0.0
+    """The arrival time (in seconds) relative to the benchmark start."""
+
+
+@dataclasses.dataclass
+class RequestRecord:  # pylint: disable=too-many-instance-attributes
+    """The timestamps and outcome of one benchmark request."""
+
+    request: BenchRequest
+    send_time: float = 0.0
+    token_times: List[float] = dataclasses.field(default_factory=list)
+    """The receiving time of each output chunk. Only recorded in streaming mode."""
+    end_time: float = 0.0
+    num_output_tokens: int = 0
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        """Whether the request finished without error."""
+        return self.error is None
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """The time to first token. None in non-streaming mode."""
+        if len(self.token_times) == 0:
+            return None
+        return self.token_times[0] - self.send_time
+
+    @property
+    def e2e_latency(self) -> float:
+        """The end-to-end latency."""
+        return self.end_time - self.send_time
+
+    @property
+    def tpot(self) -> Optional[float]:
+        """The average time per output token after the first token."""
+        if self.num_output_tokens <= 1:
+            return None
+        first_token_time = self.token_times[0] if len(self.token_times) > 0 else self.send_time
+        return (self.end_time - first_token_time) / (self.num_output_tokens - 1)
+
+    @property
+    def itls(self) -> List[float]:
+        """The inter-token latencies between consecutive output chunks."""
+        return [t1 - t0 for t0, t1 in zip(self.token_times[:-1], self.token_times[1:])]
+
+
+@dataclasses.dataclass
+class SLO:
+    """The service level objectives of a request. None means unconstrained."""
+
+    ttft: Optional[float] = None
+    tpot: Optional[float] = None
+    e2e_latency: Optional[float] = None
+
+    def is_met(self, record: RequestRecord) -> bool:
+        """Check if the request record meets all the objectives."""
+        if not record.success:
+            return False
+        for name in ["ttft", "tpot", "e2e_latency"]:
+            objective = getattr(self, name)
+            value = getattr(record, name)
+            if objective is not None and value is not None and value > objective:
+                return False
+        return True
+
+
+################ Workload ################
+
+
+def load_trace(path: Path) -> List[BenchRequest]:
+    """Load the requests from a JSON Lines trace file. Each line is an object with
+    "prompt", "max_tokens" and an optional "timestamp" of the recorded arrival (in seconds).
+    """
+    requests = []
+    with open(path, "r", encoding="utf-8") as i_f:
+        for line in i_f:
+            if line.strip() == "":
+                continue
+            entry = json.loads(line)
+            requests.append(
+                BenchRequest(
+                    prompt=entry["prompt"],
+                    max_tokens=int(entry["max_tokens"]),
+                    arrival_time=float(entry.get("timestamp", 0.0)),
+                )
+            )
+    if len(requests) > 0:
+        start_time = min(request.arrival_time for request in requests)
+        for request in requests:
+            request.arrival_time -= start_time
+    return requests
+
+
+def synthesize_requests(
+    num_requests: int, input_len: int, output_len: int, seed: int
+) -> List[BenchRequest]:
+    """Synthesize requests whose prompts consist of `input_len` random words."""
+    rng = random.Random(seed)
+    words = ["the", "of", "and", "model", "language", "serve", "token", "cache", "batch", "light"]
+    return [
+        BenchRequest(
+            prompt=" ".join(rng.choice(words) for _ in range(input_len)),
+            max_tokens=output_len,
+        )
+        for _ in range(num_requests)
+    ]
+
+
+def assign_arrival_times(
+    requests: List[BenchRequest],
+    request_rate: float,
+    process: str,
+    burstiness: float = 1.0,
+    seed: int = 0,
+) -> List[BenchRequest]:
+    """Assign the arrival times of requests.
+
+    Parameters
+    ----------
+    requests : List[BenchRequest]
+        The requests to assign arrival times to.
+
+    request_rate : float
+        The average number of requests per second. The requests all arrive at
+        the beginning when it is infinite. Ignored by the "trace" process.
+
+    process : str
+        The arrival process. "poisson" draws exponential inter-arrival times,
+        "gamma" draws gamma inter-arrival times whose shape is `burstiness`,
+        and "trace" keeps the recorded arrival times of requests.
+
+    burstiness : float
+        The shape of the gamma distribution. Values below 1 produce burstier
+        arrivals than Poisson, and values above 1 produce more uniform arrivals.
+
+    seed : int
+        The random seed.
+
+    Returns
+    -------
+    requests : List[BenchRequest]
+        The requests with arrival times, sorted by arrival time.
+    """
+    if process not in ARRIVAL_PROCESSES:
+        raise ValueError(f"Unknown arrival process {process}. Choices: {ARRIVAL_PROCESSES}")
+    requests = [dataclasses.replace(request) for request in requests]
+    if process != "trace":
+        rng = np.random.default_rng(seed)
+        if math.isinf(request_rate):
+            intervals = np.zeros(len(requests))
+        elif process == "poisson":
+            intervals = rng.exponential(1.0 / request_rate, size=len(requests))
+        else:
+            assert burstiness > 0, "The burstiness is expected to be positive."
+            intervals = rng.gamma(burstiness, 1.0 / (request_rate * burstiness), len(requests))
+        # The first request arrives at the beginning.
+        arrival_times = np.cumsum(intervals) - intervals[0] if len(requests) > 0 else []
+        for request, arrival_time in zip(requests, arrival_times):
+            request.arrival_time = float(arrival_time)
+    return sorted(requests, key=lambda request: request.arrival_time)
+
+
+################ Clients ################
+
+
+class OpenAIClient:  # pylint: disable=too-few-public-methods
+    """The client that sends requests to the OpenAI API-compatible endpoints of
+    `mlc_chat.serve.server`.
+
+    Parameters
+    ----------
+    url : str
+        The base URL of the server, e.g., "http://127.0.0.1:8000".
+
+    model : str
+        The served model name to request.
+
+    endpoint : str
+        The endpoint to benchmark, either "chat" or "completions".
+
+    stream : bool
+        Whether to request streaming responses.
+
+    timeout : Optional[float]
+        The timeout (in seconds) of each request.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        model: str,
+        endpoint: str = "chat",
+        stream: bool = True,
+        timeout: Optional[float] = None,
+    ) -> None:
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {endpoint}. Choices: {list(ENDPOINTS.keys())}")
+        self.url = url.rstrip("/") + ENDPOINTS[endpoint]
+        self.model = model
+        self.endpoint = endpoint
+        self.stream = stream
+        self.timeout = timeout
+
+    def send(self, request: BenchRequest, record: RequestRecord) -> None:
+        """Send the request and fill the record."""
+        import requests  # pylint: disable=import-outside-toplevel
+
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "max_tokens": request.max_tokens,
+            "stream": self.stream,
+            # Generate exactly `max_tokens` tokens, so that the workload is reproducible.
+            "ignore_eos": True,
+        }
+        if self.endpoint == "chat":
+            payload["messages"] = [{"role": "user", "content": request.prompt}]
+        else:
+            payload["prompt"] = request.prompt
+
+        with requests.post(
+            self.url, json=payload, stream=self.stream, timeout=self.timeout
+        ) as response:
+            if response.status_code != 200:
+                record.error = f"HTTP {response.status_code}: {response.text}"
+                record.end_time = time.perf_counter()
+                return
+            if not self.stream:
+                usage = response.json()["usage"]
+                record.num_output_tokens = usage["completion_tokens"]
+                record.end_time = time.perf_counter()
+                return
+            for line in response.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                data = line[len(b"data: ") :]
+                if data == b"[DONE]":
+                    break
+                record.token_times.append(time.perf_counter())
+                chunk = json.loads(data)
+                usage = chunk.get("usage", None)
+                if usage is not None:
+                    record.num_output_tokens = usage["completion_tokens"]
+                else:
+                    # The chat stream response does not carry the usage, and each
+                    # chunk carries the delta text of at least one token.
+                    record.num_output_tokens += 1
+            record.end_time = time.perf_counter()
+
+
+class StubEngineClient:  # pylint: disable=too-few-public-methods
+    """The client that fakes the latency of a server with sleeps instead of
+    sending requests, so that the benchmark itself can run without a server or GPU.
+
+    Each request sleeps `prefill_time_per_token` per prompt word, and then
+    sleeps once for each output token, for `decode_step_time` plus
+    `decode_time_per_request` for every request in flight at that time. The
+    requests sleep independently, so decode steps are not shared across
+    requests, and there is no request queueing or KV cache capacity limit.
+
+    Parameters
+    ----------
+    prefill_time_per_token : float
+        The simulated prefill time (in seconds) of each prompt token.
+
+    decode_step_time : float
+        The simulated base time (in seconds) of a decode step.
+
+    decode_time_per_request : float
+        The simulated extra decode step time (in seconds) of each running request.
+
+    stream : bool
+        Whether to record the timestamps of each output token.
+    """
+
+    def __init__(
+        self,
+        prefill_time_per_token: float = 1e-5,
+        decode_step_time: float = 1e-3,
+        decode_time_per_request: float = 1e-4,
+        stream: bool = True,
+    ) -> None:
+        self.prefill_time_per_token = prefill_time_per_token
+        self.decode_step_time = decode_step_time
+        self.decode_time_per_request = decode_time_per_request
+        self.stream = stream
+        self._lock = threading.Lock()
+        self._num_running = 0
+
+    def send(self, request: BenchRequest, record: RequestRecord) -> None:
+        """Simulate the request and fill the record."""
+        with self._lock:
+            self._num_running += 1
+        try:
+            time.sleep(self.prefill_time_per_token * len(request.prompt.split()))
+            for _ in range(request.max_tokens):
+                if self.stream:
+                    record.token_times.append(time.perf_counter())
+                record.num_output_tokens += 1
+                with self._lock:
+                    num_running = self._num_running
+                time.sleep(self.decode_step_time + self.decode_time_per_request * num_running)
+        finally:
+            with self._lock:
+                self._num_running -= 1
+        record.end_time = time.perf_counter()
+
+
+################ Benchmark ################
+
+
+def run_benchmark(
+    client: Any, requests: List[BenchRequest], max_concurrency: int = 256
+) -> Tuple[List[RequestRecord], float]:
+    """Replay the requests against the client in an open loop. Each request is sent
+    at its arrival time regardless of the completion of earlier requests.
+
+    Parameters
+    ----------
+    client : Any
+        The client with a `send(request, record)` method, e.g., OpenAIClient.
+
+    requests : List[BenchRequest]
+        The requests sorted by arrival time.
+
+    max_concurrency : int
+        The maximum number of in-flight requests. Requests arriving when the
+        limit is reached are queued, and the queueing time counts into latency.
+
+    Returns
+    -------
+    records : List[RequestRecord]
+        The record of each request.
+
+    duration : float
+        The benchmark duration in seconds.
+    """
+    records = [RequestRecord(request=request) for request in requests]
+
+    def _send(record: RequestRecord) -> None:
+        try:
+            client.send(record.request, record)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            record.error = f"{type(err).__name__}: {err}"
+            record.end_time = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        start_time = time.perf_counter()
+        for record in records:
+            # The latency is measured from the scheduled arrival time, so that
+            # the delay of a saturated client is not hidden.
+            record.send_time = start_time + record.request.arrival_time
+            delay = record.send_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(_send, record)
+    duration = max((record.end_time for record in records), default=start_time) - start_time
+    return records, duration
+
+
+def _percentile_metrics(name: str, values: Sequence[float]) -> Dict[str, float]:
+    if len(values) == 0:
+        return {}
+    metrics = {f"{name}_mean": float(np.mean(values))}
+    for percentile in PERCENTILES:
+        metrics[f"{name}_p{percentile}"] = float(np.percentile(values, percentile))
+    return metrics
+
+
+def compute_metrics(records: List[RequestRecord], duration: float, slo: SLO) -> Dict[str, float]:
+    """Compute the throughput, latency percentiles and goodput of the benchmark.
+
+    Parameters
+    ----------
+    records : List[RequestRecord]
+        The records of the benchmark requests.
+
+    duration : float
+        The benchmark duration in seconds.
+
+    slo : SLO
+        The service level objectives for goodput.
+
+    Returns
+    -------
+    metrics : Dict[str, float]
+        The metrics, including request and output token throughput, the
+        goodput (the number of requests per second that meet the SLO), the
+        SLO attainment, and the mean and percentiles of TTFT, inter-token
+        latency (ITL), time per output token (TPOT) and end-to-end latency.
+        TTFT and ITL are only available in streaming mode.
+    """
+    succeeded = [record for record in records if record.success]
+    num_slo_met = sum(1 for record in succeeded if slo.is_met(record))
+    duration = max(duration, 1e-9)
+    metrics: Dict[str, float] = {
+        "num_requests": len(records),
+        "num_failed_requests": len(records) - len(succeeded),
+        "duration": duration,
+        "request_throughput": len(succeeded) / duration,
+        "output_token_throughput": sum(r.num_output_tokens for r in succeeded) / duration,
+        "goodput": num_slo_met / duration,
+        "slo_attainment": num_slo_met / len(records) if len(records) > 0 else 0.0,
+    }
+    metrics.update(_percentile_metrics("ttft", [r.ttft for r in succeeded if r.ttft is not None]))
+    metrics.update(_percentile_metrics("itl", [itl for r in succeeded for itl in r.itls]))
+    metrics.update(_percentile_metrics("tpot", [r.tpot for r in succeeded if r.tpot is not None]))
+    metrics.update(_percentile_metrics("e2e_latency", [r.e2e_latency for r in succeeded]))
+    return metrics
+
+
+def format_report(results: List[Tuple[float, Dict[str, float]]]) -> str:
+    """Format the throughput-latency curve, one row for each request rate."""
+
+    def _ms(metrics: Dict[str, float], key: str) -> str:
+        return f"{metrics[key] * 1000:.1f}" if key in metrics else "-"
+
+    out = StringIO()
+    header = (
+        f"{'rate':>8} {'req/s':>8} {'tok/s':>9} {'goodput':>8} {'slo%':>6} "
+        f"{'ttft p50':>9} {'ttft p99':>9} {'itl p50':>8} {'itl p99':>8} "
+        f"{'e2e p50':>9} {'e2e p99':>9} {'failed':>6}"
+    )
+    print(bold("Throughput-latency curve (latency in ms):"), file=out)
+    print(header, file=out)
+    for request_rate, metrics in results:
+        print(
+            f"{request_rate:>8.2f} {metrics['request_throughput']:>8.2f} "
+            f"{metrics['output_token_throughput']:>9.1f} {metrics['goodput']:>8.2f} "
+            f"{metrics['slo_attainment'] * 100:>6.1f} "
+            f"{_ms(metrics, 'ttft_p50'):>9} {_ms(metrics, 'ttft_p99'):>9} "
+            f"{_ms(metrics, 'itl_p50'):>8} {_ms(metrics, 'itl_p99'):>8} "
+            f"{_ms(metrics, 'e2e_latency_p50'):>9} {_ms(metrics, 'e2e_latency_p99'):>9} "
+            f"{int(metrics['num_failed_requests']):>6}",
+            file=out,
+        )
+    return out.getvalue().rstrip()
+
+
+def bench_serve(  # pylint: disable=too-many-arguments,too-many-locals
+    client: Any,
+    requests: List[BenchRequest],
+    request_rates: List[float],
+    arrival_process: str,
+    burstiness: float,
+    max_concurrency: int,
+    slo: SLO,
+    seed: int,
+    output: Optional[Path] = None,
+) -> List[Tuple[float, Dict[str, float]]]:
+    """Run the benchmark at each request rate and report the throughput-latency curve.
+
+    Returns
+    -------
+    results : List[Tuple[float, Dict[str, float]]]
+        The request rate and the metrics of each run.
+    """
+    results = []
+    for request_rate in request_rates:
+        workload = assign_arrival_times(requests, request_rate, arrival_process, burstiness, seed)
+        logger.info(
+            "Benchmarking %d requests at request rate %s (%s arrival)",
+            len(workload),
+            request_rate,
+            arrival_process,
+        )
+        records, duration = run_benchmark(client, workload, max_concurrency)
+        results.append((request_rate, compute_metrics(records, duration, slo)))
+        if arrival_process == "trace":
+            # The request rate does not affect the recorded arrivals.
+            break
+    print(format_report(results))
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as o_f:
+            # The infinite request rate is saved as "inf", since JSON has no infinity.
+            json.dump(
+                [
+                    {"request_rate": rate if math.isfinite(rate) else str(rate), **metrics}
+                    for rate, metrics in results
+                ],
+                o_f,
+                indent=2,
+                allow_nan=False,
+            )
+        logger.info("Benchmark results saved to %s", output)
+    return results
@@ -0,0 +1,109 @@
+"""Python entrypoint of managing the cache of JIT-compiled model libraries."""
+import dataclasses
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from mlc_chat.support import logging
+from mlc_chat.support.style import bold, green, red
+
+from . import jit
+from .compiler_flags import ModelConfigOverride
+
+logger = logging.getLogger(__name__)
+
+
+def cache_ls() -> None:
+    """List the cached model libraries, most recently used first."""
+    entries = jit.get_model_lib_cache().entries()
+    total_nbytes = 0
+    for entry in entries:
+        total_nbytes += entry.nbytes
+        key = entry.key
+        print(
+            f"{entry.hash_value}  {entry.nbytes / (1 << 20):8.2f} MB  "
+            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.last_access))}  "
+            f"{key.get('model_type', '?')}  {key.get('quantization', '?')}  "
+            f"{key.get('device', '?')}  {key.get('overrides', '?')}"
+        )
+    print(
+        f"{len(entries)} model libs, {total_nbytes / (1 << 30):.2f} GB in total, "
+        f"under {bold(str(jit.get_model_lib_cache().cache_dir))}"
+    )
+
+
+def cache_prune(max_size_gb: float, dry_run: bool = False) -> None:
+    """Evict least recently used model libraries until the cache fits in `max_size_gb`."""
+    evicted = jit.get_model_lib_cache().prune(max_size_gb, dry_run=dry_run)
+    print(
+        f"{'Would evict' if dry_run else 'Evicted'} {len(evicted)} model libs, "
+        f"{sum(entry.nbytes for entry in evicted) / (1 << 30):.2f} GB in total"
+    )
+
+
+def cache_warm(
+    models: List[str],
+    devices: List[str],
+    overrides: List[str],
+    opt: Optional[str] = None,
+    num_jobs: int = 1,
+) -> None:
+    """Compile the model libraries of every (model, device, overrides) combination into the
+    cache ahead of time, so that engines started later find them without JIT.
+
+    Parameters
+    ----------
+    models : List[str]
+        The models, each of which is a model directory or a URL as accepted by `ChatModule`.
+
+    devices : List[str]
+        The devices to compile for, such as "cuda:0". They do not need to exist locally.
+
+    overrides : List[str]
+        The model config overrides in the format of `--overrides` of compilation, where an
+        empty string denotes the configuration in `mlc-chat-config.json`.
+
+    opt : Optional[str]
+        The optimization flags, which default to O2 as JIT does.
+
+    num_jobs : int
+        The number of libraries compiled in parallel.
+    """
+    matrix = list(itertools.product(models, devices, overrides))
+    logger.info("Warming up %d model libs", len(matrix))
+
+    def _warm(item: Tuple[str, str, str]) -> Path:
+        model, device, override = item
+        # pylint: disable=import-outside-toplevel
+        from mlc_chat.chat_module import ChatConfig, _get_chat_config, _get_model_path
+
+        # pylint: enable=import-outside-toplevel
+
+        # Resolve the chat config the same way as `ChatModule` and the serving engine do, so
+        # that the libraries are found by their JIT lookups.
+        model_path, config_file_path = _get_model_path(model)
+        user_chat_config = ChatConfig(
+            opt=opt, **dataclasses.asdict(ModelConfigOverride.from_str(override))
+        )
+        chat_config = _get_chat_config(config_file_path, user_chat_config)
+        return jit.jit(
+            model_path=Path(model_path),
+            chat_config=dataclasses.asdict(chat_config),
+            device=device,
+        )
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=num_jobs) as executor:
+        futures = [executor.submit(_warm, item) for item in matrix]
+        for item, future in zip(matrix, futures):
+            try:
+                lib_path = future.result()
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                logger.error("%s %s: %s", red("Failed"), item, error)
+                failures.append(item)
+                continue
+            logger.info("%s %s: %s", green("Warmed"), item, lib_path)
+    if failures:
+        raise RuntimeError(f"Failed to compile {len(failures)} model libs: {failures}")
@@ -11,6 +11,7 @@ from mlc_chat.callback import StreamToStdout
 from mlc_chat.chat_module import ChatConfig, ChatModule, GenerationConfig
 from mlc_chat.support import argparse
 from mlc_chat.support.config import ConfigOverrideBase
+from mlc_chat.support.timeline_recorder import TimelineRecorder
 
 
 @dataclasses.dataclass
@@ -95,6 +96,7 @@ def _print_help_str():
   /help               print the special commands
   /exit               quit the cli
   /stats              print out the latest stats (token/sec)
+  /timeline           print out the latency summary of the recent timeline
   /reset              restart a fresh chat
   /set [overrides]    override settings in the generation config. For example,
                       `/set temperature=0.5;max_gen_len=100;stop=end,stop`
@@ -125,6 +127,7 @@ def chat(
     overrides: ChatConfigOverride,
     model_lib_path: Optional[str],
     energy_events_filename: str,
+    timeline_filename: Optional[str] = None,
 ):
     """chat with a model."""
     # Set up chat config and generate config
@@ -133,7 +136,24 @@ def chat(
     # Apply overrides
     config = overrides.apply(config)
     # Set up ChatModule
-    cm = ChatModule(model, device, chat_config=config, model_lib_path=model_lib_path)
+    recorder = TimelineRecorder()
+    cm = ChatModule(
+        model,
+        device,
+        chat_config=config,
+        model_lib_path=model_lib_path,
+        timeline_recorder=recorder,
+    )
+    try:
+        _chat_loop(cm, generate_config)
+    finally:
+        # Dump the timeline also when the chat is interrupted.
+        recorder.dump_energy_events(energy_events_filename)
+        if timeline_filename is not None:
+            recorder.dump(timeline_filename)
+
+
+def _chat_loop(cm: ChatModule, generate_config: GenerationConfig) -> None:
     _print_help_str()
     cm._process_system_prompts()  # pylint: disable=protected-access
 
@@ -149,10 +169,9 @@ def chat(
         if prompt[:6] == "/reset":
             cm.reset_chat()
         elif prompt[:5] == "/exit":
-            with open(energy_events_filename, 'w', encoding='utf-8') as f:
-                for event_key, event_value in cm.energy_events.items():
-                    f.write(f"{event_key} {event_value}\n")
             break
+        elif prompt[:9] == "/timeline":
+            print(json.dumps(cm.timeline_recorder.summary(), indent=4), flush=True)
         elif prompt[:6] == "/stats":
             # print(cm.stats(verbose=True), flush=True)
             # ----------- prefill -----------
@@ -13,11 +13,11 @@ from tvm.target import Target
 
 from mlc_chat import compiler_pass as _
 from mlc_chat import op as op_ext
-from mlc_chat.cli.model_metadata import _report_memory_usage
 from mlc_chat.model import Model
 from mlc_chat.quantization import Quantization
 from mlc_chat.support import logging
 from mlc_chat.support.config import ConfigBase
+from mlc_chat.support.model_metadata import report_memory_usage
 from mlc_chat.support.style import bold
 
 from .compiler_flags import ModelConfigOverride, OptimizationFlags
@@ -39,6 +39,7 @@ class CompileArgs:  # pylint: disable=too-many-instance-attributes
     output: Path
     overrides: ModelConfigOverride
     debug_dump: Optional[Path]
+    tuning_database: Optional[Path] = None
 
     def __post_init__(self) -> None:
         self.opt.update(self.target, self.quantization)
@@ -55,6 +56,7 @@ class CompileArgs:  # pylint: disable=too-many-instance-attributes
         print(f"  {bold('--system-lib-prefix'):<25} \"{self.system_lib_prefix}\"", file=out)
         print(f"  {bold('--output'):<25} {self.output}", file=out)
         print(f"  {bold('--overrides'):<25} {self.overrides}", file=out)
+        print(f"  {bold('--tuning-database'):<25} {self.tuning_database}", file=out)
         # As it's debug only, no need to display
         # print(f"  {bold('--debug-dump'):<25} {self.debug_dump}", file=out)
         print(out.getvalue().rstrip())
@@ -170,6 +172,7 @@ def _compile(args: CompileArgs, model_config: ConfigBase):
             "prefill_chunk_size": model_config.prefill_chunk_size,  # type: ignore
             "tensor_parallel_shards": model_config.tensor_parallel_shards,  # type: ignore
             "kv_cache_bytes": kv_cache_bytes,
+            "kv_cache_dtype": args.quantization.model_dtype,
         }
         logger.info("Registering metadata: %s", metadata)
         metadata["params"] = [_get_param_metadata(name, param) for name, param in named_params]
@@ -188,9 +191,10 @@ def _compile(args: CompileArgs, model_config: ConfigBase):
                     ext_mods=ext_mods,
                     metadata=metadata,
                     debug_dump=args.debug_dump,
+                    tuning_database=args.tuning_database,
                 ),
             )
-        _report_memory_usage(metadata=metadata, config=model_config)
+        report_memory_usage(metadata=metadata, config=model_config)
     logger.info("Generated: %s", bold(str(args.output)))
 
 
@@ -205,6 +209,7 @@ def compile(  # pylint: disable=too-many-arguments,redefined-builtin
     output: Path,
     overrides: ModelConfigOverride,
     debug_dump: Optional[Path] = None,
+    tuning_database: Optional[Path] = None,
 ):
     """Compile a model given its configuration and quantization format to a specific target."""
     if "model_config" in config:
@@ -225,6 +230,7 @@ def compile(  # pylint: disable=too-many-arguments,redefined-builtin
         output,
         overrides,
         debug_dump,
+        tuning_database,
     )
     args.display()
     _compile(args, model_config)
@@ -5,10 +5,10 @@ import math
 import os
 from io import StringIO
 from pathlib import Path
+from typing import Optional, Set
 
 import numpy as np
 from tvm import tir
-from tvm.contrib import tvmjs
 from tvm.runtime import Device, NDArray
 from tvm.runtime import cpu as cpu_device
 from tvm.target import Target
@@ -17,6 +17,7 @@ from mlc_chat.loader import LOADER
 from mlc_chat.model import Model
 from mlc_chat.quantization import Quantization
 from mlc_chat.support import logging, tqdm
+from mlc_chat.support.ndarray_cache import NDArrayCacheWriter
 from mlc_chat.support.preshard import apply_preshard
 from mlc_chat.support.style import bold, green
 
@@ -34,6 +35,8 @@ class ConversionArgs:  # pylint: disable=too-many-instance-attributes
     source: Path
     source_format: str
     output: Path
+    num_workers: int = 1
+    max_memory_gb: Optional[float] = None
 
     def display(self) -> None:
         """Display the arguments to stdout."""
@@ -50,6 +53,8 @@ class ConversionArgs:  # pylint: disable=too-many-instance-attributes
         print(f"  {bold('--source'):<25} {self.source}", file=out)
         print(f"  {bold('--source-format'):<25} {self.source_format}", file=out)
         print(f"  {bold('--output'):<25} {self.output}", file=out)
+        print(f"  {bold('--num-workers'):<25} {self.num_workers}", file=out)
+        print(f"  {bold('--max-memory-gb'):<25} {self.max_memory_gb}", file=out)
         print(out.getvalue().rstrip())
 
 
@@ -83,7 +88,7 @@ def _convert_args(args: ConversionArgs) -> None:  # pylint: disable=too-many-loc
         nonlocal named_params
         if name not in named_params:
             raise ValueError(f"Parameter not found in model: {name}")
-        if name in param_dict:
+        if name in param_names:
             raise ValueError(f"Duplication: Parameter {name} already computed")
 
         # Check shape (possibly dynamic)
@@ -111,19 +116,23 @@ def _convert_args(args: ConversionArgs) -> None:  # pylint: disable=too-many-loc
             )
         del named_params[name]
 
-    # load and quantize
-    param_dict = {}
+    # load, quantize and stream the parameters to the output directory
+    param_names: Set[str] = set()
     total_bytes = 0.0
+    writer = NDArrayCacheWriter(args.output, encode_format="f32-to-bf16")
     with Target.from_device(args.device), tqdm.redirect():
         loader = LOADER[args.source_format](
             path=args.source,
             extern_param_map=args.model.source[args.source_format](model_config, args.quantization),
             quantize_param_map=quantize_map,
+            num_workers=args.num_workers,
+            memory_budget_gb=args.max_memory_gb,
         )
         for name, param in loader.load(device=args.device, preshard_funcs=preshard_funcs):
             _check_param(name, param)
+            param_names.add(name)
             param = param.copyto(cpu_device())
-            param_dict[name] = param
+            writer.add(name, param)
             total_bytes += math.prod(param.shape) * np.dtype(param.dtype).itemsize
     total_params = loader.stats.total_param_num
     if named_params:
@@ -140,16 +149,12 @@ def _convert_args(args: ConversionArgs) -> None:  # pylint: disable=too-many-loc
         green("Bits per parameter"),
         total_bytes * 8.0 / total_params,
     )
-    # dump to output directory
-    tvmjs.dump_ndarray_cache(
-        param_dict,
-        str(args.output),
+    writer.finish(
         meta_data={
-            "ParamSize": len(param_dict),
+            "ParamSize": len(param_names),
             "ParamBytes": total_bytes,
             "BitsPerParam": total_bytes * 8.0 / total_params,
         },
-        encode_format="f32-to-bf16",
     )
     logger.info("Saved to directory: %s", bold(str(args.output)))
 
@@ -162,8 +167,20 @@ def convert_weight(  # pylint: disable=too-many-arguments
     source: Path,
     source_format: str,
     output: Path,
+    num_workers: int = 1,
+    max_memory_gb: Optional[float] = None,
 ):
     """MLC LLM's weight conversation and quantization flow."""
-    args = ConversionArgs(config, quantization, model, device, source, source_format, output)
+    args = ConversionArgs(
+        config,
+        quantization,
+        model,
+        device,
+        source,
+        source_format,
+        output,
+        num_workers,
+        max_memory_gb,
+    )
     args.display()
     _convert_args(args)
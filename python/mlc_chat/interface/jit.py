@@ -1,15 +1,11 @@
 """Just-in-time compilation of MLC-Chat models."""
 import dataclasses
-import hashlib
 import json
-import os
 import shlex
-import shutil
 import subprocess
 import sys
-import tempfile
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Union
 
 from tvm.runtime import Device
 
@@ -20,8 +16,9 @@ from mlc_chat.support.constants import (
     MLC_CACHE_DIR,
     MLC_DSO_SUFFIX,
     MLC_JIT_POLICY,
-    MLC_TEMP_DIR,
+    MLC_MODEL_LIB_CACHE_MAX_GB,
 )
+from mlc_chat.support.model_lib_cache import ModelLibCache
 from mlc_chat.support.style import blue, bold
 
 from .compiler_flags import ModelConfigOverride, OptimizationFlags
@@ -29,8 +26,18 @@ from .compiler_flags import ModelConfigOverride, OptimizationFlags
 logger = logging.getLogger(__name__)
 
 
-def jit(model_path: Path, chat_config: Dict[str, Any], device: Device) -> Path:
-    """Just-in-time compile a MLC-Chat model."""
+def get_model_lib_cache() -> ModelLibCache:
+    """The cache of model libraries compiled by JIT."""
+    return ModelLibCache(MLC_CACHE_DIR / "model_lib", max_size_gb=MLC_MODEL_LIB_CACHE_MAX_GB)
+
+
+def jit(model_path: Path, chat_config: Dict[str, Any], device: Union[Device, str]) -> Path:
+    """Just-in-time compile a MLC-Chat model.
+
+    The compiled library is cached under `MLC_CACHE_DIR`, and shared by all processes. A device
+    string such as "cuda:0" is accepted as well, so that libraries can be compiled ahead of time
+    on machines without the device.
+    """
     logger.info(
         "%s = %s. Can be one of: ON, OFF, REDO, READONLY",
         bold("MLC_JIT_POLICY"),
@@ -72,57 +79,51 @@ def jit(model_path: Path, chat_config: Dict[str, Any], device: Device) -> Path:
                 model_config[field.name] = value
         return MODELS[model_type].config.from_dict(model_config).asdict()
 
-    def _run_jit(opt: str, overrides: str, device: str, dst: str):
-        with tempfile.TemporaryDirectory(dir=MLC_TEMP_DIR) as tmp_dir:
-            dso_path = os.path.join(tmp_dir, f"lib.{MLC_DSO_SUFFIX}")
-            cmd = [
-                sys.executable,
-                "-m",
-                "mlc_chat",
-                "compile",
-                str(model_path),
-                "--opt",
-                opt,
-                "--overrides",
-                overrides,
-                "--device",
-                device,
-                "--output",
-                dso_path,
-            ]
-            logger.info("Compiling using commands below:")
-            logger.info("%s", blue(shlex.join(cmd)))
-            subprocess.run(cmd, check=True)
-            shutil.move(dso_path, dst)
-            logger.info("Using compiled model lib: %s", bold(dst))
+    def _run_jit(opt: str, overrides: str, device: str, dst: Path):
+        cmd = [
+            sys.executable,
+            "-m",
+            "mlc_chat",
+            "compile",
+            str(model_path),
+            "--opt",
+            opt,
+            "--overrides",
+            overrides,
+            "--device",
+            device,
+            "--output",
+            str(dst),
+        ]
+        logger.info("Compiling using commands below:")
+        logger.info("%s", blue(shlex.join(cmd)))
+        subprocess.run(cmd, check=True)
 
     hash_key = {
         "model_config": _get_model_config(),
         "overrides": _get_overrides(),
         "opt": _get_optimization_flags(),
-        "device": device2str(device),
+        "device": device if isinstance(device, str) else device2str(device),
         "model_type": model_type,
         "quantization": quantization,
     }
-    hash_value = hashlib.md5(
-        json.dumps(
-            hash_key,
-            sort_keys=True,
-            indent=2,
-        ).encode("utf-8")
-    ).hexdigest()
-    dst = MLC_CACHE_DIR / "model_lib" / f"{hash_value}.so"
-    if dst.is_file() and MLC_JIT_POLICY in ["ON", "READONLY"]:
-        logger.info("Using cached model lib: %s", bold(str(dst)))
-        return dst
+    cache = get_model_lib_cache()
     if MLC_JIT_POLICY == "READONLY":
-        raise RuntimeError(
-            "No cached model lib found, and JIT is disabled by MLC_JIT_POLICY=READONLY"
+        dst = cache.lookup(hash_key)
+        if dst is None:
+            raise RuntimeError(
+                "No cached model lib found, and JIT is disabled by MLC_JIT_POLICY=READONLY"
+            )
+    else:
+        dst = cache.get_or_compile(
+            hash_key,
+            lambda dst: _run_jit(
+                opt=hash_key["opt"],
+                overrides=hash_key["overrides"],
+                device=hash_key["device"],
+                dst=dst,
+            ),
+            force_redo=MLC_JIT_POLICY == "REDO",
         )
-    _run_jit(
-        opt=hash_key["opt"],
-        overrides=hash_key["overrides"],
-        device=hash_key["device"],
-        dst=str(dst),
-    )
+    logger.info("Using compiled model lib: %s", bold(str(dst)))
     return dst
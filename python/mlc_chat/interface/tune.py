@@ -0,0 +1,163 @@
+"""Python entrypoint of kernel tuning."""
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import tvm
+from tvm import IRModule
+from tvm import meta_schedule as ms
+from tvm import tir
+from tvm.ir.transform import Pass
+from tvm.target import Target
+
+from mlc_chat.model import Model
+from mlc_chat.quantization import Quantization
+from mlc_chat.support import logging
+from mlc_chat.support.style import bold
+from mlc_chat.support.tuning_database import create_tuning_database
+
+from .compile import CompileArgs, compile  # pylint: disable=redefined-builtin
+from .compiler_flags import ModelConfigOverride, OptimizationFlags
+
+logger = logging.getLogger(__name__)
+
+
+@tvm.instrument.pass_instrument
+class _CaptureModuleBeforeDispatch:
+    """Capture the module right before the tuned kernels are dispatched, whose TIR functions
+    are the ones that the tuning database is matched against in compilation."""
+
+    def __init__(self) -> None:
+        self.mod: Optional[IRModule] = None
+
+    def run_before_pass(self, mod: IRModule, info: tvm.transform.PassInfo) -> None:
+        """Capture the module before `DispatchTunedKernels`."""
+        if info.name == "DispatchTunedKernels":
+            self.mod = mod
+
+
+def _has_static_shapes(func: tir.PrimFunc) -> bool:
+    """Whether all the buffers of the function have static shapes. MetaSchedule measures
+    the candidates with concrete inputs, and the tuned kernels are dispatched by the
+    structural hash of the function, so only functions with static shapes are tuned."""
+    return all(
+        all(isinstance(dim, tir.IntImm) for dim in buffer.shape)
+        for buffer in func.buffer_map.values()
+    )
+
+
+def _is_hot(func: tir.PrimFunc) -> bool:
+    """Whether the function is worth tuning. It has to have static shapes and a reduction,
+    as the (dequantize-)matmul and GEMV kernels of single-sequence `decode` that dominate
+    the run time of the chat module.
+
+    Kernels of `prefill`, `batch_prefill` and `batch_decode` have a dynamic sequence length
+    or batch size, so they are not tuned and keep the default schedules. Tuning them at
+    representative sizes would not help either, since a kernel specialized to a size does
+    not match the dynamic function in the database."""
+    if func.attrs is not None and "tir.is_scheduled" in func.attrs:
+        return False
+    if not _has_static_shapes(func):
+        return False
+    has_reduction = False
+
+    def _visit(node) -> None:
+        nonlocal has_reduction
+        if isinstance(node, tir.Block) and any(
+            iter_var.iter_type == tir.IterVar.CommReduce for iter_var in node.iter_vars
+        ):
+            has_reduction = True
+
+    tir.stmt_functor.post_order_visit(func.body, _visit)
+    return has_reduction
+
+
+def _is_tuned(database: ms.Database, mod: IRModule) -> bool:
+    return database.has_workload(mod) and bool(
+        database.get_top_k(database.commit_workload(mod), top_k=1)
+    )
+
+
+def _tune(
+    mod: IRModule,
+    args: CompileArgs,
+    pipeline: Pass,
+    num_trials: int,
+    num_trials_per_task: int,
+) -> None:
+    capture = _CaptureModuleBeforeDispatch()
+    # Capture in a nested context, so that the instruments of the ambient one are kept.
+    ctx = tvm.transform.PassContext.current()
+    with tvm.transform.PassContext(
+        opt_level=ctx.opt_level,
+        required_pass=list(ctx.required_pass),
+        disabled_pass=list(ctx.disabled_pass),
+        instruments=[capture],
+        config=ctx.config,
+    ):
+        pipeline(mod)
+    assert capture.mod is not None, "DispatchTunedKernels is not in the pipeline"
+
+    database = create_tuning_database(args.output, args.target)
+    extracted_tasks = ms.relax_integration.extract_tasks(capture.mod, args.target)
+    hot_tasks = [task for task in extracted_tasks if _is_hot(task.mod["main"])]
+    tasks = [task for task in hot_tasks if not _is_tuned(database, task.mod)]
+    num_dynamic = sum(not _has_static_shapes(task.mod["main"]) for task in extracted_tasks)
+    logger.info(
+        "Skipping %d kernels with dynamic shapes, e.g. those of prefill and batch_decode, "
+        "which keep the default schedules",
+        num_dynamic,
+    )
+    logger.info(
+        "Found %d kernels to tune out of %d kernels, %d of which are already tuned in %s",
+        len(hot_tasks),
+        len(extracted_tasks),
+        len(hot_tasks) - len(tasks),
+        bold(str(args.output)),
+    )
+    if not tasks:
+        return
+    for task in tasks:
+        logger.info("Tuning kernel %s, called %d times", bold(task.task_name), task.weight)
+    work_dir = str(args.output / "logs")
+    contexts, task_weights = ms.relax_integration.extracted_tasks_to_tune_contexts(
+        tasks, work_dir=work_dir
+    )
+    ms.tune_tasks(
+        tasks=contexts,
+        task_weights=task_weights,
+        work_dir=work_dir,
+        max_trials_global=num_trials,
+        max_trials_per_task=num_trials_per_task,
+        database=database,
+    )
+
+
+def tune(  # pylint: disable=too-many-arguments
+    config: Dict[str, Any],
+    quantization: Quantization,
+    model_type: Model,
+    target: Target,
+    opt: OptimizationFlags,
+    output: Path,
+    overrides: ModelConfigOverride,
+    num_trials: int,
+    num_trials_per_task: int,
+):
+    """Tune the kernels of a model given its configuration and quantization format on a
+    specific target with MetaSchedule, and store them to the tuning database at `output`,
+    which `compile` takes with `tuning_database`. Kernels already in the database are kept.
+
+    Only kernels with static shapes are tuned, which excludes the kernels of the serving
+    engine's `batch_decode` and `batch_prefill` with a dynamic batch size."""
+    compile(
+        config=config,
+        quantization=quantization,
+        model_type=model_type,
+        target=target,
+        opt=opt,
+        build_func=partial(_tune, num_trials=num_trials, num_trials_per_task=num_trials_per_task),
+        system_lib_prefix="",
+        output=output,
+        overrides=overrides,
+    )
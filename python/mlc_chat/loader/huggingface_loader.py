@@ -1,9 +1,11 @@
 """A weight loader for HuggingFace's PyTorch format"""
 import gc
 import json
-from collections import OrderedDict, defaultdict
+import math
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
 
 import numpy as np
 from tqdm import tqdm
@@ -16,7 +18,12 @@ from mlc_chat.support.style import bold
 
 from .mapping import ExternMapping, QuantizeMapping
 from .stats import Stats
-from .utils import check_parameter_usage, load_safetensor_shard, load_torch_shard
+from .utils import (
+    check_parameter_usage,
+    load_safetensor_shard,
+    load_torch_shard,
+    read_safetensor_header,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +50,9 @@ class HuggingFaceLoader:  # pylint: disable=too-few-public-methods
 
     quantize_param_map : Optional[QuantizeMapping]
         The quantization mapping from MLC to quantized MLC parameters.
+
+    num_workers : int
+        The number of worker threads that quantize parameters.
     """
 
     stats: Stats
@@ -50,12 +60,15 @@ class HuggingFaceLoader:  # pylint: disable=too-few-public-methods
     torch_to_path: Dict[str, Path]
     extern_param_map: ExternMapping
     quantize_param_map: Optional[QuantizeMapping]
+    num_workers: int
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         path: Path,
         extern_param_map: ExternMapping,
         quantize_param_map: Optional[QuantizeMapping] = None,
+        num_workers: int = 1,
+        memory_budget_gb: Optional[float] = None,
     ) -> None:
         """Create a parameter loader from HuggingFace PyTorch format.
 
@@ -77,14 +90,33 @@ class HuggingFaceLoader:  # pylint: disable=too-few-public-methods
         quantize_param_map: Optional[QuantizeMapping]
             The quantization mapping from MLC to quantized MLC parameters, default to None, which
             means no quantization.
+
+        num_workers : int
+            The number of worker threads that quantize parameters, default to 1. Parameters
+            are mapped on the calling thread and quantized on the workers in a pipeline.
+
+        memory_budget_gb : Optional[float]
+            The RAM budget in GB, default to None, which means unbounded. The next weight file
+            is prefetched in background only when it fits in the budget, and parameters
+            waiting for quantization are drained when the budget is exceeded.
         """
         assert path.is_file(), f"Path {path} is not a file"
-        self.stats = Stats()
+        assert num_workers > 0, "The number of quantization workers is expected to be positive."
+        self.stats = Stats(memory_budget_gb=memory_budget_gb)
         self.extern_param_map = extern_param_map
         self.cached_files = {}
         self.torch_to_path = {}
         self.quantize_param_map = quantize_param_map
-        if path.suffix in (".bin", ".safetensors", ".pt"):
+        self.num_workers = num_workers
+        self._prefetcher: Optional[ThreadPoolExecutor] = None
+        self._prefetched_files: Dict[Path, Tuple[int, Future]] = {}
+        self._required_params: Dict[Path, Set[str]] = {}
+        if path.suffix == ".safetensors":
+            # Only the header is read, and the parameters are loaded lazily.
+            _, header = read_safetensor_header(path)
+            for name in header.keys():
+                self.torch_to_path[name] = path
+        elif path.suffix in (".bin", ".pt"):
             self._load_file(path)
             for name in self.cached_files[path].keys():
                 self.torch_to_path[name] = path
@@ -96,6 +128,12 @@ class HuggingFaceLoader:  # pylint: disable=too-few-public-methods
         else:
             raise FileNotFoundError(f"Unknown file suffix: {path}")
         check_parameter_usage(extern_param_map, set(self.torch_to_path.keys()))
+        # Only the parameters used by the mapping are loaded from each file.
+        for torch_names in extern_param_map.param_map.values():
+            for torch_name in torch_names:
+                self._required_params.setdefault(self.torch_to_path[torch_name], set()).add(
+                    torch_name
+                )
 
     def load(
         self, device: Device, preshard_funcs: Dict[str, Callable] = None
@@ -113,15 +151,52 @@ class HuggingFaceLoader:  # pylint: disable=too-few-public-methods
             The MLC parameter name and its value, quantized if quantization mapping is provided.
         """
         mlc_names = _loading_order(self.extern_param_map, self.torch_to_path)
-        for mlc_name in tqdm(mlc_names):
-            param = self._load_mlc_param(mlc_name, device=device)
-            if preshard_funcs is not None and mlc_name in preshard_funcs:
-                sharded_params = preshard_funcs[mlc_name](param)
-                for i, sharded_param in enumerate(sharded_params):
-                    sharded_name = _sharded_param_name(mlc_name, i)
-                    yield from self._load_or_quantize(sharded_name, sharded_param, device)
-            else:
-                yield from self._load_or_quantize(mlc_name, param, device)
+        file_order = self._file_loading_order(mlc_names)
+        # The parameters waiting for quantization in order, with their sizes in bytes.
+        pending: Deque[Tuple[int, Future]] = deque()
+        # Pipeline: the calling thread maps parameters while the prefetcher reads the
+        # next weight file and the workers quantize the mapped parameters.
+        with ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="mlc-weight-prefetch"
+        ) as prefetcher, ThreadPoolExecutor(
+            max_workers=self.num_workers, thread_name_prefix="mlc-weight-quantize"
+        ) as quantizer:
+            self._prefetcher = prefetcher
+            for mlc_name in tqdm(mlc_names):
+                param = self._load_mlc_param(mlc_name, device=device)
+                self._prefetch_next_file(file_order)
+                if preshard_funcs is not None and mlc_name in preshard_funcs:
+                    sharded_params = preshard_funcs[mlc_name](param)
+                    named_params = [
+                        (_sharded_param_name(mlc_name, i), sharded_param)
+                        for i, sharded_param in enumerate(sharded_params)
+                    ]
+                else:
+                    named_params = [(mlc_name, param)]
+                for name, named_param in named_params:
+                    nbytes = math.prod(named_param.shape) * np.dtype(named_param.dtype).itemsize
+                    self.stats.mem_add(nbytes)
+                    pending.append(
+                        (
+                            nbytes,
+                            quantizer.submit(self._load_or_quantize, name, named_param, device),
+                        )
+                    )
+                # Yield the finished parameters in order. Wait for the oldest one when
+                # all workers are busy or the RAM budget is exceeded.
+                while pending and (
+                    pending[0][1].done()
+                    or len(pending) > self.num_workers
+                    or not self.stats.mem_within_budget()
+                ):
+                    nbytes, future = pending.popleft()
+                    yield from future.result()
+                    self.stats.mem_rm(nbytes)
+            while pending:
+                nbytes, future = pending.popleft()
+                yield from future.result()
+                self.stats.mem_rm(nbytes)
+            self._prefetcher = None
 
         cached_files = list(self.cached_files.keys())
         for path in cached_files:
@@ -129,6 +204,35 @@ class HuggingFaceLoader:  # pylint: disable=too-few-public-methods
         self.stats.log_time_info("HF")
         self.stats.log_mem_usage()
 
+    def _file_loading_order(self, mlc_names: List[str]) -> List[Path]:
+        """The order of weight files to load when loading parameters in the given order."""
+        order: Dict[Path, int] = OrderedDict()
+        for mlc_name in mlc_names:
+            for torch_name in self.extern_param_map.param_map[mlc_name]:
+                order.setdefault(self.torch_to_path[torch_name], 1)
+        return list(order.keys())
+
+    def _prefetch_next_file(self, file_order: List[Path]) -> None:
+        """Read the next weight file in background if it fits in the RAM budget."""
+        assert self._prefetcher is not None
+        if self._prefetched_files:
+            # Only prefetch one file at a time.
+            return
+        for path in file_order:
+            if path in self.cached_files:
+                continue
+            nbytes = path.stat().st_size
+            if not self.stats.mem_within_budget(nbytes):
+                return
+            logger.info("Prefetching HF parameters from: %s", path)
+            # The file size is accounted as an estimate until the file is loaded.
+            self.stats.mem_add(nbytes)
+            self._prefetched_files[path] = (
+                nbytes,
+                self._prefetcher.submit(_read_file, path, self._required_params.get(path)),
+            )
+            return
+
     def _load_mlc_param(self, mlc_name: str, device: Optional[Device]) -> NDArray:
         torch_names = self.extern_param_map.param_map[mlc_name]
         files_required = {self.torch_to_path[p] for p in torch_names}
@@ -154,7 +258,8 @@ class HuggingFaceLoader:  # pylint: disable=too-few-public-methods
             return as_ndarray(param, device=device)
         return as_ndarray(param)
 
-    def _load_or_quantize(self, mlc_name, param, device: Device):
+    def _load_or_quantize(self, mlc_name, param, device: Device) -> List[Tuple[str, NDArray]]:
+        """Quantize the parameter if needed. This runs on the quantization workers."""
         if self.quantize_param_map and mlc_name in self.quantize_param_map.param_map:
             with self.stats.timer("quant_time_sec"):
                 q_names = self.quantize_param_map.param_map[mlc_name]
@@ -167,23 +272,29 @@ class HuggingFaceLoader:  # pylint: disable=too-few-public-methods
                     q_param.shape,
                     q_param.dtype,
                 )
-                yield q_name, q_param
-        else:
-            logger.info(
-                '[Not quantized] Parameter: "%s", shape: %s, dtype: %s',
-                bold(mlc_name),
-                param.shape,
-                param.dtype,
-            )
-            device.sync()
-            yield mlc_name, param
+            return list(zip(q_names, q_params))
+        logger.info(
+            '[Not quantized] Parameter: "%s", shape: %s, dtype: %s',
+            bold(mlc_name),
+            param.shape,
+            param.dtype,
+        )
+        device.sync()
+        return [(mlc_name, param)]
 
     def _load_file(self, path: Path) -> None:
-        logger.info("Loading HF parameters from: %s", path)
-        load_func = load_safetensor_shard if path.suffix == ".safetensors" else load_torch_shard
         with self.stats.timer("load_time_sec"):
+            if path in self._prefetched_files:
+                # The file has been read in background. Replace the estimated size
+                # with the actual size of parameters.
+                nbytes, future = self._prefetched_files.pop(path)
+                params = future.result()
+                self.stats.mem_rm(nbytes)
+            else:
+                logger.info("Loading HF parameters from: %s", path)
+                params = _read_file(path, self._required_params.get(path))
             result = {}
-            for name, param in load_func(path):
+            for name, param in params:
                 result[name] = param
                 self.stats.mem_add(param.nbytes)
                 if name not in self.extern_param_map.unused_params:
@@ -199,6 +310,11 @@ class HuggingFaceLoader:  # pylint: disable=too-few-public-methods
             gc.collect()
 
 
+def _read_file(path: Path, names: Optional[Set[str]]) -> List[Tuple[str, np.ndarray]]:
+    load_func = load_safetensor_shard if path.suffix == ".safetensors" else load_torch_shard
+    return list(load_func(path, names))
+
+
 def _loading_order(param_map: ExternMapping, torch_to_path: Dict[str, Path]) -> List[str]:
     # Step 1. Build a map from path to torch parameters
     path_to_torch: Dict[Path, List[str]] = defaultdict(list)
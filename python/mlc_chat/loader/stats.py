@@ -1,7 +1,9 @@
 """Statistics of the loading process of parameter loaders"""
 import dataclasses
+import threading
 import time
 from contextlib import contextmanager
+from typing import Optional
 
 from mlc_chat.support import logging
 from mlc_chat.support.style import green
@@ -35,6 +37,10 @@ class Stats:
 
     total_param_num: int
         Total number of parameters (original non-MLC model weights), excluding unused params.
+
+    memory_budget_gb : Optional[float]
+        The RAM budget in GB that bounds prefetching and in-flight quantization.
+        None means unbounded.
     """
 
     load_time_sec: float = 0.0
@@ -47,6 +53,11 @@ class Stats:
 
     total_param_num: int = 0
 
+    memory_budget_gb: Optional[float] = None
+
+    # Guards the timers, which are updated from the quantization workers.
+    _lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False)
+
     def timer(self, attr):
         """A context manager to time the scope and add the time to the attribute."""
 
@@ -55,7 +66,8 @@ class Stats:
             start_time = time.time()
             yield
             elapsed_time = time.time() - start_time
-            setattr(self, attr, getattr(self, attr) + elapsed_time)
+            with self._lock:
+                setattr(self, attr, getattr(self, attr) + elapsed_time)
 
         return timed_scope()
 
@@ -71,6 +83,12 @@ class Stats:
         mem_gb = float(nbytes) / float(1024**3)
         self.current_memory_gb -= mem_gb
 
+    def mem_within_budget(self, nbytes: int = 0) -> bool:
+        """Check if the RAM usage stays within the budget after adding the given number of bytes."""
+        if self.memory_budget_gb is None:
+            return True
+        return self.current_memory_gb + float(nbytes) / float(1024**3) <= self.memory_budget_gb
+
     def log_time_info(self, weight_format: str):
         """Log the time used in loading, pre-quantization and quantization."""
         logger.info(
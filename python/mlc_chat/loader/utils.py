@@ -1,7 +1,9 @@
 """Common utilities for loading parameters"""
 # pylint: disable=too-few-public-methods
+import json
+import struct
 from pathlib import Path
-from typing import TYPE_CHECKING, Iterator, Set, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Set, Tuple
 
 import numpy as np
 
@@ -35,11 +37,15 @@ def check_parameter_usage(param_map: "ExternMapping", extern_weights: Set[str]):
         )
 
 
-def load_torch_shard(path: Path) -> Iterator[Tuple[str, np.ndarray]]:
-    """Load and yield PyTorch format parameters."""
+def load_torch_shard(
+    path: Path, names: Optional[Set[str]] = None
+) -> Iterator[Tuple[str, np.ndarray]]:
+    """Load and yield PyTorch format parameters. Only yield the given names if provided."""
     import torch  # pylint: disable=import-outside-toplevel
 
     for name, param in torch.load(path, map_location=torch.device("cpu")).items():
+        if names is not None and name not in names:
+            continue
         if param is None:
             logger.warning("Encountered None param, skipping it: %s", name)
             continue
@@ -51,16 +57,73 @@ def load_torch_shard(path: Path) -> Iterator[Tuple[str, np.ndarray]]:
         yield name, param
 
 
-def load_safetensor_shard(path: Path) -> Iterator[Tuple[str, np.ndarray]]:
-    """Load and yield SafeTensor format parameters."""
-    import safetensors  # pylint: disable=import-outside-toplevel,import-error
+# The NumPy dtypes of SafeTensor dtypes. BF16 is decoded into float32 separately.
+_SAFETENSOR_DTYPES = {
+    "F64": "<f8",
+    "F32": "<f4",
+    "F16": "<f2",
+    "I64": "<i8",
+    "I32": "<i4",
+    "I16": "<i2",
+    "I8": "i1",
+    "U64": "<u8",
+    "U32": "<u4",
+    "U16": "<u2",
+    "U8": "u1",
+    "BOOL": "?",
+}
+
+
+def read_safetensor_header(path: Path) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    """Read the header of a SafeTensor file.
+
+    Returns
+    -------
+    data_offset : int
+        The offset of the data section in the file.
+
+    header : Dict[str, Dict[str, Any]]
+        The mapping from each parameter name to its "dtype", "shape" and
+        "data_offsets" relative to the data section.
+    """
+    with path.open("rb") as in_file:
+        (header_size,) = struct.unpack("<Q", in_file.read(8))
+        header = json.loads(in_file.read(header_size))
+    header.pop("__metadata__", None)
+    return 8 + header_size, header
 
-    with safetensors.safe_open(path, framework="pt", device="cpu") as in_file:
-        for name in in_file.keys():
-            param = in_file.get_tensor(name)
-            param = param.detach().cpu()
-            dtype = str(param.dtype)
-            if dtype == "torch.bfloat16":
-                param = param.float()
-            param = param.numpy()
-            yield name, param
+
+def _bf16_to_f32(value: np.ndarray) -> np.ndarray:
+    """Decode bfloat16 bits into float32 by shifting them to the upper half."""
+    result = value.astype("<u4")
+    np.left_shift(result, 16, out=result)
+    return result.view("<f4")
+
+
+def load_safetensor_shard(
+    path: Path, names: Optional[Set[str]] = None
+) -> Iterator[Tuple[str, np.ndarray]]:
+    """Load and yield SafeTensor format parameters. Only yield the given names if provided.
+
+    The file is memory-mapped without torch, and the parameters are yielded as copy-on-write
+    NumPy views of the file, so that the data are only read from disk when accessed.
+    BF16 parameters are decoded into float32, which is the only copy made.
+    """
+    data_offset, header = read_safetensor_header(path)
+    entries = [(name, info) for name, info in header.items() if names is None or name in names]
+    if not entries:
+        return
+    # Yield in the order of file offsets, so that the file is read sequentially.
+    entries.sort(key=lambda entry: entry[1]["data_offsets"][0])
+    data = np.memmap(path, dtype="u1", mode="c", offset=data_offset)
+    for name, info in entries:
+        begin, end = info["data_offsets"]
+        dtype = info["dtype"]
+        shape = info["shape"]
+        if dtype == "BF16":
+            param = _bf16_to_f32(data[begin:end].view("<u2")).reshape(shape)
+        elif dtype in _SAFETENSOR_DTYPES:
+            param = data[begin:end].view(_SAFETENSOR_DTYPES[dtype]).reshape(shape)
+        else:
+            raise ValueError(f"Unsupported SafeTensor dtype {dtype} of parameter {name}")
+        yield name, param
@@ -332,8 +332,23 @@ class TIRPagedKVCache(PagedKVCache):  # pylint: disable=too-few-public-methods
         rotary_dim : int
             The number of dimensions in the embedding that RoPE is applied to.
         target : Target
-            The target to build the model to.
+            The target to build the model to. The attention kernels for CPU are used
+            when it is an llvm target.
         """
+        # pylint: disable=line-too-long
+        # fmt: off
+        if target.kind.name == "llvm":
+            attention_prefill = _attention_prefill_cpu(num_key_value_heads, num_attention_heads, head_dim, dtype)
+            attention_decode = _attention_decode_cpu(num_key_value_heads, num_attention_heads, head_dim, dtype)
+            attention_prefill_ragged = _attention_prefill_ragged_cpu(num_key_value_heads, num_attention_heads, head_dim, dtype)
+            merge_state_inplace = _merge_state_inplace_cpu(dtype)
+        else:
+            attention_prefill = _attention_prefill(num_key_value_heads, num_attention_heads, head_dim, dtype, target)
+            attention_decode = _attention_decode(num_key_value_heads, num_attention_heads, head_dim, dtype, target)
+            attention_prefill_ragged = _attention_prefill_ragged(num_key_value_heads, num_attention_heads, head_dim, dtype, target)
+            merge_state_inplace = _merge_state_inplace(num_key_value_heads, head_dim, dtype, target)
+        # fmt: on
+        # pylint: enable=line-too-long
 
         bb = rx.BlockBuilder.current()
         args = [
@@ -349,10 +364,10 @@ class TIRPagedKVCache(PagedKVCache):  # pylint: disable=too-few-public-methods
             # pylint: disable=line-too-long
             # fmt: off
             bb.add_func(_kv_cache_transpose_append(num_key_value_heads, head_dim, dtype), "kv_cache_transpose_append"),
-            bb.add_func(_attention_prefill(num_key_value_heads, num_attention_heads, head_dim, dtype, target), "tir_attention_prefill"),
-            bb.add_func(_attention_decode(num_key_value_heads, num_attention_heads, head_dim, dtype, target), "tir_attention_decode"),
-            bb.add_func(_attention_prefill_ragged(num_key_value_heads, num_attention_heads, head_dim, dtype, target), "tir_attention_prefill_ragged"),
-            bb.add_func(_merge_state_inplace(num_key_value_heads, head_dim, dtype, target), "tir_attention_merge_state"),
+            bb.add_func(attention_prefill, "tir_attention_prefill"),
+            bb.add_func(attention_decode, "tir_attention_decode"),
+            bb.add_func(attention_prefill_ragged, "tir_attention_prefill_ragged"),
+            bb.add_func(merge_state_inplace, "tir_attention_merge_state"),
             bb.add_func(llama_rope_with_position_map(rope_theta, rope_scale, head_dim, num_attention_heads, num_key_value_heads, dtype, rotary_dim), "tir_split_rotary"),
             bb.add_func(llama_inplace_rope(rope_theta, rope_scale, head_dim, num_attention_heads, num_key_value_heads, dtype, target, rotary_dim), "tir_qk_rotary_inplace"),
             bb.add_func(_kv_cache_debug_get_kv(num_hidden_layers, num_key_value_heads, head_dim, dtype), "kv_cache_debug_get_kv"),
@@ -1433,3 +1448,366 @@ def _attention_prefill_ragged(
 
     apply_to_md(sch, sch.get_block("lse_store"))
     return sch.mod["main"].with_attr("tir.is_scheduled", 1)
+
+
+def _cpu_vec_size(head_dim: int) -> int:
+    """The number of lanes the CPU attention kernels accumulate the q*k dot products in."""
+    return 8 if head_dim % 8 == 0 else 1
+
+
+def _attention_prefill_cpu(h_kv, h_q, d, dtype):
+    """The paged prefill attention for CPU, which computes the query heads in parallel, and
+    each query row with online softmax over its k/v positions."""
+    # pylint: disable=invalid-name
+    group_size = h_q // h_kv
+    sm_scale = 1.0 / math.sqrt(float(d)) * math.log2(math.exp(1))
+    VEC = _cpu_vec_size(d)
+
+    # pylint: disable=line-too-long,too-many-arguments,too-many-branches
+    # fmt: off
+    @T.prim_func
+    def batch_prefill_paged_kv_cpu(
+        _0: T.int32,  # pylint: disable=unused-argument
+        var_q: T.handle, # [total_len, h_q, d]
+        var_q_indptr: T.handle, # [batch_size + 1]
+        var_pages: T.handle, # [max_num_pages, 2, h_kv, page_size, d]
+        var_page_indptr: T.handle, # [batch_size + 1]
+        var_page_values: T.handle, # [nnz_pages]
+        var_last_page_len: T.handle, # [b]
+        var_k_rope_pos_offset: T.handle, # [b]
+        var_q_rope_position: T.handle, # [total_len]
+        var_output: T.handle, # [total_len, h_q, d]
+        var_lse: T.handle, # [total_len, h_q]
+        causal: T.int32,
+        rotary_mode: T.int32,
+        rope_scale: T.float32,
+        rope_theta: T.float32,
+        attn_score_scaling_factor: T.float32,
+    ):
+        T.func_attr({"tir.is_scheduled": 1})
+        batch_size = T.int32(is_size_var=True)
+        total_len = T.int32(is_size_var=True)
+        nnz_pages = T.int32(is_size_var=True)
+        max_num_pages = T.int32(is_size_var=True)
+
+        q = T.match_buffer(var_q, (total_len, h_q, d), dtype)
+        q_indptr = T.match_buffer(var_q_indptr, (batch_size + 1,), "int32")
+        pages = T.match_buffer(var_pages, (max_num_pages, 2, h_kv, 16, d), dtype)
+        page_indptr = T.match_buffer(var_page_indptr, (batch_size + 1,), "int32")
+        page_values = T.match_buffer(var_page_values, (nnz_pages,), "int32")
+        last_page_len = T.match_buffer(var_last_page_len, (batch_size,), "int32")
+        k_rope_pos_offset = T.match_buffer(var_k_rope_pos_offset, (batch_size,), "int32")
+        q_rope_position = T.match_buffer(var_q_rope_position, (total_len,), "int32")
+        output = T.match_buffer(var_output, (total_len, h_q, d), dtype)
+        lse = T.match_buffer(var_lse, (total_len, h_q), "float32")
+
+        for h_qo in T.parallel(h_q):
+            with T.block("attn"):
+                Q_local = T.alloc_buffer((d,), "float32", scope="local")
+                O_local = T.alloc_buffer((d,), "float32", scope="local")
+                S_vec = T.alloc_buffer((VEC,), "float32", scope="local")
+                s_val = _var("float32")
+                m_val = _var("float32")
+                m_prev = _var("float32")
+                d_val = _var("float32")
+
+                by: T.int32 = h_qo // group_size
+                for b_idx in T.serial(batch_size):
+                    cur_page_indptr_begin: T.int32 = page_indptr[b_idx]
+                    cur_page_indptr_end: T.int32 = page_indptr[b_idx + 1]
+                    kv_chunk_len: T.int32 = T.if_then_else(
+                        cur_page_indptr_begin != cur_page_indptr_end,
+                        (cur_page_indptr_end - cur_page_indptr_begin - 1) * 16 + last_page_len[b_idx],
+                        0
+                    )
+                    qo_len: T.int32 = q_indptr[b_idx + 1] - q_indptr[b_idx]
+                    for row in T.serial(qo_len):
+                        cur_L: T.int32 = q_indptr[b_idx] + row
+                        for j in T.serial(d):
+                            Q_local[j] = T.Cast("float32", T.if_then_else(
+                                rotary_mode == 1,
+                                _rope(q, q_rope_position[cur_L], d, rope_theta, rope_scale, (cur_L, h_qo, j), dtype),
+                                q[cur_L, h_qo, j]
+                            ))
+                            O_local[j] = 0.0
+                        m_val[0] = -5e4
+                        d_val[0] = 1.0
+                        # The causal mask keeps the k/v positions up to the one of the row.
+                        for col in T.serial(T.if_then_else(causal > 0, kv_chunk_len - qo_len + row + 1, kv_chunk_len)):
+                            page_no: T.int32(is_size_var=True) = page_values[cur_page_indptr_begin + T.floordiv(col, 16)]  # type: ignore
+                            page_offset: T.int32(is_size_var=True) = T.floormod(col, 16)  # type: ignore
+                            for vec in T.vectorized(VEC):
+                                S_vec[vec] = 0.0
+                            for jo in T.serial(d // VEC):
+                                for vec in T.vectorized(VEC):
+                                    S_vec[vec] += Q_local[jo * VEC + vec] * T.Cast("float32", T.if_then_else(
+                                        rotary_mode == 1,
+                                        _rope(pages, k_rope_pos_offset[b_idx] + col, d, rope_theta, rope_scale, (page_no, 0, by, page_offset, jo * VEC + vec), dtype),
+                                        pages[page_no, 0, by, page_offset, jo * VEC + vec]
+                                    ))
+                            s_val[0] = 0.0
+                            for vec in T.serial(VEC):
+                                s_val[0] += S_vec[vec]
+                            s_val[0] *= attn_score_scaling_factor * sm_scale
+                            m_prev[0] = m_val[0]
+                            m_val[0] = T.max(m_val[0], s_val[0])
+                            o_scale: T.float32 = T.exp2(m_prev[0] - m_val[0])
+                            p: T.float32 = T.exp2(s_val[0] - m_val[0])
+                            d_val[0] = d_val[0] * o_scale + p
+                            for jo in T.serial(d // VEC):
+                                for vec in T.vectorized(VEC):
+                                    O_local[jo * VEC + vec] = O_local[jo * VEC + vec] * o_scale + p * T.Cast("float32", pages[page_no, 1, by, page_offset, jo * VEC + vec])
+                        for j in T.serial(d):
+                            output[cur_L, h_qo, j] = T.Cast(dtype, O_local[j] / d_val[0])
+                        lse[cur_L, h_qo] = m_val[0] + T.log2(d_val[0])
+    # fmt: on
+    # pylint: enable=line-too-long,invalid-name,too-many-arguments,too-many-branches
+    return batch_prefill_paged_kv_cpu
+
+
+def _attention_decode_cpu(num_kv_heads, num_qo_heads, head_dim, qkv_dtype):
+    """The paged decode attention for CPU, which computes the (sequence, query head) pairs in
+    parallel, each with online softmax over the k/v positions of the sequence."""
+    # pylint: disable=invalid-name
+    H_qo = num_qo_heads
+    H_kv = num_kv_heads
+    D = head_dim
+    GROUP_SIZE = H_qo // H_kv
+    sm_scale = 1.0 / math.sqrt(float(D)) * math.log2(math.exp(1))
+    VEC = _cpu_vec_size(D)
+
+    # pylint: disable=line-too-long,too-many-arguments,too-many-branches
+    # fmt: off
+    @T.prim_func
+    def batch_decode_paged_kv_cpu(
+        _0: T.int32,  # pylint: disable=unused-argument
+        Q_handle: T.handle,
+        pages_handle: T.handle,
+        page_table_indptr_handle: T.handle,
+        page_table_values_handle: T.handle,
+        last_page_len_handle: T.handle,
+        k_rope_pos_offset_handle: T.handle,
+        q_rope_position_handle: T.handle,
+        output_handle: T.handle,
+        lse_handle: T.handle,
+        rotary_mode: T.int32,
+        rope_scale: T.float32,
+        rope_theta: T.float32,
+        attn_score_scaling_factor: T.float32,
+    ):
+        T.func_attr({"tir.is_scheduled": 1})
+        B = T.int32(is_size_var=True)
+        nnz_pages = T.int32(is_size_var=True)
+        max_num_pages = T.int32(is_size_var=True)
+
+        Q = T.match_buffer(Q_handle, (B, H_qo, D), qkv_dtype)
+        pages = T.match_buffer(pages_handle, (max_num_pages, 2, H_kv, 16, D), qkv_dtype)
+        page_table_indptr = T.match_buffer(page_table_indptr_handle, (B + 1,), "int32")
+        page_table_values = T.match_buffer(page_table_values_handle, (nnz_pages,), "int32")
+        k_rope_pos_offset = T.match_buffer(k_rope_pos_offset_handle, (B,), "int32")
+        q_rope_position = T.match_buffer(q_rope_position_handle, (B,), "int32")
+        last_page_len = T.match_buffer(last_page_len_handle, (B,), "int32")
+        output = T.match_buffer(output_handle, (B, H_qo, D), qkv_dtype)
+        lse = T.match_buffer(lse_handle, (B, H_qo), "float32")
+
+        for fused_b_h in T.parallel(B * H_qo):
+            with T.block("attn"):
+                Q_local = T.alloc_buffer((D,), "float32", scope="local")
+                O_local = T.alloc_buffer((D,), "float32", scope="local")
+                S_vec = T.alloc_buffer((VEC,), "float32", scope="local")
+                s_val = _var("float32")
+                m_val = _var("float32")
+                m_prev = _var("float32")
+                d_val = _var("float32")
+
+                batch_idx: T.int32 = fused_b_h // H_qo
+                h_qo: T.int32 = fused_b_h % H_qo
+                by: T.int32 = h_qo // GROUP_SIZE
+                cur_page_indptr_begin: T.int32 = page_table_indptr[batch_idx]
+                cur_page_indptr_end: T.int32 = page_table_indptr[batch_idx + 1]
+                kv_chunk_len: T.int32 = T.if_then_else(
+                    cur_page_indptr_begin != cur_page_indptr_end,
+                    (cur_page_indptr_end - cur_page_indptr_begin - 1) * 16 + last_page_len[batch_idx],
+                    0
+                )
+                for j in T.serial(D):
+                    Q_local[j] = T.Cast("float32", T.if_then_else(
+                        rotary_mode == 1,
+                        _rope(Q, q_rope_position[batch_idx], head_dim, rope_theta, rope_scale, (batch_idx, h_qo, j), qkv_dtype),
+                        Q[batch_idx, h_qo, j]
+                    ))
+                    O_local[j] = 0.0
+                m_val[0] = -5e4
+                d_val[0] = 1.0
+                for col in T.serial(kv_chunk_len):
+                    page_no: T.int32(is_size_var=True) = page_table_values[cur_page_indptr_begin + T.floordiv(col, 16)]  # type: ignore
+                    page_offset: T.int32(is_size_var=True) = T.floormod(col, 16)  # type: ignore
+                    for vec in T.vectorized(VEC):
+                        S_vec[vec] = 0.0
+                    for jo in T.serial(D // VEC):
+                        for vec in T.vectorized(VEC):
+                            S_vec[vec] += Q_local[jo * VEC + vec] * T.Cast("float32", T.if_then_else(
+                                rotary_mode == 1,
+                                _rope(pages, k_rope_pos_offset[batch_idx] + col, head_dim, rope_theta, rope_scale, (page_no, 0, by, page_offset, jo * VEC + vec), qkv_dtype),
+                                pages[page_no, 0, by, page_offset, jo * VEC + vec]
+                            ))
+                    s_val[0] = 0.0
+                    for vec in T.serial(VEC):
+                        s_val[0] += S_vec[vec]
+                    s_val[0] *= attn_score_scaling_factor * sm_scale
+                    m_prev[0] = m_val[0]
+                    m_val[0] = T.max(m_val[0], s_val[0])
+                    o_scale: T.float32 = T.exp2(m_prev[0] - m_val[0])
+                    p: T.float32 = T.exp2(s_val[0] - m_val[0])
+                    d_val[0] = d_val[0] * o_scale + p
+                    for jo in T.serial(D // VEC):
+                        for vec in T.vectorized(VEC):
+                            O_local[jo * VEC + vec] = O_local[jo * VEC + vec] * o_scale + p * T.Cast("float32", pages[page_no, 1, by, page_offset, jo * VEC + vec])
+                for j in T.serial(D):
+                    output[batch_idx, h_qo, j] = T.Cast(qkv_dtype, O_local[j] / d_val[0])
+                lse[batch_idx, h_qo] = m_val[0] + T.log2(d_val[0])
+    # fmt: on
+    # pylint: enable=line-too-long,invalid-name,too-many-arguments,too-many-branches
+    return batch_decode_paged_kv_cpu
+
+
+def _attention_prefill_ragged_cpu(h_kv, h_q, d, dtype):
+    """The ragged prefill attention for CPU, which computes the query heads in parallel, and
+    each query row with online softmax over the k/v positions of its sequence."""
+    # pylint: disable=invalid-name
+    group_size = h_q // h_kv
+    sm_scale = 1.0 / math.sqrt(float(d)) * math.log2(math.exp(1))
+    VEC = _cpu_vec_size(d)
+
+    # pylint: disable=line-too-long,too-many-arguments,too-many-branches
+    # fmt: off
+    @T.prim_func
+    def batch_prefill_ragged_kv_cpu(
+        var_q: T.handle, # [total_len, h_q, d]
+        var_q_indptr: T.handle, # [batch_size + 1]
+        var_k: T.handle, # [total_len, h_kv, d]
+        var_v: T.handle, # [total_len, h_kv, d]
+        var_kv_indptr: T.handle, # [batch_size + 1]
+        var_q_rope_position: T.handle, # [total_q_len]
+        var_k_rope_pos_offset: T.handle, # [b]
+        var_output: T.handle, # [total_len, h_q, d]
+        var_lse: T.handle, # [total_len, h_q]
+        causal: T.int32,
+        rotary_mode: T.int32,
+        rope_scale: T.float32,
+        rope_theta: T.float32,
+        attn_score_scaling_factor: T.float32
+    ):
+        T.func_attr({"tir.is_scheduled": 1})
+        batch_size = T.int32(is_size_var=True)
+        qo_len = T.int32(is_size_var=True)
+        kv_len = T.int32(is_size_var=True)
+
+        q = T.match_buffer(var_q, (qo_len, h_q, d), dtype)
+        q_indptr = T.match_buffer(var_q_indptr, (batch_size + 1,), "int32")
+        k = T.match_buffer(var_k, (kv_len, h_kv, d), dtype)
+        v = T.match_buffer(var_v, (kv_len, h_kv, d), dtype)
+        kv_indptr = T.match_buffer(var_kv_indptr, (batch_size + 1,), "int32")
+        q_rope_position = T.match_buffer(var_q_rope_position, (qo_len,), "int32")
+        k_rope_pos_offset = T.match_buffer(var_k_rope_pos_offset, (batch_size,), "int32")
+        output = T.match_buffer(var_output, (qo_len, h_q, d), dtype)
+        lse = T.match_buffer(var_lse, (qo_len, h_q), "float32")
+
+        for h_qo in T.parallel(h_q):
+            with T.block("attn"):
+                Q_local = T.alloc_buffer((d,), "float32", scope="local")
+                O_local = T.alloc_buffer((d,), "float32", scope="local")
+                S_vec = T.alloc_buffer((VEC,), "float32", scope="local")
+                s_val = _var("float32")
+                m_val = _var("float32")
+                m_prev = _var("float32")
+                d_val = _var("float32")
+
+                by: T.int32 = h_qo // group_size
+                for b_idx in T.serial(batch_size):
+                    L_kv_base: T.int32 = kv_indptr[b_idx]
+                    kv_chunk_len: T.int32 = kv_indptr[b_idx + 1] - L_kv_base
+                    cur_qo_len: T.int32 = q_indptr[b_idx + 1] - q_indptr[b_idx]
+                    for row in T.serial(cur_qo_len):
+                        cur_L: T.int32 = q_indptr[b_idx] + row
+                        for j in T.serial(d):
+                            Q_local[j] = T.Cast("float32", T.if_then_else(
+                                rotary_mode == 1,
+                                _rope(q, q_rope_position[cur_L], d, rope_theta, rope_scale, (cur_L, h_qo, j), dtype),
+                                q[cur_L, h_qo, j]
+                            ))
+                            O_local[j] = 0.0
+                        m_val[0] = -5e4
+                        d_val[0] = 1.0
+                        # The causal mask keeps the k/v positions up to the one of the row.
+                        for col in T.serial(T.if_then_else(causal > 0, kv_chunk_len - cur_qo_len + row + 1, kv_chunk_len)):
+                            for vec in T.vectorized(VEC):
+                                S_vec[vec] = 0.0
+                            for jo in T.serial(d // VEC):
+                                for vec in T.vectorized(VEC):
+                                    S_vec[vec] += Q_local[jo * VEC + vec] * T.Cast("float32", T.if_then_else(
+                                        rotary_mode == 1,
+                                        _rope(k, k_rope_pos_offset[b_idx] + col, d, rope_theta, rope_scale, (L_kv_base + col, by, jo * VEC + vec), dtype),
+                                        k[L_kv_base + col, by, jo * VEC + vec]
+                                    ))
+                            s_val[0] = 0.0
+                            for vec in T.serial(VEC):
+                                s_val[0] += S_vec[vec]
+                            s_val[0] *= attn_score_scaling_factor * sm_scale
+                            m_prev[0] = m_val[0]
+                            m_val[0] = T.max(m_val[0], s_val[0])
+                            o_scale: T.float32 = T.exp2(m_prev[0] - m_val[0])
+                            p: T.float32 = T.exp2(s_val[0] - m_val[0])
+                            d_val[0] = d_val[0] * o_scale + p
+                            for jo in T.serial(d // VEC):
+                                for vec in T.vectorized(VEC):
+                                    O_local[jo * VEC + vec] = O_local[jo * VEC + vec] * o_scale + p * T.Cast("float32", v[L_kv_base + col, by, jo * VEC + vec])
+                        for j in T.serial(d):
+                            output[cur_L, h_qo, j] = T.Cast(dtype, O_local[j] / d_val[0])
+                        lse[cur_L, h_qo] = m_val[0] + T.log2(d_val[0])
+    # fmt: on
+    # pylint: enable=line-too-long,invalid-name,too-many-arguments,too-many-branches
+    return batch_prefill_ragged_kv_cpu
+
+
+def _merge_state_inplace_cpu(v_dtype):
+    """Merge the attention outputs and their softmax log-sum-exps in place on CPU, with the
+    (position, head) pairs in parallel."""
+    # pylint: disable=invalid-name
+
+    @T.prim_func
+    def merge_state_inplace_cpu(
+        v: T.handle,
+        s: T.handle,
+        v_other: T.handle,
+        s_other: T.handle,
+    ):
+        T.func_attr({"tir.is_scheduled": 1})
+        N = T.int32(is_size_var=True)
+        H = T.int32(is_size_var=True)
+        D = T.int32(is_size_var=True)
+
+        V = T.match_buffer(v, (N, H, D), v_dtype)
+        S = T.match_buffer(s, (N, H), "float32")
+        V_other = T.match_buffer(v_other, (N, H, D), v_dtype)
+        S_other = T.match_buffer(s_other, (N, H), "float32")
+
+        for fused_n_h in T.parallel(N * H):
+            with T.block("merge"):
+                n: T.int32 = fused_n_h // H
+                h: T.int32 = fused_n_h % H
+                s_max: T.float32 = T.max(S[n, h], S_other[n, h])
+                s_val: T.float32 = T.exp2(S[n, h] - s_max)
+                s_other_val: T.float32 = T.exp2(S_other[n, h] - s_max)
+                scale: T.float32 = s_val / (s_val + s_other_val)
+                other_scale: T.float32 = s_other_val / (s_val + s_other_val)
+                for j in T.serial(D):
+                    V[n, h, j] = T.Cast(
+                        v_dtype,
+                        T.Cast("float32", V[n, h, j]) * scale
+                        + T.Cast("float32", V_other[n, h, j]) * other_scale,
+                    )
+                S[n, h] = T.log2(s_val + s_other_val) + s_max
+
+    # pylint: enable=invalid-name
+    return merge_state_inplace_cpu
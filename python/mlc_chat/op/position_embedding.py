@@ -278,7 +278,7 @@ def llama_inplace_rope(
     num_q_heads: int,
     num_kv_heads: int,
     dtype: str,
-    target: Target,  # pylint: disable=unused-argument
+    target: Target,
     rotary_dim: Optional[int] = None,
 ):
     """Return the TIR function that inplace computes Llama-style RoPE with q position offset.
@@ -370,6 +370,52 @@ def llama_inplace_rope(
                                         q[s + instance_offset, h, d] = _rope(q, s, h, d, rope_offset, instance_offset)
                                     else:
                                         k[s + instance_offset, h - num_q_heads, d] = _rope(k, s, h - num_q_heads, d, rope_offset, instance_offset)
+
+    @T.prim_func
+    def tir_rotary_cpu(  # pylint: disable=too-many-locals
+        var_q: T.handle,
+        var_k: T.handle,
+        var_append_len_indptr: T.handle,
+        var_rope_offsets: T.handle,
+        _0: T.int32,
+        _1: T.int32,
+        _2: T.int32,
+        _3: T.int32,
+        _4: T.int32,
+        _5: T.float32,
+        _6: T.float32,
+    ):
+        T.func_attr({"tir.is_scheduled": 1})
+        total_len = T.int32()
+        batch_size = T.int32()
+        q = T.match_buffer(var_q, (total_len, num_q_heads, head_dim), dtype)
+        k = T.match_buffer(var_k, (total_len, num_kv_heads, head_dim), dtype)
+        rope_offsets = T.match_buffer(var_rope_offsets, (batch_size,), "int32")
+        append_len_indptr = T.match_buffer(var_append_len_indptr, (batch_size + 1,), "int32")
+        for b_h in T.parallel(batch_size * (num_q_heads + num_kv_heads)):
+            with T.block("rotary"):
+                # Both values of a rotated pair are computed before either is written back.
+                x = T.alloc_buffer((2,), dtype, scope="local")
+                b: T.int32 = b_h // (num_q_heads + num_kv_heads)
+                h: T.int32 = b_h % (num_q_heads + num_kv_heads)
+                instance_offset: T.int32 = append_len_indptr[b]
+                rope_offset: T.int32 = rope_offsets[b]
+                append_len: T.int32 = append_len_indptr[b + 1] - append_len_indptr[b]
+                for s, d in T.grid(append_len, rotary_dim // 2):
+                    if h < num_q_heads:
+                        x[0] = _rope(q, s, h, d, rope_offset, instance_offset)
+                        x[1] = _rope(q, s, h, d + rotary_dim // 2, rope_offset, instance_offset)
+                        q[s + instance_offset, h, d] = x[0]
+                        q[s + instance_offset, h, d + rotary_dim // 2] = x[1]
+                    else:
+                        x[0] = _rope(k, s, h - num_q_heads, d, rope_offset, instance_offset)
+                        x[1] = _rope(k, s, h - num_q_heads, d + rotary_dim // 2, rope_offset, instance_offset)
+                        k[s + instance_offset, h - num_q_heads, d] = x[0]
+                        k[s + instance_offset, h - num_q_heads, d + rotary_dim // 2] = x[1]
+    # fmt: on
+
+    if target.kind.name == "llvm":
+        return tir_rotary_cpu
     return tir_rotary
 
 
@@ -51,6 +51,20 @@ class UsageInfo(BaseModel):
 ################ v1/models ################
 
 
+class ModelResidency(BaseModel):
+    """The residency and the load latency statistics of a served model,
+    which extend the OpenAI "v1/models" response. Latencies are in seconds."""
+
+    resident: bool
+    pinned: bool
+    last_used: Optional[float] = None
+    num_loads: int = 0
+    num_evictions: int = 0
+    last_load_latency: Optional[float] = None
+    avg_load_latency: Optional[float] = None
+    num_pending_requests: int = 0
+
+
 class ModelResponse(BaseModel):
     """OpenAI "v1/models" response protocol.
     API reference: https://platform.openai.com/docs/api-reference/models/object
@@ -60,6 +74,7 @@ class ModelResponse(BaseModel):
     created: int = Field(default_factory=lambda: int(time.time()))
     object: str = "model"
     owned_by: str = "MLC-LLM"
+    residency: Optional[ModelResidency] = None
 
 
 ################ v1/completions ################
@@ -89,6 +104,7 @@ class CompletionRequest(BaseModel):
     top_p: float = 1.0
     user: Optional[str] = None
     ignore_eos: bool = False
+    priority: int = 0
 
     @field_validator("frequency_penalty", "presence_penalty")
     @classmethod
@@ -123,6 +139,17 @@ class CompletionRequest(BaseModel):
             raise ValueError('"logprobs" must be True to support "top_logprobs"')
         return self
 
+    @model_validator(mode="after")
+    def check_num_choices(self) -> "CompletionRequest":
+        """Check if the number of choices and the number of candidates are valid."""
+        if self.n < 1:
+            raise ValueError('"n" must be at least 1')
+        if self.best_of < self.n:
+            raise ValueError('"best_of" must be no less than "n"')
+        if self.stream and self.best_of > self.n:
+            raise ValueError('"best_of" larger than "n" is not supported when streaming')
+        return self
+
 
 class CompletionResponseChoice(BaseModel):
     finish_reason: Optional[Literal["stop", "length"]] = None
@@ -171,6 +198,10 @@ class ChatToolCall(BaseModel):
     function: ChatFunctionCall
 
 
+class ResponseFormat(BaseModel):
+    type: Literal["text", "json_object"] = "text"
+
+
 class ChatCompletionMessage(BaseModel):
     content: Optional[Union[str, List[Dict[str, str]]]] = None
     role: Literal["system", "user", "assistant", "tool"]
@@ -193,7 +224,7 @@ class ChatCompletionRequest(BaseModel):
     logit_bias: Optional[Dict[int, float]] = None
     max_tokens: Optional[int] = None
     n: int = 1
-    response_format: Literal["text", "json_object"] = "text"
+    response_format: ResponseFormat = Field(default_factory=ResponseFormat)
     seed: Optional[int] = None
     stop: Optional[Union[str, List[str]]] = None
     stream: bool = False
@@ -203,6 +234,7 @@ class ChatCompletionRequest(BaseModel):
     tool_choice: Optional[Union[Literal["none", "auto"], Dict]] = None
     user: Optional[str] = None
     ignore_eos: bool = False
+    priority: int = 0
 
     @field_validator("frequency_penalty", "presence_penalty")
     @classmethod
@@ -237,6 +269,13 @@ class ChatCompletionRequest(BaseModel):
             raise ValueError('"logprobs" must be True to support "top_logprobs"')
         return self
 
+    @model_validator(mode="after")
+    def check_num_choices(self) -> "ChatCompletionRequest":
+        """Check if the number of choices is valid."""
+        if self.n < 1:
+            raise ValueError('"n" must be at least 1')
+        return self
+
 
 class ChatCompletionResponseChoice(BaseModel):
     finish_reason: Optional[Literal["stop", "length", "tool_calls", "error"]] = None
@@ -281,6 +320,37 @@ class ChatCompletionStreamResponse(BaseModel):
     object: Literal["chat.completion.chunk"] = "chat.completion.chunk"
 
 
+################ v1/embeddings ################
+
+
+class EmbeddingRequest(BaseModel):
+    """OpenAI embedding request protocol.
+    API reference: https://platform.openai.com/docs/api-reference/embeddings/create
+    """
+
+    model: str
+    input: Union[str, List[int], List[Union[str, List[int]]]]
+    encoding_format: Literal["float"] = "float"
+    user: Optional[str] = None
+
+
+class EmbeddingObject(BaseModel):
+    embedding: List[float]
+    index: int
+    object: Literal["embedding"] = "embedding"
+
+
+class EmbeddingResponse(BaseModel):
+    """OpenAI embedding response protocol.
+    API reference: https://platform.openai.com/docs/api-reference/embeddings/object
+    """
+
+    data: List[EmbeddingObject]
+    model: str
+    object: Literal["list"] = "list"
+    usage: UsageInfo
+
+
 ################################################
 
 
@@ -288,11 +358,7 @@ def openai_api_get_unsupported_fields(
     request: Union[CompletionRequest, ChatCompletionRequest]
 ) -> List[str]:
     """Get the unsupported fields in the request."""
-    unsupported_field_default_values: List[Tuple[str, Any]] = [
-        ("best_of", 1),
-        ("n", 1),
-        ("response_format", "text"),
-    ]
+    unsupported_field_default_values: List[Tuple[str, Any]] = []
 
     unsupported_fields: List[str] = []
     for field, value in unsupported_field_default_values:
@@ -317,6 +383,7 @@ def openai_api_get_generation_config(
         "logit_bias",
         "seed",
         "ignore_eos",
+        "n",
     ]
     for arg_name in arg_names:
         kwargs[arg_name] = getattr(request, arg_name)
@@ -326,4 +393,6 @@ def openai_api_get_generation_config(
         kwargs["max_tokens"] = -1
     if request.stop is not None:
         kwargs["stop_strs"] = [request.stop] if isinstance(request.stop, str) else request.stop
+    if isinstance(request, ChatCompletionRequest):
+        kwargs["response_format"] = request.response_format.model_dump()
     return kwargs
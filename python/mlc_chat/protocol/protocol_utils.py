@@ -4,7 +4,7 @@ from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel
 
-from ..serve.config import GenerationConfig
+from ..serve.config import GenerationConfig, ResponseFormat
 from . import RequestProtocol
 from .openai_api_protocol import ChatCompletionRequest as OpenAIChatCompletionRequest
 from .openai_api_protocol import CompletionRequest as OpenAICompletionRequest
@@ -55,4 +55,7 @@ def get_generation_config(
         stop_strs += extra_stop_str
         kwargs["stop_strs"] = stop_strs
 
+    if "response_format" in kwargs:
+        kwargs["response_format"] = ResponseFormat(**kwargs["response_format"])
+
     return GenerationConfig(**kwargs)
@@ -11,6 +11,7 @@ from tvm.relax.frontend import nn
 from tvm.runtime import NDArray
 from tvm.target import Target
 
+from mlc_chat.compiler_pass import cpu_schedule
 from mlc_chat.loader import QuantizeMapping
 from mlc_chat.nn import MixtralExperts
 from mlc_chat.support import logging
@@ -215,8 +216,12 @@ class GroupQuantize:  # pylint: disable=too-many-instance-attributes
                         dl.gpu.Fallback(),
                     )(mod)
             elif device_type == "cpu":
-                target = "llvm"
+                target = Target("llvm")
                 mod = relax.transform.LegalizeOps()(mod)
+                with target:
+                    mod = dl.ApplyDefaultSchedule(  # type: ignore   # pylint: disable=not-callable
+                        cpu_schedule.Fallback(),
+                    )(mod)
             else:
                 raise NotImplementedError(f"Device type {device_type} is not supported")
             ex = relax.build(mod, target=target)
@@ -5,13 +5,14 @@ import asyncio
 import dataclasses
 import json
 from contextlib import asynccontextmanager
-from typing import Dict, List
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Union
 
 import numpy as np
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from mlc_chat.chat_module import GenerationConfig
 from mlc_chat.support.random import set_global_random_seed
@@ -38,6 +39,9 @@ from .interface.openai_api import (
     VisualStudioCodeCompletionRequest,
     VisualStudioCodeCompletionResponse,
 )
+from .serve import AsyncThreadedEngine, KVCacheConfig
+from .serve.engine import ModelInfo
+from .serve.legacy_rest import LegacyRESTEngine, ServerOverloadedError
 
 
 @dataclasses.dataclass
@@ -113,6 +117,53 @@ class RestAPIArgs:
             )
         },
     )
+    engine: bool = dataclasses.field(
+        default=False,
+        metadata={
+            "help": (
+                """
+                Serve with the serving engine, which batches concurrent requests continuously,
+                instead of a ChatModule that processes requests one at a time. Requests are
+                stateless in this mode, and embeddings are also computed by the engine.
+                """
+            ),
+            "action": "store_true",
+        },
+    )
+    max_batch_size: int = dataclasses.field(
+        default=80,
+        metadata={
+            "help": (
+                """
+                The maximum number of requests the engine runs in a batch. Only used with
+                ``--engine``.
+                """
+            )
+        },
+    )
+    max_total_seq_length: int = dataclasses.field(
+        default=None,
+        metadata={
+            "help": (
+                """
+                The total number of tokens the KV cache of the engine holds. By default, it is
+                estimated from the GPU memory. Only used with ``--engine``.
+                """
+            )
+        },
+    )
+    max_pending_requests: int = dataclasses.field(
+        default=256,
+        metadata={
+            "help": (
+                """
+                The maximum number of requests admitted at the same time, counting both the
+                running and the waiting requests. More requests are rejected with status 429.
+                Only used with ``--engine``.
+                """
+            )
+        },
+    )
 
 
 def convert_args_to_argparser() -> argparse.ArgumentParser:
@@ -131,20 +182,36 @@ def convert_args_to_argparser() -> argparse.ArgumentParser:
     return args
 
 
-session: Dict[str, ChatModule] = {}
+# The session holds either "chat_mod", a ChatModule, or "engine", a LegacyRESTEngine.
+session: Dict[str, Any] = {}
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     if ARGS.random_seed is not None:
         set_global_random_seed(ARGS.random_seed)
-    chat_mod = ChatModule(
-        model=ARGS.model,
-        device=ARGS.device,
-        model_lib_path=ARGS.lib_path,
-    )
-    session["chat_mod"] = chat_mod
+
+    def _create_chat_module() -> ChatModule:
+        return ChatModule(
+            model=ARGS.model,
+            device=ARGS.device,
+            model_lib_path=ARGS.lib_path,
+        )
+
+    if ARGS.engine:
+        engine = AsyncThreadedEngine(
+            ModelInfo(model=ARGS.model, model_lib_path=ARGS.lib_path, device=ARGS.device),
+            KVCacheConfig(
+                max_num_sequence=ARGS.max_batch_size,
+                max_total_sequence_length=ARGS.max_total_seq_length,
+            ),
+        )
+        session["engine"] = LegacyRESTEngine(engine, max_pending_requests=ARGS.max_pending_requests)
+    else:
+        session["chat_mod"] = _create_chat_module()
     yield
+    if "engine" in session:
+        session["engine"].terminate()
     session.clear()
 
 
@@ -261,6 +328,9 @@ async def request_chat_completion(request: ChatCompletionRequest):
     ```
     ]
     """
+    if "engine" in session:
+        return await _engine_chat_completion(request)
+
     generation_config = GenerationConfig(
         temperature=request.temperature,
         repetition_penalty=request.repetition_penalty,
@@ -314,6 +384,12 @@ async def request_chat_completion(request: ChatCompletionRequest):
     if isinstance(msg, str):
         msg = [msg]
 
+    return _chat_completion_response(msg, use_function_call)
+
+
+def _chat_completion_response(
+    msg: List[str], use_function_call: bool, usage: Optional[UsageInfo] = None
+) -> ChatCompletionResponse:
     choices = []
     for index, msg_i in enumerate(msg):
         if use_function_call:
@@ -347,16 +423,32 @@ async def request_chat_completion(request: ChatCompletionRequest):
 
     return ChatCompletionResponse(
         choices=choices,
-        # TODO: Fill in correct usage info
-        usage=UsageInfo(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+        # TODO: Fill in correct usage info of ChatModule
+        usage=usage if usage is not None else UsageInfo(prompt_tokens=0, completion_tokens=0),
     )
 
 
+def _completion_prompt(prompt: Union[str, List[str]]) -> str:
+    # Langchain's load_qa_chain.run expects the input to be a list with the query
+    if isinstance(prompt, list):
+        if len(prompt) > 1:
+            raise ValueError(
+                """
+                The /v1/completions endpoint currently only supports single message prompts.
+                Please ensure your request contains only one message
+                """
+            )
+        return prompt[0]
+    return prompt
+
+
 @app.post("/v1/completions")
 async def request_completion(request: CompletionRequest):
     """
     Creates a completion for a given prompt.
     """
+    if "engine" in session:
+        return await _engine_completion(request)
 
     generation_config = GenerationConfig(
         temperature=request.temperature,
@@ -371,18 +463,7 @@ async def request_completion(request: CompletionRequest):
     )
 
     session["chat_mod"].reset_chat()
-    # Langchain's load_qa_chain.run expects the input to be a list with the query
-    if isinstance(request.prompt, list):
-        if len(request.prompt) > 1:
-            raise ValueError(
-                """
-                The /v1/completions endpoint currently only supports single message prompts.
-                Please ensure your request contains only one message
-                """
-            )
-        prompt = request.prompt[0]
-    else:
-        prompt = request.prompt
+    prompt = _completion_prompt(request.prompt)
 
     if request.stream:
         session["chat_mod"]._prefill(  # pylint: disable=protected-access
@@ -434,12 +515,22 @@ async def request_embeddings(request: EmbeddingsRequest):
         assert f"Invalid input type {type(request.input)}"
 
     data = []
-    for i, inp in enumerate(inps):
-        session["chat_mod"].reset_chat()
-        emb = session["chat_mod"].embed_text(input=inp).numpy()
-        mean_emb = np.squeeze(np.mean(emb, axis=1), axis=0)
-        norm_emb = mean_emb / np.linalg.norm(mean_emb)
-        data.append({"object": "embedding", "embedding": norm_emb.tolist(), "index": i})
+    if "engine" in session:
+        try:
+            # The engine embeds all the inputs together between the steps of the requests
+            # being served.
+            norm_embs = await session["engine"].embed(inps)
+        except ValueError as error:
+            return _bad_request_response(error)
+        for i, norm_emb in enumerate(norm_embs):
+            data.append({"object": "embedding", "embedding": norm_emb.tolist(), "index": i})
+    else:
+        for i, inp in enumerate(inps):
+            session["chat_mod"].reset_chat()
+            emb = session["chat_mod"].embed_text(input=inp).numpy()
+            mean_emb = np.squeeze(np.mean(emb, axis=1), axis=0)
+            norm_emb = mean_emb / np.linalg.norm(mean_emb)
+            data.append({"object": "embedding", "embedding": norm_emb.tolist(), "index": i})
     # TODO: Fill in correct usage info
     return EmbeddingsResponse(
         data=data, usage=UsageInfo(prompt_tokens=0, completion_tokens=0, total_tokens=0)
@@ -451,7 +542,9 @@ async def reset():
     """
     Reset the chat for the currently initialized model.
     """
-    session["chat_mod"].reset_chat()
+    # Requests are stateless with the engine, so there is nothing to reset.
+    if "chat_mod" in session:
+        session["chat_mod"].reset_chat()
 
 
 @app.get("/stats")
@@ -459,6 +552,8 @@ async def read_stats():
     """
     Get the runtime stats.
     """
+    if "engine" in session:
+        return session["engine"].stats()
     return session["chat_mod"].stats()
 
 
@@ -467,6 +562,8 @@ async def read_stats_verbose():
     """
     Get the verbose runtime stats.
     """
+    if "engine" in session:
+        return session["engine"].stats()
     return session["chat_mod"].stats(verbose=True)
 
 
@@ -476,6 +573,9 @@ async def request_llm_vscode(request: VisualStudioCodeCompletionRequest):
     Creates a vscode code completion for a given prompt.
     Follows huggingface LSP (https://github.com/huggingface/llm-ls)
     """
+    if "engine" in session:
+        return await _engine_llm_vscode(request)
+
     generation_config = GenerationConfig(
         temperature=request.parameters.temperature,
         top_p=request.parameters.top_p,
@@ -487,6 +587,126 @@ async def request_llm_vscode(request: VisualStudioCodeCompletionRequest):
     return VisualStudioCodeCompletionResponse(generated_text=msg)
 
 
+def _overloaded_response(error: ServerOverloadedError) -> JSONResponse:
+    return JSONResponse(
+        {"error": str(error)},
+        status_code=HTTPStatus.TOO_MANY_REQUESTS,
+        headers={"Retry-After": "1"},
+    )
+
+
+def _bad_request_response(error: ValueError) -> JSONResponse:
+    return JSONResponse({"error": str(error)}, status_code=HTTPStatus.BAD_REQUEST)
+
+
+async def _engine_chat_completion(request: ChatCompletionRequest):
+    engine: LegacyRESTEngine = session["engine"]
+    try:
+        use_function_call = function_call_util(request)
+        prompt = await engine.tokenize_chat(request.messages)
+    except ValueError as error:
+        return _bad_request_response(error)
+    generation_config = engine.get_generation_config(
+        temperature=request.temperature,
+        top_p=request.top_p,
+        repetition_penalty=request.repetition_penalty,
+        presence_penalty=request.presence_penalty,
+        frequency_penalty=request.frequency_penalty,
+        max_tokens=request.max_gen_len,
+        stop=request.stop,
+    )
+    try:
+        if request.stream:
+            stream = engine.generate(prompt, generation_config)
+
+            async def iter_response():
+                async for delta_text in stream:
+                    chunk = ChatCompletionStreamResponse(
+                        choices=[
+                            ChatCompletionResponseStreamChoice(
+                                index=0,
+                                delta=DeltaMessage(role="assistant", content=delta_text),
+                                finish_reason="stop",
+                            )
+                        ]
+                    )
+                    yield f"data: {chunk.json(exclude_unset=True)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(iter_response(), media_type="text/event-stream")
+        msg, usage = await engine.generate_all(prompt, generation_config, n=request.n or 1)
+    except ServerOverloadedError as error:
+        return _overloaded_response(error)
+    return _chat_completion_response(msg, use_function_call, usage)
+
+
+async def _engine_completion(request: CompletionRequest):
+    engine: LegacyRESTEngine = session["engine"]
+    # The legacy server feeds the prompt to ChatModule as a user message, so the engine applies
+    # the conversation template likewise to keep the outputs consistent.
+    try:
+        prompt = await engine.tokenize_chat(
+            [ChatMessage(role="user", content=_completion_prompt(request.prompt))]
+        )
+    except ValueError as error:
+        return _bad_request_response(error)
+    generation_config = engine.get_generation_config(
+        temperature=request.temperature,
+        top_p=request.top_p,
+        repetition_penalty=request.repetition_penalty,
+        presence_penalty=request.presence_penalty,
+        frequency_penalty=request.frequency_penalty,
+        max_tokens=request.max_gen_len,
+        stop=request.stop,
+    )
+    try:
+        if request.stream:
+            stream = engine.generate(prompt, generation_config)
+
+            async def iter_response():
+                async for delta_text in stream:
+                    chunk = CompletionStreamResponse(
+                        choices=[
+                            CompletionResponseStreamChoice(
+                                index=0,
+                                text=delta_text,
+                                finish_reason="stop",
+                            )
+                        ]
+                    )
+                    yield f"data: {chunk.json(exclude_unset=True)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(iter_response(), media_type="text/event-stream")
+        msg, usage = await engine.generate_all(prompt, generation_config, n=request.n or 1)
+    except ServerOverloadedError as error:
+        return _overloaded_response(error)
+    return CompletionResponse(
+        choices=[
+            CompletionResponseChoice(index=index, text=msg[index]) for index in range(len(msg))
+        ],
+        usage=usage,
+    )
+
+
+async def _engine_llm_vscode(request: VisualStudioCodeCompletionRequest):
+    engine: LegacyRESTEngine = session["engine"]
+    try:
+        prompt = await engine.tokenize_chat([ChatMessage(role="user", content=request.inputs)])
+    except ValueError as error:
+        return _bad_request_response(error)
+    generation_config = engine.get_generation_config(
+        temperature=request.parameters.temperature,
+        top_p=request.parameters.top_p,
+        max_tokens=request.parameters.max_new_tokens,
+    )
+    try:
+        msg, _ = await engine.generate_all(prompt, generation_config)
+    except ServerOverloadedError as error:
+        return _overloaded_response(error)
+    return VisualStudioCodeCompletionResponse(generated_text=msg[0])
+
+
 ARGS = convert_args_to_argparser().parse_args()
 if __name__ == "__main__":
     uvicorn.run("mlc_chat.rest:app", host=ARGS.host, port=ARGS.port, reload=False, access_log=False)
@@ -3,27 +3,42 @@ Acknowledgment: Part of the code was adapted from the vLLM project.
 """
 
 import asyncio
+import json
 import sys
 import threading
 from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import tvm
 
 from ..streamer import TextStreamer
 from ..tokenizer import Tokenizer
 from . import data
+from .async_tokenizer import AsyncTokenizer
 from .config import EngineMode, GenerationConfig, KVCacheConfig
 from .engine import ModelInfo, _estimate_max_total_sequence_length, _process_model_args
 from .event_trace_recorder import EventTraceRecorder
 from .request import Request
 
+# The delta output of one choice of a request, which is a tuple of the delta output
+# text, the number of delta tokens, the logprobs of delta tokens, and the optional
+# finish reason respectively.
+ChoiceOutput = Tuple[str, int, Optional[data.TokenLogProbs], Optional[str]]
+
+
+def _get_choice_request_ids(request_id: str, num_choices: int) -> List[str]:
+    """Get the ids of the sequences generated for each choice of the request in
+    the engine, which are consistent with `GetChoiceRequestId` in C++."""
+    return [request_id] + [f"{request_id}#{i}" for i in range(1, num_choices)]
+
 
 class AsyncRequestStream:
     """The asynchronous stream for requests.
 
-    Each request has its own unique stream.
+    Each request has its own unique stream, which is shared by all the
+    choices (i.e., the `n` generated sequences) of the request.
     The stream exposes the method `push` for engine to push new generated
-    delta text to the stream, and the method `finish` for engine to mark
+    delta outputs to the stream, and the method `finish` for engine to mark
     the finish of generation.
 
     The stream implements `__aiter__` and `__anext__`, which the engine
@@ -31,28 +46,37 @@ class AsyncRequestStream:
     """
 
     # The asynchronous queue to hold elements of
-    # - either a tuple of (str, int, List[str], Optional[str]), denoting the
-    #   delta output text, the number of delta tokens, the logprob JSON strings
-    #   of delta tokens, and the optional finish reason respectively,
+    # - either a list of the optional delta output of each choice, where a
+    #   choice without new output in the item is None,
     # - or an exception.
     if sys.version_info >= (3, 9):
         _queue: asyncio.Queue[  # pylint: disable=unsubscriptable-object
-            Union[Tuple[str, int, Optional[List[str]], Optional[str]], Exception]
+            Union[List[Optional[ChoiceOutput]], Exception]
         ]
     else:
         _queue: asyncio.Queue
     # The finish flag.
     _finished: bool
+    # The number of choices of the request, and the number of unfinished ones.
+    num_choices: int
+    _num_unfinished_choices: int
 
-    def __init__(self) -> None:
+    def __init__(self, num_choices: int = 1) -> None:
         self._queue = asyncio.Queue()
         self._finished = False
+        self.num_choices = num_choices
+        self._num_unfinished_choices = num_choices
+
+    @property
+    def all_choices_finished(self) -> bool:
+        """Whether all the choices of the request have finished generation."""
+        return self._num_unfinished_choices == 0
 
     def push(
         self,
-        item_or_exception: Union[Tuple[str, int, Optional[List[str]], Optional[str]], Exception],
+        item_or_exception: Union[List[Optional[ChoiceOutput]], Exception],
     ) -> None:
-        """Push a new token to the stream."""
+        """Push the new outputs of the choices to the stream."""
         if self._finished:
             # No new item is expected after finish.
             self._queue.put_nowait(
@@ -62,6 +86,10 @@ class AsyncRequestStream:
                 )
             )
             return
+        if not isinstance(item_or_exception, Exception):
+            self._num_unfinished_choices -= sum(
+                output is not None and output[3] is not None for output in item_or_exception
+            )
         self._queue.put_nowait(item_or_exception)
 
     def finish(self) -> None:
@@ -72,7 +100,7 @@ class AsyncRequestStream:
     def __aiter__(self):
         return self
 
-    async def __anext__(self) -> Tuple[str, int, Optional[List[str]], Optional[str]]:
+    async def __anext__(self) -> List[Optional[ChoiceOutput]]:
         result = await self._queue.get()
         if isinstance(result, StopIteration):
             raise StopAsyncIteration
@@ -105,14 +133,29 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
 
     enable_tracing : bool
         A boolean indicating if to enable event logging for requests.
+
+    detokenize_in_background : bool
+        A boolean indicating if to detokenize the generated tokens on the
+        background engine thread. When enabled, the engine hands the event
+        loop a single batch of detokenized outputs per wakeup, and coalesces
+        the outputs of multiple engine steps when the event loop falls behind.
+        This reduces the work on the event loop thread when serving many
+        concurrent streams.
+
+    gpu_memory_budget_bytes : Optional[int]
+        The GPU memory in bytes the engine is allowed to use, which bounds the
+        estimated KV cache capacity when "max_total_sequence_length" is not
+        specified in `kv_cache_config`. The whole GPU memory is used by default.
     """
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         models: Union[ModelInfo, List[ModelInfo]],
         kv_cache_config: KVCacheConfig,
         engine_mode: Optional[EngineMode] = None,
         enable_tracing: bool = False,
+        detokenize_in_background: bool = False,
+        gpu_memory_budget_bytes: Optional[int] = None,
     ) -> None:
         if isinstance(models, ModelInfo):
             models = [models]
@@ -128,7 +171,7 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
 
         if kv_cache_config.max_total_sequence_length is None:
             kv_cache_config.max_total_sequence_length = _estimate_max_total_sequence_length(
-                models, config_file_paths
+                models, config_file_paths, gpu_memory_budget_bytes
             )
         if kv_cache_config.prefill_chunk_size is None:
             kv_cache_config.prefill_chunk_size = prefill_chunk_size
@@ -138,6 +181,8 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
                 f"larger than the maximum prefill chunk size {prefill_chunk_size} supported by "
                 "models. Please specify a smaller prefill chunk size."
             )
+        self.prefill_chunk_size = kv_cache_config.prefill_chunk_size
+        self.max_num_sequence = kv_cache_config.max_num_sequence
 
         module = tvm.get_global_func("mlc.serve.create_threaded_engine", allow_missing=False)()
         self._ffi = {
@@ -145,29 +190,52 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
             for key in [
                 "add_request",
                 "abort_request",
+                "embed_tokens",
+                "metrics",
                 "run_background_loop",
                 "init_background_engine",
                 "exit_background_loop",
+                "enable_background_detokenization",
+                "pop_detokenized_stream_outputs",
             ]
         }
         self.tokenizer = Tokenizer(tokenizer_path)
+        # The tokenization stage that batches concurrent encodings off the event loop.
+        self.async_tokenizer = AsyncTokenizer(self.tokenizer)
         if engine_mode is None:
             # The default engine mode: non-speculative
             engine_mode = EngineMode()
 
-        # The mapping from request ids to request asynchronous stream.
-        self._request_tools: Dict[str, Tuple[AsyncRequestStream, TextStreamer]] = {}
+        # The mapping from the ids of the sequences in the engine to the asynchronous
+        # stream of their request and their choice index in the request, together
+        # with the text streamer when detokenizing on the event loop.
+        self._request_tools: Dict[str, Tuple[AsyncRequestStream, int, Optional[TextStreamer]]] = {}
+        # The mapping from the ids of unfinished requests to the ids of their sequences.
+        self._choice_request_ids: Dict[str, List[str]] = {}
+        # The string and the bytes of each token returned in logprobs, loaded at the first use.
+        self._logprob_token_table: Optional[List[Tuple[str, List[int]]]] = None
+        self._detokenize_in_background = detokenize_in_background
+        if detokenize_in_background:
+            self._ffi["enable_background_detokenization"](
+                tokenizer_path, self._detokenized_stream_wakeup_callback
+            )
+
+        # The event set when the background engine finishes loading the models.
+        self._initialized = threading.Event()
 
         def _background_loop():
-            self._ffi["init_background_engine"](
-                self.max_single_sequence_length,
-                tokenizer_path,
-                kv_cache_config.asjson(),
-                engine_mode.asjson(),
-                self._request_stream_callback,
-                self.trace_recorder,
-                *model_args,
-            )
+            try:
+                self._ffi["init_background_engine"](
+                    self.max_single_sequence_length,
+                    tokenizer_path,
+                    kv_cache_config.asjson(),
+                    engine_mode.asjson(),
+                    None if detokenize_in_background else self._request_stream_callback,
+                    self.trace_recorder,
+                    *model_args,
+                )
+            finally:
+                self._initialized.set()
             self._ffi["run_background_loop"]()
 
         # Create the background engine-driving thread and start the loop.
@@ -178,23 +246,67 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
         self._async_event_loop: Optional[asyncio.AbstractEventLoop] = None
         self._terminated = False
 
+    def metrics(self) -> Dict[str, Any]:
+        """The engine metrics for monitoring, which are updated at each engine step.
+        See `Engine.metrics` for the entries. It is empty before the engine is initialized,
+        and after the engine is terminated."""
+        if self._terminated:
+            return {}
+        return json.loads(self._ffi["metrics"]())
+
+    @property
+    def num_pending_requests(self) -> int:
+        """The number of requests that are added and not finished yet."""
+        return len(self._choice_request_ids)
+
+    @property
+    def logprob_token_table(self) -> List[Tuple[str, List[int]]]:
+        """The string and the bytes of each token returned in logprobs, indexed by token id.
+        The string keeps only the visible ASCII characters of the token."""
+        if self._logprob_token_table is None:
+            self._logprob_token_table = [
+                ("".join(chr(byte) for byte in token if 33 <= byte <= 126), list(token))
+                for token in self.tokenizer.get_token_table()
+            ]
+        return self._logprob_token_table
+
+    def wait_until_initialized(self) -> None:
+        """Block until the background engine finishes loading the models.
+        The engine accepts requests before that, which wait in the engine."""
+        self._initialized.wait()
+
     def terminate(self):
-        """Terminate the engine."""
+        """Terminate the engine. The background engine releases the models and the
+        KV cache when it exits, and the engine module is released with the last
+        reference to it, which this object drops here."""
         self._terminated = True
         self._ffi["exit_background_loop"]()
         self._background_loop_thread.join()
+        self.async_tokenizer.terminate()
+        self._ffi.clear()
 
-    async def generate(
-        self, prompt: Union[str, List[int]], generation_config: GenerationConfig, request_id: str
-    ) -> AsyncGenerator[Tuple[str, int, Optional[List[str]], Optional[str]], Any]:
+    async def generate(  # pylint: disable=too-many-arguments
+        self,
+        prompt: Union[str, List[int]],
+        generation_config: GenerationConfig,
+        request_id: str,
+        priority: int = 0,
+        tenant: str = "",
+    ) -> AsyncGenerator[List[Optional[ChoiceOutput]], Any]:
         """Asynchronous text generation interface.
-        The method is a coroutine that streams a tuple at a time via yield.
-        Each tuple is contained of
+        The method is a coroutine that streams a list at a time via yield.
+        The list has one element for each of the `generation_config.n` choices,
+        which is None when the choice has no new output, or a tuple of
         - the delta text in type str,
         - the number of delta tokens in type int,
-        - the logprob JSON strings of delta tokens,
+        - the logprobs of delta tokens in type Optional[data.TokenLogProbs],
         - the optional finish reason in type Optional[str].
 
+        The choices other than the first one are forked from the first one
+        after the prompt is prefilled, so that they share the KV cache of the
+        prompt. Each choice finishes independently, and the generator stops
+        after all choices finish.
+
         Parameters
         ----------
         prompt : Union[str, List[int]]
@@ -205,6 +317,12 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
 
         request_id : str
             The unique identifier (in string) or this generation request.
+
+        priority : int
+            The priority of the request under the "priority" scheduler.
+
+        tenant : str
+            The tenant of the request under the "fair_share" scheduler.
         """
         if self._terminated:
             raise ValueError("The AsyncThreadedEngine has terminated.")
@@ -212,15 +330,23 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
             # Lazily set the asyncio event loop so that the event
             # loop is the main driving event loop of the process.
             self._async_event_loop = asyncio.get_event_loop()
+        if generation_config.n > self.max_num_sequence:
+            raise ValueError(
+                f"The number of choices {generation_config.n} exceeds the maximum number "
+                f"of sequences {self.max_num_sequence} in the engine."
+            )
 
         # Create the request with the given id, input data, generation
         # config and the created callback.
         input_data = data.TextData(prompt) if isinstance(prompt, str) else data.TokenData(prompt)
-        request = Request(request_id, input_data, generation_config)
+        request = Request(request_id, input_data, generation_config, priority, tenant)
 
         # Create the unique stream of the request.
-        stream = AsyncRequestStream()
-        if request_id in self._request_tools:
+        stream = AsyncRequestStream(generation_config.n)
+        choice_request_ids = _get_choice_request_ids(request_id, generation_config.n)
+        if request_id in self._choice_request_ids or any(
+            choice_request_id in self._request_tools for choice_request_id in choice_request_ids
+        ):
             # Report error in the stream if the request id already exists.
             stream.push(
                 RuntimeError(
@@ -230,7 +356,13 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
             )
         else:
             # Record the stream in the tracker
-            self._request_tools[request_id] = (stream, TextStreamer(self.tokenizer))
+            for choice_index, choice_request_id in enumerate(choice_request_ids):
+                self._request_tools[choice_request_id] = (
+                    stream,
+                    choice_index,
+                    None if self._detokenize_in_background else TextStreamer(self.tokenizer),
+                )
+            self._choice_request_ids[request_id] = choice_request_ids
             self._ffi["add_request"](request)
 
         # Iterate the stream asynchronously and yield the token.
@@ -240,6 +372,84 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
         except (Exception, asyncio.CancelledError) as e:  # pylint: disable=broad-exception-caught
             await self.abort(request_id)
             raise e
+        finally:
+            self._choice_request_ids.pop(request_id, None)
+
+    async def embed(
+        self, prompts: List[List[int]], max_batch_tokens: Optional[int] = None
+    ) -> np.ndarray:
+        """Asynchronous embedding interface, which computes the mean-pooled and
+        L2-normalized token embeddings of each input prompt.
+
+        The token ids of all prompts are concatenated and embedded in batches
+        of at most `max_batch_tokens` tokens each, so that many short prompts
+        take one pass of the model instead of one pass each. A prompt may span
+        two batches, since the token embeddings do not depend on the context.
+
+        Parameters
+        ----------
+        prompts : List[List[int]]
+            The token ids of each prompt. No prompt is allowed to be empty.
+
+        max_batch_tokens : Optional[int]
+            The maximum number of tokens embedded in one batch, which defaults to
+            and must not exceed the prefill chunk size.
+
+        Returns
+        -------
+        embeddings : np.ndarray
+            The float32 embeddings in shape (len(prompts), hidden_size).
+        """
+        if self._terminated:
+            raise ValueError("The AsyncThreadedEngine has terminated.")
+        if max_batch_tokens is None:
+            max_batch_tokens = self.prefill_chunk_size
+        elif not 0 < max_batch_tokens <= self.prefill_chunk_size:
+            raise ValueError(
+                f"The maximum number of tokens in a batch {max_batch_tokens} must be positive "
+                f"and not exceed the prefill chunk size {self.prefill_chunk_size}."
+            )
+        lengths = np.array([len(prompt) for prompt in prompts], dtype="int64")
+        if len(prompts) == 0 or np.any(lengths == 0):
+            raise ValueError("The prompts to embed must be non-empty.")
+
+        token_ids = np.concatenate([np.asarray(prompt, dtype="int32") for prompt in prompts])
+        # The index of the prompt that each token belongs to.
+        token_prompt_ids = np.repeat(np.arange(len(prompts)), lengths)
+        sums: Optional[np.ndarray] = None
+        for start in range(0, len(token_ids), max_batch_tokens):
+            end = min(start + max_batch_tokens, len(token_ids))
+            embeddings = await self._embed_tokens(token_ids[start:end].tolist())
+            embeddings = embeddings.reshape(end - start, -1).astype("float32")
+            if sums is None:
+                sums = np.zeros((len(prompts), embeddings.shape[1]), dtype="float32")
+            # Sum up the embeddings of the contiguous tokens of each prompt in the batch.
+            batch_prompt_ids = token_prompt_ids[start:end]
+            segment_starts = np.flatnonzero(
+                np.concatenate([[True], batch_prompt_ids[1:] != batch_prompt_ids[:-1]])
+            )
+            sums[batch_prompt_ids[segment_starts]] += np.add.reduceat(
+                embeddings, segment_starts, axis=0
+            )
+        assert sums is not None
+        # The normalized sum equals the normalized mean.
+        return sums / np.linalg.norm(sums, axis=1, keepdims=True)
+
+    def _embed_tokens(self, token_ids: List[int]) -> "asyncio.Future[np.ndarray]":
+        """Embed the token ids on the background engine thread."""
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[np.ndarray]" = loop.create_future()
+
+        def _set_result(embeddings: np.ndarray) -> None:
+            if not future.cancelled():
+                future.set_result(embeddings)
+
+        def _callback(embeddings: tvm.nd.NDArray) -> None:
+            # NOTE: This function is invoked on the background thread and causes GIL.
+            loop.call_soon_threadsafe(_set_result, embeddings.numpy())
+
+        self._ffi["embed_tokens"](tvm.runtime.ShapeTuple(token_ids), _callback)
+        return future
 
     async def abort(self, request_id: str) -> None:
         """Generation abortion interface.
@@ -253,8 +463,10 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
 
     def _abort(self, request_id: str):
         """Internal implementation of request abortion."""
-        self._request_tools.pop(request_id, None)
-        self._ffi["abort_request"](request_id)
+        for choice_request_id in self._choice_request_ids.pop(request_id, [request_id]):
+            self._request_tools.pop(choice_request_id, None)
+            if not self._terminated:
+                self._ffi["abort_request"](choice_request_id)
 
     def _request_stream_callback(self, delta_outputs: List[data.RequestStreamOutput]) -> None:
         """The request stream callback function for engine to stream back
@@ -281,11 +493,12 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
 
     def _request_stream_callback_impl(self, delta_outputs: List[data.RequestStreamOutput]) -> None:
         """The underlying implementation of request stream callback."""
+        choice_outputs: Dict[int, Tuple[AsyncRequestStream, List[Optional[ChoiceOutput]]]] = {}
         for delta_output in delta_outputs:
             (
                 request_id,
                 delta_token_ids,
-                delta_logprob_json_strs,
+                delta_logprobs,
                 finish_reason,
             ) = delta_output.unpack()
             tools = self._request_tools.get(request_id, None)
@@ -293,7 +506,8 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
                 continue
 
             self.record_event(request_id, event="start callback")
-            stream, text_streamer = tools
+            stream, choice_index, text_streamer = tools
+            assert text_streamer is not None
 
             self.record_event(request_id, event="start detokenization")
             delta_text = text_streamer.put(delta_token_ids)
@@ -301,12 +515,98 @@ class AsyncThreadedEngine:  # pylint: disable=too-many-instance-attributes
                 delta_text += text_streamer.finish()
             self.record_event(request_id, event="finish detokenization")
 
-            # Push new delta text to the stream.
-            stream.push((delta_text, len(delta_token_ids), delta_logprob_json_strs, finish_reason))
+            self._get_choice_outputs(choice_outputs, stream)[choice_index] = (
+                delta_text,
+                len(delta_token_ids),
+                delta_logprobs,
+                finish_reason,
+            )
             if finish_reason is not None:
-                stream.finish()
                 self._request_tools.pop(request_id, None)
             self.record_event(request_id, event="finish callback")
+        self._push_choice_outputs(choice_outputs)
+
+    def _detokenized_stream_wakeup_callback(self) -> None:
+        """The callback function for the engine to notify that new
+        detokenized outputs are buffered in background detokenization mode.
+
+        Note
+        ----
+        The engine invokes this callback only when its output buffer turns
+        from empty to non-empty. The outputs of all steps finished before
+        the scheduled invocation runs are fetched together in one batch.
+        """
+        self._async_event_loop.call_soon_threadsafe(self._detokenized_stream_callback_impl)
+
+    def _detokenized_stream_callback_impl(self) -> None:
+        """Fetch the buffered detokenized outputs in batch and push them to streams."""
+        if self._terminated:
+            return
+        (
+            request_ids,
+            delta_texts,
+            num_delta_tokens,
+            delta_logprob_token_ids_list,
+            delta_logprobs_list,
+            finish_reasons,
+        ) = self._ffi["pop_detokenized_stream_outputs"]()
+        choice_outputs: Dict[int, Tuple[AsyncRequestStream, List[Optional[ChoiceOutput]]]] = {}
+        for (
+            request_id,
+            delta_text,
+            num_tokens,
+            delta_logprob_token_ids,
+            delta_logprobs,
+            finish_reason,
+        ) in zip(
+            request_ids,
+            delta_texts,
+            num_delta_tokens,
+            delta_logprob_token_ids_list,
+            delta_logprobs_list,
+            finish_reasons,
+        ):
+            request_id = str(request_id)
+            tools = self._request_tools.get(request_id, None)
+            if tools is None:
+                continue
+
+            stream, choice_index, _ = tools
+            finish_reason = str(finish_reason) if finish_reason is not None else None
+            self._get_choice_outputs(choice_outputs, stream)[choice_index] = (
+                str(delta_text),
+                int(num_tokens),
+                (
+                    data.TokenLogProbs(delta_logprob_token_ids.numpy(), delta_logprobs.numpy())
+                    if delta_logprobs is not None
+                    else None
+                ),
+                finish_reason,
+            )
+            if finish_reason is not None:
+                self._request_tools.pop(request_id, None)
+        self._push_choice_outputs(choice_outputs)
+
+    @staticmethod
+    def _get_choice_outputs(
+        choice_outputs: Dict[int, Tuple[AsyncRequestStream, List[Optional[ChoiceOutput]]]],
+        stream: AsyncRequestStream,
+    ) -> List[Optional[ChoiceOutput]]:
+        """Get the list collecting the outputs of the choices of the stream in one callback."""
+        if id(stream) not in choice_outputs:
+            choice_outputs[id(stream)] = (stream, [None] * stream.num_choices)
+        return choice_outputs[id(stream)][1]
+
+    @staticmethod
+    def _push_choice_outputs(
+        choice_outputs: Dict[int, Tuple[AsyncRequestStream, List[Optional[ChoiceOutput]]]]
+    ) -> None:
+        """Push the collected outputs of the choices to each stream in one item,
+        and finish the streams whose choices have all finished."""
+        for stream, outputs in choice_outputs.values():
+            stream.push(outputs)
+            if stream.all_choices_finished:
+                stream.finish()
 
     def record_event(self, request_id: str, event: str) -> None:
         """Record a event for the the input request in the trace
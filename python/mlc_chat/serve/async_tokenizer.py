@@ -0,0 +1,120 @@
+"""The asynchronous batched tokenization stage in MLC LLM serving."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from ..tokenizer import Tokenizer
+
+
+class AsyncTokenizer:
+    """The tokenization stage that runs tokenizer on a dedicated thread
+    and coalesces concurrent encoding requests into batches.
+
+    Each call of `encode` enqueues the text and returns a future that is
+    resolved once the batch containing the text is tokenized. A batch is
+    flushed when either `max_batch_size` texts are pending, or the oldest
+    pending text has waited for `batch_window` seconds. The batched encoding
+    runs on a background thread, so that the asyncio event loop only awaits
+    the future and keeps serving other streams.
+
+    Parameters
+    ----------
+    tokenizer : Tokenizer
+        The tokenizer to encode texts with.
+
+    max_batch_size : int
+        The maximum number of texts to encode in one batch.
+
+    batch_window : float
+        The time window (in seconds) to wait for more texts to coalesce
+        into a batch after the first text arrives.
+    """
+
+    def __init__(
+        self, tokenizer: Tokenizer, max_batch_size: int = 64, batch_window: float = 0.002
+    ) -> None:
+        assert max_batch_size > 0, "The max batch size of tokenization is expected to be positive."
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        # NOTE: We use a single worker since the underlying tokenizer keeps
+        # per-handle encoding buffers and is not safe to call concurrently.
+        # The GIL is released in the encoding FFI call, so the worker does
+        # not block the event loop thread.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mlc-tokenize")
+        # The pending texts and their futures to resolve.
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def encode(self, text: str) -> List[int]:
+        """Asynchronously encode text into ids.
+
+        Parameters
+        ----------
+        text : str
+            The text string to encode.
+
+        Returns
+        -------
+        token_ids : List[int]
+            The list of encoded token ids.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush, loop)
+        return await future
+
+    async def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """Asynchronously encode a list of texts into ids.
+        The texts may be coalesced with texts from other concurrent callers.
+
+        Parameters
+        ----------
+        texts : List[str]
+            The text strings to encode.
+
+        Returns
+        -------
+        token_ids : List[List[int]]
+            The list of encoded token ids, one for each input text.
+        """
+        if len(texts) == 0:
+            return []
+        return list(await asyncio.gather(*[self.encode(text) for text in texts]))
+
+    def terminate(self) -> None:
+        """Shut down the tokenization thread."""
+        self._executor.shutdown(wait=False)
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Submit all pending texts as one batch to the tokenization thread."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if len(pending) == 0:
+            return
+
+        batch_future = loop.run_in_executor(
+            self._executor, self.tokenizer.encode_batch, [text for text, _ in pending]
+        )
+
+        def _dispatch(batch_future: asyncio.Future) -> None:
+            exception = None if batch_future.cancelled() else batch_future.exception()
+            for i, (_, future) in enumerate(pending):
+                if future.done():
+                    # The awaiting coroutine has been cancelled.
+                    continue
+                if batch_future.cancelled():
+                    future.cancel()
+                elif exception is not None:
+                    future.set_exception(exception)
+                else:
+                    future.set_result(batch_future.result()[i])
+
+        batch_future.add_done_callback(_dispatch)
@@ -2,7 +2,21 @@
 
 import json
 from dataclasses import asdict, dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
+
+
+@dataclass
+class ResponseFormat:
+    """The response format dataclass.
+
+    Parameters
+    ----------
+    type : Literal["text", "json_object"]
+        The type of the response format. "json_object" constrains the output to be
+        a JSON object by the JSON grammar.
+    """
+
+    type: Literal["text", "json_object"] = "text"
 
 
 @dataclass
@@ -11,12 +25,22 @@ class GenerationConfig:  # pylint: disable=too-many-instance-attributes
 
     Parameters
     ----------
+    n : int
+        The number of sequences to generate for the request. The sequences are
+        sampled independently after the prompt is prefilled once, and share the
+        KV data of the prompt.
+
     temperature : float
         The value that applies to logits and modulates the next token probabilities.
 
     top_p : float
         In sampling, only the most probable tokens with probabilities summed up to
-        `top_k` are kept for sampling.
+        `top_p` are kept for sampling.
+
+    top_k : int
+        In sampling, only the `top_k` most probable tokens are kept for sampling.
+        It is disabled when non-positive. The probabilities of the kept tokens
+        are renormalized after applying both `top_p` and `top_k`.
 
     frequency_penalty : float
         Positive values penalize new tokens based on their existing frequency
@@ -63,10 +87,15 @@ class GenerationConfig:  # pylint: disable=too-many-instance-attributes
     ignore_eos: bool
         When it is true, ignore the eos token and generate tokens until `max_tokens`.
         Default is set to False.
+
+    response_format : ResponseFormat
+        The format of the response, which is plain text by default.
     """
 
+    n: int = 1
     temperature: float = 0.8
     top_p: float = 0.95
+    top_k: int = -1
     frequency_penalty: float = 0.0
     presence_penalty: float = 0.0
     repetition_penalty: float = 1.0
@@ -80,6 +109,8 @@ class GenerationConfig:  # pylint: disable=too-many-instance-attributes
     stop_token_ids: List[int] = field(default_factory=list)
     ignore_eos: bool = False
 
+    response_format: ResponseFormat = field(default_factory=ResponseFormat)
+
     def asjson(self) -> str:
         """Return the config in string of JSON format."""
         return json.dumps(asdict(self))
@@ -87,7 +118,10 @@ class GenerationConfig:  # pylint: disable=too-many-instance-attributes
     @staticmethod
     def from_json(json_str: str) -> "GenerationConfig":
         """Construct a config from JSON string."""
-        return GenerationConfig(**json.loads(json_str))
+        config = json.loads(json_str)
+        if "response_format" in config:
+            config["response_format"] = ResponseFormat(**config["response_format"])
+        return GenerationConfig(**config)
 
 
 @dataclass
@@ -112,12 +146,20 @@ class KVCacheConfig:
     prefill_chunk_size : Optional[int]
         The maximum total sequence length in a prefill.
         If not specified, it will be automatically inferred from model config.
+
+    prefix_cache_max_num_entries : int
+        The maximum number of prefilled prompt prefixes whose KV data are kept
+        in the prefix cache, so that later requests sharing a prompt prefix skip
+        the prefill of the shared part. The prefixes are aligned to pages, and
+        a prompt caches the prefix it shares with the cached prompts as well as
+        its own longest prefix. Set it to 0 to disable the prefix cache.
     """
 
     page_size: int = 16
     max_num_sequence: int = 32
     max_total_sequence_length: Optional[int] = None
     prefill_chunk_size: Optional[int] = None
+    prefix_cache_max_num_entries: int = 0
 
     def asjson(self) -> str:
         """Return the config in string of JSON format."""
@@ -140,10 +182,33 @@ class EngineMode:
 
     spec_draft_length : int
         The number of tokens to generate in speculative proposal (draft), default 4.
+        It is the initial draft length of requests when the draft length is adaptive.
+
+    spec_adaptive_draft_length : bool
+        Whether the draft length of each request adapts to the rate at which its draft
+        tokens are accepted, default True. The draft length is chosen to maximize the
+        expected number of tokens generated per unit of time, and is shortened down to
+        one token, i.e., close to plain decoding, when speculation does not pay off.
+
+    spec_max_draft_length : int
+        The maximum draft length of requests when the draft length is adaptive, default 8.
+
+    scheduler : Literal["fcfs", "shortest_prompt_first", "priority", "fair_share"]
+        The policy deciding which waiting requests are admitted first, and which
+        running requests are preempted first when the KV cache runs out, default "fcfs".
+        "fcfs" serves requests in the order of arrival.
+        "shortest_prompt_first" admits requests with shorter prompts first.
+        "priority" admits requests with higher `priority` first.
+        "fair_share" admits requests of the tenant that has been served the fewest
+        tokens first, where the tenant is given by the `tenant` of requests.
+        Requests tied under a policy are served in the order of arrival.
     """
 
     enable_speculative: bool = False
     spec_draft_length: int = 4
+    spec_adaptive_draft_length: bool = True
+    spec_max_draft_length: int = 8
+    scheduler: Literal["fcfs", "shortest_prompt_first", "priority", "fair_share"] = "fcfs"
 
     def asjson(self) -> str:
         """Return the config in string of JSON format."""
@@ -1,7 +1,8 @@
 """Classes denoting multi-modality data used in MLC LLM serving"""
 
-from typing import List, Optional, Tuple
+from typing import List, NamedTuple, Optional, Tuple
 
+import numpy as np
 import tvm._ffi
 from tvm.runtime import Object
 
@@ -57,11 +58,39 @@ class TokenData(Data):
         return list(_ffi_api.TokenDataGetTokenIds(self))  # type: ignore  # pylint: disable=no-member
 
 
+class TokenLogProbs(NamedTuple):
+    """The logprobs of a sequence of generated tokens, packed in arrays.
+
+    Parameters
+    ----------
+    token_ids : np.ndarray
+        The token ids in int32 and shape `(num_tokens, 1 + top_logprobs)`.
+        In each row, the first column is the generated token, and the other
+        columns are the tokens with top probabilities in descending order.
+
+    logprobs : np.ndarray
+        The logprobs in float32 corresponding to `token_ids`.
+    """
+
+    token_ids: np.ndarray
+    logprobs: np.ndarray
+
+    @staticmethod
+    def concat(token_logprobs: List["TokenLogProbs"]) -> "TokenLogProbs":
+        """Concatenate the logprobs of consecutive token sequences."""
+        if len(token_logprobs) == 1:
+            return token_logprobs[0]
+        return TokenLogProbs(
+            np.concatenate([item.token_ids for item in token_logprobs]),
+            np.concatenate([item.logprobs for item in token_logprobs]),
+        )
+
+
 @tvm._ffi.register_object("mlc.serve.RequestStreamOutput")  # pylint: disable=protected-access
 class RequestStreamOutput(Object):
     """The generated delta request output that is streamed back
     through callback stream function.
-    It contains four fields (in order):
+    It contains five fields (in order):
 
     request_id : str
         The id of the request that the function is invoked for.
@@ -70,9 +99,12 @@ class RequestStreamOutput(Object):
         The new generated tokens since the last callback invocation
         for the input request.
 
-    delta_logprob_json_strs : Optional[List[str]]
-        The logprobs JSON strings of the new generated tokens
-        since last invocation.
+    delta_logprob_token_ids : Optional[tvm.nd.NDArray]
+        The ids of the new generated tokens and their top tokens since
+        last invocation. Check out `TokenLogProbs` for the layout.
+
+    delta_logprobs : Optional[tvm.nd.NDArray]
+        The logprobs corresponding to `delta_logprob_token_ids`.
 
     finish_reason : Optional[str]
         The finish reason of the request when it is finished,
@@ -84,7 +116,7 @@ class RequestStreamOutput(Object):
     instantiates this class.
     """
 
-    def unpack(self) -> Tuple[str, List[int], Optional[List[str]], Optional[str]]:
+    def unpack(self) -> Tuple[str, List[int], Optional[TokenLogProbs], Optional[str]]:
         """Return the fields of the delta output in a tuple.
 
         Returns
@@ -96,9 +128,9 @@ class RequestStreamOutput(Object):
             The new generated tokens since the last callback invocation
             for the input request.
 
-        delta_logprob_json_strs : Optional[List[str]]
-            The logprobs JSON strings of the new generated tokens
-            since last invocation.
+        delta_logprobs : Optional[TokenLogProbs]
+            The logprobs of the new generated tokens since last
+            invocation, or None if logprobs are not requested.
 
         finish_reason : Optional[str]
             The finish reason of the request when it is finished,
@@ -109,9 +141,9 @@ class RequestStreamOutput(Object):
             str(fields[0]),
             list(fields[1]),
             (
-                [str(logprob_json_str) for logprob_json_str in fields[2]]
+                TokenLogProbs(fields[2].numpy(), fields[3].numpy())
                 if fields[2] is not None
                 else None
             ),
-            str(fields[3]) if fields[3] is not None else None,
+            str(fields[4]) if fields[4] is not None else None,
         )
@@ -2,18 +2,17 @@
 
 import json
 import os
-import subprocess
-import sys
 from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import tvm
-from tvm.runtime import Device
+from tvm.runtime import DataType, Device
 
 from mlc_chat.serve import data
 from mlc_chat.support import logging
 from mlc_chat.support.auto_device import detect_device
+from mlc_chat.support.model_metadata import compute_memory_usage, read_metadata
 from mlc_chat.support.style import green
 
 from ..chat_module import _get_chat_config, _get_lib_module_path, _get_model_path
@@ -137,10 +136,27 @@ def _process_model_args(
     )
 
 
+def _get_gpu_size_bytes(device: Device) -> int:
+    """Get the single-card GPU memory size in bytes."""
+    gpu_size_bytes = os.environ.get("MLC_GPU_SIZE_BYTES", default=None)
+    if gpu_size_bytes is None:
+        gpu_size_bytes = device.total_global_memory
+        if gpu_size_bytes is None:
+            raise ValueError(
+                "Cannot read total GPU global memory from device. "
+                'Please the GPU memory size in bytes through "MLC_GPU_SIZE_BYTES" env variable.'
+            )
+    return int(gpu_size_bytes)
+
+
 def _estimate_max_total_sequence_length(  # pylint: disable=too-many-locals
-    models: List[ModelInfo], config_file_paths: List[str]
+    models: List[ModelInfo],
+    config_file_paths: List[str],
+    gpu_memory_budget_bytes: Optional[int] = None,
 ) -> int:
-    """Estimate the max total sequence length (capacity) of the KV cache."""
+    """Estimate the max total sequence length (capacity) of the KV cache.
+    The models are sized to fit the given GPU memory budget in bytes, or the
+    whole single-card GPU memory when the budget is not specified."""
     assert len(models) != 0
 
     kv_bytes_per_token = 0
@@ -149,49 +165,42 @@ def _estimate_max_total_sequence_length(  # pylint: disable=too-many-locals
 
     for model, config_file_path in zip(models, config_file_paths):
         # Read metadata for the parameter size and the temporary memory size.
-        cmd = [
-            sys.executable,
-            "-m",
-            "mlc_chat.cli.model_metadata",
-            model.model_lib_path,
-            "--print-memory-usage-in-json",
-            "--mlc-chat-config",
-            config_file_path,
-        ]
-        usage_str = subprocess.check_output(cmd, universal_newlines=True)
-        usage_json = json.loads(usage_str)
-        params_bytes += usage_json["params_bytes"]
-        temp_func_bytes = max(temp_func_bytes, usage_json["temp_func_bytes"])
+        with open(config_file_path, mode="rt", encoding="utf-8") as file:
+            mlc_chat_config = json.load(file)
+        metadata = read_metadata(model.model_lib_path)
+        model_params_bytes, model_temp_func_bytes, _ = compute_memory_usage(
+            metadata, mlc_chat_config
+        )
+        params_bytes += model_params_bytes
+        temp_func_bytes = max(temp_func_bytes, model_temp_func_bytes)
 
         # Read model config and compute the kv size per token.
-        with open(config_file_path, mode="rt", encoding="utf-8") as file:
-            json_object = json.load(file)
-            model_config = json_object["model_config"]
-            num_layers = model_config["num_hidden_layers"]
-            hidden_size = model_config["hidden_size"]
-            num_qo_heads = model_config["num_attention_heads"]
-            num_kv_heads = model_config["num_key_value_heads"]
-            tensor_parallel_shards = model_config["tensor_parallel_shards"]
+        model_config = mlc_chat_config["model_config"]
+        num_layers = model_config["num_hidden_layers"]
+        hidden_size = model_config["hidden_size"]
+        num_qo_heads = model_config["num_attention_heads"]
+        num_kv_heads = model_config["num_key_value_heads"]
+        tensor_parallel_shards = model_config["tensor_parallel_shards"]
+        # Model libraries compiled before the KV cache dtype is recorded store k/v in fp16.
+        kv_dtype_bytes = DataType(metadata.get("kv_cache_dtype", "float16")).bits // 8
         kv_bytes_per_token += (
             (hidden_size / num_qo_heads)
             * (num_kv_heads / tensor_parallel_shards)  # on single GPU
             * num_layers
-            * 4  # key, value, fp16
+            * 2  # key, value
+            * kv_dtype_bytes
             * 1.10  # over estimation to guarantee safety
         )
 
-    # Get single-card GPU size.
-    gpu_size_bytes = os.environ.get("MLC_GPU_SIZE_BYTES", default=None)
-    if gpu_size_bytes is None:
-        gpu_size_bytes = models[0].device.total_global_memory
-        if gpu_size_bytes is None:
-            raise ValueError(
-                "Cannot read total GPU global memory from device. "
-                'Please the GPU memory size in bytes through "MLC_GPU_SIZE_BYTES" env variable.'
-            )
+    # Get single-card GPU size, or the memory budget of the models.
+    gpu_size_bytes = (
+        gpu_memory_budget_bytes
+        if gpu_memory_budget_bytes is not None
+        else _get_gpu_size_bytes(models[0].device)
+    )
 
     max_total_sequence_length = int(
-        (int(gpu_size_bytes) * 0.97 - params_bytes * 1.04 - temp_func_bytes) / kv_bytes_per_token
+        (gpu_size_bytes * 0.97 - params_bytes * 1.04 - temp_func_bytes) / kv_bytes_per_token
     )
     assert max_total_sequence_length > 0, (
         "Cannot estimate KV cache capacity. "
@@ -290,6 +299,7 @@ class Engine:
                 "abort_request",
                 "step",
                 "stats",
+                "metrics",
                 "reset",
                 "get_request_stream_callback",
                 "set_request_stream_callback",
@@ -329,7 +339,7 @@ class Engine:
         self,
         prompts: Union[str, List[str], List[int], List[List[int]]],
         generation_config: Union[GenerationConfig, List[GenerationConfig]],
-    ) -> Tuple[List[str], List[Optional[List[str]]]]:
+    ) -> Tuple[List[str], List[Optional[data.TokenLogProbs]]]:
         """Generate texts for a list of input prompts.
         Each prompt can be a string or a list of token ids.
         The generation for each prompt is independent.
@@ -353,8 +363,8 @@ class Engine:
         output_text : List[str]
             The text generation results, one string for each input prompt.
 
-        output_logprobs_str : List[Optional[List[str]]]
-            The logprob strings of each token for each input prompt, or None
+        output_logprobs : List[Optional[data.TokenLogProbs]]
+            The logprobs of the generated tokens for each input prompt, or None
             if an input prompt does not require logprobs.
         """
         if isinstance(prompts, str):
@@ -378,14 +388,19 @@ class Engine:
         assert (
             len(generation_config) == num_requests
         ), "Number of generation config and number of prompts mismatch"
+        if any(config.n > 1 for config in generation_config):
+            raise ValueError(
+                "Engine.generate returns one output for each prompt and does not support n > 1. "
+                "Please use AsyncThreadedEngine.generate to generate multiple choices."
+            )
 
         num_finished_requests = 0
         output_texts: List[str] = []
-        output_logprobs_str: List[Optional[List[str]]] = []
+        output_logprobs: List[Optional[List[data.TokenLogProbs]]] = []
         text_streamers: List[TextStreamer] = []
         for i in range(num_requests):
             output_texts.append("")
-            output_logprobs_str.append([] if generation_config[i].logprobs else None)
+            output_logprobs.append([] if generation_config[i].logprobs else None)
             text_streamers.append(TextStreamer(self.tokenizer))
 
         # Save a copy of the original function callback since `generate`
@@ -400,14 +415,15 @@ class Engine:
                 (
                     request_id,
                     delta_token_ids,
-                    delta_logprob_json_strs,
+                    delta_logprobs,
                     finish_reason,
                 ) = delta_output.unpack()
                 rid = int(request_id)
                 text_streamer = text_streamers[rid]
-                if output_logprobs_str[rid] is not None:
-                    assert delta_logprob_json_strs is not None
-                    output_logprobs_str[rid] += delta_logprob_json_strs
+                request_logprobs = output_logprobs[rid]
+                if request_logprobs is not None:
+                    assert delta_logprobs is not None
+                    request_logprobs.append(delta_logprobs)
 
                 delta_text = text_streamer.put(delta_token_ids)
                 if finish_reason is not None:
@@ -440,7 +456,10 @@ class Engine:
 
         # Restore the callback function in engine.
         self._ffi["set_request_stream_callback"](original_callback)
-        return output_texts, output_logprobs_str
+        return output_texts, [
+            data.TokenLogProbs.concat(logprobs) if logprobs is not None else None
+            for logprobs in output_logprobs
+        ]
 
     def add_request(self, request: Request) -> None:
         """Add a new request to the engine.
@@ -480,7 +499,7 @@ class Engine:
         """Reset the engine, clean up all running data and statistics."""
         self._ffi["reset"]()
 
-    def stats(self) -> Dict[str, float]:
+    def stats(self) -> Dict[str, Any]:
         """The engine runtime statistics.
         We collect the following entries:
         - single token prefill latency (s/tok): avg latency of processing one token in prefill
@@ -489,6 +508,31 @@ class Engine:
         - engine time for decode (sec)
         - total number of processed tokens in prefill.
         - total number of processed tokens in decode.
+        - prefix cache hit rate: the fraction of prefilled requests that hit a cached prefix
+        - prefix cache token hit rate: the fraction of input tokens whose prefill is skipped
+        - prefix cache hit tokens, evictions and number of entries.
+        - average and max queue wait time (sec) of requests before their admission, and the
+          same statistics of each request class of the scheduler in "queue_wait_by_class".
+        - in speculative decoding, the number of draft verifications by the number of accepted
+          draft tokens in "spec_accept_histogram", the number of finished requests by their
+          draft acceptance rate in buckets of width 0.1 in
+          "spec_request_acceptance_rate_histogram", and the average draft length.
         """
         stats_json_str = self._ffi["stats"]()
         return json.loads(stats_json_str)
+
+    def metrics(self) -> Dict[str, Any]:
+        """The engine metrics for monitoring. Different from `stats`, they are raw
+        counters, gauges and histograms updated incrementally at each engine step, which
+        are cheap to read frequently. They are organized as
+        - "counters": the numbers of added, finished and aborted requests, of prefilled
+          and generated tokens, and the engine time on prefill and decode,
+        - "gauges": the numbers of waiting and running requests, and the fraction of
+          KV cache pages in use,
+        - "histograms": the waiting queue size and running batch size at each step,
+          time to first token, inter-token latency, request latency (sec), and the
+          number of tokens per second of each prefill and decode step.
+        Each histogram has the bucket upper "bounds", the number of observations in each
+        bucket "counts" (with one more bucket for +Inf), and the "sum" and "count".
+        """
+        return json.loads(self._ffi["metrics"]())
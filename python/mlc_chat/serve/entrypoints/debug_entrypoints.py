@@ -35,11 +35,15 @@ async def debug_dump_event_trace(request: fastapi.Request):
 
     # - Check the requested model.
     model = request_dict["model"]
-    async_engine = ServerContext.get_engine(model)
-    if async_engine is None:
+    if model not in ServerContext.get_model_list():
         return entrypoint_utils.create_error_response(
             HTTPStatus.BAD_REQUEST, message=f'The requested model "{model}" is not served.'
         )
+    async_engine = ServerContext.get_resident_engine(model)
+    if async_engine is None:
+        return entrypoint_utils.create_error_response(
+            HTTPStatus.BAD_REQUEST, message=f'The requested model "{model}" is not loaded.'
+        )
     if async_engine.trace_recorder is None:
         return entrypoint_utils.create_error_response(
             HTTPStatus.BAD_REQUEST, message=f'The requested model "{model}" does not enable tracing'
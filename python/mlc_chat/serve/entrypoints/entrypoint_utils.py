@@ -2,7 +2,7 @@
 
 import uuid
 from http import HTTPStatus
-from typing import Callable, List, Optional, Union
+from typing import Awaitable, Callable, List, Optional, Union
 
 import fastapi
 
@@ -55,19 +55,20 @@ def check_prompts_length(
     return None
 
 
-def process_prompts(
+async def process_prompts(
     input_prompts: Union[str, List[int], List[Union[str, List[int]]]],
-    ftokenize: Callable[[str], List[int]],
+    ftokenize_batch: Callable[[List[str]], Awaitable[List[List[int]]]],
 ) -> Union[List[List[int]], fastapi.responses.JSONResponse]:
     """Convert all input tokens to list of token ids with regard to the
-    given tokenization function.
+    given batched tokenization function.
     For each input prompt, return the list of token ids after tokenization.
+    All the string prompts are tokenized together in one batch.
     """
     error_msg = f"Invalid request prompt {input_prompts}"
 
     # Case 1. The prompt is a single string.
     if isinstance(input_prompts, str):
-        return [ftokenize(input_prompts)]
+        return await ftokenize_batch([input_prompts])
 
     assert isinstance(input_prompts, list)
     if len(input_prompts) == 0:
@@ -81,6 +82,7 @@ def process_prompts(
 
     # Case 3. A list of prompts.
     output_prompts: List[List[int]] = []
+    str_prompt_indices: List[int] = []
     for input_prompt in input_prompts:
         is_str = isinstance(input_prompt, str)
         is_token_ids = isinstance(input_prompt, list) and all(
@@ -88,5 +90,15 @@ def process_prompts(
         )
         if not (is_str or is_token_ids):
             return create_error_response(HTTPStatus.BAD_REQUEST, message=error_msg)
-        output_prompts.append(ftokenize(input_prompt) if is_str else input_prompt)  # type: ignore
+        if is_str:
+            str_prompt_indices.append(len(output_prompts))
+            output_prompts.append([])
+        else:
+            output_prompts.append(input_prompt)  # type: ignore
+    if len(str_prompt_indices) != 0:
+        token_ids_list = await ftokenize_batch(
+            [input_prompts[i] for i in str_prompt_indices]  # type: ignore
+        )
+        for i, token_ids in zip(str_prompt_indices, token_ids_list):
+            output_prompts[i] = token_ids
     return output_prompts
@@ -0,0 +1,146 @@
+"""MLC LLM server metrics entrypoints in the Prometheus text exposition format."""
+from typing import Any, Dict, List, Tuple
+
+import fastapi
+from fastapi.responses import PlainTextResponse
+
+from ..server import ServerContext
+
+app = fastapi.APIRouter()
+
+# The exported counters, gauges and histograms, as tuples of the key in the engine
+# metrics, the exported metric name and the help text.
+_COUNTERS: List[Tuple[str, str, str]] = [
+    ("requests_added", "mlc_requests_added_total", "Number of requests added to the engine."),
+    ("requests_finished", "mlc_requests_finished_total", "Number of finished requests."),
+    ("requests_aborted", "mlc_requests_aborted_total", "Number of aborted requests."),
+    (
+        "prefill_tokens",
+        "mlc_prefill_tokens_total",
+        "Number of prefilled tokens, including the recomputation after preemption.",
+    ),
+    ("generated_tokens", "mlc_generated_tokens_total", "Number of generated tokens."),
+    ("prefill_time", "mlc_prefill_time_seconds_total", "Engine time spent on prefill."),
+    ("decode_time", "mlc_decode_time_seconds_total", "Engine time spent on decode."),
+]
+_GAUGES: List[Tuple[str, str, str]] = [
+    ("waiting_requests", "mlc_waiting_requests", "Number of requests waiting for admission."),
+    ("running_requests", "mlc_running_requests", "Number of running requests."),
+    (
+        "kv_cache_utilization",
+        "mlc_kv_cache_utilization",
+        "Fraction of the KV cache pages in use.",
+    ),
+]
+_HISTOGRAMS: List[Tuple[str, str, str]] = [
+    (
+        "waiting_queue_size",
+        "mlc_waiting_queue_size",
+        "Number of waiting requests at the start of each engine step.",
+    ),
+    (
+        "running_batch_size",
+        "mlc_running_batch_size",
+        "Number of running requests at the start of each engine step.",
+    ),
+    (
+        "time_to_first_token",
+        "mlc_time_to_first_token_seconds",
+        "Time from adding a request to returning its first token.",
+    ),
+    (
+        "inter_token_latency",
+        "mlc_inter_token_latency_seconds",
+        "Time between returning successive tokens of a request.",
+    ),
+    ("request_latency", "mlc_request_latency_seconds", "Time from adding a request to finish."),
+    (
+        "prefill_throughput",
+        "mlc_prefill_throughput_tokens_per_second",
+        "Number of tokens prefilled per second in each prefill step.",
+    ),
+    (
+        "decode_throughput",
+        "mlc_decode_throughput_tokens_per_second",
+        "Number of tokens generated per second in each decode step.",
+    ),
+]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: Any) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_prometheus_metrics(  # pylint: disable=too-many-locals
+    model_metrics: Dict[str, Dict[str, Any]]
+) -> str:
+    """Format the engine metrics of each model in the Prometheus text exposition format.
+
+    Parameters
+    ----------
+    model_metrics : Dict[str, Dict[str, Any]]
+        The mapping from the model name to the metrics of its engine, which is
+        returned by `AsyncThreadedEngine.metrics`.
+
+    Returns
+    -------
+    metrics_text : str
+        The metrics in text format, where each sample is labeled with the model.
+    """
+    lines: List[str] = []
+    for key, name, help_text in _COUNTERS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for model, metrics in model_metrics.items():
+            value = metrics["counters"][key]
+            lines.append(f"{name}{_format_labels({'model': model})} {_format_value(value)}")
+
+    for key, name, help_text in _GAUGES:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for model, metrics in model_metrics.items():
+            value = metrics["gauges"][key]
+            lines.append(f"{name}{_format_labels({'model': model})} {_format_value(value)}")
+
+    for key, name, help_text in _HISTOGRAMS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for model, metrics in model_metrics.items():
+            histogram = metrics["histograms"][key]
+            cumulative_count = 0
+            bounds = [_format_value(float(bound)) for bound in histogram["bounds"]] + ["+Inf"]
+            for bound, count in zip(bounds, histogram["counts"]):
+                cumulative_count += count
+                labels = _format_labels({"model": model, "le": bound})
+                lines.append(f"{name}_bucket{labels} {cumulative_count}")
+            labels = _format_labels({"model": model})
+            lines.append(f"{name}_sum{labels} {_format_value(float(histogram['sum']))}")
+            lines.append(f"{name}_count{labels} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+################ /metrics ################
+
+
+@app.get("/metrics")
+async def metrics():
+    """Return the metrics of the engines of the resident models in the Prometheus
+    text exposition format. The metrics are maintained incrementally by the engines,
+    so scraping does not depend on the amount of served requests."""
+    model_metrics: Dict[str, Dict[str, Any]] = {}
+    for model in ServerContext.get_model_list():
+        async_engine = ServerContext.get_resident_engine(model)
+        if async_engine is None:
+            continue
+        engine_metrics = async_engine.metrics()
+        if engine_metrics:
+            model_metrics[model] = engine_metrics
+    return PlainTextResponse(
+        format_prometheus_metrics(model_metrics),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
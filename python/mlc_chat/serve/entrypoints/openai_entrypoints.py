@@ -4,7 +4,7 @@
 import ast
 import json
 from http import HTTPStatus
-from typing import AsyncGenerator, Dict, List, Optional, Union
+from typing import AsyncGenerator, Dict, List, Optional, Tuple, Union
 
 import fastapi
 
@@ -22,13 +22,21 @@ from ...protocol.openai_api_protocol import (
     CompletionRequest,
     CompletionResponse,
     CompletionResponseChoice,
+    EmbeddingObject,
+    EmbeddingRequest,
+    EmbeddingResponse,
     ListResponse,
     LogProbs,
     LogProbsContent,
+    ModelResidency,
     ModelResponse,
+    TopLogProbs,
     UsageInfo,
 )
+from ..async_engine import AsyncThreadedEngine
+from ..data import TokenLogProbs
 from ..server import ServerContext
+from ..server.model_manager import EngineHold
 from . import entrypoint_utils
 
 app = fastapi.APIRouter()
@@ -41,7 +49,14 @@ async def request_models():
     """OpenAI-compatible served model query API.
     API reference: https://platform.openai.com/docs/api-reference/models
     """
-    return ListResponse(data=[ModelResponse(id=model) for model in ServerContext.get_model_list()])
+    return ListResponse(
+        data=[
+            ModelResponse(
+                id=model, residency=ModelResidency(**ServerContext.get_model_stats(model))
+            )
+            for model in ServerContext.get_model_list()
+        ]
+    )
 
 
 ################ v1/completions ################
@@ -52,12 +67,23 @@ async def request_completion(request: CompletionRequest, raw_request: fastapi.Re
     """OpenAI-compatible completion API.
     API reference: https://platform.openai.com/docs/api-reference/completions/create
     """
-    # - Check the requested model.
-    async_engine = ServerContext.get_engine(request.model)
-    if async_engine is None:
+    # - Check the requested model, and hold its engine from eviction until the request finishes.
+    engine_hold = await ServerContext.get_engine(request.model)
+    if engine_hold is None:
         return entrypoint_utils.create_error_response(
             HTTPStatus.BAD_REQUEST, message=f'The requested model "{request.model}" is not served.'
         )
+    try:
+        return await _request_completion(request, raw_request, engine_hold)
+    finally:
+        engine_hold.release()
+
+
+async def _request_completion(
+    request: CompletionRequest, raw_request: fastapi.Request, engine_hold: EngineHold
+):
+    """Serve the completion request with the held engine of the requested model."""
+    async_engine = engine_hold.engine
     request_id = f"cmpl-{entrypoint_utils.random_uuid()}"
     async_engine.record_event(request_id, event="receive request")
 
@@ -68,7 +94,9 @@ async def request_completion(request: CompletionRequest, raw_request: fastapi.Re
 
     # - Process prompt and check validity.
     async_engine.record_event(request_id, event="start tokenization")
-    prompts = entrypoint_utils.process_prompts(request.prompt, async_engine.tokenizer.encode)
+    prompts = await entrypoint_utils.process_prompts(
+        request.prompt, async_engine.async_tokenizer.encode_batch
+    )
     async_engine.record_event(request_id, event="finish tokenization")
     if isinstance(prompts, fastapi.responses.JSONResponse):
         # Errored when processing the prompts
@@ -86,19 +114,32 @@ async def request_completion(request: CompletionRequest, raw_request: fastapi.Re
 
     # Process generation config. Create request id.
     generation_cfg = protocol_utils.get_generation_config(request)
+    # Generate "best_of" candidates and return the best "n" of them, which are
+    # ranked by the mean logprob of the generated tokens.
+    generation_cfg.n = request.best_of
+    if request.best_of > request.n:
+        generation_cfg.logprobs = True
+    if generation_cfg.n > async_engine.max_num_sequence:
+        return entrypoint_utils.create_error_response(
+            HTTPStatus.BAD_REQUEST,
+            message=f"The number of generated sequences {generation_cfg.n} exceeds the maximum "
+            f"number of sequences {async_engine.max_num_sequence} of the served model.",
+        )
 
     # Streaming response.
     if request.stream:
 
         async def completion_stream_generator() -> AsyncGenerator[str, None]:
-            assert request.n == 1
+            assert request.best_of == request.n
 
             # - Echo back the prompt.
             if request.echo:
                 text = async_engine.tokenizer.decode(prompt)
                 response = CompletionResponse(
                     id=request_id,
-                    choices=[CompletionResponseChoice(text=text)],
+                    choices=[
+                        CompletionResponseChoice(index=i, text=text) for i in range(request.n)
+                    ],
                     model=request.model,
                     usage=UsageInfo(
                         prompt_tokens=len(prompt),
@@ -109,37 +150,37 @@ async def request_completion(request: CompletionRequest, raw_request: fastapi.Re
 
             # - Generate new tokens.
             num_completion_tokens = 0
-            finish_reason = None
+            finish_reasons: List[Optional[str]] = [None] * request.n
             async_engine.record_event(request_id, event="invoke generate")
-            async for (
-                delta_text,
-                num_delta_tokens,
-                delta_logprob_json_strs,
-                finish_reason,
-            ) in async_engine.generate(prompt, generation_cfg, request_id):
-                num_completion_tokens += num_delta_tokens
-                if delta_text == "":
+            async for outputs in async_engine.generate(
+                prompt, generation_cfg, request_id, request.priority, request.user or ""
+            ):
+                choices = []
+                for i, output in enumerate(outputs):
+                    delta_text, num_delta_tokens, delta_logprobs = "", 0, None
+                    if output is not None:
+                        (
+                            delta_text,
+                            num_delta_tokens,
+                            delta_logprobs,
+                            finish_reasons[i],
+                        ) = output
+                    num_completion_tokens += num_delta_tokens
+                    choices.append(
+                        CompletionResponseChoice(
+                            finish_reason=finish_reasons[i],
+                            index=i,
+                            text=delta_text,
+                            logprobs=_get_logprobs(async_engine, delta_logprobs),
+                        )
+                    )
+                if all(choice.text == "" for choice in choices):
                     # Ignore empty delta text -- do not yield.
                     continue
 
                 response = CompletionResponse(
                     id=request_id,
-                    choices=[
-                        CompletionResponseChoice(
-                            finish_reason=finish_reason,
-                            text=delta_text,
-                            logprobs=(
-                                LogProbs(
-                                    content=[
-                                        LogProbsContent.model_validate_json(logprob_json_str)
-                                        for logprob_json_str in delta_logprob_json_strs
-                                    ]
-                                )
-                                if delta_logprob_json_strs is not None
-                                else None
-                            ),
-                        )
-                    ],
+                    choices=choices,
                     model=request.model,
                     usage=UsageInfo(
                         prompt_tokens=len(prompt),
@@ -151,14 +192,16 @@ async def request_completion(request: CompletionRequest, raw_request: fastapi.Re
 
             # - Echo the suffix.
             if request.suffix is not None:
-                assert finish_reason is not None
+                assert all(finish_reason is not None for finish_reason in finish_reasons)
                 response = CompletionResponse(
                     id=request_id,
                     choices=[
                         CompletionResponseChoice(
                             finish_reason=finish_reason,
+                            index=i,
                             text=request.suffix,
                         )
+                        for i, finish_reason in enumerate(finish_reasons)
                     ],
                     model=request.model,
                     usage=UsageInfo(
@@ -171,21 +214,20 @@ async def request_completion(request: CompletionRequest, raw_request: fastapi.Re
             yield "data: [DONE]\n\n"
 
         return fastapi.responses.StreamingResponse(
-            completion_stream_generator(), media_type="text/event-stream"
+            engine_hold.hold_stream(completion_stream_generator()),
+            media_type="text/event-stream",
         )
 
     # Normal response.
-    output_text = "" if not request.echo else async_engine.tokenizer.decode(prompt)
+    num_candidates = generation_cfg.n
+    output_texts = [""] * num_candidates
     num_completion_tokens = 0
-    finish_reason: Optional[str] = None
-    logprob_json_strs: Optional[List[str]] = [] if generation_cfg.logprobs else None
+    finish_reasons: List[Optional[str]] = [None] * num_candidates
+    output_logprobs: List[List[TokenLogProbs]] = [[] for _ in range(num_candidates)]
     async_engine.record_event(request_id, event="invoke generate")
-    async for (
-        delta_text,
-        num_delta_tokens,
-        delta_logprob_json_strs,
-        finish_reason,
-    ) in async_engine.generate(prompt, generation_cfg, request_id):
+    async for outputs in async_engine.generate(
+        prompt, generation_cfg, request_id, request.priority, request.user or ""
+    ):
         if await raw_request.is_disconnected():
             # In non-streaming cases, the engine will not be notified
             # when the request is disconnected.
@@ -195,31 +237,41 @@ async def request_completion(request: CompletionRequest, raw_request: fastapi.Re
             return entrypoint_utils.create_error_response(
                 HTTPStatus.BAD_REQUEST, message="The request has disconnected"
             )
-        output_text += delta_text
-        num_completion_tokens += num_delta_tokens
-        if logprob_json_strs is not None:
-            assert delta_logprob_json_strs is not None
-            logprob_json_strs += delta_logprob_json_strs
-    assert finish_reason is not None
+        for i, output in enumerate(outputs):
+            if output is None:
+                continue
+            delta_text, num_delta_tokens, delta_logprobs, finish_reasons[i] = output
+            output_texts[i] += delta_text
+            num_completion_tokens += num_delta_tokens
+            if generation_cfg.logprobs:
+                assert delta_logprobs is not None
+                output_logprobs[i].append(delta_logprobs)
+    assert all(finish_reason is not None for finish_reason in finish_reasons)
+    prefix = "" if not request.echo else async_engine.tokenizer.decode(prompt)
     suffix = request.suffix if request.suffix is not None else ""
     async_engine.record_event(request_id, event="finish")
+
+    logprobs: List[Optional[TokenLogProbs]] = [
+        TokenLogProbs.concat(choice_logprobs) if generation_cfg.logprobs else None
+        for choice_logprobs in output_logprobs
+    ]
+    candidates = list(range(num_candidates))
+    if request.best_of > request.n:
+        candidates = sorted(candidates, key=lambda i: _get_mean_logprob(logprobs[i]), reverse=True)[
+            : request.n
+        ]
     response = CompletionResponse(
         id=request_id,
         choices=[
             CompletionResponseChoice(
-                finish_reason=finish_reason,
-                text=output_text + suffix,
+                finish_reason=finish_reasons[candidate],
+                index=i,
+                text=prefix + output_texts[candidate] + suffix,
                 logprobs=(
-                    LogProbs(
-                        content=[
-                            LogProbsContent.model_validate_json(logprob_json_str)
-                            for logprob_json_str in logprob_json_strs
-                        ]
-                    )
-                    if logprob_json_strs is not None
-                    else None
+                    _get_logprobs(async_engine, logprobs[candidate]) if request.logprobs else None
                 ),
             )
+            for i, candidate in enumerate(candidates)
         ],
         model=request.model,
         usage=UsageInfo(
@@ -230,6 +282,92 @@ async def request_completion(request: CompletionRequest, raw_request: fastapi.Re
     return response
 
 
+def _get_logprobs(
+    async_engine: AsyncThreadedEngine, logprobs: Optional[TokenLogProbs]
+) -> Optional[LogProbs]:
+    """Build the logprobs of tokens from the packed logprob arrays returned by the engine.
+    The fields come from the engine, so the objects are constructed without validation."""
+    if logprobs is None:
+        return None
+    token_table = async_engine.logprob_token_table
+    content = []
+    for token_ids, token_logprobs in zip(logprobs.token_ids.tolist(), logprobs.logprobs.tolist()):
+        token, token_bytes = token_table[token_ids[0]]
+        top_logprobs = [
+            TopLogProbs.model_construct(
+                token=token_table[top_token_id][0],
+                logprob=top_logprob,
+                bytes=token_table[top_token_id][1],
+            )
+            for top_token_id, top_logprob in zip(token_ids[1:], token_logprobs[1:])
+        ]
+        content.append(
+            LogProbsContent.model_construct(
+                token=token,
+                logprob=token_logprobs[0],
+                bytes=token_bytes,
+                top_logprobs=top_logprobs,
+            )
+        )
+    return LogProbs.model_construct(content=content)
+
+
+def _get_mean_logprob(logprobs: Optional[TokenLogProbs]) -> float:
+    """Get the mean logprob of the generated tokens, which ranks the candidates of "best_of"."""
+    assert logprobs is not None
+    if logprobs.logprobs.shape[0] == 0:
+        return float("-inf")
+    return float(logprobs.logprobs[:, 0].mean())
+
+
+################ v1/embeddings ################
+
+
+@app.post("/v1/embeddings")
+async def request_embeddings(request: EmbeddingRequest):
+    """OpenAI-compatible embedding API.
+    API reference: https://platform.openai.com/docs/api-reference/embeddings/create
+    """
+    # - Check the requested model, and hold its engine from eviction until the request finishes.
+    engine_hold = await ServerContext.get_engine(request.model)
+    if engine_hold is None:
+        return entrypoint_utils.create_error_response(
+            HTTPStatus.BAD_REQUEST, message=f'The requested model "{request.model}" is not served.'
+        )
+    try:
+        return await _request_embeddings(request, engine_hold)
+    finally:
+        engine_hold.release()
+
+
+async def _request_embeddings(request: EmbeddingRequest, engine_hold: EngineHold):
+    """Serve the embedding request with the held engine of the requested model."""
+    async_engine = engine_hold.engine
+
+    # - Process the inputs and check validity.
+    prompts = await entrypoint_utils.process_prompts(
+        request.input, async_engine.async_tokenizer.encode_batch
+    )
+    if isinstance(prompts, fastapi.responses.JSONResponse):
+        # Errored when processing the prompts
+        return prompts
+    if any(len(prompt) == 0 for prompt in prompts):
+        return entrypoint_utils.create_error_response(
+            HTTPStatus.BAD_REQUEST, message="Entrypoint /v1/embeddings does not accept empty input."
+        )
+
+    # - All the inputs are embedded together in batches.
+    embeddings = await async_engine.embed(prompts)
+    return EmbeddingResponse(
+        data=[
+            EmbeddingObject(embedding=embedding.tolist(), index=i)
+            for i, embedding in enumerate(embeddings)
+        ],
+        model=request.model,
+        usage=UsageInfo(prompt_tokens=sum(len(prompt) for prompt in prompts)),
+    )
+
+
 ################ v1/chat/completions ################
 
 
@@ -329,18 +467,27 @@ def convert_function_str_to_json(stringified_calls: str) -> List[Union[Dict, Non
 
 
 @app.post("/v1/chat/completions")
-async def request_chat_completion(
-    request: ChatCompletionRequest, raw_request: fastapi.Request
-):  # pylint: disable=too-many-branches
+async def request_chat_completion(request: ChatCompletionRequest, raw_request: fastapi.Request):
     """OpenAI-compatible chat completion API.
     API reference: https://platform.openai.com/docs/api-reference/chat
     """
-    # - Check the requested model.
-    async_engine = ServerContext.get_engine(request.model)
-    if async_engine is None:
+    # - Check the requested model, and hold its engine from eviction until the request finishes.
+    engine_hold = await ServerContext.get_engine(request.model)
+    if engine_hold is None:
         return entrypoint_utils.create_error_response(
             HTTPStatus.BAD_REQUEST, message=f'The requested model "{request.model}" is not served.'
         )
+    try:
+        return await _request_chat_completion(request, raw_request, engine_hold)
+    finally:
+        engine_hold.release()
+
+
+async def _request_chat_completion(  # pylint: disable=too-many-branches
+    request: ChatCompletionRequest, raw_request: fastapi.Request, engine_hold: EngineHold
+):
+    """Serve the chat completion request with the held engine of the requested model."""
+    async_engine = engine_hold.engine
     request_id = f"chatcmpl-{entrypoint_utils.random_uuid()}"
     async_engine.record_event(request_id, event="receive request")
 
@@ -385,8 +532,8 @@ async def request_chat_completion(
     # - Get the prompt from template, and encode to token ids.
     # - Check prompt length
     async_engine.record_event(request_id, event="start tokenization")
-    prompts = entrypoint_utils.process_prompts(
-        conv_template.as_prompt(), async_engine.tokenizer.encode
+    prompts = await entrypoint_utils.process_prompts(
+        conv_template.as_prompt(), async_engine.async_tokenizer.encode_batch
     )
     async_engine.record_event(request_id, event="finish tokenization")
     assert isinstance(prompts, list) and len(prompts) == 1, "Internal error"
@@ -404,68 +551,70 @@ async def request_chat_completion(
         extra_stop_str=conv_template.stop_str,
     )
 
+    if generation_cfg.n > async_engine.max_num_sequence:
+        return entrypoint_utils.create_error_response(
+            HTTPStatus.BAD_REQUEST,
+            message=f"The number of choices {generation_cfg.n} exceeds the maximum number "
+            f"of sequences {async_engine.max_num_sequence} of the served model.",
+        )
+
     # Streaming response.
     if request.stream:
 
         async def completion_stream_generator() -> AsyncGenerator[str, None]:
-            assert request.n == 1
+            finish_reasons: List[Optional[str]] = [None] * request.n
             async_engine.record_event(request_id, event="invoke generate")
-            async for (
-                delta_text,
-                _,
-                delta_logprob_json_strs,
-                finish_reason,
-            ) in async_engine.generate(prompt, generation_cfg, request_id):
-                if delta_text == "":
+            async for outputs in async_engine.generate(
+                prompt, generation_cfg, request_id, request.priority, request.user or ""
+            ):
+                choices = []
+                for i, output in enumerate(outputs):
+                    delta_text, delta_logprobs = "", None
+                    if output is not None:
+                        delta_text, _, delta_logprobs, finish_reason = output
+                        if conv_template.use_function_calling:
+                            finish_reason = "tool_calls"
+                        finish_reasons[i] = finish_reason
+                    choices.append(
+                        ChatCompletionStreamResponseChoice(
+                            finish_reason=finish_reasons[i],
+                            index=i,
+                            delta=ChatCompletionMessage(content=delta_text, role="assistant"),
+                            logprobs=_get_logprobs(async_engine, delta_logprobs),
+                        )
+                    )
+                if all(choice.delta.content == "" for choice in choices):
                     async_engine.record_event(request_id, event="skip empty delta text")
                     # Ignore empty delta text -- do not yield.
                     continue
 
-                if conv_template.use_function_calling:
-                    finish_reason = "tool_calls"
-
                 response = ChatCompletionStreamResponse(
                     id=request_id,
-                    choices=[
-                        ChatCompletionStreamResponseChoice(
-                            finish_reason=finish_reason,
-                            delta=ChatCompletionMessage(content=delta_text, role="assistant"),
-                            logprobs=(
-                                LogProbs(
-                                    content=[
-                                        LogProbsContent.model_validate_json(logprob_json_str)
-                                        for logprob_json_str in delta_logprob_json_strs
-                                    ]
-                                )
-                                if delta_logprob_json_strs is not None
-                                else None
-                            ),
-                        )
-                    ],
+                    choices=choices,
                     model=request.model,
                     system_fingerprint="",
                 )
-                async_engine.record_event(request_id, event=f"yield delta text {delta_text}")
+                async_engine.record_event(request_id, event="yield delta text")
                 yield f"data: {response.model_dump_json()}\n\n"
             async_engine.record_event(request_id, event="finish")
             yield "data: [DONE]\n\n"
 
         return fastapi.responses.StreamingResponse(
-            completion_stream_generator(), media_type="text/event-stream"
+            engine_hold.hold_stream(completion_stream_generator()),
+            media_type="text/event-stream",
         )
 
     # Normal response.
-    output_text = ""
+    output_texts = [""] * request.n
     num_completion_tokens = 0
-    finish_reason: Optional[str] = None
-    logprob_json_strs: Optional[List[str]] = [] if generation_cfg.logprobs else None
+    finish_reasons: List[Optional[str]] = [None] * request.n
+    output_logprobs: Optional[List[List[TokenLogProbs]]] = (
+        [[] for _ in range(request.n)] if generation_cfg.logprobs else None
+    )
     async_engine.record_event(request_id, event="invoke generate")
-    async for (
-        delta_text,
-        num_delta_tokens,
-        delta_logprob_json_strs,
-        finish_reason,
-    ) in async_engine.generate(prompt, generation_cfg, request_id):
+    async for outputs in async_engine.generate(
+        prompt, generation_cfg, request_id, request.priority, request.user or ""
+    ):
         if await raw_request.is_disconnected():
             # In non-streaming cases, the engine will not be notified
             # when the request is disconnected.
@@ -475,63 +624,64 @@ async def request_chat_completion(
             return entrypoint_utils.create_error_response(
                 HTTPStatus.BAD_REQUEST, message="The request has disconnected"
             )
-        output_text += delta_text
-        num_completion_tokens += num_delta_tokens
-        if logprob_json_strs is not None:
-            assert delta_logprob_json_strs is not None
-            logprob_json_strs += delta_logprob_json_strs
-    assert finish_reason is not None
+        for i, output in enumerate(outputs):
+            if output is None:
+                continue
+            delta_text, num_delta_tokens, delta_logprobs, finish_reasons[i] = output
+            output_texts[i] += delta_text
+            num_completion_tokens += num_delta_tokens
+            if output_logprobs is not None:
+                assert delta_logprobs is not None
+                output_logprobs[i].append(delta_logprobs)
+    assert all(finish_reason is not None for finish_reason in finish_reasons)
 
     async_engine.record_event(request_id, event="finish")
 
-    if conv_template.use_function_calling:
-        try:
-            fn_json_list = convert_function_str_to_json(output_text)
-        except (SyntaxError, ValueError):
-            output_text = "Got an invalid function call output from model"
-            finish_reason = "error"
-        else:
-            tool_calls = [
-                ChatToolCall(
-                    type="function",
-                    function=ChatFunctionCall(
-                        name=fn_json_obj["name"], arguments=fn_json_obj["arguments"]
-                    ),
-                )
-                for fn_json_obj in fn_json_list
-                if fn_json_obj is not None
-            ]
-            if len(tool_calls) == 0:
-                output_text = "Got an invalid function call output from model"
-                finish_reason = "error"
-            else:
-                finish_reason = "tool_calls"
-
-    message = (
-        ChatCompletionMessage(role="assistant", content=output_text)
-        if (not conv_template.use_function_calling or finish_reason == "error")
-        else ChatCompletionMessage(role="assistant", content=None, tool_calls=tool_calls)
-    )
-
-    return ChatCompletionResponse(
-        id=request_id,
-        choices=[
+    choices = []
+    for i, (output_text, finish_reason) in enumerate(zip(output_texts, finish_reasons)):
+        message = ChatCompletionMessage(role="assistant", content=output_text)
+        if conv_template.use_function_calling:
+            message, finish_reason = _get_tool_calls_message(output_text)
+        choices.append(
             ChatCompletionResponseChoice(
                 finish_reason=finish_reason,
+                index=i,
                 message=message,
                 logprobs=(
-                    LogProbs(
-                        content=[
-                            LogProbsContent.model_validate_json(logprob_json_str)
-                            for logprob_json_str in logprob_json_strs
-                        ]
-                    )
-                    if logprob_json_strs is not None
+                    _get_logprobs(async_engine, TokenLogProbs.concat(output_logprobs[i]))
+                    if output_logprobs is not None
                     else None
                 ),
             )
-        ],
+        )
+    return ChatCompletionResponse(
+        id=request_id,
+        choices=choices,
         model=request.model,
         system_fingerprint="",
         usage=UsageInfo(prompt_tokens=len(prompt), completion_tokens=num_completion_tokens),
     )
+
+
+def _get_tool_calls_message(output_text: str) -> Tuple[ChatCompletionMessage, str]:
+    """Parse the function calls in the output text, and return the message
+    together with the finish reason, which is "error" for invalid calls."""
+    error_message = ChatCompletionMessage(
+        role="assistant", content="Got an invalid function call output from model"
+    )
+    try:
+        fn_json_list = convert_function_str_to_json(output_text)
+    except (SyntaxError, ValueError):
+        return error_message, "error"
+    tool_calls = [
+        ChatToolCall(
+            type="function",
+            function=ChatFunctionCall(name=fn_json_obj["name"], arguments=fn_json_obj["arguments"]),
+        )
+        for fn_json_obj in fn_json_list
+        if fn_json_obj is not None
+    ]
+    if len(tool_calls) == 0:
+        return error_message, "error"
+    message = ChatCompletionMessage(role="assistant", content=None, tool_calls=tool_calls)
+    return message, "tool_calls"
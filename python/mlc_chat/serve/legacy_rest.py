@@ -0,0 +1,255 @@
+"""The continuous batching backend of the legacy `mlc_chat.rest` server.
+
+The legacy server runs every request on one ChatModule, so requests are processed one at a time.
+This backend serves the same API with AsyncThreadedEngine instead, where concurrent requests are
+batched by the engine. Requests beyond the admission limit are rejected rather than queued
+without bound.
+"""
+import dataclasses
+import time
+import weakref
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ..conversation_template import ConvTemplateRegistry
+from ..interface.openai_api import ChatMessage, UsageInfo
+from .async_engine import AsyncThreadedEngine
+from .config import GenerationConfig
+from .entrypoints.entrypoint_utils import random_uuid
+
+
+class ServerOverloadedError(RuntimeError):
+    """The error raised when the number of pending requests reaches the admission limit."""
+
+
+class _Admission:
+    """The pending request slots reserved for admitted requests, which are released once."""
+
+    def __init__(self, engine: "LegacyRESTEngine", num_requests: int) -> None:
+        self._engine = engine
+        self.num_requests = num_requests
+        engine.num_pending_requests += num_requests
+
+    def release(self) -> None:
+        """Release the reserved slots. Releasing more than once has no effect."""
+        if self._engine is not None:
+            self._engine.num_pending_requests -= self.num_requests
+            self._engine = None
+
+
+class LegacyRESTEngine:
+    """The backend of the legacy REST API on top of AsyncThreadedEngine.
+
+    Parameters
+    ----------
+    engine : AsyncThreadedEngine
+        The engine serving the model.
+
+    max_pending_requests : int
+        The maximum number of requests admitted at the same time, including both the running
+        requests and the requests waiting in the engine.
+    """
+
+    def __init__(self, engine: AsyncThreadedEngine, max_pending_requests: int) -> None:
+        self.engine = engine
+        self.max_pending_requests = max_pending_requests
+        self.num_pending_requests = 0
+        self._conv_template = (
+            ConvTemplateRegistry.get_conv_template(engine.conv_template_name)
+            if engine.conv_template_name is not None
+            else None
+        )
+        self._start_time = time.monotonic()
+        self._num_finished_requests = 0
+        self._num_rejected_requests = 0
+        self._total_prompt_tokens = 0
+        self._total_completion_tokens = 0
+
+    async def tokenize_chat(self, messages: List[ChatMessage]) -> List[int]:
+        """Apply the conversation template of the model to the messages, and tokenize."""
+        if self._conv_template is None:
+            raise ValueError("The served model does not have a conversation template.")
+        conv_template = self._conv_template.model_copy(deep=True)
+        for message in messages:
+            if message.role == "system":
+                conv_template.system_message = message.content or ""
+            elif message.role in ("user", "assistant"):
+                conv_template.messages.append((message.role, message.content))
+            else:
+                raise ValueError("Only user and assistant roles are supported.")
+        conv_template.messages.append(("assistant", None))
+        prompt = (await self.engine.async_tokenizer.encode_batch([conv_template.as_prompt()]))[0]
+        if conv_template.system_prefix_token_ids is not None:
+            prompt = conv_template.system_prefix_token_ids + prompt
+        if len(prompt) > self.engine.max_single_sequence_length:
+            raise ValueError(
+                f"Request prompt has {len(prompt)} tokens, larger than the model capacity "
+                f"{self.engine.max_single_sequence_length}."
+            )
+        return prompt
+
+    def get_generation_config(  # pylint: disable=too-many-arguments
+        self,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+        repetition_penalty: Optional[float] = None,
+        presence_penalty: Optional[float] = None,
+        frequency_penalty: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stop: Optional[Union[str, List[str]]] = None,
+    ) -> GenerationConfig:
+        """Create the generation config from the fields of legacy requests, where unspecified
+        fields take the defaults of the engine."""
+        kwargs: Dict[str, Any] = {
+            "temperature": temperature,
+            "top_p": top_p,
+            "repetition_penalty": repetition_penalty,
+            "presence_penalty": presence_penalty,
+            "frequency_penalty": frequency_penalty,
+            "max_tokens": max_tokens,
+        }
+        kwargs = {key: value for key, value in kwargs.items() if value is not None}
+        stop_strs = [stop] if isinstance(stop, str) else list(stop or [])
+        stop_token_ids: List[int] = []
+        if self._conv_template is not None:
+            stop_strs += self._conv_template.stop_str
+            stop_token_ids += self._conv_template.stop_token_ids
+        return GenerationConfig(stop_strs=stop_strs, stop_token_ids=stop_token_ids, **kwargs)
+
+    def admit(self, num_requests: int = 1) -> _Admission:
+        """Reserve the pending request slots of the given number of new requests. The check
+        and the reservation are one step, so that concurrent requests cannot all pass the check
+        before any of them is counted.
+
+        Raises
+        ------
+        ServerOverloadedError
+            If the number of pending requests would exceed the admission limit.
+        """
+        if self.num_pending_requests + num_requests > self.max_pending_requests:
+            self._num_rejected_requests += 1
+            raise ServerOverloadedError(
+                f"The server has {self.num_pending_requests} pending requests, and cannot admit "
+                f"{num_requests} more under the limit {self.max_pending_requests}. "
+                "Please retry later."
+            )
+        return _Admission(self, num_requests)
+
+    def generate(
+        self, prompt: List[int], generation_config: GenerationConfig
+    ) -> AsyncGenerator[str, None]:
+        """Admit the request, and return the generator of its delta texts. The request is
+        admitted on the call instead of at the start of iteration, so that an overloaded
+        request fails with ServerOverloadedError before responding, rather than with a broken
+        stream. The slot is released when the generator finishes, is closed, or is
+        garbage-collected without being iterated.
+
+        Raises
+        ------
+        ServerOverloadedError
+            If the number of pending requests reaches the admission limit.
+        """
+        admission = self.admit()
+
+        async def _generate() -> AsyncGenerator[str, None]:
+            async for delta_texts in self._generate_choices(prompt, generation_config, admission):
+                if delta_texts[0] != "":
+                    yield delta_texts[0]
+
+        generator = _generate()
+        weakref.finalize(generator, admission.release)
+        return generator
+
+    async def generate_all(
+        self, prompt: List[int], generation_config: GenerationConfig, n: int = 1
+    ) -> Tuple[List[str], UsageInfo]:
+        """Generate `n` outputs for a tokenized prompt, which share the prefilled prompt.
+
+        Returns
+        -------
+        output_texts : List[str]
+            The output text of each of the `n` choices.
+
+        usage : UsageInfo
+            The number of prompt tokens, counted once for all choices, and the total number of
+            tokens generated by the choices.
+
+        Raises
+        ------
+        ServerOverloadedError
+            If the number of pending requests would exceed the admission limit.
+        """
+        admission = self.admit(n)
+        output_texts = [""] * n
+        usage = UsageInfo(prompt_tokens=len(prompt))
+        async for delta_texts in self._generate_choices(
+            prompt, dataclasses.replace(generation_config, n=n), admission, usage
+        ):
+            for i, delta_text in enumerate(delta_texts):
+                output_texts[i] += delta_text
+        return output_texts, usage
+
+    async def _generate_choices(
+        self,
+        prompt: List[int],
+        generation_config: GenerationConfig,
+        admission: _Admission,
+        usage: Optional[UsageInfo] = None,
+    ) -> AsyncGenerator[List[str], None]:
+        """Generate the `generation_config.n` choices in one request, and yield the delta
+        text of every choice, which is empty for the choices without new output. The slots
+        of the admission are released when the generation finishes or fails, and the number
+        of generated tokens is added to `usage` if given."""
+        num_choices = generation_config.n
+        num_completion_tokens = 0
+        try:
+            async for outputs in self.engine.generate(
+                prompt, generation_config, request_id=f"rest-{random_uuid()}"
+            ):
+                delta_texts = [""] * num_choices
+                for i, output in enumerate(outputs):
+                    if output is not None:
+                        delta_texts[i], num_delta_tokens, _, _ = output
+                        num_completion_tokens += num_delta_tokens
+                yield delta_texts
+        finally:
+            admission.release()
+            self._num_finished_requests += num_choices
+            self._total_prompt_tokens += len(prompt) * num_choices
+            self._total_completion_tokens += num_completion_tokens
+            if usage is not None:
+                usage.completion_tokens += num_completion_tokens
+                usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Compute the mean-pooled and L2-normalized embeddings of the texts with the engine,
+        in batches between the engine steps. Like ChatModule, each text is embedded as a user
+        message in the conversation template.
+
+        Returns
+        -------
+        embeddings : np.ndarray
+            The float32 embeddings in shape (len(texts), hidden_size).
+        """
+        prompts = [
+            await self.tokenize_chat([ChatMessage(role="user", content=text)]) for text in texts
+        ]
+        return await self.engine.embed(prompts)
+
+    def stats(self) -> Dict[str, Any]:
+        """The serving statistics since the server started."""
+        elapsed = time.monotonic() - self._start_time
+        return {
+            "num_pending_requests": self.num_pending_requests,
+            "max_pending_requests": self.max_pending_requests,
+            "num_finished_requests": self._num_finished_requests,
+            "num_rejected_requests": self._num_rejected_requests,
+            "total_prompt_tokens": self._total_prompt_tokens,
+            "total_completion_tokens": self._total_completion_tokens,
+            "completion_throughput": f"{self._total_completion_tokens / elapsed:.3f} tok/s",
+        }
+
+    def terminate(self) -> None:
+        """Terminate the engine."""
+        self.engine.terminate()
@@ -28,13 +28,22 @@ class Request(Object):
     generation_config : GenerationConfig
         The sampling configuration which may contain temperature,
         top_p, repetition_penalty, max_gen_len, etc.
+
+    priority : int
+        The priority of the request under the "priority" scheduler.
+        Requests with higher priority are admitted first and preempted last.
+
+    tenant : str
+        The tenant the request belongs to under the "fair_share" scheduler.
     """
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         request_id: str,
         inputs: Union[Data, List[Data]],
         generation_config: GenerationConfig,
+        priority: int = 0,
+        tenant: str = "",
     ):
         if not isinstance(inputs, list):
             inputs = [inputs]
@@ -43,6 +52,8 @@ class Request(Object):
             request_id,
             inputs,
             generation_config.asjson(),
+            priority,
+            tenant,
         )
 
     @property
@@ -1,6 +1,8 @@
 """Entrypoint of RESTful HTTP request server in MLC LLM"""
 import argparse
+import functools
 import json
+from typing import Optional
 
 import fastapi
 import uvicorn
@@ -14,13 +16,23 @@ def parse_args_and_initialize() -> argparse.Namespace:
     """Parse the server arguments and initialize the engine."""
 
     args = argparse.ArgumentParser()  # pylint: disable=redefined-outer-name
-    args.add_argument("--model", type=str, required=True)
-    args.add_argument("--model-lib-path", type=str, required=True)
+    args.add_argument("--model", type=str, action="append", required=True)
+    args.add_argument("--model-lib-path", type=str, action="append", required=True)
     args.add_argument("--device", type=str, default="auto")
     args.add_argument("--max-batch-size", type=int, default=80)
     args.add_argument("--max-total-seq-length", type=int)
     args.add_argument("--prefill-chunk-size", type=int)
+    args.add_argument("--prefix-cache-max-num-entries", type=int, default=0)
+    args.add_argument(
+        "--scheduler",
+        type=str,
+        choices=["fcfs", "shortest_prompt_first", "priority", "fair_share"],
+        default="fcfs",
+    )
+    args.add_argument("--memory-budget-gb", type=float)
+    args.add_argument("--max-resident-models", type=int)
     args.add_argument("--enable-tracing", action="store_true")
+    args.add_argument("--detokenize-in-background", action="store_true")
 
     args.add_argument("--host", type=str, default="127.0.0.1", help="host name")
     args.add_argument("--port", type=int, default=8000, help="port")
@@ -30,26 +42,55 @@ def parse_args_and_initialize() -> argparse.Namespace:
     args.add_argument("--allowed-headers", type=json.loads, default=["*"], help="allowed headers")
 
     parsed = args.parse_args()
+    if len(parsed.model) != len(parsed.model_lib_path):
+        args.error('Each "--model" requires a corresponding "--model-lib-path".')
 
-    # Initialize model loading info and KV cache config
-    model_info = async_engine.ModelInfo(
-        model=parsed.model,
-        model_lib_path=parsed.model_lib_path,
-        device=parsed.device,
+    ServerContext.init_model_manager(
+        memory_budget_bytes=(
+            int(parsed.memory_budget_gb * 1024 * 1024 * 1024)
+            if parsed.memory_budget_gb is not None
+            else None
+        ),
+        max_resident_models=parsed.max_resident_models,
     )
+    for model, model_lib_path in zip(parsed.model, parsed.model_lib_path):
+        # Initialize model loading info.
+        model_info = async_engine.ModelInfo(
+            model=model,
+            model_lib_path=model_lib_path,
+            device=parsed.device,
+        )
+        ServerContext.register_model(
+            model, model_info, functools.partial(_create_engine, parsed, model_info)
+        )
+    # Load the models that fit in the memory budget now, so that the first requests do not wait
+    # for loading and a model failing to load fails the startup. The other models are loaded at
+    # their first requests.
+    ServerContext.load_models()
+    return parsed
+
+
+def _create_engine(
+    parsed: argparse.Namespace,
+    model_info: async_engine.ModelInfo,
+    gpu_memory_budget_bytes: Optional[int],
+) -> async_engine.AsyncThreadedEngine:
+    """Create the engine of a model and start the background loop."""
     kv_cache_config = config.KVCacheConfig(
         max_num_sequence=parsed.max_batch_size,
         max_total_sequence_length=parsed.max_total_seq_length,
         prefill_chunk_size=parsed.prefill_chunk_size,
+        prefix_cache_max_num_entries=parsed.prefix_cache_max_num_entries,
     )
-    # Create engine and start the background loop
-    engine = async_engine.AsyncThreadedEngine(
-        model_info, kv_cache_config, enable_tracing=parsed.enable_tracing
+    return async_engine.AsyncThreadedEngine(
+        model_info,
+        kv_cache_config,
+        engine_mode=config.EngineMode(scheduler=parsed.scheduler),
+        enable_tracing=parsed.enable_tracing,
+        detokenize_in_background=parsed.detokenize_in_background,
+        gpu_memory_budget_bytes=gpu_memory_budget_bytes,
     )
 
-    ServerContext.add_model(parsed.model, engine)
-    return parsed
-
 
 if __name__ == "__main__":
     # Parse the arguments and initialize the asynchronous engine.
@@ -64,8 +105,9 @@ if __name__ == "__main__":
     )
 
     # Include the routers from subdirectories.
-    from ..entrypoints import debug_entrypoints, openai_entrypoints
+    from ..entrypoints import debug_entrypoints, metrics_entrypoints, openai_entrypoints
 
     app.include_router(openai_entrypoints.app)
     app.include_router(debug_entrypoints.app)
+    app.include_router(metrics_entrypoints.app)
     uvicorn.run(app, host=args.host, port=args.port, log_level="info")
@@ -0,0 +1,317 @@
+"""The manager of the models hosted by the server, which loads models on demand
+and keeps the resident models within one GPU memory budget."""
+
+import asyncio
+import gc
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, TypeVar
+
+from ...support import logging
+from ..async_engine import AsyncThreadedEngine
+from ..engine import ModelInfo, _get_gpu_size_bytes
+
+logging.enable_logging()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class _HostedModel:  # pylint: disable=too-many-instance-attributes
+    """The residency state of a hosted model."""
+
+    model_info: Optional[ModelInfo]
+    create_engine: Optional[Callable[[Optional[int]], AsyncThreadedEngine]]
+    engine: Optional[AsyncThreadedEngine] = None
+    pinned: bool = False
+    last_used: Optional[float] = None
+    num_holds: int = 0
+    num_loads: int = 0
+    num_evictions: int = 0
+    total_load_time: float = 0.0
+    last_load_time: Optional[float] = None
+
+
+class EngineHold:
+    """A hold on the engine of a resident model, which keeps the model from being
+    evicted until the hold is released. Requests hold the engine from looking it
+    up until they finish."""
+
+    def __init__(self, model: _HostedModel, on_release: Callable[[], None]) -> None:
+        assert model.engine is not None
+        self.engine: AsyncThreadedEngine = model.engine
+        self._model = model
+        self._on_release = on_release
+        self._released = False
+        model.num_holds += 1
+
+    def release(self) -> None:
+        """Release the hold. Releasing a hold more than once has no effect."""
+        if not self._released:
+            self._released = True
+            self._model.num_holds -= 1
+            self._on_release()
+
+    def hold_stream(self, stream: AsyncGenerator[T, None]) -> AsyncGenerator[T, None]:
+        """Hold the engine until the stream finishes, independently of this hold.
+        The returned stream releases its hold when it finishes or is closed, or
+        when it is garbage collected without being iterated."""
+        hold = EngineHold(self._model, self._on_release)
+
+        async def _stream() -> AsyncGenerator[T, None]:
+            try:
+                async for item in stream:
+                    yield item
+            finally:
+                hold.release()
+
+        held_stream = _stream()
+        weakref.finalize(held_stream, hold.release)
+        return held_stream
+
+
+class ModelManager:
+    """The manager of hosted models.
+
+    Models are registered without being loaded. The server loads the models
+    that fit up front with `load_models`, and the other models are loaded at
+    the first request to them. At most `max_resident_models` models are
+    resident at the same time, each of which is given an equal share of the
+    memory budget to size its KV cache. To load a model when there is no room,
+    the least recently used resident model without requests holding its engine
+    is evicted. When every resident model is in use, the load waits until a
+    request releases its hold on an engine.
+
+    Parameters
+    ----------
+    memory_budget_bytes : Optional[int]
+        The GPU memory in bytes shared by the resident models. It defaults to
+        the GPU memory size of the device of the first loaded model.
+
+    max_resident_models : Optional[int]
+        The maximum number of models resident at the same time. It defaults to
+        the number of registered models, in which case no model is evicted.
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: Optional[int] = None,
+        max_resident_models: Optional[int] = None,
+    ) -> None:
+        if max_resident_models is not None and max_resident_models <= 0:
+            raise ValueError(
+                f"The maximum number of resident models {max_resident_models} must be positive."
+            )
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_resident_models = max_resident_models
+        self._models: Dict[str, _HostedModel] = {}
+        self._load_lock: Optional[asyncio.Lock] = None
+        # The event set when a hold on an engine is released, which wakes up the
+        # loads waiting for a model to become evictable.
+        self._hold_released: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def register_model(
+        self,
+        hosted_model: str,
+        model_info: ModelInfo,
+        create_engine: Callable[[Optional[int]], AsyncThreadedEngine],
+    ) -> None:
+        """Register a model to host without loading it.
+
+        Parameters
+        ----------
+        hosted_model : str
+            The name of the model in requests.
+
+        model_info : ModelInfo
+            The model to load.
+
+        create_engine : Callable[[Optional[int]], AsyncThreadedEngine]
+            The function creating the engine of the model, which takes the GPU
+            memory budget in bytes of the engine.
+        """
+        if hosted_model in self._models:
+            raise RuntimeError(f"Model {hosted_model} already registered.")
+        self._models[hosted_model] = _HostedModel(model_info, create_engine)
+
+    def add_engine(self, hosted_model: str, engine: AsyncThreadedEngine) -> None:
+        """Add a model together with its loaded engine, which is never evicted."""
+        if hosted_model in self._models:
+            raise RuntimeError(f"Model {hosted_model} already running.")
+        self._models[hosted_model] = _HostedModel(
+            model_info=None, create_engine=None, engine=engine, pinned=True
+        )
+
+    def load_models(self) -> None:
+        """Load the registered models in the order of registration, up to the maximum
+        number of resident models. It blocks until the models are loaded, and is called
+        before serving, so that the first requests do not wait for the models to load,
+        and that a model failing to load fails the server startup."""
+        for hosted_model, model in self._models.items():
+            if self._get_num_resident_models() >= self._get_max_resident_models():
+                break
+            if model.engine is None:
+                self._load_engine(hosted_model, model)
+
+    def get_model_list(self) -> List[str]:
+        """Get the list of hosted models."""
+        return list(self._models.keys())
+
+    def get_resident_engine(self, hosted_model: str) -> Optional[AsyncThreadedEngine]:
+        """Get the engine of the model if it is resident, without loading it."""
+        model = self._models.get(hosted_model, None)
+        return model.engine if model is not None else None
+
+    async def get_engine(self, hosted_model: str) -> Optional[EngineHold]:
+        """Get a hold on the engine of the model, and load the model if it is not
+        resident. The model is not evicted until the hold is released.
+        Return None if the model is not hosted."""
+        model = self._models.get(hosted_model, None)
+        if model is None:
+            return None
+        if model.engine is None:
+            await self._load(hosted_model, model)
+        model.last_used = time.time()
+        return EngineHold(model, self._on_release)
+
+    def get_model_stats(self, hosted_model: str) -> Dict[str, Any]:
+        """Get the residency and the load latency statistics of the model."""
+        model = self._models[hosted_model]
+        return {
+            "resident": model.engine is not None,
+            "pinned": model.pinned,
+            "last_used": model.last_used,
+            "num_loads": model.num_loads,
+            "num_evictions": model.num_evictions,
+            "last_load_latency": model.last_load_time,
+            "avg_load_latency": (
+                model.total_load_time / model.num_loads if model.num_loads > 0 else None
+            ),
+            "num_pending_requests": (
+                model.engine.num_pending_requests if model.engine is not None else 0
+            ),
+        }
+
+    def terminate(self) -> None:
+        """Terminate all the resident engines."""
+        for model in self._models.values():
+            if model.engine is not None:
+                model.engine.terminate()
+                model.engine = None
+
+    def _get_max_resident_models(self) -> int:
+        if self.max_resident_models is not None:
+            return self.max_resident_models
+        return len(self._models)
+
+    def _get_num_resident_models(self) -> int:
+        return sum(model.engine is not None for model in self._models.values())
+
+    def _get_engine_memory_budget(self, model_info: ModelInfo) -> Optional[int]:
+        num_shares = min(self._get_max_resident_models(), len(self._models))
+        if self.memory_budget_bytes is None and num_shares == 1:
+            # A single model uses the whole GPU as the standalone engine does.
+            return None
+        memory_budget_bytes = (
+            self.memory_budget_bytes
+            if self.memory_budget_bytes is not None
+            else _get_gpu_size_bytes(model_info.device)
+        )
+        return memory_budget_bytes // num_shares
+
+    def _on_release(self) -> None:
+        """Wake up the loads waiting for a model to become evictable. A hold may be
+        released from another thread when its stream is garbage collected."""
+        if self._hold_released is None or self._loop is None:
+            return
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._hold_released.set()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._hold_released.set)
+
+    def _load_engine(self, hosted_model: str, model: _HostedModel) -> None:
+        """Create the engine of the model and wait until it is initialized."""
+        assert model.model_info is not None and model.create_engine is not None
+        memory_budget_bytes = self._get_engine_memory_budget(model.model_info)
+        tstart = time.perf_counter()
+        engine = model.create_engine(memory_budget_bytes)
+        engine.wait_until_initialized()
+        load_time = time.perf_counter() - tstart
+
+        model.engine = engine
+        model.num_loads += 1
+        model.total_load_time += load_time
+        model.last_load_time = load_time
+        logger.info("Loaded model %s in %.2f s.", hosted_model, load_time)
+
+    async def _load(self, hosted_model: str, model: _HostedModel) -> None:
+        if self._load_lock is None or self._hold_released is None:
+            self._load_lock = asyncio.Lock()
+            self._hold_released = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+        while True:
+            # Clear the event before checking for an evictable model, so that a hold
+            # released after the check wakes up the wait below.
+            self._hold_released.clear()
+            # Models are loaded one at a time so that the evictions of concurrent
+            # loads do not interleave.
+            async with self._load_lock:
+                if model.engine is not None:
+                    # The model is loaded by a concurrent request.
+                    return
+                if await self._evict_for_new_model():
+                    await self._loop.run_in_executor(None, self._load_engine, hosted_model, model)
+                    return
+            # All the resident models are busy. Wait for a hold to be released without
+            # holding the lock, which would block the loads of other models.
+            await self._hold_released.wait()
+
+    async def _evict_for_new_model(self) -> bool:
+        """Evict the least recently used idle models until there is room for a new model.
+        Return False if there is no room while all the resident models are busy."""
+        loop = asyncio.get_running_loop()
+        while self._get_num_resident_models() >= self._get_max_resident_models():
+            if all(model.pinned for model in self._models.values() if model.engine is not None):
+                raise RuntimeError(
+                    "Cannot load a new model because all the resident models are pinned. "
+                    "Please increase the maximum number of resident models."
+                )
+            victim_name = self._find_eviction_victim()
+            if victim_name is None:
+                return False
+            victim = self._models[victim_name]
+            engine = victim.engine
+            assert engine is not None
+            victim.engine = None
+            victim.num_evictions += 1
+            await loop.run_in_executor(None, engine.terminate)
+            # The engine frees the device memory of the model once it is collected.
+            del engine
+            gc.collect()
+            logger.info("Evicted model %s.", victim_name)
+        return True
+
+    def _find_eviction_victim(self) -> Optional[str]:
+        """Find the least recently used resident model without holds or pending requests."""
+        victim_name: Optional[str] = None
+        victim_last_used = float("inf")
+        for name, model in self._models.items():
+            if (
+                model.engine is None
+                or model.pinned
+                or model.num_holds > 0
+                or model.engine.num_pending_requests > 0
+            ):
+                continue
+            last_used = model.last_used if model.last_used is not None else 0.0
+            if last_used < victim_last_used:
+                victim_name = name
+                victim_last_used = last_used
+        return victim_name
@@ -1,37 +1,70 @@
 """Server context that shared by multiple entrypoint files."""
 
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from ...conversation_template import ConvTemplateRegistry
 from ...protocol.conversation_protocol import Conversation
 from .. import async_engine
+from .model_manager import EngineHold, ModelManager
 
 
 class ServerContext:
-    """The global server context, including the running models
+    """The global server context, including the hosted models
     and corresponding async engines.
     """
 
-    _models: Dict[str, async_engine.AsyncThreadedEngine] = {}
+    _model_manager: ModelManager = ModelManager()
     _conv_templates: Dict[str, Conversation] = {}
 
+    @staticmethod
+    def init_model_manager(
+        memory_budget_bytes: Optional[int] = None, max_resident_models: Optional[int] = None
+    ) -> None:
+        """Set the GPU memory budget and the maximum number of resident models
+        of the hosted models. It is called before adding any model."""
+        assert not ServerContext._model_manager.get_model_list()
+        ServerContext._model_manager = ModelManager(memory_budget_bytes, max_resident_models)
+
     @staticmethod
     def add_model(hosted_model: str, engine: async_engine.AsyncThreadedEngine) -> None:
-        """Add a new model to the server context together with the engine."""
-        if hosted_model in ServerContext._models:
-            raise RuntimeError(f"Model {hosted_model} already running.")
-        ServerContext._models[hosted_model] = engine
+        """Add a new model to the server context together with the engine.
+        The engine stays resident until the server exits."""
+        ServerContext._model_manager.add_engine(hosted_model, engine)
+        ServerContext._add_conv_template(hosted_model, engine)
 
-        # Get the conversation template.
-        if engine.conv_template_name is not None:
-            conv_template = ConvTemplateRegistry.get_conv_template(engine.conv_template_name)
-            if conv_template is not None:
-                ServerContext._conv_templates[hosted_model] = conv_template
+    @staticmethod
+    def register_model(
+        hosted_model: str,
+        model_info: async_engine.ModelInfo,
+        create_engine: Callable[[Optional[int]], async_engine.AsyncThreadedEngine],
+    ) -> None:
+        """Register a new model to the server context, which is loaded by `load_models` or
+        at its first request. See `ModelManager.register_model` for the parameters."""
+        ServerContext._model_manager.register_model(hosted_model, model_info, create_engine)
 
     @staticmethod
-    def get_engine(model: str) -> Optional[async_engine.AsyncThreadedEngine]:
-        """Get the async engine of the requested model."""
-        return ServerContext._models.get(model, None)
+    def load_models() -> None:
+        """Load the registered models that fit in the residency limit before serving.
+        See `ModelManager.load_models`."""
+        ServerContext._model_manager.load_models()
+        for model in ServerContext._model_manager.get_model_list():
+            engine = ServerContext._model_manager.get_resident_engine(model)
+            if engine is not None and model not in ServerContext._conv_templates:
+                ServerContext._add_conv_template(model, engine)
+
+    @staticmethod
+    async def get_engine(model: str) -> Optional[EngineHold]:
+        """Get a hold on the async engine of the requested model, and load the model
+        if needed. The model is not evicted until the hold is released."""
+        engine_hold = await ServerContext._model_manager.get_engine(model)
+        if engine_hold is not None and model not in ServerContext._conv_templates:
+            ServerContext._add_conv_template(model, engine_hold.engine)
+        return engine_hold
+
+    @staticmethod
+    def get_resident_engine(model: str) -> Optional[async_engine.AsyncThreadedEngine]:
+        """Get the async engine of the requested model if the model is resident."""
+        return ServerContext._model_manager.get_resident_engine(model)
 
     @staticmethod
     def get_conv_template(model: str) -> Optional[Conversation]:
@@ -44,4 +77,16 @@ class ServerContext:
     @staticmethod
     def get_model_list() -> List[str]:
         """Get the list of models on serve."""
-        return list(ServerContext._models.keys())
+        return ServerContext._model_manager.get_model_list()
+
+    @staticmethod
+    def get_model_stats(model: str) -> Dict[str, Any]:
+        """Get the residency and the load latency statistics of the model."""
+        return ServerContext._model_manager.get_model_stats(model)
+
+    @staticmethod
+    def _add_conv_template(hosted_model: str, engine: async_engine.AsyncThreadedEngine) -> None:
+        if engine.conv_template_name is not None:
+            conv_template = ConvTemplateRegistry.get_conv_template(engine.conv_template_name)
+            if conv_template is not None:
+                ServerContext._conv_templates[hosted_model] = conv_template
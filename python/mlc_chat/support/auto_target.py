@@ -10,7 +10,14 @@ from tvm.target import Target
 
 from . import logging
 from .auto_device import AUTO_DETECT_DEVICES, detect_device, device2str
-from .constants import MLC_MULTI_ARCH
+from .constants import (
+    MLC_CACHE_DIR,
+    MLC_KERNEL_CACHE_MAX_GB,
+    MLC_KERNEL_CACHE_NUM_WORKERS,
+    MLC_KERNEL_CACHE_POLICY,
+    MLC_MULTI_ARCH,
+)
+from .kernel_cache import KernelCache, build_with_kernel_cache
 from .style import bold, green, red
 
 if TYPE_CHECKING:
@@ -232,6 +239,20 @@ def _build_default():
             logger.warning("Unknown output suffix: %s. Assuming shared library.", output.suffix)
             system_lib = False
         mod = _add_system_lib_prefix(mod, args.system_lib_prefix, is_system_lib=system_lib)
+        if (
+            MLC_KERNEL_CACHE_POLICY == "ON"
+            and pipeline is not None
+            and KernelCache.is_supported(args.target, system_lib)
+        ):
+            kernel_cache = KernelCache(
+                MLC_CACHE_DIR / "kernel",
+                num_workers=MLC_KERNEL_CACHE_NUM_WORKERS,
+                max_size_gb=MLC_KERNEL_CACHE_MAX_GB,
+            )
+            build_with_kernel_cache(mod, args.target, pipeline, kernel_cache).export_library(
+                str(output),
+            )
+            return
         relax.build(
             mod,
             target=args.target,
@@ -0,0 +1,98 @@
+"""Common utilities of the on-disk caches under MLC_CACHE_DIR, which share the LRU eviction
+policy: the modification time of an entry is refreshed on every hit, and least recently used
+entries are evicted until the cache fits in its size limit."""
+import dataclasses
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from . import logging
+
+logger = logging.getLogger(__name__)
+
+# Temporary directories of crashed compilations older than this are removed on pruning.
+_STALE_TEMP_DIR_SECONDS = 24 * 3600
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    """An entry in an on-disk cache."""
+
+    hash_value: str
+    lib_path: Path
+    nbytes: int
+    last_access: float
+    key: Dict[str, Any]
+
+
+def touch(path: Path) -> None:
+    """Refresh the modification time of a cached file, which is the recency of LRU eviction."""
+    try:
+        os.utime(path)
+    except OSError:
+        # Read-only caches still work, only without LRU recency.
+        pass
+
+
+def evict_lru(
+    entries: List[CacheEntry],
+    max_size_gb: float,
+    keep: Optional[Set[str]],
+    remove: Callable[[CacheEntry], bool],
+) -> List[CacheEntry]:
+    """Evict least recently used entries until the total size fits in the size limit.
+
+    Parameters
+    ----------
+    entries : List[CacheEntry]
+        The entries of the cache, most recently used first.
+
+    max_size_gb : float
+        The size limit in GB.
+
+    keep : Optional[Set[str]]
+        The hashes of the entries that are never evicted.
+
+    remove : Callable[[CacheEntry], bool]
+        The function that removes an entry, which returns False if the entry is in use and
+        cannot be removed.
+
+    Returns
+    -------
+    evicted : List[CacheEntry]
+        The evicted entries.
+    """
+    keep = keep or set()
+    total_nbytes = sum(entry.nbytes for entry in entries)
+    max_nbytes = max_size_gb * (1 << 30)
+    evicted = []
+    for entry in reversed(entries):
+        if total_nbytes <= max_nbytes:
+            break
+        if entry.hash_value in keep:
+            continue
+        if not remove(entry):
+            continue
+        evicted.append(entry)
+        total_nbytes -= entry.nbytes
+    return evicted
+
+
+def remove_stale_temp_dirs(cache_dir: Path, dry_run: bool = False) -> None:
+    """Remove the temporary directories of crashed compilations in the cache directory."""
+    now = time.time()
+    for tmp_dir in cache_dir.glob(".tmp-*"):
+        try:
+            if now - tmp_dir.stat().st_mtime < _STALE_TEMP_DIR_SECONDS:
+                continue
+        except FileNotFoundError:
+            continue
+        logger.info(
+            "%s stale temporary directory: %s",
+            "Would remove" if dry_run else "Removing",
+            tmp_dir,
+        )
+        if not dry_run:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
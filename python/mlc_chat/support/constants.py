@@ -2,6 +2,7 @@
 import os
 import sys
 from pathlib import Path
+from typing import Optional
 
 
 def _check():
@@ -10,6 +11,11 @@ def _check():
             'Invalid MLC_JIT_POLICY. It has to be one of "ON", "OFF", "REDO", "READONLY"'
             f"but got {MLC_JIT_POLICY}."
         )
+    if MLC_KERNEL_CACHE_POLICY not in ["ON", "OFF"]:
+        raise ValueError(
+            'Invalid MLC_KERNEL_CACHE_POLICY. It has to be one of "ON", "OFF" '
+            f"but got {MLC_KERNEL_CACHE_POLICY}."
+        )
 
 
 def _get_cache_dir() -> Path:
@@ -32,9 +38,28 @@ def _get_cache_dir() -> Path:
         )
     (result / "model_weights").mkdir(parents=True, exist_ok=True)
     (result / "model_lib").mkdir(parents=True, exist_ok=True)
+    (result / "kernel").mkdir(parents=True, exist_ok=True)
     return result
 
 
+def _get_model_lib_cache_max_gb() -> Optional[float]:
+    if "MLC_MODEL_LIB_CACHE_MAX_GB" in os.environ:
+        return float(os.environ["MLC_MODEL_LIB_CACHE_MAX_GB"])
+    return None
+
+
+def _get_kernel_cache_max_gb() -> Optional[float]:
+    if "MLC_KERNEL_CACHE_MAX_GB" in os.environ:
+        return float(os.environ["MLC_KERNEL_CACHE_MAX_GB"])
+    return None
+
+
+def _get_kernel_cache_num_workers() -> Optional[int]:
+    if "MLC_KERNEL_CACHE_NUM_WORKERS" in os.environ:
+        return int(os.environ["MLC_KERNEL_CACHE_NUM_WORKERS"])
+    return None
+
+
 def _get_dso_suffix() -> str:
     if "MLC_DSO_SUFFIX" in os.environ:
         return os.environ["MLC_DSO_SUFFIX"]
@@ -50,6 +75,10 @@ MLC_MULTI_ARCH = os.environ.get("MLC_MULTI_ARCH", None)
 MLC_CACHE_DIR: Path = _get_cache_dir()
 MLC_JIT_POLICY = os.environ.get("MLC_JIT_POLICY", "ON")
 MLC_DSO_SUFFIX = _get_dso_suffix()
+MLC_MODEL_LIB_CACHE_MAX_GB = _get_model_lib_cache_max_gb()
+MLC_KERNEL_CACHE_POLICY = os.environ.get("MLC_KERNEL_CACHE_POLICY", "ON")
+MLC_KERNEL_CACHE_NUM_WORKERS = _get_kernel_cache_num_workers()
+MLC_KERNEL_CACHE_MAX_GB = _get_kernel_cache_max_gb()
 
 
 _check()
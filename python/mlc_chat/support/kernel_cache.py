@@ -0,0 +1,328 @@
+"""The on-disk cache of compiled kernels, with which a model library is rebuilt by compiling only
+the kernels that changed since previous builds, e.g. when only the context window size changes.
+
+Each TIR function is compiled on its own, and stored in an entry addressed by the structural hash
+of the function, together with the target and everything else that affects code generation. An
+entry is a directory under the cache directory that consists of
+
+- `host.o`, the host object file of the function;
+- `device<i>.<format>`, the device modules of the function, if any;
+- `meta.json`, the symbol of the function and the file names of the device modules.
+
+Kernels are compiled into temporary directories inside the cache directory, and published with an
+atomic rename, so that concurrent builds never observe a partially written entry. The cached host
+objects are linked into the model library as static libraries when it is exported.
+
+The modification time of `meta.json` is refreshed whenever the kernel is reused, and serves as the
+recency of LRU eviction, which shares the policy of the model lib cache. Entries are evicted by
+renaming them to temporary directories first, so that they disappear atomically as well.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import tvm
+from tvm import IRModule, relax, tir
+from tvm.contrib.popen_pool import PopenPoolExecutor
+from tvm.target import Target
+
+from . import logging
+from .cache_utils import CacheEntry, evict_lru, remove_stale_temp_dirs, touch
+from .style import bold
+
+logger = logging.getLogger(__name__)
+
+# The kinds of device targets whose device modules can be saved to and loaded from files.
+_CACHEABLE_TARGET_KINDS = ["llvm", "cuda", "rocm", "vulkan", "opencl"]
+_META_FILE = "meta.json"
+_HOST_FILE = "host.o"
+
+
+class KernelCache:
+    """The cache of compiled kernels.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        The directory of the cache, usually `MLC_CACHE_DIR / "kernel"`.
+
+    num_workers : Optional[int]
+        The number of processes compiling the kernels missing in the cache in parallel,
+        which defaults to the number of CPUs.
+
+    max_size_gb : Optional[float]
+        The size limit of the cache in GB. When specified, least recently used kernels are
+        evicted after each build to keep the cache under the limit.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        num_workers: Optional[int] = None,
+        max_size_gb: Optional[float] = None,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.num_workers = num_workers if num_workers is not None else (os.cpu_count() or 1)
+        self.max_size_gb = max_size_gb
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def is_supported(target: Target, system_lib: bool) -> bool:
+        """Whether the model library of the target can be built through the cache. System
+        libraries are not supported, since the startup code that registers the functions to
+        the system library is generated for each module."""
+        return (
+            not system_lib
+            and target.kind.name in _CACHEABLE_TARGET_KINDS
+            and (target.host is None or target.host.kind.name == "llvm")
+        )
+
+    @staticmethod
+    def hash_key(func: tir.PrimFunc, symbol: str, target: Target) -> str:
+        """Compute the address of the compiled kernel of the function in the cache."""
+        key = {
+            "structural_hash": str(tvm.ir.structural_hash(func, map_free_vars=True)),
+            "symbol": symbol,
+            "target": str(target.export()),
+            "tvm": tvm.__version__,
+            "tvm_git_commit": tvm.support.libinfo().get("GIT_COMMIT_HASH", ""),
+            # The architectures of CUDA fatbins are decided by the environment variable.
+            "multi_arch": os.environ.get("MLC_MULTI_ARCH", ""),
+        }
+        return hashlib.md5(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def build(self, tir_mod: IRModule, target: Target) -> Optional[tvm.runtime.Module]:
+        """Build the TIR functions of the module, reusing the cached kernels.
+
+        Returns
+        -------
+        lib : Optional[tvm.runtime.Module]
+            The module implementing all functions, which imports the modules of each
+            function. It can only be exported, not executed. None if there is no function.
+        """
+        kernels: List[Tuple[str, tir.PrimFunc, Path]] = []
+        missing: List[Tuple[str, str, Path]] = []
+        for gvar, func in tir_mod.functions.items():
+            if not isinstance(func, tir.PrimFunc):
+                continue
+            symbol = gvar.name_hint
+            if func.attrs is not None and "global_symbol" in func.attrs:
+                symbol = str(func.attrs["global_symbol"])
+            entry = self.cache_dir / self.hash_key(func, symbol, target)
+            kernels.append((symbol, func, entry))
+            if (entry / _META_FILE).is_file():
+                touch(entry / _META_FILE)
+            else:
+                missing.append((symbol, tvm.ir.save_json(func), entry))
+        if not kernels:
+            return None
+        logger.info(
+            "Reusing %d of %d kernels from cache %s, compiling %d kernels",
+            len(kernels) - len(missing),
+            len(kernels),
+            bold(str(self.cache_dir)),
+            len(missing),
+        )
+        self._compile(missing, target)
+
+        lib: Optional[tvm.runtime.Module] = None
+        for symbol, func, entry in kernels:
+            try:
+                host_mod, device_mods = _load_entry(entry)
+            except (OSError, tvm.TVMError):
+                if (entry / _META_FILE).is_file():
+                    raise
+                # The kernel was evicted by a concurrent build after it was found in the cache.
+                self._compile([(symbol, tvm.ir.save_json(func), entry)], target)
+                host_mod, device_mods = _load_entry(entry)
+            for device_mod in device_mods:
+                host_mod.import_module(device_mod)
+            if lib is None:
+                lib = host_mod
+            else:
+                lib.import_module(host_mod)
+        if self.max_size_gb is not None:
+            self.prune(self.max_size_gb, keep={entry.name for _, _, entry in kernels})
+        return lib
+
+    def entries(self) -> List[CacheEntry]:
+        """List the kernels in the cache, most recently used first."""
+        result = []
+        for entry in self.cache_dir.iterdir():
+            if entry.name.startswith("."):
+                continue
+            try:
+                last_access = (entry / _META_FILE).stat().st_mtime
+                nbytes = sum(path.stat().st_size for path in entry.iterdir())
+            except FileNotFoundError:
+                # Evicted concurrently.
+                continue
+            result.append(
+                CacheEntry(
+                    hash_value=entry.name,
+                    lib_path=entry,
+                    nbytes=nbytes,
+                    last_access=last_access,
+                    key={},
+                )
+            )
+        result.sort(key=lambda entry: entry.last_access, reverse=True)
+        return result
+
+    def prune(
+        self,
+        max_size_gb: float,
+        keep: Optional[Set[str]] = None,
+        dry_run: bool = False,
+    ) -> List[CacheEntry]:
+        """Evict least recently used kernels until the cache fits in the size limit.
+
+        Kernels whose hash is in `keep` are never evicted.
+
+        Returns
+        -------
+        evicted : List[CacheEntry]
+            The evicted entries.
+        """
+        remove_stale_temp_dirs(self.cache_dir, dry_run)
+        evicted = evict_lru(
+            self.entries(),
+            max_size_gb,
+            keep=keep,
+            remove=(lambda _: True) if dry_run else self._remove,
+        )
+        if evicted:
+            logger.info(
+                "%s %d kernels (%.2f MB) from cache %s",
+                "Would evict" if dry_run else "Evicted",
+                len(evicted),
+                sum(entry.nbytes for entry in evicted) / (1 << 20),
+                self.cache_dir,
+            )
+        return evicted
+
+    def _remove(self, entry: CacheEntry) -> bool:
+        # Builds that found the entry before the rename recompile it when it fails to load.
+        tmp_dir = self.cache_dir / f".tmp-evict-{entry.hash_value}-{os.getpid()}"
+        try:
+            os.replace(entry.lib_path, tmp_dir)
+        except OSError:
+            # Evicted concurrently.
+            return False
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return True
+
+    def _compile(self, missing: List[Tuple[str, str, Path]], target: Target) -> None:
+        target_config = target.export()
+        if self.num_workers <= 1 or len(missing) <= 1:
+            for symbol, func_json, entry in missing:
+                _compile_kernel(symbol, func_json, target_config, str(entry))
+            return
+        pool = PopenPoolExecutor(
+            max_workers=min(self.num_workers, len(missing)),
+            initializer=_init_worker,
+            initargs=(target_config,),
+        )
+        try:
+            futures = [
+                pool.submit(_compile_kernel, symbol, func_json, target_config, str(entry))
+                for symbol, func_json, entry in missing
+            ]
+            for future in futures:
+                future.result()
+        finally:
+            del pool
+
+
+def build_with_kernel_cache(
+    mod: IRModule,
+    target: Target,
+    pipeline: tvm.transform.Pass,
+    kernel_cache: KernelCache,
+) -> relax.Executable:
+    """Build the module into a shared library like `relax.build`, except that the TIR functions
+    are compiled through the kernel cache.
+
+    Parameters
+    ----------
+    mod : IRModule
+        The module to build.
+
+    target : Target
+        The target to build for.
+
+    pipeline : tvm.transform.Pass
+        The compilation pipeline that lowers the module to VM bytecode.
+
+    kernel_cache : KernelCache
+        The cache of compiled kernels.
+
+    Returns
+    -------
+    executable : relax.Executable
+        The executable to export, which cannot be executed directly.
+    """
+    # pylint: disable=protected-access
+    from tvm.relax import vm_build  # pylint: disable=import-outside-toplevel
+
+    mod = pipeline(mod)
+    ext_libs, constants = vm_build._extract_attrs(mod)
+    builder = relax.ExecBuilder()
+    mod = vm_build._vmcodegen(builder, mod, "bytecode")
+    lib = kernel_cache.build(vm_build._filter_tir(mod), target)
+    return vm_build.Executable(
+        relax._ffi_api.VMLink(builder, target, lib, ext_libs, dict(constants))  # type: ignore
+    )
+
+
+def _init_worker(target_config: Dict[str, Any]) -> None:
+    """Register the compilation hooks of the target in the worker processes."""
+    target = Target(target_config)
+    if target.kind.name == "cuda":
+        from .auto_target import (  # pylint: disable=import-outside-toplevel
+            _register_cuda_hook,
+        )
+
+        _register_cuda_hook(target)
+
+
+def _compile_kernel(
+    symbol: str, func_json: str, target_config: Dict[str, Any], entry_dir: str
+) -> None:
+    """Compile a TIR function, and publish the compiled kernel to the cache entry."""
+    entry = Path(entry_dir)
+    func = tvm.ir.load_json(func_json)
+    rt_mod = tvm.build(IRModule({symbol: func}), target=Target(target_config))
+    tmp_dir = Path(tempfile.mkdtemp(dir=entry.parent, prefix=".tmp-"))
+    try:
+        rt_mod.save(str(tmp_dir / _HOST_FILE))
+        device_files = []
+        for i, device_mod in enumerate(rt_mod.imported_modules):
+            device_file = f"device{i}.{device_mod.format}"
+            device_mod.save(str(tmp_dir / device_file))
+            device_files.append(device_file)
+        with (tmp_dir / _META_FILE).open("w", encoding="utf-8") as out_file:
+            json.dump({"symbol": symbol, "device_files": device_files}, out_file, indent=2)
+        try:
+            os.replace(tmp_dir, entry)
+        except OSError:
+            # The same kernel has been published by a concurrent build.
+            if not (entry / _META_FILE).is_file():
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _load_entry(entry: Path) -> Tuple[tvm.runtime.Module, List[tvm.runtime.Module]]:
+    """Load the host module and the device modules of a compiled kernel."""
+    with (entry / _META_FILE).open("r", encoding="utf-8") as in_file:
+        meta = json.load(in_file)
+    host_mod = tvm.runtime.load_static_library(str(entry / _HOST_FILE), [meta["symbol"]])
+    device_mods = [
+        tvm.runtime.load_module(str(entry / device_file)) for device_file in meta["device_files"]
+    ]
+    return host_mod, device_mods
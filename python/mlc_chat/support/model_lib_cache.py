@@ -0,0 +1,285 @@
+"""The on-disk cache of compiled model libraries.
+
+Each entry of the cache is addressed by the hash of everything that affects compilation, and
+consists of three files under the cache directory:
+
+- `<hash>.so`, the compiled model library;
+- `<hash>.json`, the metadata recording the hash key, which is used for listing;
+- `<hash>.lock`, the lock file that serializes the compilation of the entry across processes.
+
+Libraries are compiled into a temporary directory inside the cache directory, and published with
+an atomic rename, so that readers never observe a partially written library. The modification
+time of a library is refreshed on every hit, and serves as the recency of LRU eviction.
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from . import logging
+from .cache_utils import CacheEntry, evict_lru, remove_stale_temp_dirs, touch
+from .constants import MLC_DSO_SUFFIX
+from .style import bold
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """An exclusive inter-process lock backed by `fcntl.flock` or `msvcrt.locking`.
+
+    The holder may remove the lock file with `unlink`. Since a waiter may have opened the
+    removed file before, the lock is only acquired once the locked file is still the one at
+    the path, so that the waiter and processes creating a new lock file do not both hold it.
+
+    Parameters
+    ----------
+    path : Path
+        The path of the lock file, which is created if it does not exist.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Acquire the lock. Returns False if non-blocking and the lock is held elsewhere."""
+        assert self._file is None, "The lock is not reentrant"
+        while True:
+            lock_file = open(self.path, "a+b")  # pylint: disable=consider-using-with
+            try:
+                self._lock(lock_file, blocking)
+            except OSError:
+                lock_file.close()
+                if blocking:
+                    raise
+                return False
+            if self._is_current(lock_file):
+                self._file = lock_file
+                return True
+            # The lock file was removed by the previous holder, retry with the new one.
+            lock_file.close()
+
+    def release(self) -> None:
+        """Release the lock."""
+        assert self._file is not None, "The lock is not held"
+        # Closing the file releases both kinds of locks.
+        self._file.close()
+        self._file = None
+
+    def unlink(self) -> None:
+        """Remove the lock file while holding the lock. Lock files are kept on Windows, where
+        files cannot be removed while open."""
+        assert self._file is not None, "The lock is not held"
+        if sys.platform != "win32":
+            self.path.unlink(missing_ok=True)
+
+    def _is_current(self, lock_file) -> bool:
+        if sys.platform == "win32":
+            return True
+        try:
+            return os.path.samestat(os.fstat(lock_file.fileno()), os.stat(self.path))
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _lock(lock_file, blocking: bool) -> None:
+        if sys.platform == "win32":
+            import msvcrt  # pylint: disable=import-outside-toplevel,import-error
+
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                    return
+                except OSError:
+                    if not blocking:
+                        raise
+                    time.sleep(0.1)
+        else:
+            import fcntl  # pylint: disable=import-outside-toplevel
+
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            fcntl.flock(lock_file.fileno(), flags)
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+
+class ModelLibCache:
+    """The cache of compiled model libraries.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        The directory of the cache, usually `MLC_CACHE_DIR / "model_lib"`.
+
+    max_size_gb : Optional[float]
+        The size limit of the cache in GB. When specified, least recently used libraries are
+        evicted after each compilation to keep the cache under the limit.
+    """
+
+    def __init__(self, cache_dir: Path, max_size_gb: Optional[float] = None) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_size_gb = max_size_gb
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def hash_key(key: Dict[str, Any]) -> str:
+        """Compute the content address of a hash key."""
+        return hashlib.md5(json.dumps(key, sort_keys=True, indent=2).encode("utf-8")).hexdigest()
+
+    def lib_path(self, hash_value: str) -> Path:
+        """The path of the library of the given hash."""
+        return self.cache_dir / f"{hash_value}.so"
+
+    def lookup(self, key: Dict[str, Any]) -> Optional[Path]:
+        """Return the cached library of the key, or None if it is not compiled yet."""
+        lib_path = self.lib_path(self.hash_key(key))
+        if not lib_path.is_file():
+            return None
+        touch(lib_path)
+        return lib_path
+
+    def get_or_compile(
+        self,
+        key: Dict[str, Any],
+        compile_func: Callable[[Path], None],
+        force_redo: bool = False,
+    ) -> Path:
+        """Return the cached library of the key, compiling it when missing.
+
+        Concurrent callers with the same key are serialized by the lock of the entry, so that
+        the library is compiled only once, and the callers that waited reuse the result.
+
+        Parameters
+        ----------
+        key : Dict[str, Any]
+            The hash key, which must contain everything that affects compilation.
+
+        compile_func : Callable[[Path], None]
+            The function that compiles the library to the given path.
+
+        force_redo : bool
+            Whether to recompile even if the library is cached.
+        """
+        hash_value = self.hash_key(key)
+        lib_path = self.lib_path(hash_value)
+        if not force_redo and lib_path.is_file():
+            touch(lib_path)
+            return lib_path
+        lock = FileLock(self.cache_dir / f"{hash_value}.lock")
+        waited = not lock.acquire(blocking=False)
+        if waited:
+            logger.info("Waiting for another process compiling the same model lib: %s", lib_path)
+            lock.acquire()
+        try:
+            # The library may have been published by the process we waited for, which is reused
+            # even if `force_redo` is set.
+            if lib_path.is_file() and (not force_redo or waited):
+                touch(lib_path)
+                return lib_path
+            self._compile_and_publish(hash_value, key, compile_func)
+        finally:
+            lock.release()
+        if self.max_size_gb is not None:
+            self.prune(self.max_size_gb, keep={hash_value})
+        return lib_path
+
+    def entries(self) -> List[CacheEntry]:
+        """List the libraries in the cache, most recently used first."""
+        result = []
+        for lib_path in self.cache_dir.glob("*.so"):
+            hash_value = lib_path.stem
+            try:
+                stat = lib_path.stat()
+            except FileNotFoundError:
+                # Evicted concurrently.
+                continue
+            key: Dict[str, Any] = {}
+            meta_path = self.cache_dir / f"{hash_value}.json"
+            if meta_path.is_file():
+                with meta_path.open("r", encoding="utf-8") as in_file:
+                    key = json.load(in_file).get("key", {})
+            result.append(
+                CacheEntry(
+                    hash_value=hash_value,
+                    lib_path=lib_path,
+                    nbytes=stat.st_size,
+                    last_access=stat.st_mtime,
+                    key=key,
+                )
+            )
+        result.sort(key=lambda entry: entry.last_access, reverse=True)
+        return result
+
+    def prune(
+        self,
+        max_size_gb: float,
+        keep: Optional[Set[str]] = None,
+        dry_run: bool = False,
+    ) -> List[CacheEntry]:
+        """Evict least recently used libraries until the cache fits in the size limit.
+
+        Libraries that are being compiled, or whose hash is in `keep`, are never evicted.
+
+        Returns
+        -------
+        evicted : List[CacheEntry]
+            The evicted entries.
+        """
+        remove_stale_temp_dirs(self.cache_dir, dry_run)
+        evicted = evict_lru(
+            self.entries(),
+            max_size_gb,
+            keep=keep,
+            remove=(lambda _: True) if dry_run else self._remove,
+        )
+        for entry in evicted:
+            logger.info(
+                "%s model lib: %s (%.2f MB)",
+                "Would evict" if dry_run else "Evicted",
+                entry.lib_path,
+                entry.nbytes / (1 << 20),
+            )
+        return evicted
+
+    def _compile_and_publish(
+        self, hash_value: str, key: Dict[str, Any], compile_func: Callable[[Path], None]
+    ) -> None:
+        # The temporary directory is in the cache directory, so that the rename below does not
+        # cross file systems and is atomic.
+        with tempfile.TemporaryDirectory(dir=self.cache_dir, prefix=".tmp-") as tmp_dir:
+            tmp_lib_path = Path(tmp_dir) / f"lib.{MLC_DSO_SUFFIX}"
+            tmp_meta_path = Path(tmp_dir) / "meta.json"
+            start_time = time.time()
+            compile_func(tmp_lib_path)
+            with tmp_meta_path.open("w", encoding="utf-8") as out_file:
+                json.dump(
+                    {"key": key, "compile_time": time.time() - start_time},
+                    out_file,
+                    indent=2,
+                )
+            # Publish the metadata first so that every published library is listed with its key.
+            os.replace(tmp_meta_path, self.cache_dir / f"{hash_value}.json")
+            os.replace(tmp_lib_path, self.lib_path(hash_value))
+        logger.info("Published model lib to cache: %s", bold(str(self.lib_path(hash_value))))
+
+    def _remove(self, entry: CacheEntry) -> bool:
+        lock = FileLock(self.cache_dir / f"{entry.hash_value}.lock")
+        if not lock.acquire(blocking=False):
+            # The entry is being compiled.
+            return False
+        try:
+            entry.lib_path.unlink(missing_ok=True)
+            (self.cache_dir / f"{entry.hash_value}.json").unlink(missing_ok=True)
+            lock.unlink()
+        finally:
+            lock.release()
+        return True
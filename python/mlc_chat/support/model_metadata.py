@@ -0,0 +1,147 @@
+"""Reading the metadata of compiled model libraries, and estimating their memory usage.
+
+Extracting the metadata requires loading the model library, which is slow for large libraries.
+The extracted metadata are cached on disk under `MLC_CACHE_DIR/model_metadata`, keyed by the
+path of the library, and validated by its modification time and size.
+"""
+import hashlib
+import json
+import math
+import os
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from . import logging
+from .config import ConfigBase
+from .constants import MLC_CACHE_DIR
+from .style import green, red
+
+logger = logging.getLogger(__name__)
+
+
+def extract_metadata(model_lib: Path) -> Dict[str, Any]:
+    """Extract the metadata by loading the model library in the current process."""
+    # pylint: disable=import-outside-toplevel
+    from tvm.runtime import device, load_module
+    from tvm.runtime.relax_vm import VirtualMachine
+
+    # pylint: enable=import-outside-toplevel
+
+    return json.loads(VirtualMachine(load_module(str(model_lib)), device("cpu"))["_metadata"]())
+
+
+def read_metadata(model_lib: Union[str, Path]) -> Dict[str, Any]:
+    """Read the metadata of a model library, using the on-disk cache when it is up to date."""
+    model_lib = Path(model_lib).resolve()
+    stat = model_lib.stat()
+    cache_path = (
+        MLC_CACHE_DIR
+        / "model_metadata"
+        / f"{hashlib.md5(str(model_lib).encode('utf-8')).hexdigest()}.json"
+    )
+    try:
+        with cache_path.open("r", encoding="utf-8") as in_file:
+            cached = json.load(in_file)
+        if (
+            cached["model_lib"] == str(model_lib)
+            and cached["mtime_ns"] == stat.st_mtime_ns
+            and cached["size"] == stat.st_size
+        ):
+            return cached["metadata"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    metadata = extract_metadata(model_lib)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename, so that concurrent readers never see a partial file.
+        with tempfile.NamedTemporaryFile(
+            "w", dir=cache_path.parent, suffix=".tmp", delete=False, encoding="utf-8"
+        ) as out_file:
+            json.dump(
+                {
+                    "model_lib": str(model_lib),
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "metadata": metadata,
+                },
+                out_file,
+            )
+        os.replace(out_file.name, cache_path)
+    except OSError:
+        logger.warning("Failed to cache the metadata of %s", model_lib, exc_info=True)
+    return metadata
+
+
+def _read_dynamic_shape(shape: List[Union[int, str]], config: Union[Dict, ConfigBase]) -> List[int]:
+    if isinstance(config, ConfigBase):
+        config = asdict(config)
+    param_shape = []
+    for s in shape:
+        if isinstance(s, int):
+            param_shape.append(s)
+        else:
+            if config is None:
+                logger.error(
+                    "%s: Encountered dynamic shape %s, need to specify `--mlc-chat-config` for "
+                    + "memory usage calculation.",
+                    red("FAILED"),
+                    red(s),
+                )
+                raise AttributeError
+            if not s in config:
+                logger.error(
+                    "%s to retrieve concrete %s for dynamic shape from %s.",
+                    red("FAILED"),
+                    red(s),
+                    config,
+                )
+                raise KeyError
+            param_shape.append(config[s])
+    return param_shape
+
+
+def compute_memory_usage(
+    metadata: Dict[str, Any], config: Optional[Union[Dict, ConfigBase]]
+) -> Tuple[float, float, float]:
+    """Compute the bytes of parameters, temporary buffers and KV cache from the metadata."""
+    params_bytes = 0.0
+    for param in metadata["params"]:
+        if all(isinstance(v, int) for v in param["shape"]):
+            assert all(v > 0 for v in param["shape"]), "All shapes should be strictly positive."
+            param_shape = param["shape"]
+        else:
+            # Contains dynamic shape; use config to look up concrete values
+            param_shape = _read_dynamic_shape(param["shape"], config)
+        params_bytes += math.prod(param_shape) * np.dtype(param["dtype"]).itemsize
+    temp_func_bytes = 0.0
+    for _func_name, func_bytes in metadata["memory_usage"].items():
+        temp_func_bytes = max(temp_func_bytes, func_bytes)
+    kv_cache_bytes = metadata["kv_cache_bytes"]
+
+    return params_bytes, temp_func_bytes, kv_cache_bytes
+
+
+def report_memory_usage(
+    metadata: Dict[str, Any], config: Optional[Union[Dict, ConfigBase]]
+) -> None:
+    """Log the memory usage estimated from the metadata."""
+    params_bytes, temp_func_bytes, kv_cache_bytes = compute_memory_usage(metadata, config)
+    total_size = params_bytes + temp_func_bytes + kv_cache_bytes
+    logger.info(
+        "%s: %.2f MB (Parameters: %.2f MB. KVCache: %.2f MB. Temporary buffer: %.2f MB)",
+        green("Total memory usage"),
+        total_size / 1024 / 1024,
+        params_bytes / 1024 / 1024,
+        kv_cache_bytes / 1024 / 1024,
+        temp_func_bytes / 1024 / 1024,
+    )
+
+    logger.info(
+        "To reduce memory usage, "
+        "tweak `prefill_chunk_size`, `context_window_size` and `sliding_window_size`"
+    )
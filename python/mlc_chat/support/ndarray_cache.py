@@ -0,0 +1,110 @@
+"""A streaming writer of MLC's ndarray-cache format, which is compatible with
+`tvm.contrib.tvmjs.dump_ndarray_cache` but writes each parameter to shard files
+as soon as it is added, instead of holding all parameters until the end.
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from tvm.runtime import NDArray
+
+
+def _convert_f32_to_bf16(value: np.ndarray) -> np.ndarray:
+    """Convert float32 values to bfloat16 bits, with the same rounding as tvmjs."""
+    cap = np.finfo("float32").max
+    bf16_limit = ((np.array([cap.view("uint32")]) >> 16) << 16).view("float32")[0]
+    # Round to nearest even within the bfloat16 range, and truncate the values
+    # out of range (usually mask values), which clips them to the limit.
+    data = value.view("uint32")
+    rounding_bias = np.where(
+        np.logical_and(value < bf16_limit, value > -bf16_limit),
+        ((data >> 16) & 1) + 0x7FFF,
+        np.zeros_like(data),
+    )
+    return ((data + rounding_bias) >> 16).astype("uint16")
+
+
+class NDArrayCacheWriter:
+    """Write parameters into `ndarray-cache.json` and `params_shard_*.bin` files.
+
+    Parameters are appended to the current shard, which is flushed to disk once it
+    reaches `shard_cap_mb`, so that at most one shard is held in memory.
+
+    Parameters
+    ----------
+    output : Path
+        The output directory.
+
+    encode_format : str
+        Either "raw", or "f32-to-bf16" which stores float32 parameters in bfloat16.
+
+    shard_cap_mb : int
+        The size cap of each shard file in MB.
+    """
+
+    def __init__(
+        self, output: Path, encode_format: str = "f32-to-bf16", shard_cap_mb: int = 32
+    ) -> None:
+        assert encode_format in ("raw", "f32-to-bf16"), f"Unknown encode format {encode_format}"
+        self.output = Path(output)
+        self.encode_format = encode_format
+        self.shard_cap_nbytes = shard_cap_mb * (1 << 20)
+        self.shard_records: List[Dict[str, Any]] = []
+        self._curr_data = bytearray()
+        self._curr_records: List[Dict[str, Any]] = []
+
+    def add(self, name: str, param: "NDArray") -> None:
+        """Add a parameter and write it to disk once its shard is full."""
+        value = param.numpy()
+        dtype = str(param.dtype)
+        if self.encode_format == "f32-to-bf16" and dtype == "float32":
+            data = _convert_f32_to_bf16(value).tobytes()
+        else:
+            data = value.tobytes()
+        record = {
+            "name": name,
+            "shape": list(value.shape),
+            "dtype": dtype,
+            "format": self.encode_format,
+            "nbytes": len(data),
+        }
+        if len(self._curr_data) + len(data) >= self.shard_cap_nbytes:
+            if len(data) * 2 >= self.shard_cap_nbytes:
+                # Large parameters are written to their own shards.
+                record["byteOffset"] = 0
+                self._write_shard(data, [record])
+                return
+            self._flush()
+        record["byteOffset"] = len(self._curr_data)
+        self._curr_records.append(record)
+        self._curr_data += data
+
+    def finish(self, meta_data: Optional[Dict[str, Any]] = None) -> None:
+        """Flush the remaining parameters and write `ndarray-cache.json`."""
+        self._flush()
+        with (self.output / "ndarray-cache.json").open("w", encoding="utf-8") as o_f:
+            json.dump({"metadata": meta_data or {}, "records": self.shard_records}, o_f, indent=4)
+
+    def _flush(self) -> None:
+        if len(self._curr_data) != 0:
+            self._write_shard(self._curr_data, self._curr_records)
+            self._curr_data = bytearray()
+            self._curr_records = []
+
+    def _write_shard(self, data: bytes, records: List[Dict[str, Any]]) -> None:
+        data_path = f"params_shard_{len(self.shard_records)}.bin"
+        with (self.output / data_path).open("wb") as o_f:
+            o_f.write(data)
+        self.shard_records.append(
+            {
+                "dataPath": data_path,
+                "format": "raw-shard",
+                "nbytes": len(data),
+                "records": records,
+                "md5sum": hashlib.md5(data).hexdigest(),
+            }
+        )
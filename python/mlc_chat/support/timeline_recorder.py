@@ -0,0 +1,182 @@
+"""A low-overhead recorder of the per-token timeline of generation.
+
+Each record is a span of (phase, request, step, t_start, t_end), where the timestamps come from
+`time.perf_counter_ns`. Records are kept in preallocated ring buffers backed by `array.array`, so
+that recording allocates no Python objects and the memory stays bounded, with the oldest records
+overwritten once the capacity is reached.
+"""
+import json
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+PHASES = (
+    "load_model",
+    "unload_model",
+    "system_prompt",
+    "prefill",
+    "decode",
+    "sample",
+    "detokenize",
+)
+LOAD_MODEL, UNLOAD_MODEL, SYSTEM_PROMPT, PREFILL, DECODE, SAMPLE, DETOKENIZE = range(len(PHASES))
+
+# The event names in the energy events format, which predates the recorder. See
+# `dump_energy_events` for how the keys of generation differ from the previous ones.
+_ENERGY_EVENT_NAMES = {
+    LOAD_MODEL: "load_model",
+    UNLOAD_MODEL: "unload_model",
+    SYSTEM_PROMPT: "prompt.system",
+    PREFILL: "chat.{request}.prefill",
+    DECODE: "chat.{request}.decode.{step}",
+    SAMPLE: "chat.{request}.sample.{step}",
+    DETOKENIZE: "chat.{request}.get_message.{step}",
+}
+
+
+class TimelineRecorder:
+    """The recorder of generation timelines.
+
+    Parameters
+    ----------
+    capacity : int
+        The maximum number of records kept. Older records are overwritten.
+    """
+
+    def __init__(self, capacity: int = 1 << 16) -> None:
+        assert capacity > 0, "The capacity must be positive"
+        self.capacity = capacity
+        self._phase = array("B", bytes(capacity))
+        self._request = array("q", bytes(8 * capacity))
+        self._step = array("q", bytes(8 * capacity))
+        self._t_start = array("q", bytes(8 * capacity))
+        self._t_end = array("q", bytes(8 * capacity))
+        # The total number of records ever added.
+        self._num_records = 0
+        # The offset converting perf_counter_ns timestamps to the Unix epoch.
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+
+    def record(  # pylint: disable=too-many-arguments
+        self, phase: int, request: int, step: int, t_start: int, t_end: int
+    ) -> None:
+        """Add a span. The timestamps are in `time.perf_counter_ns`."""
+        index = self._num_records % self.capacity
+        self._phase[index] = phase
+        self._request[index] = request
+        self._step[index] = step
+        self._t_start[index] = t_start
+        self._t_end[index] = t_end
+        self._num_records += 1
+
+    def __len__(self) -> int:
+        return min(self._num_records, self.capacity)
+
+    def clear(self) -> None:
+        """Drop all records."""
+        self._num_records = 0
+
+    def records(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        """Iterate over the kept records from the oldest to the newest."""
+        start = max(0, self._num_records - self.capacity)
+        for i in range(start, self._num_records):
+            index = i % self.capacity
+            yield (
+                self._phase[index],
+                self._request[index],
+                self._step[index],
+                self._t_start[index],
+                self._t_end[index],
+            )
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Summarize the durations of each phase over the kept records, which cover the most
+        recent `capacity` spans.
+
+        Returns
+        -------
+        summary : Dict[str, Dict[str, float]]
+            The count, total, mean, p50 and p99 of durations in milliseconds of each phase.
+        """
+        durations: Dict[int, List[int]] = {}
+        for phase, _, _, t_start, t_end in self.records():
+            durations.setdefault(phase, []).append(t_end - t_start)
+        result = {}
+        for phase, values in sorted(durations.items()):
+            values.sort()
+            result[PHASES[phase]] = {
+                "count": len(values),
+                "total_ms": sum(values) / 1e6,
+                "mean_ms": sum(values) / len(values) / 1e6,
+                "p50_ms": values[(len(values) - 1) // 2] / 1e6,
+                "p99_ms": values[min(len(values) - 1, int(len(values) * 0.99))] / 1e6,
+            }
+        return result
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Export the records in the Chrome Trace Event Format, with one thread per request.
+        Timestamps are in microseconds since the Unix epoch."""
+        events = []
+        for phase, request, step, t_start, t_end in self.records():
+            events.append(
+                {
+                    "name": PHASES[phase],
+                    "ph": "X",
+                    "ts": (t_start + self._epoch_offset_ns) / 1e3,
+                    "dur": (t_end - t_start) / 1e3,
+                    "pid": 0,
+                    "tid": request,
+                    "args": {"step": step},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: Union[str, Path]) -> None:
+        """Dump the records to a file, whose format is decided by the suffix: ".parquet" for
+        Parquet, which requires `pyarrow`, and Chrome trace JSON otherwise."""
+        path = Path(path)
+        if path.suffix == ".parquet":
+            self._dump_parquet(path)
+        else:
+            with path.open("w", encoding="utf-8") as out_file:
+                json.dump(self.to_chrome_trace(), out_file)
+
+    def dump_energy_events(self, path: Union[str, Path]) -> None:
+        """Dump the records as lines of "<event>.start <ns>" and "<event>.end <ns>", with
+        timestamps in nanoseconds since the Unix epoch, to be aligned with power measurements.
+
+        The events of generation are keyed by the request and the step, e.g.
+        "chat.<request>.prefill" and "chat.<request>.decode.<step>", instead of the
+        "chat.<generation>.<sequence>.prefill" keys of the energy events of ChatModule, where
+        the request counts every prefill. Detokenization events also carry the step, as
+        "chat.<request>.get_message.<step>", since a request may detokenize at every step."""
+        with Path(path).open("w", encoding="utf-8") as out_file:
+            for phase, request, step, t_start, t_end in self.records():
+                name = _ENERGY_EVENT_NAMES[phase].format(request=request, step=step)
+                out_file.write(f"{name}.start {t_start + self._epoch_offset_ns}\n")
+                out_file.write(f"{name}.end {t_end + self._epoch_offset_ns}\n")
+
+    def _dump_parquet(self, path: Path) -> None:
+        try:
+            # pylint: disable=import-outside-toplevel,import-error
+            import pyarrow
+            from pyarrow import parquet
+
+            # pylint: enable=import-outside-toplevel,import-error
+        except ImportError as error:
+            raise ImportError("Exporting timelines to Parquet requires `pyarrow`") from error
+        columns: Tuple[List[Any], ...] = ([], [], [], [], [])
+        for record in self.records():
+            for column, value in zip(columns, record):
+                column.append(value)
+        phase, request, step, t_start, t_end = columns
+        table = pyarrow.table(
+            {
+                "phase": [PHASES[p] for p in phase],
+                "request": pyarrow.array(request, pyarrow.int64()),
+                "step": pyarrow.array(step, pyarrow.int64()),
+                "t_start_ns": [t + self._epoch_offset_ns for t in t_start],
+                "t_end_ns": [t + self._epoch_offset_ns for t in t_end],
+            }
+        )
+        parquet.write_table(table, path)
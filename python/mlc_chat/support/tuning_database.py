@@ -0,0 +1,94 @@
+"""The versioned on-disk database of kernels tuned by MetaSchedule, which `mlc_chat tune` writes
+and `mlc_chat compile --tuning-database` dispatches to.
+
+A tuning database is a directory that consists of
+
+- `database_workload.json` and `database_tuning_record.json`, the MetaSchedule JSON database,
+  whose workloads are matched against the TIR functions of a model by structural hash;
+- `tuning-db.json`, the format version of the database and the target it is tuned for.
+
+A database is only used for the target it is tuned for, since the tuned schedules are specific
+to the target, and is ignored if its format version differs from the one of this package.
+"""
+import json
+from pathlib import Path
+from typing import Optional
+
+from tvm import meta_schedule as ms
+from tvm.target import Target
+
+from . import logging
+from .style import bold
+
+logger = logging.getLogger(__name__)
+
+# Bump the version when the tuned kernels in existing databases no longer apply.
+TUNING_DATABASE_VERSION = 1
+_MANIFEST_FILE = "tuning-db.json"
+_WORKLOAD_FILE = "database_workload.json"
+_TUNING_RECORD_FILE = "database_tuning_record.json"
+
+
+def _target_key(target: Target) -> str:
+    """The target that tuned schedules apply to, regardless of the target host."""
+    config = dict(target.export())
+    config.pop("host", None)
+    return str(Target(config))
+
+
+def _open(path: Path) -> ms.Database:
+    return ms.database.JSONDatabase(
+        path_workload=str(path / _WORKLOAD_FILE),
+        path_tuning_record=str(path / _TUNING_RECORD_FILE),
+        allow_missing=True,
+    )
+
+
+def create_tuning_database(path: Path, target: Target) -> ms.Database:
+    """Create the tuning database of the target at the given directory, or open it if it
+    already exists, so that tuning continues from the existing records."""
+    path = Path(path)
+    manifest_path = path / _MANIFEST_FILE
+    manifest = {"version": TUNING_DATABASE_VERSION, "target": _target_key(target)}
+    if manifest_path.is_file():
+        with manifest_path.open("r", encoding="utf-8") as in_file:
+            existing = json.load(in_file)
+        if existing != manifest:
+            raise ValueError(
+                f"Tuning database {path} is for target {existing.get('target')} of version "
+                f"{existing.get('version')}, which cannot be extended with target "
+                f"{manifest['target']} of version {TUNING_DATABASE_VERSION}"
+            )
+    path.mkdir(parents=True, exist_ok=True)
+    with manifest_path.open("w", encoding="utf-8") as out_file:
+        json.dump(manifest, out_file, indent=2)
+    return _open(path)
+
+
+def load_tuning_database(path: Path, target: Target) -> Optional[ms.Database]:
+    """Load the tuning database at the given directory. Return None with a warning if it is
+    of another format version, or tuned for another target."""
+    path = Path(path)
+    manifest_path = path / _MANIFEST_FILE
+    if not manifest_path.is_file():
+        raise ValueError(f"Not a tuning database, as {manifest_path} does not exist")
+    with manifest_path.open("r", encoding="utf-8") as in_file:
+        manifest = json.load(in_file)
+    if manifest.get("version") != TUNING_DATABASE_VERSION:
+        logger.warning(
+            "Ignoring tuning database %s of version %s, which requires version %d. "
+            "Please tune it again with `mlc_chat tune`",
+            bold(str(path)),
+            manifest.get("version"),
+            TUNING_DATABASE_VERSION,
+        )
+        return None
+    if manifest.get("target") != _target_key(target):
+        logger.warning(
+            "Ignoring tuning database %s, which is tuned for target %s instead of %s",
+            bold(str(path)),
+            manifest.get("target"),
+            _target_key(target),
+        )
+        return None
+    return _open(path)
@@ -3,6 +3,7 @@ This tokenizer essentially wraps and binds the HuggingFace tokenizer
 library and sentencepiece.
 Reference: https://github.com/mlc-ai/tokenizers-cpp
 """
+import struct
 from typing import List
 
 import tvm
@@ -37,6 +38,30 @@ class Tokenizer(Object):
         """
         return list(_ffi_api.TokenizerEncode(self, text))  # type: ignore  # pylint: disable=no-member
 
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """Encode a batch of texts into ids in a single FFI call.
+
+        Parameters
+        ----------
+        texts : List[str]
+            The text strings to encode.
+
+        Returns
+        -------
+        token_ids : List[List[int]]
+            The list of encoded token ids, one for each input text.
+
+        Note
+        ----
+        The GIL is released during the FFI call, which allows this method to
+        run on a background thread without blocking the caller thread.
+        Concurrent calls on the same tokenizer object must be serialized.
+        """
+        return [
+            list(token_ids)
+            for token_ids in _ffi_api.TokenizerEncodeBatch(self, texts)  # type: ignore  # pylint: disable=no-member
+        ]
+
     def decode(self, token_ids: List[int]) -> str:
         """Decode token ids into text.
 
@@ -53,3 +78,22 @@ class Tokenizer(Object):
         return _ffi_api.TokenizerDecode(  # type: ignore  # pylint: disable=no-member
             self, tvm.runtime.ShapeTuple(token_ids)
         )
+
+    def get_token_table(self) -> List[bytes]:
+        """Get the token table of the tokenizer.
+
+        Returns
+        -------
+        token_table : List[bytes]
+            The bytes of each token, indexed by the token id.
+        """
+        packed_token_table = _ffi_api.TokenizerGetTokenTable(self)  # type: ignore  # pylint: disable=no-member
+        token_table: List[bytes] = []
+        pos = 0
+        while pos < len(packed_token_table):
+            # Each token is prefixed by its length in 4-byte little endian.
+            (length,) = struct.unpack_from("<I", packed_token_table, pos)
+            pos += 4
+            token_table.append(packed_token_table[pos : pos + length])
+            pos += length
+        return token_table
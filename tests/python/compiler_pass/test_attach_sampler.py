@@ -0,0 +1,141 @@
+# pylint: disable=invalid-name,missing-docstring
+import numpy as np
+import tvm
+import tvm.testing
+from tvm.script import ir as I
+from tvm.script import relax as R
+
+from mlc_chat.compiler_pass.attach_sampler import (
+    MAX_NUM_TOP_PROBS,
+    AttachGPUSamplerFunc,
+)
+from mlc_chat.serve import _ffi_api
+
+
+def _get_module():
+    @I.ir_module
+    class Module:
+        @R.function
+        def main(x: R.Tensor((1, 32), "float32")):
+            return x
+
+    return Module
+
+
+def test_attach_sampler_func():
+    mod = AttachGPUSamplerFunc(tvm.target.Target("cuda"))(_get_module())
+    assert "batch_sample_top_p_top_k" in [gv.name_hint for gv in mod.get_global_vars()]
+    mod = AttachGPUSamplerFunc(tvm.target.Target("llvm"))(_get_module())
+    assert "batch_sample_top_p_top_k" not in [gv.name_hint for gv in mod.get_global_vars()]
+
+
+def _build_sample_func():
+    target = tvm.target.Target("cuda")
+    mod = AttachGPUSamplerFunc(target)(_get_module())
+    return tvm.build(mod["batch_sample_top_p_top_k"], target=target)
+
+
+def _get_probs(batch_size: int, vocab_size: int) -> np.ndarray:
+    np.random.seed(0)
+    probs = np.random.rand(batch_size, vocab_size).astype("float32") ** 4
+    probs /= probs.sum(axis=1, keepdims=True)
+    return probs
+
+
+def _sample(func, probs, sample_indices, uniform_samples, top_p, top_k, num_top_probs):
+    device = tvm.cuda(0)
+    num_samples = len(sample_indices)
+    inputs = [
+        np.array(sample_indices, dtype="int32"),
+        np.array(uniform_samples, dtype="float32"),
+        np.array(top_p, dtype="float32"),
+        np.array(top_k, dtype="int32"),
+        np.array(num_top_probs, dtype="int32"),
+    ]
+    outputs = [
+        np.zeros((num_samples,), "int32"),
+        np.zeros((num_samples,), "float32"),
+        np.zeros((num_samples, MAX_NUM_TOP_PROBS), "int32"),
+        np.zeros((num_samples, MAX_NUM_TOP_PROBS), "float32"),
+    ]
+    args = [tvm.nd.array(array, device) for array in [probs] + inputs + outputs]
+    func(*args)
+    return [arg.numpy() for arg in args[6:]]
+
+
+@tvm.testing.requires_cuda
+def test_batch_sample_top_p_top_k():
+    func = _build_sample_func()
+    probs = _get_probs(batch_size=3, vocab_size=1000)
+    # Sample 0: greedy. Sample 1: top-k 3 on row 2. Sample 2: top-p 0.5 on row 1.
+    sampled_token_ids, sampled_probs, top_token_ids, top_token_probs = _sample(
+        func,
+        probs,
+        sample_indices=[0, 2, 1],
+        uniform_samples=[0.3, 0.999, 0.0],
+        top_p=[1.0, 2.0, 0.5],
+        top_k=[1, 3, 0],
+        num_top_probs=[0, 3, 5],
+    )
+
+    # Greedy sampling picks the most probable token.
+    assert sampled_token_ids[0] == np.argmax(probs[0])
+    tvm.testing.assert_allclose(sampled_probs[0], 1.0, rtol=1e-5)
+    # The kept tokens are sampled in the descending order of probabilities, so top-k
+    # sampling with a uniform sample close to 1 picks the third most probable token.
+    order = np.argsort(-probs[2], kind="stable")
+    assert sampled_token_ids[1] == order[2]
+    tvm.testing.assert_allclose(sampled_probs[1], probs[2, order[2]], rtol=1e-5)
+    assert list(top_token_ids[1, :3]) == list(order[:3])
+    tvm.testing.assert_allclose(top_token_probs[1, :3], probs[2, order[:3]], rtol=1e-5)
+    # Top-p sampling with a uniform sample of 0 picks the most probable token.
+    order = np.argsort(-probs[1], kind="stable")
+    assert sampled_token_ids[2] == order[0]
+    tvm.testing.assert_allclose(sampled_probs[2], probs[1, order[0]], rtol=1e-5)
+    assert list(top_token_ids[2]) == list(order[:MAX_NUM_TOP_PROBS])
+
+
+@tvm.testing.requires_cuda
+def test_batch_sample_top_p_top_k_consistent_with_cpu():
+    func = _build_sample_func()
+    probs = _get_probs(batch_size=4, vocab_size=1000)
+    np.random.seed(1)
+    # (top_p, top_k) with top-p being 1 and top-k being 0 keeps all the tokens.
+    configs = [(1.0, 0), (0.9, 0), (0.5, 0), (1.0, 3), (0.8, 20), (1.0, 1)]
+    sample_indices = []
+    uniform_samples = []
+    top_p = []
+    top_k = []
+    for _ in range(16):
+        for config_top_p, config_top_k in configs:
+            sample_indices.append(np.random.randint(probs.shape[0]))
+            uniform_samples.append(float(np.float32(np.random.rand())))
+            top_p.append(config_top_p)
+            top_k.append(config_top_k)
+    # The engine passes a top-p larger than 1 to the kernel to keep all the tokens.
+    sampled_token_ids, sampled_probs, _, _ = _sample(
+        func,
+        probs,
+        sample_indices,
+        uniform_samples,
+        top_p=[2.0 if p >= 1.0 else p for p in top_p],
+        top_k=top_k,
+        num_top_probs=[0] * len(sample_indices),
+    )
+
+    probs_cpu = tvm.nd.array(probs)
+    for i, row in enumerate(sample_indices):
+        expected_token_id = _ffi_api.SampleTopPFromProb(  # type: ignore  # pylint: disable=no-member
+            probs_cpu, row, top_p[i], top_k[i], uniform_samples[i]
+        )
+        assert sampled_token_ids[i] == expected_token_id
+        # The probability of the sampled token in the input distribution is returned,
+        # except for greedy sampling.
+        expected_prob = 1.0 if top_k[i] == 1 else probs[row, expected_token_id]
+        tvm.testing.assert_allclose(sampled_probs[i], expected_prob, rtol=1e-5)
+
+
+if __name__ == "__main__":
+    test_attach_sampler_func()
+    test_batch_sample_top_p_top_k()
+    test_batch_sample_top_p_top_k_consistent_with_cpu()
@@ -0,0 +1,76 @@
+# pylint: disable=invalid-name,line-too-long,missing-docstring
+import numpy as np
+import tvm
+import tvm.testing
+from tvm import dlight as dl
+from tvm.script import tir as T
+from tvm.target import Target
+
+from mlc_chat.compiler_pass import cpu_schedule
+
+N, K = 64, 256
+
+
+# fmt: off
+@T.prim_func
+def dequantize_gemv(
+    W: T.Buffer((N, K // 8), "uint32"),
+    S: T.Buffer((N, K // 32), "float32"),
+    A: T.Buffer((1, K), "float32"),
+    C: T.Buffer((1, N), "float32"),
+):
+    T.func_attr({"tir.noalias": T.bool(True)})
+    W_deq = T.alloc_buffer((N, K), "float32")
+    for n, k in T.grid(N, K):
+        with T.block("dequantize"):
+            vn, vk = T.axis.remap("SS", [n, k])
+            W_deq[vn, vk] = (T.Cast("float32", T.bitwise_and(T.shift_right(W[vn, vk // 8], T.Cast("uint32", vk % 8 * 4)), T.uint32(15))) - T.float32(7)) * S[vn, vk // 32]
+    for i, n, k in T.grid(1, N, K):
+        with T.block("gemv"):
+            vi, vn, vk = T.axis.remap("SSR", [i, n, k])
+            with T.init():
+                C[vi, vn] = T.float32(0)
+            C[vi, vn] = C[vi, vn] + A[vi, vk] * W_deq[vn, vk]
+# fmt: on
+
+
+def _schedule(func, target):
+    mod = tvm.IRModule({"main": func})
+    with target:
+        mod = dl.ApplyDefaultSchedule(  # pylint: disable=not-callable
+            cpu_schedule.Reduction(),
+            cpu_schedule.Fallback(),
+        )(mod)
+    return mod
+
+
+def test_dequantize_gemv():
+    target = Target("llvm")
+    mod = _schedule(dequantize_gemv, target)
+    script = mod.script()
+    assert "T.parallel" in script
+    assert "T.vectorized" in script
+    # The dequantization is inlined into the GEMV.
+    assert 'T.block("dequantize")' not in script
+
+    np.random.seed(0)
+    w = np.random.randint(0, 2**32, (N, K // 8), dtype="uint64").astype("uint32")
+    s = np.random.uniform(0, 1, (N, K // 32)).astype("float32")
+    a = np.random.uniform(-1, 1, (1, K)).astype("float32")
+    shifts = np.arange(8, dtype="uint32") * 4
+    w_deq = ((w[:, :, None] >> shifts) & 15).reshape(N, K).astype("float32") - 7
+    w_deq *= np.repeat(s, 32, axis=1)
+    c = tvm.nd.empty((1, N), "float32")
+    tvm.build(mod, target=target)["main"](tvm.nd.array(w), tvm.nd.array(s), tvm.nd.array(a), c)
+    tvm.testing.assert_allclose(c.numpy(), a @ w_deq.T, rtol=1e-5, atol=1e-5)
+
+
+def test_skip_gpu_targets():
+    target = Target("cuda")
+    assert cpu_schedule.Reduction().apply(dequantize_gemv, target, False) is None
+    assert cpu_schedule.Fallback().apply(dequantize_gemv, target, False) is None
+
+
+if __name__ == "__main__":
+    test_dequantize_gemv()
+    test_skip_gpu_targets()
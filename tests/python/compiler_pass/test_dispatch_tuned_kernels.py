@@ -0,0 +1,65 @@
+# pylint: disable=invalid-name,missing-docstring
+import tempfile
+from pathlib import Path
+
+from tvm import meta_schedule as ms
+from tvm import tir
+from tvm.script import ir as I
+from tvm.script import relax as R
+from tvm.script import tir as T
+from tvm.target import Target
+
+from mlc_chat.compiler_pass.dispatch_tuned_kernels import DispatchTunedKernels
+from mlc_chat.support.tuning_database import create_tuning_database
+
+
+def _get_module():
+    @I.ir_module
+    class Module:
+        @T.prim_func
+        def add_one(A: T.Buffer((64, 64), "float32"), B: T.Buffer((64, 64), "float32")):
+            for i, j in T.grid(64, 64):
+                with T.block("B"):
+                    vi, vj = T.axis.remap("SS", [i, j])
+                    B[vi, vj] = A[vi, vj] + T.float32(1)
+
+        @R.function
+        def main(x: R.Tensor((64, 64), "float32")):
+            cls = Module
+            with R.dataflow():
+                y = R.call_tir(cls.add_one, (x,), out_sinfo=R.Tensor((64, 64), "float32"))
+                R.output(y)
+            return y
+
+    return Module
+
+
+def _is_scheduled(func: tir.PrimFunc) -> bool:
+    return func.attrs is not None and "tir.is_scheduled" in func.attrs
+
+
+def test_dispatch_tuned_kernels(tmp_path: Path):
+    target = Target("llvm")
+    (task,) = ms.relax_integration.extract_tasks(_get_module(), target)
+    sch = tir.Schedule(task.mod)
+    sch.parallel(sch.get_loops(sch.get_block("B"))[0])
+    database = create_tuning_database(tmp_path, target)
+    database.commit_tuning_record(
+        ms.database.TuningRecord(
+            sch.trace, database.commit_workload(task.mod), run_secs=[1e-6], target=target
+        )
+    )
+
+    mod = DispatchTunedKernels(target, tmp_path)(_get_module())
+    assert _is_scheduled(mod["add_one"])
+    assert "T.parallel" in mod["add_one"].script()
+    # The database is ignored for other targets, and no database is a no-op.
+    mod = DispatchTunedKernels(Target("llvm -mcpu=znver3"), tmp_path)(_get_module())
+    assert not _is_scheduled(mod["add_one"])
+    mod = DispatchTunedKernels(target, None)(_get_module())
+    assert not _is_scheduled(mod["add_one"])
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_dispatch_tuned_kernels(Path(tmp_dir))
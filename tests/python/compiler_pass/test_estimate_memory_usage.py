@@ -0,0 +1,102 @@
+# pylint: disable=invalid-name,missing-docstring,unused-variable
+from tvm.script import ir as I
+from tvm.script import relax as R
+from tvm.script import tir as T
+
+from mlc_chat.compiler_pass.estimate_memory_usage import AttachMetadataWithMemoryUsage
+
+
+def _get_module():
+    @I.ir_module
+    class Module:
+        @R.function(pure=False)
+        def main(x: R.Tensor(("n", 4), "float32")):
+            R.func_attr({"tir_var_upper_bound": {"n": 8}})
+            n = T.int64()
+            storage = R.memory.alloc_storage(
+                R.shape([1024]), R.prim_value(0), R.str("global"), R.dtype("float32")
+            )
+            a = R.memory.alloc_tensor(storage, R.prim_value(0), R.shape([256]), R.dtype("float32"))
+            _0 = R.call_packed("test.fill", a, sinfo_args=R.Object)
+            b = R.builtin.alloc_tensor(R.shape([n, 4]), R.dtype("float32"), R.prim_value(0))
+            # The last use of the storage, which is released afterwards.
+            _1 = R.call_packed("test.copy", a, b, sinfo_args=R.Object)
+            c = R.builtin.alloc_tensor(R.shape([64]), R.dtype("float32"), R.prim_value(0))
+            _2 = R.call_packed("test.copy", b, c, sinfo_args=R.Object)
+            return c
+
+    return Module
+
+
+def test_peak_memory_usage():
+    metadata = {}
+    AttachMetadataWithMemoryUsage(metadata)(_get_module())
+    # The storage (1024 bytes) and `b` (8 * 4 * 4 bytes) are alive at the same time, while
+    # `c` (256 bytes) is allocated after the storage is released.
+    assert metadata["memory_usage"] == {"main": 1024 + 128}
+    assert metadata["memory_usage_breakdown"]["main"] == {
+        "peak_bytes": 1024 + 128,
+        "total_bytes": 1024 + 128 + 256,
+        "num_allocs": 3,
+        "num_unbounded_allocs": 0,
+    }
+
+
+def test_unbounded_memory_usage():
+    mod = _get_module()
+    mod["main"] = mod["main"].with_attr("tir_var_upper_bound", {})
+    metadata = {}
+    AttachMetadataWithMemoryUsage(metadata)(mod)
+    assert metadata["memory_usage_breakdown"]["main"] == {
+        "peak_bytes": 1024,
+        "total_bytes": 1024 + 256,
+        "num_allocs": 3,
+        "num_unbounded_allocs": 1,
+    }
+
+
+def test_reshape_memory_usage():
+    @I.ir_module
+    class Module:
+        @R.function(pure=False)
+        def main(x: R.Tensor((8, 4), "float32")):
+            a = R.builtin.alloc_tensor(R.shape([8, 32]), R.dtype("float32"), R.prim_value(0))
+            _0 = R.call_packed("test.fill", a, sinfo_args=R.Object)
+            a_flat = R.reshape(a, R.shape([256]))
+            b = R.builtin.alloc_tensor(R.shape([64]), R.dtype("float32"), R.prim_value(0))
+            # `a` is read through its reshape after `b` is allocated.
+            _1 = R.call_packed("test.copy", a_flat, b, sinfo_args=R.Object)
+            return b
+
+    metadata = {}
+    AttachMetadataWithMemoryUsage(metadata)(Module)
+    assert metadata["memory_usage"] == {"main": 1024 + 256}
+
+
+def test_if_memory_usage():
+    @I.ir_module
+    class Module:
+        @R.function(pure=False)
+        def main(x: R.Tensor((8, 4), "float32"), cond: R.Tensor((), "bool")):
+            a = R.builtin.alloc_tensor(R.shape([256]), R.dtype("float32"), R.prim_value(0))
+            _0 = R.call_packed("test.fill", a, sinfo_args=R.Object)
+            if cond:
+                t = R.builtin.alloc_tensor(R.shape([32]), R.dtype("float32"), R.prim_value(0))
+                y = t
+            else:
+                y = a
+            b = R.builtin.alloc_tensor(R.shape([64]), R.dtype("float32"), R.prim_value(0))
+            # `y` refers to either `a` or `t`, both of which are alive until here.
+            _1 = R.call_packed("test.copy", y, b, sinfo_args=R.Object)
+            return b
+
+    metadata = {}
+    AttachMetadataWithMemoryUsage(metadata)(Module)
+    assert metadata["memory_usage"] == {"main": 1024 + 128 + 256}
+
+
+if __name__ == "__main__":
+    test_peak_memory_usage()
+    test_unbounded_memory_usage()
+    test_reshape_memory_usage()
+    test_if_memory_usage()
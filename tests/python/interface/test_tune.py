@@ -0,0 +1,150 @@
+# pylint: disable=invalid-name,missing-docstring
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import tvm
+from tvm import IRModule, relax, tir
+from tvm.ir.transform import Pass
+from tvm.script import tir as T
+from tvm.target import Target
+
+from mlc_chat.interface.compile import (  # pylint: disable=redefined-builtin
+    CompileArgs,
+    compile,
+)
+from mlc_chat.interface.compiler_flags import ModelConfigOverride, OptimizationFlags
+from mlc_chat.interface.tune import _is_hot, tune
+from mlc_chat.model import MODEL_PRESETS, MODELS
+from mlc_chat.quantization import QUANTIZATION
+from mlc_chat.support.tuning_database import load_tuning_database
+
+
+@T.prim_func
+def gemv(
+    A: T.Buffer((1, 64), "float32"),
+    W: T.Buffer((64, 64), "float32"),
+    B: T.Buffer((1, 64), "float32"),
+):
+    for i, j, k in T.grid(1, 64, 64):
+        with T.block("B"):
+            vi, vj, vk = T.axis.remap("SSR", [i, j, k])
+            with T.init():
+                B[vi, vj] = T.float32(0)
+            B[vi, vj] = B[vi, vj] + A[vi, vk] * W[vj, vk]
+
+
+@T.prim_func
+def batch_gemv(var_A: T.handle, W: T.Buffer((64, 64), "float32"), var_B: T.handle):
+    batch_size = T.int64()
+    A = T.match_buffer(var_A, (batch_size, 64), "float32")
+    B = T.match_buffer(var_B, (batch_size, 64), "float32")
+    for i, j, k in T.grid(batch_size, 64, 64):
+        with T.block("B"):
+            vi, vj, vk = T.axis.remap("SSR", [i, j, k])
+            with T.init():
+                B[vi, vj] = T.float32(0)
+            B[vi, vj] = B[vi, vj] + A[vi, vk] * W[vj, vk]
+
+
+@T.prim_func
+def add_one(A: T.Buffer((1, 64), "float32"), B: T.Buffer((1, 64), "float32")):
+    for i, j in T.grid(1, 64):
+        with T.block("B"):
+            vi, vj = T.axis.remap("SS", [i, j])
+            B[vi, vj] = A[vi, vj] + T.float32(1)
+
+
+def test_is_hot():
+    assert _is_hot(gemv)
+    # Scheduled kernels, kernels with dynamic shapes and kernels without reduction are
+    # not tuned.
+    assert not _is_hot(gemv.with_attr("tir.is_scheduled", 1))
+    assert not _is_hot(batch_gemv)
+    assert not _is_hot(add_one)
+
+
+@tvm.instrument.pass_instrument
+class _CountTunedKernels:
+    """Count the kernels dispatched to the tuning database."""
+
+    def __init__(self) -> None:
+        self.num_scheduled_before: Optional[int] = None
+        self.num_scheduled_after: Optional[int] = None
+
+    @staticmethod
+    def _num_scheduled(mod: IRModule) -> int:
+        return sum(
+            isinstance(func, tir.PrimFunc)
+            and func.attrs is not None
+            and "tir.is_scheduled" in func.attrs
+            for func in mod.functions.values()
+        )
+
+    def run_before_pass(self, mod: IRModule, info: tvm.transform.PassInfo) -> None:
+        if info.name == "DispatchTunedKernels":
+            self.num_scheduled_before = self._num_scheduled(mod)
+
+    def run_after_pass(self, mod: IRModule, info: tvm.transform.PassInfo) -> None:
+        if info.name == "DispatchTunedKernels":
+            self.num_scheduled_after = self._num_scheduled(mod)
+
+
+def test_tune_and_compile(tmp_path: Path):
+    config = dict(MODEL_PRESETS["llama2_7b"])
+    config.update(
+        hidden_size=64,
+        intermediate_size=128,
+        num_attention_heads=2,
+        num_key_value_heads=2,
+        num_hidden_layers=1,
+        vocab_size=256,
+        context_window_size=128,
+        prefill_chunk_size=64,
+        max_batch_size=2,
+    )
+    target = Target("llvm -num-cores=4")
+    tune(
+        config=dict(config),
+        quantization=QUANTIZATION["q0f32"],
+        model_type=MODELS["llama"],
+        target=target,
+        opt=OptimizationFlags.from_str("O0"),
+        output=tmp_path / "db",
+        overrides=ModelConfigOverride(),
+        num_trials=16,
+        num_trials_per_task=2,
+    )
+    database = load_tuning_database(tmp_path / "db", target)
+    assert database is not None and len(database) > 0
+
+    counter = _CountTunedKernels()
+
+    def _build(mod: IRModule, args: CompileArgs, pipeline: Pass) -> None:
+        ctx = tvm.transform.PassContext.current()
+        with tvm.transform.PassContext(
+            opt_level=ctx.opt_level, instruments=[counter], config=ctx.config
+        ):
+            executable = relax.build(mod, target=args.target, pipeline=pipeline)
+        executable.export_library(str(args.output))
+
+    compile(
+        config=dict(config),
+        quantization=QUANTIZATION["q0f32"],
+        model_type=MODELS["llama"],
+        target=target,
+        opt=OptimizationFlags.from_str("O0"),
+        build_func=_build,
+        system_lib_prefix="",
+        output=tmp_path / "lib.so",
+        overrides=ModelConfigOverride(),
+        tuning_database=tmp_path / "db",
+    )
+    assert counter.num_scheduled_after > counter.num_scheduled_before
+    assert (tmp_path / "lib.so").is_file()
+
+
+if __name__ == "__main__":
+    test_is_hot()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_tune_and_compile(Path(tmp_dir))
@@ -0,0 +1,63 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring
+import json
+import struct
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from mlc_chat.loader.utils import load_safetensor_shard, read_safetensor_header
+
+
+def _write_safetensor(path: Path, tensors: Dict[str, Tuple[str, np.ndarray]]) -> None:
+    header = {"__metadata__": {"format": "pt"}}
+    data = b""
+    for name, (dtype, value) in tensors.items():
+        raw = value.tobytes()
+        header[name] = {
+            "dtype": dtype,
+            "shape": list(value.shape),
+            "data_offsets": [len(data), len(data) + len(raw)],
+        }
+        data += raw
+    header_bytes = json.dumps(header).encode("utf-8")
+    with path.open("wb") as o_f:
+        o_f.write(struct.pack("<Q", len(header_bytes)))
+        o_f.write(header_bytes)
+        o_f.write(data)
+
+
+def test_load_safetensor_shard(tmp_path):
+    rng = np.random.default_rng(0)
+    f32 = rng.standard_normal((4, 8)).astype("float32")
+    # The bfloat16 bits are the upper half of float32 bits.
+    bf16_bits = (f32.view("uint32") >> 16).astype("uint16")
+    tensors = {
+        "w_f16": ("F16", rng.standard_normal((3, 5)).astype("float16")),
+        "w_bf16": ("BF16", bf16_bits),
+        "w_i32": ("I32", rng.integers(-100, 100, (7,)).astype("int32")),
+        "w_unused": ("F32", f32),
+    }
+    path = tmp_path / "model.safetensors"
+    _write_safetensor(path, tensors)
+
+    _, header = read_safetensor_header(path)
+    assert set(header.keys()) == set(tensors.keys())
+
+    params = dict(load_safetensor_shard(path, names={"w_f16", "w_bf16", "w_i32"}))
+    assert set(params.keys()) == {"w_f16", "w_bf16", "w_i32"}
+    np.testing.assert_equal(params["w_f16"], tensors["w_f16"][1])
+    np.testing.assert_equal(params["w_i32"], tensors["w_i32"][1])
+    assert params["w_bf16"].dtype == "float32"
+    np.testing.assert_equal(params["w_bf16"], (bf16_bits.astype("uint32") << 16).view("float32"))
+    np.testing.assert_allclose(params["w_bf16"], f32, rtol=1e-2)
+    # The views are copy-on-write, which do not modify the file.
+    params["w_f16"][0, 0] = 0
+    np.testing.assert_equal(dict(load_safetensor_shard(path))["w_f16"], tensors["w_f16"][1])
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_load_safetensor_shard(Path(tmp_dir))
@@ -1,12 +1,19 @@
 # pylint: disable=line-too-long,missing-docstring
+import numpy as np
 import tvm
+import tvm.testing
 from tvm import tir
 from tvm.relax.frontend.nn import core, modules, spec
 from tvm.script import ir as I
 from tvm.script import relax as R
 from tvm.script import tir as T
 
-from mlc_chat.nn.kv_cache import FlashInferPagedKVCache, PagedKVCache, RopeMode
+from mlc_chat.nn.kv_cache import (
+    FlashInferPagedKVCache,
+    PagedKVCache,
+    RopeMode,
+    _attention_decode_cpu,
+)
 
 # mypy: disable-error-code="attr-defined"
 # pylint: disable=invalid-name,unused-argument,too-many-locals,too-many-statements
@@ -203,5 +210,53 @@ def test_nn_module_paged_kv_cache():
     tvm.ir.assert_structural_equal(tvm_mod, Module, True)
 
 
+def test_cpu_attention_decode():
+    num_qo_heads, num_kv_heads, head_dim = 4, 2, 64
+    func = _attention_decode_cpu(num_kv_heads, num_qo_heads, head_dim, "float32")
+    lib = tvm.build(func.with_attr("global_symbol", "decode"), target="llvm")
+
+    np.random.seed(0)
+    # Sequence 0 occupies pages 0 and 2 with 20 tokens, and sequence 1 occupies page 1.
+    page_indptr = np.array([0, 2, 3], dtype="int32")
+    page_values = np.array([0, 2, 1], dtype="int32")
+    last_page_len = np.array([4, 5], dtype="int32")
+    pages = np.random.uniform(-1, 1, (3, 2, num_kv_heads, 16, head_dim)).astype("float32")
+    q = np.random.uniform(-1, 1, (2, num_qo_heads, head_dim)).astype("float32")
+    output = tvm.nd.empty((2, num_qo_heads, head_dim), "float32")
+    lse = tvm.nd.empty((2, num_qo_heads), "float32")
+    zeros = tvm.nd.array(np.zeros((2,), "int32"))
+    lib["decode"](
+        0,
+        tvm.nd.array(q),
+        tvm.nd.array(pages),
+        tvm.nd.array(page_indptr),
+        tvm.nd.array(page_values),
+        tvm.nd.array(last_page_len),
+        zeros,
+        zeros,
+        output,
+        lse,
+        0,
+        1.0,
+        1e4,
+        1.0,
+    )
+
+    for b, seq_len in enumerate([20, 5]):
+        kv = np.concatenate(
+            [pages[page] for page in page_values[page_indptr[b] : page_indptr[b + 1]]], axis=2
+        )
+        for h in range(num_qo_heads):
+            k, v = kv[0, h // 2, :seq_len], kv[1, h // 2, :seq_len]
+            # The kernel computes the softmax in base 2.
+            score = k @ q[b, h] / np.sqrt(head_dim) * np.log2(np.e)
+            prob = np.exp2(score - score.max())
+            tvm.testing.assert_allclose(
+                output.numpy()[b, h], prob @ v / prob.sum(), rtol=1e-5, atol=1e-5
+            )
+            tvm.testing.assert_allclose(lse.numpy()[b, h], np.log2(np.exp2(score).sum()), rtol=1e-5)
+
+
 if __name__ == "__main__":
     test_nn_module_paged_kv_cache()
+    test_cpu_attention_decode()
@@ -679,25 +679,79 @@ def test_openai_v1_completions_invalid_logprobs(
     assert response.json()["detail"][0]["msg"].endswith('"top_logprobs" must be in range [0, 5]')
 
 
-def test_openai_v1_completions_unsupported_args(
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("best_of", [None, 4])
+def test_openai_v1_completions_n(
+    served_model: Tuple[str, str],
+    launch_server,  # pylint: disable=unused-argument
+    stream: bool,
+    best_of: Optional[int],
+):
+    # `served_model` and `launch_server` are pytest fixtures
+    # defined in conftest.py.
+
+    if stream and best_of is not None:
+        pytest.skip("best_of larger than n is not supported when streaming")
+
+    n = 2
+    max_tokens = 64
+    payload = {
+        "model": served_model[0],
+        "prompt": "What is the meaning of life?",
+        "max_tokens": max_tokens,
+        "n": n,
+        "stream": stream,
+    }
+    if best_of is not None:
+        payload["best_of"] = best_of
+
+    response = requests.post(OPENAI_V1_COMPLETION_URL, json=payload, timeout=60)
+    if not stream:
+        check_openai_nonstream_response(
+            response.json(),
+            is_chat_completion=False,
+            model=served_model[0],
+            object_str="text_completion",
+            num_choices=n,
+            finish_reason="length",
+            # All the generated candidates are counted.
+            completion_tokens=max_tokens * (best_of if best_of is not None else n),
+        )
+    else:
+        responses = []
+        for chunk in response.iter_lines(chunk_size=512):
+            if not chunk or chunk == b"data: [DONE]":
+                continue
+            responses.append(json.loads(chunk.decode("utf-8")[6:]))
+        check_openai_stream_response(
+            responses,
+            is_chat_completion=False,
+            model=served_model[0],
+            object_str="text_completion",
+            num_choices=n,
+            finish_reason="length",
+            completion_tokens=max_tokens * n,
+        )
+
+
+def test_openai_v1_completions_invalid_n(
     served_model: Tuple[str, str],
     launch_server,  # pylint: disable=unused-argument
 ):
     # `served_model` and `launch_server` are pytest fixtures
     # defined in conftest.py.
 
-    # Right now "best_of" is unsupported.
-    best_of = 2
     payload = {
         "model": served_model[0],
         "prompt": "What is the meaning of life?",
         "max_tokens": 256,
-        "best_of": best_of,
+        "n": 2,
+        "best_of": 1,
     }
 
     response = requests.post(OPENAI_V1_COMPLETION_URL, json=payload, timeout=60)
-    error_msg_prefix = 'Request fields "best_of" are not supported right now.'
-    expect_error(response.json(), msg_prefix=error_msg_prefix)
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["msg"].endswith('"best_of" must be no less than "n"')
 
 
 def test_openai_v1_completions_request_cancellation(
@@ -1018,7 +1072,10 @@ if __name__ == "__main__":
     test_openai_v1_completions_prompt_overlong(MODEL, None, stream=True)
     test_openai_v1_completions_invalid_logprobs(MODEL, None, stream=False)
     test_openai_v1_completions_invalid_logprobs(MODEL, None, stream=True)
-    test_openai_v1_completions_unsupported_args(MODEL, None)
+    test_openai_v1_completions_n(MODEL, None, stream=False, best_of=None)
+    test_openai_v1_completions_n(MODEL, None, stream=True, best_of=None)
+    test_openai_v1_completions_n(MODEL, None, stream=False, best_of=4)
+    test_openai_v1_completions_invalid_n(MODEL, None)
     test_openai_v1_completions_request_cancellation(MODEL, None)
 
     for msg in CHAT_COMPLETION_MESSAGES:
@@ -0,0 +1,48 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring,missing-class-docstring
+import asyncio
+import threading
+from typing import List
+
+from mlc_chat.serve.async_tokenizer import AsyncTokenizer
+
+
+class _FakeTokenizer:
+    def __init__(self) -> None:
+        self.batch_sizes: List[int] = []
+        self.thread_ids: List[int] = []
+
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        self.batch_sizes.append(len(texts))
+        self.thread_ids.append(threading.get_ident())
+        return [[ord(ch) for ch in text] for text in texts]
+
+
+def test_async_tokenizer_coalesce():
+    tokenizer = _FakeTokenizer()
+    async_tokenizer = AsyncTokenizer(tokenizer, max_batch_size=64, batch_window=0.05)
+    texts = [f"prompt {i}" for i in range(10)]
+
+    async def run():
+        return await asyncio.gather(*[async_tokenizer.encode(text) for text in texts])
+
+    results = asyncio.run(run())
+    async_tokenizer.terminate()
+    assert results == [[ord(ch) for ch in text] for text in texts]
+    assert tokenizer.batch_sizes == [10]
+    assert tokenizer.thread_ids[0] != threading.get_ident()
+
+
+def test_async_tokenizer_max_batch_size():
+    tokenizer = _FakeTokenizer()
+    async_tokenizer = AsyncTokenizer(tokenizer, max_batch_size=4, batch_window=0.05)
+    texts = [str(i) for i in range(10)]
+
+    results = asyncio.run(async_tokenizer.encode_batch(texts))
+    async_tokenizer.terminate()
+    assert results == [[ord(ch) for ch in text] for text in texts]
+    assert tokenizer.batch_sizes == [4, 4, 2]
+
+
+if __name__ == "__main__":
+    test_async_tokenizer_coalesce()
+    test_async_tokenizer_max_batch_size()
@@ -0,0 +1,168 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring
+import json
+import math
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mlc_chat.interface.bench_serve import (
+    SLO,
+    OpenAIClient,
+    StubEngineClient,
+    assign_arrival_times,
+    bench_serve,
+    compute_metrics,
+    load_trace,
+    run_benchmark,
+    synthesize_requests,
+)
+
+
+class _FakeServerHandler(BaseHTTPRequestHandler):
+    """The OpenAI API-compatible endpoints that return `max_tokens` chunks of one
+    token each. The completions stream reports the usage in its last chunk, and
+    the prompt "fail" gets an HTTP error."""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = payload.get("prompt", payload.get("messages", [{}])[-1].get("content"))
+        if prompt == "fail":
+            self.send_response(503)
+            self.end_headers()
+            self.wfile.write(b"overloaded")
+            return
+        num_tokens = payload["max_tokens"]
+        self.send_response(200)
+        if not payload["stream"]:
+            body = json.dumps({"usage": {"completion_tokens": num_tokens}}).encode()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i in range(num_tokens):
+            chunk = {"choices": [{"index": 0, "delta": {"content": "x"}}]}
+            if self.path == "/v1/completions" and i == num_tokens - 1:
+                chunk["usage"] = {"completion_tokens": num_tokens}
+            self.wfile.write(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@contextmanager
+def _fake_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeServerHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_openai_client():
+    requests = synthesize_requests(num_requests=4, input_len=8, output_len=6, seed=0)
+    workload = assign_arrival_times(requests, request_rate=math.inf, process="poisson")
+    with _fake_server() as url:
+        for endpoint in ["chat", "completions"]:
+            client = OpenAIClient(url, model="fake", endpoint=endpoint, stream=True)
+            records, _ = run_benchmark(client, workload, max_concurrency=4)
+            for record in records:
+                assert record.success, record.error
+                assert record.num_output_tokens == 6
+                assert len(record.token_times) == 6
+                assert 0 <= record.ttft <= record.e2e_latency
+
+            client = OpenAIClient(url, model="fake", endpoint=endpoint, stream=False)
+            records, _ = run_benchmark(client, workload, max_concurrency=4)
+            for record in records:
+                assert record.success, record.error
+                assert record.num_output_tokens == 6
+                assert record.ttft is None
+
+        workload[0].prompt = "fail"
+        records, _ = run_benchmark(OpenAIClient(url, model="fake"), workload, max_concurrency=4)
+        assert records[0].error == "HTTP 503: overloaded"
+        assert all(record.success for record in records[1:])
+
+
+def test_assign_arrival_times():
+    requests = synthesize_requests(num_requests=200, input_len=8, output_len=4, seed=0)
+    for process in ["poisson", "gamma"]:
+        workload = assign_arrival_times(requests, request_rate=50.0, process=process, seed=0)
+        arrival_times = [request.arrival_time for request in workload]
+        assert arrival_times[0] == 0.0
+        assert arrival_times == sorted(arrival_times)
+        # The average rate is close to the requested rate.
+        assert 25.0 < len(workload) / arrival_times[-1] < 100.0
+    workload = assign_arrival_times(requests, request_rate=math.inf, process="poisson")
+    assert all(request.arrival_time == 0.0 for request in workload)
+    # The input requests are not modified.
+    assert all(request.arrival_time == 0.0 for request in requests)
+
+
+def test_load_trace(tmp_path):
+    trace_path = tmp_path / "trace.jsonl"
+    with open(trace_path, "w", encoding="utf-8") as o_f:
+        for timestamp in [10.5, 10.0, 12.0]:
+            o_f.write(json.dumps({"prompt": "hi", "max_tokens": 2, "timestamp": timestamp}) + "\n")
+    requests = assign_arrival_times(load_trace(trace_path), request_rate=1.0, process="trace")
+    assert [request.arrival_time for request in requests] == [0.0, 0.5, 2.0]
+
+
+def test_stub_engine_streaming():
+    requests = synthesize_requests(num_requests=8, input_len=16, output_len=5, seed=0)
+    workload = assign_arrival_times(requests, request_rate=200.0, process="poisson")
+    records, duration = run_benchmark(StubEngineClient(), workload, max_concurrency=4)
+    assert duration > 0
+    for record in records:
+        assert record.success
+        assert record.num_output_tokens == 5
+        assert len(record.token_times) == 5
+        assert len(record.itls) == 4
+        assert 0 <= record.ttft <= record.e2e_latency
+
+    metrics = compute_metrics(records, duration, SLO())
+    assert metrics["num_failed_requests"] == 0
+    assert metrics["slo_attainment"] == 1.0
+    assert metrics["goodput"] == metrics["request_throughput"]
+    for name in ["ttft", "itl", "tpot", "e2e_latency"]:
+        assert metrics[f"{name}_p50"] <= metrics[f"{name}_p99"]
+    # No request can finish in one microsecond.
+    metrics = compute_metrics(records, duration, SLO(e2e_latency=1e-6))
+    assert metrics["goodput"] == 0.0
+
+
+def test_stub_engine_non_streaming(tmp_path):
+    requests = synthesize_requests(num_requests=4, input_len=16, output_len=3, seed=0)
+    output = tmp_path / "results.json"
+    results = bench_serve(
+        client=StubEngineClient(stream=False),
+        requests=requests,
+        request_rates=[100.0, math.inf],
+        arrival_process="gamma",
+        burstiness=0.5,
+        max_concurrency=8,
+        slo=SLO(tpot=1.0),
+        seed=0,
+        output=output,
+    )
+    assert [rate for rate, _ in results] == [100.0, math.inf]
+    for _, metrics in results:
+        assert "ttft_p50" not in metrics
+        assert metrics["output_token_throughput"] > 0
+    with open(output, "r", encoding="utf-8") as i_f:
+        saved = json.load(i_f)
+    assert [entry["request_rate"] for entry in saved] == [100.0, "inf"]
+
+
+if __name__ == "__main__":
+    test_openai_client()
+    test_assign_arrival_times()
+    test_stub_engine_streaming()
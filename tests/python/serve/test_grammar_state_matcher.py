@@ -371,6 +371,41 @@ def test_reset(json_grammar: BNFGrammar):
     assert orig_result == result_after_reset
 
 
+def test_accept_token_rejected(json_grammar: BNFGrammar):
+    token_table = [
+        # fmt: off
+        "<s>", "</s>", "a", "abc", 'b"', '"', ':"', "{", "}", ", ", "6", ":", "\n", " ", '"a":true',
+        # fmt: on
+    ]
+    grammar_state_matcher = GrammarStateMatcher(json_grammar, token_table)
+    assert grammar_state_matcher.accept_token(token_table.index("{"))
+    orig_rejected = grammar_state_matcher.find_next_rejected_tokens()
+
+    # Rejected tokens leave the state unchanged.
+    assert not grammar_state_matcher.accept_token(token_table.index(':"'))
+    assert not grammar_state_matcher.accept_token(token_table.index("6"))
+    assert grammar_state_matcher.find_next_rejected_tokens() == orig_rejected
+    assert grammar_state_matcher.accept_token(token_table.index("}"))
+
+
+def test_accept_stop_token(json_grammar: BNFGrammar):
+    token_table = [
+        # fmt: off
+        "<s>", "</s>", "a", "abc", 'b"', '"', ':"', "{", "}", ", ", "6", ":", "\n", " ", '"a":true',
+        # fmt: on
+    ]
+    stop_token_id = token_table.index("</s>")
+    grammar_state_matcher = GrammarStateMatcher(json_grammar, token_table, 1)
+
+    assert not grammar_state_matcher.accept_token(stop_token_id)
+    for token in ["{", '"a":true', "}"]:
+        assert grammar_state_matcher.accept_token(token_table.index(token))
+    assert stop_token_id not in grammar_state_matcher.find_next_rejected_tokens()
+    assert grammar_state_matcher.accept_token(stop_token_id)
+    grammar_state_matcher.rollback(1)
+    assert stop_token_id not in grammar_state_matcher.find_next_rejected_tokens()
+
+
 if __name__ == "__main__":
     # Run a benchmark to show the performance before running tests
     test_find_rejected_tokens(
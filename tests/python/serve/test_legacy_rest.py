@@ -0,0 +1,121 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring,import-outside-toplevel
+import asyncio
+import gc
+import importlib
+import sys
+
+import numpy as np
+import pytest
+
+from mlc_chat.serve.legacy_rest import LegacyRESTEngine, ServerOverloadedError
+
+
+class _FakeEngine:
+    """The engine that generates "x" for every token up to `max_tokens`, yielding to the event
+    loop between tokens, and embeds each prompt to its length, in place of AsyncThreadedEngine."""
+
+    conv_template_name = "llama-2"
+    max_single_sequence_length = 4096
+
+    def __init__(self) -> None:
+        self.async_tokenizer = self
+
+    async def encode_batch(self, texts):
+        return [[1] * len(text.split()) for text in texts]
+
+    async def generate(self, prompt, generation_config, request_id):
+        for i in range(generation_config.max_tokens):
+            await asyncio.sleep(0)
+            finish_reason = "length" if i == generation_config.max_tokens - 1 else None
+            yield [("x", 1, None, finish_reason)] * generation_config.n
+
+    async def embed(self, prompts):
+        return np.array([[len(prompt)] for prompt in prompts], dtype="float32")
+
+    def terminate(self) -> None:
+        pass
+
+
+def _create_engine(max_pending_requests: int) -> LegacyRESTEngine:
+    return LegacyRESTEngine(_FakeEngine(), max_pending_requests=max_pending_requests)
+
+
+def test_admission():
+    async def _test():
+        engine = _create_engine(max_pending_requests=2)
+        config = engine.get_generation_config(max_tokens=3)
+        # The requests are admitted before their streams are iterated.
+        stream0 = engine.generate([1], config)
+        stream1 = engine.generate([1], config)
+        assert engine.num_pending_requests == 2
+        with pytest.raises(ServerOverloadedError):
+            engine.generate([1], config)
+        with pytest.raises(ServerOverloadedError):
+            await engine.generate_all([1], config)
+        assert engine.stats()["num_rejected_requests"] == 2
+
+        # The slot is released after the stream finishes, or when the stream is dropped
+        # without being iterated.
+        assert "".join([delta_text async for delta_text in stream0]) == "xxx"
+        assert engine.num_pending_requests == 1
+        del stream1
+        gc.collect()
+        assert engine.num_pending_requests == 0
+
+        output_texts, usage = await engine.generate_all([1, 2], config, n=2)
+        assert output_texts == ["xxx", "xxx"]
+        assert (usage.prompt_tokens, usage.completion_tokens, usage.total_tokens) == (2, 6, 8)
+        assert engine.num_pending_requests == 0
+        with pytest.raises(ServerOverloadedError):
+            await engine.generate_all([1], config, n=3)
+        assert engine.num_pending_requests == 0
+
+    asyncio.run(_test())
+
+
+def test_rest_admission(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(sys, "argv", ["mlc_chat.rest", "--model", "dist/fake", "--engine"])
+    rest = importlib.import_module("mlc_chat.rest")
+    engine = _create_engine(max_pending_requests=1)
+    monkeypatch.setitem(rest.session, "engine", engine)
+    # The lifespan of the app, which loads the model, is not run outside the context manager.
+    client = TestClient(rest.app)
+
+    for path, payload in [
+        ("/v1/chat/completions", {"messages": [{"role": "user", "content": "hi"}]}),
+        ("/v1/completions", {"prompt": "hi"}),
+    ]:
+        payload["max_gen_len"] = 3
+        for stream in [False, True]:
+            payload["stream"] = stream
+            admission = engine.admit()
+            response = client.post(path, json=payload)
+            assert response.status_code == 429
+            assert response.headers["Retry-After"] == "1"
+            admission.release()
+
+            response = client.post(path, json=payload)
+            assert response.status_code == 200
+            if stream:
+                assert response.text.endswith("data: [DONE]\n\n")
+            assert engine.num_pending_requests == 0
+            if not stream:
+                assert response.json()["usage"]["completion_tokens"] == 3
+
+    # Invalid requests are rejected with status 400.
+    response = client.post(
+        "/v1/chat/completions", json={"messages": [{"role": "tool", "content": "hi"}]}
+    )
+    assert response.status_code == 400
+
+    # The engine embeds the inputs, each as a user message in the conversation template.
+    response = client.post("/v1/embeddings", json={"input": ["hi", "hi hi hi"]})
+    assert response.status_code == 200
+    embeddings = [item["embedding"] for item in response.json()["data"]]
+    assert embeddings[1][0] - embeddings[0][0] == 2
+
+
+if __name__ == "__main__":
+    test_admission()
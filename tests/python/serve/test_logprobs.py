@@ -0,0 +1,56 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring,protected-access
+from types import SimpleNamespace
+
+import numpy as np
+
+from mlc_chat.serve.data import TokenLogProbs
+from mlc_chat.serve.entrypoints import openai_entrypoints
+
+
+def _token_logprobs(token_ids, logprobs):
+    return TokenLogProbs(np.array(token_ids, dtype="int32"), np.array(logprobs, dtype="float32"))
+
+
+def test_token_logprobs_concat():
+    first = _token_logprobs([[1, 1, 2]], [[-0.5, -0.5, -1.0]])
+    second = _token_logprobs([[2, 0, 2], [0, 0, 1]], [[-2.0, -0.25, -2.0], [-0.25, -0.25, -3.0]])
+    merged = TokenLogProbs.concat([first, second])
+    assert merged.token_ids.tolist() == [[1, 1, 2], [2, 0, 2], [0, 0, 1]]
+    assert merged.logprobs[:, 0].tolist() == [-0.5, -2.0, -0.25]
+    assert TokenLogProbs.concat([first]) is first
+
+
+def test_get_logprobs():
+    async_engine = SimpleNamespace(
+        logprob_token_table=[("a", [97]), ("bc", [32, 98, 99]), ("", [10])]
+    )
+    logprobs = openai_entrypoints._get_logprobs(
+        async_engine, _token_logprobs([[1, 1, 2], [2, 2, 0]], [[-0.5, -0.5, -1.0], [-1, -1, -2]])
+    )
+    assert logprobs is not None
+    content = logprobs.model_dump()["content"]
+    assert content[0] == {
+        "token": "bc",
+        "logprob": -0.5,
+        "bytes": [32, 98, 99],
+        "top_logprobs": [
+            {"token": "bc", "logprob": -0.5, "bytes": [32, 98, 99]},
+            {"token": "", "logprob": -1.0, "bytes": [10]},
+        ],
+    }
+    assert content[1]["token"] == ""
+    assert [top["token"] for top in content[1]["top_logprobs"]] == ["", "a"]
+    assert openai_entrypoints._get_logprobs(async_engine, None) is None
+
+
+def test_get_mean_logprob():
+    logprobs = _token_logprobs([[1], [2]], [[-1.0], [-2.0]])
+    assert openai_entrypoints._get_mean_logprob(logprobs) == -1.5
+    empty = TokenLogProbs(np.zeros((0, 1), "int32"), np.zeros((0, 1), "float32"))
+    assert openai_entrypoints._get_mean_logprob(empty) == float("-inf")
+
+
+if __name__ == "__main__":
+    test_token_logprobs_concat()
+    test_get_logprobs()
+    test_get_mean_logprob()
@@ -0,0 +1,57 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring
+from mlc_chat.serve.entrypoints.metrics_entrypoints import format_prometheus_metrics
+
+
+def _histogram():
+    return {"bounds": [0.1, 1.0], "counts": [1, 2, 3], "sum": 5.5, "count": 6}
+
+
+def _engine_metrics():
+    return {
+        "counters": {
+            "requests_added": 3,
+            "requests_finished": 2,
+            "requests_aborted": 1,
+            "prefill_tokens": 100,
+            "generated_tokens": 20,
+            "prefill_time": 1.5,
+            "decode_time": 2.0,
+        },
+        "gauges": {"waiting_requests": 0, "running_requests": 2, "kv_cache_utilization": 0.5},
+        "histograms": {
+            key: _histogram()
+            for key in [
+                "waiting_queue_size",
+                "running_batch_size",
+                "time_to_first_token",
+                "inter_token_latency",
+                "request_latency",
+                "prefill_throughput",
+                "decode_throughput",
+            ]
+        },
+    }
+
+
+def test_format_prometheus_metrics():
+    text = format_prometheus_metrics({"llama": _engine_metrics(), 'a"b': _engine_metrics()})
+    lines = text.splitlines()
+    assert text.endswith("\n")
+    assert "# TYPE mlc_requests_added_total counter" in lines
+    assert 'mlc_requests_added_total{model="llama"} 3' in lines
+    assert 'mlc_decode_time_seconds_total{model="llama"} 2.0' in lines
+    assert 'mlc_kv_cache_utilization{model="llama"} 0.5' in lines
+    # Label values are escaped.
+    assert 'mlc_running_requests{model="a\\"b"} 2' in lines
+    # Histogram buckets are cumulative and end with the +Inf bucket.
+    assert 'mlc_request_latency_seconds_bucket{model="llama",le="0.1"} 1' in lines
+    assert 'mlc_request_latency_seconds_bucket{model="llama",le="1.0"} 3' in lines
+    assert 'mlc_request_latency_seconds_bucket{model="llama",le="+Inf"} 6' in lines
+    assert 'mlc_request_latency_seconds_sum{model="llama"} 5.5' in lines
+    assert 'mlc_request_latency_seconds_count{model="llama"} 6' in lines
+    # Each metric has exactly one HELP and TYPE line.
+    assert sum(line.startswith("# TYPE mlc_request_latency_seconds ") for line in lines) == 1
+
+
+if __name__ == "__main__":
+    test_format_prometheus_metrics()
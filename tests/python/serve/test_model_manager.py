@@ -0,0 +1,157 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring,missing-class-docstring
+import asyncio
+import gc
+import weakref
+from typing import List, Optional
+
+import tvm
+import tvm.testing
+
+from mlc_chat.serve.engine import ModelInfo
+from mlc_chat.serve.server.model_manager import ModelManager
+
+
+class _FakeEngine:
+    def __init__(self, name: str, gpu_memory_budget_bytes: Optional[int]) -> None:
+        self.name = name
+        self.gpu_memory_budget_bytes = gpu_memory_budget_bytes
+        self.num_pending_requests = 0
+        self.terminated = False
+
+    def wait_until_initialized(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        self.terminated = True
+
+
+def _register_models(manager: ModelManager, names: List[str], engines: List[_FakeEngine]):
+    for name in names:
+
+        def _create_engine(budget: Optional[int], name=name) -> _FakeEngine:
+            engine = _FakeEngine(name, budget)
+            engines.append(engine)
+            return engine
+
+        model_info = ModelInfo(model=name, model_lib_path=f"{name}.so", device=tvm.cpu())
+        manager.register_model(name, model_info, _create_engine)
+
+
+async def _get_engine(manager: ModelManager, name: str) -> Optional[_FakeEngine]:
+    """Get the engine of a model without holding it."""
+    engine_hold = await manager.get_engine(name)
+    if engine_hold is None:
+        return None
+    engine_hold.release()
+    return engine_hold.engine
+
+
+def test_model_manager_lazy_load_and_lru_eviction():
+    manager = ModelManager(memory_budget_bytes=8 << 30, max_resident_models=2)
+    engines: List[_FakeEngine] = []
+    _register_models(manager, ["a", "b", "c"], engines)
+    assert not engines
+
+    async def run():
+        engine_a = await _get_engine(manager, "a")
+        engine_b = await _get_engine(manager, "b")
+        assert await _get_engine(manager, "a") is engine_a
+        # Loading "c" evicts "b", the least recently used model.
+        engine_c = await _get_engine(manager, "c")
+        return engine_a, engine_b, engine_c
+
+    engine_a, engine_b, engine_c = asyncio.run(run())
+    assert [engine.name for engine in engines] == ["a", "b", "c"]
+    assert engine_b.terminated and not engine_a.terminated and not engine_c.terminated
+    # The budget is split between the resident models.
+    assert all(engine.gpu_memory_budget_bytes == 4 << 30 for engine in engines)
+    assert manager.get_model_stats("b")["resident"] is False
+    assert manager.get_model_stats("b")["num_evictions"] == 1
+    assert manager.get_model_stats("a")["num_loads"] == 1
+    assert manager.get_model_stats("a")["avg_load_latency"] is not None
+    assert asyncio.run(manager.get_engine("unknown")) is None
+
+
+def test_model_manager_load_models():
+    manager = ModelManager(memory_budget_bytes=8 << 30, max_resident_models=2)
+    engines: List[_FakeEngine] = []
+    _register_models(manager, ["a", "b", "c"], engines)
+    # The models that fit are loaded in the order of registration.
+    manager.load_models()
+    assert [engine.name for engine in engines] == ["a", "b"]
+    assert asyncio.run(_get_engine(manager, "b")) is engines[1]
+    assert len(engines) == 2
+
+
+def test_model_manager_skip_busy_engine():
+    manager = ModelManager(memory_budget_bytes=8 << 30, max_resident_models=2)
+    engines: List[_FakeEngine] = []
+    _register_models(manager, ["a", "b", "c"], engines)
+
+    async def run():
+        engine_a = await _get_engine(manager, "a")
+        await _get_engine(manager, "b")
+        # "a" is least recently used but has pending requests.
+        engine_a.num_pending_requests = 1
+        await _get_engine(manager, "c")
+
+    asyncio.run(run())
+    assert [engine.terminated for engine in engines] == [False, True, False]
+
+
+def test_model_manager_hold_engine():
+    manager = ModelManager(memory_budget_bytes=8 << 30, max_resident_models=1)
+    engines: List[_FakeEngine] = []
+    _register_models(manager, ["a", "b"], engines)
+
+    async def _stream():
+        yield "x"
+
+    async def run():
+        # The held engine is not evicted, even if it has no pending requests.
+        hold_a = await manager.get_engine("a")
+        load_b = asyncio.create_task(manager.get_engine("b"))
+        await asyncio.sleep(0.3)
+        assert not load_b.done() and not hold_a.engine.terminated
+
+        # The stream holds the engine after the hold of the request is released.
+        stream = hold_a.hold_stream(_stream())
+        hold_a.release()
+        hold_a.release()
+        await asyncio.sleep(0.3)
+        assert not load_b.done()
+        assert [item async for item in stream] == ["x"]
+        hold_b = await load_b
+        assert hold_a.engine.terminated
+        hold_b.release()
+
+        # A stream that is never iterated releases its hold when it is collected.
+        hold_a = await manager.get_engine("a")
+        stream = hold_a.hold_stream(_stream())
+        hold_a.release()
+        del stream
+        gc.collect()
+        await manager.get_engine("b")
+
+    asyncio.run(run())
+    assert [engine.name for engine in engines] == ["a", "b", "a", "b"]
+    assert [engine.terminated for engine in engines] == [True, True, True, False]
+
+
+def test_model_manager_release_evicted_engine():
+    manager = ModelManager(memory_budget_bytes=8 << 30, max_resident_models=1)
+    engines: List[_FakeEngine] = []
+    _register_models(manager, ["a", "b"], engines)
+
+    async def run():
+        engine_ref = weakref.ref(await _get_engine(manager, "a"))
+        engines.clear()
+        await _get_engine(manager, "b")
+        return engine_ref
+
+    # The manager keeps no reference to the evicted engine.
+    assert asyncio.run(run())() is None
+
+
+if __name__ == "__main__":
+    tvm.testing.main()
@@ -1,7 +1,10 @@
 # pylint: disable=chained-comparison,line-too-long,missing-docstring,
 # pylint: disable=too-many-arguments,too-many-locals,unused-argument,unused-variable
 import asyncio
-from typing import List
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
 
 from mlc_chat.serve import AsyncThreadedEngine, GenerationConfig, KVCacheConfig
 from mlc_chat.serve.engine import ModelInfo
@@ -44,10 +47,11 @@ async def test_engine_generate():
     ):
         print(f"generate task for request {request_id}")
         rid = int(request_id)
-        async for delta_text, _, _, _ in async_engine.generate(
+        async for delta_outputs in async_engine.generate(
             prompt, generation_cfg, request_id=request_id
         ):
-            outputs[rid] += delta_text
+            assert len(delta_outputs) == 1 and delta_outputs[0] is not None
+            outputs[rid] += delta_outputs[0][0]
 
     tasks = [
         asyncio.create_task(
@@ -68,5 +72,134 @@ async def test_engine_generate():
     del async_engine
 
 
+async def test_engine_embed():
+    model = ModelInfo(
+        "dist/Llama-2-7b-chat-hf-q0f16-MLC",
+        model_lib_path="dist/Llama-2-7b-chat-hf-q0f16-MLC/Llama-2-7b-chat-hf-q0f16-MLC-cuda.so",
+    )
+    kv_cache_config = KVCacheConfig(page_size=16)
+    async_engine = AsyncThreadedEngine(model, kv_cache_config)
+
+    token_ids = await async_engine.async_tokenizer.encode_batch(prompts)
+    # Embed all prompts together in small batches, where prompts span batches.
+    embeddings = await async_engine.embed(token_ids, max_batch_tokens=7)
+    assert embeddings.shape[0] == len(prompts)
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-4)
+    # The batched embeddings are the same as embedding each prompt alone.
+    for i, prompt_token_ids in enumerate(token_ids):
+        embedding = await async_engine.embed([prompt_token_ids])
+        assert np.allclose(embedding[0], embeddings[i], atol=1e-3)
+
+    async_engine.terminate()
+    del async_engine
+
+
+async def test_engine_generate_n():
+    # Initialize model loading info and KV cache config
+    model = ModelInfo(
+        "dist/Llama-2-7b-chat-hf-q0f16-MLC",
+        model_lib_path="dist/Llama-2-7b-chat-hf-q0f16-MLC/Llama-2-7b-chat-hf-q0f16-MLC-cuda.so",
+    )
+    kv_cache_config = KVCacheConfig(page_size=16)
+    async_engine = AsyncThreadedEngine(model, kv_cache_config)
+
+    n = 4
+    max_tokens = 64
+    generation_cfg = GenerationConfig(temperature=1.0, max_tokens=max_tokens, n=n, seed=0)
+
+    # All the choices are generated in one request, sharing the prefilled prompt.
+    outputs: List[str] = ["" for _ in range(n)]
+    num_tokens: List[int] = [0 for _ in range(n)]
+    finish_reasons: List[Optional[str]] = [None for _ in range(n)]
+    async for delta_outputs in async_engine.generate(prompts[0], generation_cfg, request_id="0"):
+        assert len(delta_outputs) == n
+        for i, delta_output in enumerate(delta_outputs):
+            if delta_output is None:
+                continue
+            assert finish_reasons[i] is None
+            delta_text, num_delta_tokens, _, finish_reasons[i] = delta_output
+            outputs[i] += delta_text
+            num_tokens[i] += num_delta_tokens
+
+    assert all(finish_reason is not None for finish_reason in finish_reasons)
+    assert all(0 < num_choice_tokens <= max_tokens for num_choice_tokens in num_tokens)
+    # The choices are sampled with different seeds.
+    assert len(set(outputs)) > 1
+    for i, output in enumerate(outputs):
+        print(f"Output {i}:{output}\n")
+
+    async_engine.terminate()
+    del async_engine
+
+
+async def _generate_greedy(
+    detokenize_in_background: bool, block_event_loop_seconds: float = 0.0
+) -> Tuple[List[str], List[int], List[int], List[Optional[str]]]:
+    """Generate for all prompts greedily, and return the output text, the number of
+    tokens, the number of stream items and the finish reason of each request."""
+    model = ModelInfo(
+        "dist/Llama-2-7b-chat-hf-q0f16-MLC",
+        model_lib_path="dist/Llama-2-7b-chat-hf-q0f16-MLC/Llama-2-7b-chat-hf-q0f16-MLC-cuda.so",
+    )
+    kv_cache_config = KVCacheConfig(page_size=16)
+    async_engine = AsyncThreadedEngine(
+        model, kv_cache_config, detokenize_in_background=detokenize_in_background
+    )
+    async_engine.wait_until_initialized()
+
+    num_requests = len(prompts)
+    outputs: List[str] = ["" for _ in range(num_requests)]
+    num_tokens: List[int] = [0 for _ in range(num_requests)]
+    num_items: List[int] = [0 for _ in range(num_requests)]
+    finish_reasons: List[Optional[str]] = [None for _ in range(num_requests)]
+
+    async def generate_task(rid: int):
+        # Requests of different lengths, so that some finish while others are running.
+        generation_cfg = GenerationConfig(temperature=0.0, max_tokens=8 + 8 * rid)
+        async for delta_outputs in async_engine.generate(
+            prompts[rid], generation_cfg, request_id=str(rid)
+        ):
+            assert len(delta_outputs) == 1 and delta_outputs[0] is not None
+            assert finish_reasons[rid] is None
+            delta_text, num_delta_tokens, _, finish_reasons[rid] = delta_outputs[0]
+            outputs[rid] += delta_text
+            num_tokens[rid] += num_delta_tokens
+            num_items[rid] += 1
+
+    tasks = [asyncio.create_task(generate_task(i)) for i in range(num_requests)]
+    # Let all tasks add their requests, and then block the event loop, so that the
+    # engine keeps generating and finishing requests while no output is consumed.
+    await asyncio.sleep(0)
+    time.sleep(block_event_loop_seconds)
+    await asyncio.gather(*tasks)
+
+    async_engine.terminate()
+    del async_engine
+    return outputs, num_tokens, num_items, finish_reasons
+
+
+async def test_engine_detokenize_in_background():
+    outputs, num_tokens, _, finish_reasons = await _generate_greedy(detokenize_in_background=False)
+    bg_outputs, bg_num_tokens, bg_num_items, bg_finish_reasons = await _generate_greedy(
+        detokenize_in_background=True, block_event_loop_seconds=3.0
+    )
+    # The streamed text is the same whichever thread detokenizes, including the
+    # trailing text flushed by the streamer when a request finishes.
+    assert bg_outputs == outputs
+    assert bg_num_tokens == num_tokens
+    assert bg_finish_reasons == finish_reasons
+    assert all(finish_reason is not None for finish_reason in bg_finish_reasons)
+    # The outputs of the steps run while the event loop was blocked are coalesced,
+    # and the requests finished meanwhile are delivered in one item.
+    assert any(
+        num_items < num_request_tokens
+        for num_items, num_request_tokens in zip(bg_num_items, bg_num_tokens)
+    )
+    assert bg_num_items[0] == 1
+
+
 if __name__ == "__main__":
     asyncio.run(test_engine_generate())
+    asyncio.run(test_engine_embed())
+    asyncio.run(test_engine_generate_n())
+    asyncio.run(test_engine_detokenize_in_background())
@@ -54,10 +54,11 @@ async def test_engine_generate():
     ):
         print(f"generate task for request {request_id}")
         rid = int(request_id)
-        async for delta_text, _, _, _ in async_engine.generate(
+        async for delta_outputs in async_engine.generate(
             prompt, generation_cfg, request_id=request_id
         ):
-            outputs[rid] += delta_text
+            assert len(delta_outputs) == 1 and delta_outputs[0] is not None
+            outputs[rid] += delta_outputs[0][0]
 
     tasks = [
         asyncio.create_task(
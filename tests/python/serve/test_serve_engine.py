@@ -6,6 +6,7 @@ import numpy as np
 
 from mlc_chat.serve import (
     Engine,
+    EngineMode,
     GenerationConfig,
     KVCacheConfig,
     Request,
@@ -384,9 +385,97 @@ def test_engine_generate():
         print(f"Output {req_id}:{output}\n")
 
 
+def test_engine_prefix_cache():
+    # Initialize model loading info and KV cache config
+    model = ModelInfo(
+        "dist/Llama-2-7b-chat-hf-q0f16-MLC",
+        model_lib_path="dist/Llama-2-7b-chat-hf-q0f16-MLC/Llama-2-7b-chat-hf-q0f16-MLC-cuda.so",
+    )
+    kv_cache_config = KVCacheConfig(page_size=16, prefix_cache_max_num_entries=8)
+    # Create engine
+    engine = Engine(model, kv_cache_config)
+
+    system_prompt = (
+        "You are a helpful, respectful and honest assistant. Always answer as helpfully "
+        "as possible, while being safe. Please ensure that your responses are socially "
+        "unbiased and positive in nature. "
+    )
+    templated_prompts = [system_prompt + prompt for prompt in prompts[:4]]
+    # Greedy decoding, so that outputs with and without cached prefixes match.
+    generation_config = GenerationConfig(temperature=0.0, max_tokens=32)
+
+    # Generate the outputs one by one. The second request diverges from the
+    # first one after the system prompt, which caches the system prompt for
+    # the requests after it.
+    output_texts = []
+    for prompt in templated_prompts:
+        outputs, _ = engine.generate([prompt], generation_config)
+        output_texts.append(outputs[0])
+    stats = engine.stats()
+    # The first two of the four requests miss.
+    assert stats["prefix_cache_hit_rate"] == 0.5
+    assert stats["prefix_cache_hit_tokens"] > 0
+    assert stats["prefix_cache_num_entries"] <= 8
+
+    # The prompts are cached, so regenerate them altogether and compare.
+    regenerated_texts, _ = engine.generate(templated_prompts, generation_config)
+    for req_id, output in enumerate(regenerated_texts):
+        assert output == output_texts[req_id]
+    # All the identical prompts hit.
+    stats = engine.stats()
+    assert stats["prefix_cache_hit_rate"] == 0.75
+
+
+def test_engine_priority_scheduler():
+    # Initialize model loading info and KV cache config
+    model = ModelInfo(
+        "dist/Llama-2-7b-chat-hf-q0f16-MLC",
+        model_lib_path="dist/Llama-2-7b-chat-hf-q0f16-MLC/Llama-2-7b-chat-hf-q0f16-MLC-cuda.so",
+    )
+    # At most two requests run at a time, so that the others wait in the queue.
+    kv_cache_config = KVCacheConfig(page_size=16, max_num_sequence=2)
+    num_requests = 6
+    high_priority_ids = ["4", "5"]
+
+    # Record the order in which requests produce their first tokens.
+    first_token_order = []
+
+    def fcallback(delta_outputs: List[RequestStreamOutput]):
+        for delta_output in delta_outputs:
+            request_id, delta_token_ids, _, _ = delta_output.unpack()
+            if delta_token_ids and request_id not in first_token_order:
+                first_token_order.append(request_id)
+
+    engine = Engine(
+        model,
+        kv_cache_config,
+        engine_mode=EngineMode(scheduler="priority"),
+        request_stream_callback=fcallback,
+    )
+    for req_id, prompt in enumerate(prompts[:num_requests]):
+        engine.add_request(
+            Request(
+                request_id=str(req_id),
+                inputs=data.TextData(prompt),
+                generation_config=GenerationConfig(max_tokens=16),
+                priority=1 if str(req_id) in high_priority_ids else 0,
+            )
+        )
+    while len(first_token_order) < num_requests:
+        engine.step()
+
+    # The requests added last are admitted first for their higher priority.
+    assert sorted(first_token_order[:2]) == high_priority_ids
+    stats = engine.stats()
+    assert stats["queue_wait_by_class"]["priority:1"]["num_admitted"] == 2
+    assert stats["queue_wait_by_class"]["priority:0"]["num_admitted"] == 4
+
+
 if __name__ == "__main__":
     test_engine_basic()
     test_engine_continuous_batching_1()
     test_engine_continuous_batching_2()
     test_engine_continuous_batching_3()
     test_engine_generate()
+    test_engine_prefix_cache()
+    test_engine_priority_scheduler()
@@ -232,6 +232,37 @@ def test_engine_generate():
         print(f"Output {req_id}:{output}\n")
 
 
+def test_engine_adaptive_draft_length():
+    # Initialize model loading info and KV cache config
+    ssm = ModelInfo(
+        "dist/Llama-2-7b-chat-hf-q4f16_1-MLC",
+        model_lib_path="dist/Llama-2-7b-chat-hf-q4f16_1-MLC/Llama-2-7b-chat-hf-q4f16_1-MLC-cuda.so",
+    )
+    model = ModelInfo(
+        "dist/Llama-2-7b-chat-hf-q0f16-MLC",
+        model_lib_path="dist/Llama-2-7b-chat-hf-q0f16-MLC/Llama-2-7b-chat-hf-q0f16-MLC-cuda.so",
+    )
+    kv_cache_config = KVCacheConfig(page_size=16)
+    engine_mode = EngineMode(enable_speculative=True, spec_draft_length=4, spec_max_draft_length=8)
+    # Create engine
+    engine = Engine([model, ssm], kv_cache_config, engine_mode)
+
+    num_requests = 10
+    max_tokens = 128
+    output_texts, _ = engine.generate(
+        prompts[:num_requests], GenerationConfig(max_tokens=max_tokens)
+    )
+    assert len(output_texts) == num_requests
+
+    stats = engine.stats()
+    # Each verification accepts at most the maximum draft length of draft tokens.
+    assert 0 < len(stats["spec_accept_histogram"]) <= 9
+    assert sum(stats["spec_request_acceptance_rate_histogram"]) == num_requests
+    assert 1 <= stats["spec_avg_draft_length"] <= 8
+    print("draft acceptance histogram:", stats["spec_accept_histogram"])
+    print("average draft length:", stats["spec_avg_draft_length"])
+
+
 def test_engine_efficiency():
     """Test engine speculative decoding efficiency."""
 
@@ -368,5 +399,6 @@ if __name__ == "__main__":
     test_engine_basic()
     test_engine_continuous_batching_1()
     test_engine_generate()
+    test_engine_adaptive_draft_length()
     test_engine_efficiency()
     test_engine_spec_efficiency()
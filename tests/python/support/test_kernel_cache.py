@@ -0,0 +1,116 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring,invalid-name
+import os
+from pathlib import Path
+
+import numpy as np
+import tvm
+from tvm import IRModule
+from tvm.script import tir as T
+from tvm.target import Target
+
+from mlc_chat.support.kernel_cache import KernelCache
+
+
+def _scale_func(name: str, scale: float):
+    @T.prim_func
+    def func(A: T.Buffer((16,), "float32"), B: T.Buffer((16,), "float32")):
+        T.func_attr({"global_symbol": name, "tir.noalias": True})
+        for i in range(16):
+            with T.block("B"):
+                vi = T.axis.spatial(16, i)
+                B[vi] = A[vi] * T.float32(scale)
+
+    return func
+
+
+def _build_and_run(cache: KernelCache, tir_mod: IRModule, lib_path: Path):
+    lib = cache.build(tir_mod, Target("llvm"))
+    assert lib is not None
+    lib.export_library(str(lib_path))
+    loaded = tvm.runtime.load_module(str(lib_path))
+    a = tvm.nd.array(np.arange(16, dtype="float32"))
+    results = {}
+    for gvar in tir_mod.get_global_vars():
+        b = tvm.nd.empty((16,), "float32")
+        loaded[gvar.name_hint](a, b)
+        results[gvar.name_hint] = b.numpy()
+    return results
+
+
+def _num_entries(cache_dir: Path) -> int:
+    return len([path for path in cache_dir.iterdir() if not path.name.startswith(".")])
+
+
+def test_kernel_cache_reuse(tmp_path: Path):
+    cache = KernelCache(tmp_path / "kernel", num_workers=1)
+    tir_mod = IRModule({"double": _scale_func("double", 2.0), "triple": _scale_func("triple", 3.0)})
+    results = _build_and_run(cache, tir_mod, tmp_path / "lib0.so")
+    np.testing.assert_allclose(results["double"], np.arange(16) * 2.0)
+    np.testing.assert_allclose(results["triple"], np.arange(16) * 3.0)
+    assert _num_entries(cache.cache_dir) == 2
+
+    # Only the changed function is compiled.
+    tir_mod = IRModule({"double": _scale_func("double", 2.0), "triple": _scale_func("triple", 4.0)})
+    results = _build_and_run(cache, tir_mod, tmp_path / "lib1.so")
+    np.testing.assert_allclose(results["double"], np.arange(16) * 2.0)
+    np.testing.assert_allclose(results["triple"], np.arange(16) * 4.0)
+    assert _num_entries(cache.cache_dir) == 3
+    assert not list(cache.cache_dir.glob(".tmp-*"))
+
+
+def test_kernel_cache_parallel_compile(tmp_path: Path):
+    cache = KernelCache(tmp_path / "kernel", num_workers=4)
+    tir_mod = IRModule({f"scale{i}": _scale_func(f"scale{i}", float(i)) for i in range(4)})
+    results = _build_and_run(cache, tir_mod, tmp_path / "lib.so")
+    for i in range(4):
+        np.testing.assert_allclose(results[f"scale{i}"], np.arange(16) * float(i))
+    assert _num_entries(cache.cache_dir) == 4
+
+
+def test_kernel_cache_prune_lru(tmp_path: Path):
+    cache = KernelCache(tmp_path / "kernel", num_workers=1)
+    funcs = [_scale_func("scale", float(i)) for i in range(3)]
+    entries = [
+        cache.cache_dir / KernelCache.hash_key(func, "scale", Target("llvm")) for func in funcs
+    ]
+    for i, func in enumerate(funcs):
+        _build_and_run(cache, IRModule({"scale": func}), tmp_path / f"lib{i}.so")
+        os.utime(entries[i] / "meta.json", (1000 + i, 1000 + i))
+    # Reusing the oldest kernel makes it the most recently used.
+    _build_and_run(cache, IRModule({"scale": funcs[0]}), tmp_path / "lib.so")
+    assert [entry.lib_path for entry in cache.entries()] == [entries[0], entries[2], entries[1]]
+
+    nbytes = {entry.lib_path: entry.nbytes for entry in cache.entries()}
+    evicted = cache.prune(
+        max_size_gb=(nbytes[entries[0]] + nbytes[entries[2]]) / (1 << 30), dry_run=True
+    )
+    assert [entry.lib_path for entry in evicted] == [entries[1]]
+    assert entries[1].is_dir()
+    evicted = cache.prune(max_size_gb=nbytes[entries[0]] / (1 << 30))
+    assert [entry.lib_path for entry in evicted] == [entries[1], entries[2]]
+    assert [entry.lib_path for entry in cache.entries()] == [entries[0]]
+    assert not list(cache.cache_dir.glob(".tmp-*"))
+
+    # The kernels of the current build are kept even if they exceed the size limit.
+    cache = KernelCache(tmp_path / "kernel", num_workers=1, max_size_gb=0)
+    results = _build_and_run(cache, IRModule({"scale": funcs[2]}), tmp_path / "lib.so")
+    np.testing.assert_allclose(results["scale"], np.arange(16) * 2.0)
+    assert [entry.lib_path for entry in cache.entries()] == [entries[2]]
+
+
+def test_kernel_cache_is_supported():
+    assert KernelCache.is_supported(Target("cuda", host="llvm"), system_lib=False)
+    assert not KernelCache.is_supported(Target("cuda", host="llvm"), system_lib=True)
+    assert not KernelCache.is_supported(Target("webgpu", host="llvm -mtriple=wasm32"), False)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_kernel_cache_reuse(Path(tmp_dir))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_kernel_cache_parallel_compile(Path(tmp_dir))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_kernel_cache_prune_lru(Path(tmp_dir))
+    test_kernel_cache_is_supported()
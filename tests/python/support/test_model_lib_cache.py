@@ -0,0 +1,94 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from mlc_chat.support.model_lib_cache import FileLock, ModelLibCache
+
+
+def _compile_func(calls: List[Path], nbytes: int = 1024):
+    def _compile(dst: Path) -> None:
+        calls.append(dst)
+        time.sleep(0.1)
+        dst.write_bytes(b"\0" * nbytes)
+
+    return _compile
+
+
+def test_model_lib_cache_concurrent_compile(tmp_path):
+    cache = ModelLibCache(tmp_path)
+    key = {"model_type": "llama", "device": "cuda:0"}
+    calls: List[Path] = []
+    results: List[Path] = []
+
+    def _worker():
+        results.append(cache.get_or_compile(key, _compile_func(calls)))
+
+    threads = [threading.Thread(target=_worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(set(results)) == 1 and results[0].is_file()
+    assert not list(tmp_path.glob(".tmp-*"))
+    (entry,) = cache.entries()
+    assert entry.key == key and entry.nbytes == 1024
+
+
+def test_model_lib_cache_prune_lru(tmp_path):
+    cache = ModelLibCache(tmp_path)
+    calls: List[Path] = []
+    lib_paths = [
+        cache.get_or_compile({"index": i}, _compile_func(calls, nbytes=1 << 20)) for i in range(3)
+    ]
+    for i, lib_path in enumerate(lib_paths):
+        os.utime(lib_path, (1000 + i, 1000 + i))
+    # Hitting the oldest library makes it the most recently used.
+    assert cache.get_or_compile({"index": 0}, _compile_func(calls)) == lib_paths[0]
+    assert len(calls) == 3
+
+    evicted = cache.prune(max_size_gb=2 / 1024, dry_run=True)
+    assert [entry.lib_path for entry in evicted] == [lib_paths[1]]
+    assert lib_paths[1].is_file()
+    evicted = cache.prune(max_size_gb=1.5 / 1024)
+    assert [entry.lib_path for entry in evicted] == [lib_paths[1], lib_paths[2]]
+    assert [entry.lib_path for entry in cache.entries()] == [lib_paths[0]]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Lock files are not removed on Windows")
+def test_file_lock_unlink(tmp_path):
+    lock_path = tmp_path / "entry.lock"
+    holder = FileLock(lock_path)
+    holder.acquire()
+    waiter = FileLock(lock_path)
+    thread = threading.Thread(target=waiter.acquire)
+    thread.start()
+    # The waiter opens the lock file and blocks on it, before the holder removes it.
+    time.sleep(0.2)
+    holder.unlink()
+    holder.release()
+    thread.join()
+    # The waiter holds the lock of the new lock file, instead of the removed one.
+    assert lock_path.is_file()
+    assert not FileLock(lock_path).acquire(blocking=False)
+    waiter.release()
+    other = FileLock(lock_path)
+    assert other.acquire(blocking=False)
+    other.release()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_model_lib_cache_concurrent_compile(Path(tmp_dir))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_model_lib_cache_prune_lru(Path(tmp_dir))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_file_lock_unlink(Path(tmp_dir))
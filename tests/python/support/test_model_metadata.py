@@ -0,0 +1,48 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring
+from pathlib import Path
+from typing import List
+
+from mlc_chat.support import model_metadata
+
+METADATA = {
+    "params": [
+        {"name": "embed", "shape": ["vocab_size", 16], "dtype": "float16"},
+        {"name": "weight", "shape": [16, 16], "dtype": "float32"},
+    ],
+    "memory_usage": {"prefill": 100, "decode": 10},
+    "kv_cache_bytes": 0,
+}
+
+
+def test_read_metadata_cache(tmp_path, monkeypatch):
+    calls: List[Path] = []
+
+    def _extract_metadata(model_lib: Path):
+        calls.append(model_lib)
+        return METADATA
+
+    monkeypatch.setattr(model_metadata, "MLC_CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(model_metadata, "extract_metadata", _extract_metadata)
+    model_lib = tmp_path / "lib.so"
+    model_lib.write_bytes(b"lib")
+
+    assert model_metadata.read_metadata(model_lib) == METADATA
+    assert model_metadata.read_metadata(str(model_lib)) == METADATA
+    assert len(calls) == 1
+    # Recompiled libraries are read again.
+    model_lib.write_bytes(b"new lib")
+    assert model_metadata.read_metadata(model_lib) == METADATA
+    assert len(calls) == 2
+
+
+def test_compute_memory_usage():
+    params_bytes, temp_func_bytes, kv_cache_bytes = model_metadata.compute_memory_usage(
+        METADATA, {"vocab_size": 32}
+    )
+    assert params_bytes == 32 * 16 * 2 + 16 * 16 * 4
+    assert temp_func_bytes == 100
+    assert kv_cache_bytes == 0
+
+
+if __name__ == "__main__":
+    test_compute_memory_usage()
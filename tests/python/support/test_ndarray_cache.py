@@ -0,0 +1,43 @@
+# pylint: disable=missing-docstring
+import json
+
+import numpy as np
+import tvm
+from tvm.contrib import tvmjs
+
+from mlc_chat.support.ndarray_cache import NDArrayCacheWriter
+
+
+def test_ndarray_cache_writer(tmp_path):
+    rng = np.random.default_rng(0)
+    params = {
+        "small_f32": rng.standard_normal((16, 16)).astype("float32"),
+        "small_f16": rng.standard_normal((8,)).astype("float16"),
+        "q_weight": rng.integers(0, 2**31, (1024, 1024)).astype("uint32"),
+        "large_f16": rng.standard_normal((1024, 1024)).astype("float16"),
+    }
+    writer = NDArrayCacheWriter(tmp_path, encode_format="f32-to-bf16", shard_cap_mb=4)
+    for name, value in params.items():
+        writer.add(name, tvm.nd.array(value))
+    writer.finish(meta_data={"ParamSize": len(params)})
+
+    with open(tmp_path / "ndarray-cache.json", "r", encoding="utf-8") as i_f:
+        cache_json = json.load(i_f)
+    assert cache_json["metadata"] == {"ParamSize": len(params)}
+    # The 4MB parameter takes its own shard, and the others share one shard.
+    assert [len(shard["records"]) for shard in cache_json["records"]] == [1, 3]
+
+    loaded, _ = tvmjs.load_ndarray_cache(str(tmp_path), tvm.cpu())
+    for name, value in params.items():
+        if value.dtype == "float32":
+            np.testing.assert_allclose(loaded[name].numpy(), value, rtol=1e-2, atol=1e-2)
+        else:
+            np.testing.assert_equal(loaded[name].numpy(), value)
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_ndarray_cache_writer(Path(tmp_dir))
@@ -0,0 +1,48 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring
+import json
+
+from mlc_chat.support.timeline_recorder import DECODE, PREFILL, TimelineRecorder
+
+
+def test_timeline_recorder_ring_buffer():
+    recorder = TimelineRecorder(capacity=4)
+    recorder.record(PREFILL, 0, 0, 0, 100)
+    for step in range(1, 6):
+        recorder.record(DECODE, 0, step, step * 100, step * 100 + 10 * step)
+    assert len(recorder) == 4
+    # The oldest records are overwritten.
+    assert [record[2] for record in recorder.records()] == [2, 3, 4, 5]
+    summary = recorder.summary()
+    assert list(summary.keys()) == ["decode"]
+    assert summary["decode"]["count"] == 4
+    assert summary["decode"]["total_ms"] == (20 + 30 + 40 + 50) / 1e6
+    assert summary["decode"]["p50_ms"] == 30 / 1e6
+    assert summary["decode"]["p99_ms"] == 50 / 1e6
+
+
+def test_timeline_recorder_export(tmp_path):
+    recorder = TimelineRecorder()
+    recorder.record(PREFILL, 3, 0, 1000, 3000)
+    recorder.record(DECODE, 3, 1, 3000, 4000)
+
+    trace_path = tmp_path / "trace.json"
+    recorder.dump(trace_path)
+    events = json.loads(trace_path.read_text(encoding="utf-8"))["traceEvents"]
+    assert [event["name"] for event in events] == ["prefill", "decode"]
+    assert [event["dur"] for event in events] == [2.0, 1.0]
+    assert events[1]["tid"] == 3 and events[1]["args"] == {"step": 1}
+
+    energy_path = tmp_path / "energy_events.txt"
+    recorder.dump_energy_events(energy_path)
+    lines = [line.split() for line in energy_path.read_text(encoding="utf-8").splitlines()]
+    assert [name for name, _ in lines] == [
+        "chat.3.prefill.start",
+        "chat.3.prefill.end",
+        "chat.3.decode.1.start",
+        "chat.3.decode.1.end",
+    ]
+    assert int(lines[1][1]) - int(lines[0][1]) == 2000
+
+
+if __name__ == "__main__":
+    test_timeline_recorder_ring_buffer()
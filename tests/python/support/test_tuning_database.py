@@ -0,0 +1,46 @@
+# pylint: disable=missing-module-docstring,missing-function-docstring
+import json
+from pathlib import Path
+
+import pytest
+from tvm.target import Target
+
+from mlc_chat.support.tuning_database import (
+    create_tuning_database,
+    load_tuning_database,
+)
+
+
+def test_tuning_database_target(tmp_path: Path):
+    target = Target("llvm -mcpu=skylake", host="llvm")
+    create_tuning_database(tmp_path, target)
+    # The target host does not matter.
+    assert load_tuning_database(tmp_path, Target("llvm -mcpu=skylake")) is not None
+    assert load_tuning_database(tmp_path, Target("llvm -mcpu=znver3")) is None
+    # Existing databases are extended only for the same target.
+    create_tuning_database(tmp_path, Target("llvm -mcpu=skylake"))
+    with pytest.raises(ValueError):
+        create_tuning_database(tmp_path, Target("llvm -mcpu=znver3"))
+
+
+def test_tuning_database_version(tmp_path: Path):
+    target = Target("llvm")
+    create_tuning_database(tmp_path, target)
+    manifest_path = tmp_path / "tuning-db.json"
+    with manifest_path.open("r", encoding="utf-8") as in_file:
+        manifest = json.load(in_file)
+    manifest["version"] = 0
+    with manifest_path.open("w", encoding="utf-8") as out_file:
+        json.dump(manifest, out_file)
+    assert load_tuning_database(tmp_path, target) is None
+    with pytest.raises(ValueError):
+        load_tuning_database(tmp_path / "missing", target)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_tuning_database_target(Path(tmp_dir))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_tuning_database_version(Path(tmp_dir))